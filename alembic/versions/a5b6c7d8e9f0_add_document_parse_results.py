@@ -0,0 +1,42 @@
+"""add document parse results
+
+Revision ID: a5b6c7d8e9f0
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5b6c7d8e9f0'
+down_revision: Union[str, None] = 'f4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 按 (租户, 文件哈希, 解析器版本) 缓存解析结果，重复上传的文件跳过解析
+    op.create_table(
+        'document_parse_results',
+        sa.Column('id', sa.String(), nullable=False, comment='ID'),
+        sa.Column('tenant_id', sa.String(), nullable=False, comment='租户ID'),
+        sa.Column('file_hash', sa.String(length=64), nullable=False, comment='文件哈希值（SHA256）'),
+        sa.Column('parser_version', sa.String(length=100), nullable=False, comment='解析器版本（解析器类名:输出版本）'),
+        sa.Column('markdown_path', sa.String(length=1000), nullable=False, comment='Markdown路径'),
+        sa.Column('title', sa.String(length=500), nullable=True, comment='标题'),
+        sa.Column('summary', sa.Text(), nullable=True, comment='摘要'),
+        sa.Column('page_count', sa.Integer(), nullable=True, comment='页数'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False, comment='创建时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'file_hash', 'parser_version', name='uq_parse_result_hash')
+    )
+    op.create_index('idx_parse_result_tenant', 'document_parse_results', ['tenant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_parse_result_tenant', table_name='document_parse_results')
+    op.drop_table('document_parse_results')
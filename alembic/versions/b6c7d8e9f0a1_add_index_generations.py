@@ -0,0 +1,36 @@
+"""add index generations
+
+Revision ID: b6c7d8e9f0a1
+Revises: a5b6c7d8e9f0
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c7d8e9f0a1'
+down_revision: Union[str, None] = 'a5b6c7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 按用户记录索引代数，worker写入向量后递增，API进程据此失效检索缓存和词法索引
+    op.create_table(
+        'index_generations',
+        sa.Column('id', sa.String(), nullable=False, comment='ID'),
+        sa.Column('tenant_id', sa.String(), nullable=False, comment='租户ID'),
+        sa.Column('user_id', sa.String(), nullable=False, comment='用户ID'),
+        sa.Column('generation', sa.Integer(), nullable=False, comment='索引代数'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'user_id', name='uq_index_generation_user')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('index_generations')
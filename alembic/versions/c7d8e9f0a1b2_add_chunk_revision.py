@@ -0,0 +1,35 @@
+"""add chunk revision
+
+Revision ID: c7d8e9f0a1b2
+Revises: b6c7d8e9f0a1
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d8e9f0a1b2'
+down_revision: Union[str, None] = 'b6c7d8e9f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 重新切分时新chunk以新版本写入，与旧chunk并存，完成后再删除旧版本，切分期间文档保持可检索
+    op.add_column(
+        'document_chunks',
+        sa.Column('revision', sa.Integer(), server_default='0', nullable=False, comment='切分版本（重新切分时新旧两套chunk并存，完成后删除旧版本）')
+    )
+    op.add_column(
+        'document_configs',
+        sa.Column('chunk_revision', sa.Integer(), server_default='0', nullable=False, comment='按当前配置切分的chunk版本（配置变化时递增）')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('document_configs', 'chunk_revision')
+    op.drop_column('document_chunks', 'revision')
@@ -0,0 +1,33 @@
+"""add folder path index (materialized path subtree lookup)
+
+Revision ID: d2e3f4a5b6c7
+Revises: c1d2e3f4a5b6
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e3f4a5b6c7'
+down_revision: Union[str, None] = 'c1d2e3f4a5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # folders.path 为物化路径，前缀匹配即可一次查询出整棵子树
+    op.create_index(
+        'idx_folder_path',
+        'folders',
+        ['path'],
+        unique=False,
+        postgresql_ops={'path': 'varchar_pattern_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_folder_path', table_name='folders')
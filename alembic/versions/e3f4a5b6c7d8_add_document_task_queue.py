@@ -0,0 +1,76 @@
+"""add document task queue columns
+
+Revision ID: e3f4a5b6c7d8
+Revises: d2e3f4a5b6c7
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3f4a5b6c7d8'
+down_revision: Union[str, None] = 'd2e3f4a5b6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _queue_columns():
+    return [
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending', comment='状态：pending/running/succeeded/failed'),
+        sa.Column('max_retries', sa.Integer(), nullable=False, server_default='3', comment='首次执行失败后的最大重试次数'),
+        sa.Column('run_after', sa.DateTime(timezone=True), nullable=True, comment='最早执行时间（失败退避）'),
+        sa.Column('locked_by', sa.String(length=100), nullable=True, comment='领取任务的worker'),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True, comment='租约到期时间（到期未续约视为worker失联）'),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True, comment='结束时间'),
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'document_tasks' not in inspector.get_table_names():
+        # document_tasks 表此前仅由 create_all 创建，未建表的数据库在这里补建
+        op.create_table(
+            'document_tasks',
+            sa.Column('id', sa.String(), nullable=False, comment='任务ID'),
+            sa.Column('document_id', sa.String(), nullable=False, comment='文档ID'),
+            sa.Column('tenant_id', sa.String(), nullable=False, comment='租户ID'),
+            sa.Column('user_id', sa.String(), nullable=False, comment='用户ID'),
+            sa.Column('task_type', sa.String(length=50), nullable=False, comment='任务类型：process_document'),
+            sa.Column('reason', sa.Text(), nullable=True, comment='失败原因'),
+            sa.Column('retries', sa.Integer(), nullable=False, server_default='0', comment='已执行次数'),
+            sa.Column('task_data', sa.JSON(), nullable=True, comment='任务参数（JSON格式）'),
+            *_queue_columns(),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False, comment='更新时间'),
+            sa.ForeignKeyConstraint(['document_id'], ['documents.id']),
+            sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('idx_task_document', 'document_tasks', ['document_id'], unique=False)
+        op.create_index('idx_task_tenant_user', 'document_tasks', ['tenant_id', 'user_id'], unique=False)
+        op.create_index('idx_task_type', 'document_tasks', ['task_type'], unique=False)
+        op.create_index('idx_task_created', 'document_tasks', ['created_at'], unique=False)
+    else:
+        existing = {column['name'] for column in inspector.get_columns('document_tasks')}
+        with op.batch_alter_table('document_tasks') as batch_op:
+            for column in _queue_columns():
+                if column.name not in existing:
+                    batch_op.add_column(column)
+        # 旧的待办记录（parse_failed/vectorize_failed）视为已失败的任务
+        op.execute("UPDATE document_tasks SET status = 'failed' WHERE task_type IN ('parse_failed', 'vectorize_failed')")
+        if 'idx_task_status_run_after' in {index['name'] for index in inspector.get_indexes('document_tasks')}:
+            return
+    # worker按状态 + 最早执行时间领取任务
+    op.create_index('idx_task_status_run_after', 'document_tasks', ['status', 'run_after'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_task_status_run_after', table_name='document_tasks')
+    with op.batch_alter_table('document_tasks') as batch_op:
+        for column in reversed(_queue_columns()):
+            batch_op.drop_column(column.name)
@@ -0,0 +1,31 @@
+"""add document task batch id
+
+Revision ID: f4a5b6c7d8e9
+Revises: e3f4a5b6c7d8
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a5b6c7d8e9'
+down_revision: Union[str, None] = 'e3f4a5b6c7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 批量提交的任务（如按文件夹/租户重新切分）共享批次ID，用于查询整体进度
+    with op.batch_alter_table('document_tasks') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(length=36), nullable=True, comment='批次ID（批量提交的任务，用于查询整体进度）'))
+    op.create_index('idx_task_batch', 'document_tasks', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_task_batch', table_name='document_tasks')
+    with op.batch_alter_table('document_tasks') as batch_op:
+        batch_op.drop_column('batch_id')
@@ -1,7 +1,7 @@
 """
 文档管理API
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from app.core.database import get_db
@@ -11,9 +11,9 @@ from app.schemas.document import (
     DocumentUploadRequest, DocumentUploadResponse, CheckDuplicateRequest, CheckDuplicateResponse,
     DocumentListResponse, DocumentDetailResponse, DocumentListQuery,
     DocumentVersionResponse, TagResponse, DocumentTagRequest, DocumentTagListResponse,
-    DocumentConfigRequest, DocumentConfigResponse
+    DocumentConfigRequest, DocumentConfigResponse, DocumentRechunkRequest, DocumentRechunkResponse
 )
-from app.schemas.document_task import DocumentTaskResponse, DocumentTaskListResponse
+from app.schemas.document_task import DocumentTaskResponse, DocumentTaskListResponse, DocumentTaskBatchProgressResponse
 from app.repositories.folder_repository import FolderRepository
 from app.repositories.document_repository import DocumentRepository
 from app.repositories.document_version_repository import DocumentVersionRepository
@@ -25,7 +25,7 @@ from app.services.document_service import DocumentService
 from app.services.storage_service import StorageService
 from app.services.document_parser_service import DocumentParserService
 from app.services.config_service import ConfigService
-from app.core.permissions import require_permission
+from app.core.permissions import PermissionChecker, require_permission
 from app.models.user import User
 
 router = APIRouter()
@@ -371,13 +371,14 @@ def get_document_tags(
 @router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_document(
     document_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     _=Depends(require_permission("doc:file:delete"))
 ):
     """删除文档（软删除）"""
     service = _build_document_service(db)
-    service.delete_document(document_id, current_user.tenant_id or "", current_user.id)
+    service.delete_document(document_id, current_user.tenant_id or "", current_user.id, background_tasks=background_tasks)
     return None
 
 
@@ -537,21 +538,63 @@ def get_recent_config(
     return DocumentConfigResponse.from_orm(recent_config)
 
 
-# 待办表接口（占位实现）
+@router.post("/rechunk", response_model=DocumentRechunkResponse, status_code=status.HTTP_202_ACCEPTED)
+def rechunk_documents(
+    request: DocumentRechunkRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _=Depends(require_permission("doc:file:update"))
+):
+    """按新的切分配置重新切分文档（单个文档/文件夹/租户，复用已解析的Markdown，不重新解析）"""
+    if request.scope == "tenant" and not PermissionChecker.has_permission(current_user.id, "system:config:update", db=db):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权重新切分租户下的所有文档")
+    
+    document_service = _build_document_service(db)
+    result = document_service.request_rechunk(
+        tenant_id=current_user.tenant_id or "",
+        user_id=current_user.id,
+        scope=request.scope,
+        document_id=request.document_id,
+        folder_id=request.folder_id,
+        config_data=request.model_dump(include={"chunk_size", "chunk_overlap", "split_method", "split_keyword"}),
+        background_tasks=background_tasks
+    )
+    return DocumentRechunkResponse(**result)
+
+
+@router.get("/rechunk/{batch_id}", response_model=DocumentTaskBatchProgressResponse)
+def get_rechunk_progress(
+    batch_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _=Depends(require_permission("doc:file:read"))
+):
+    """查询重新切分批次的进度"""
+    from app.repositories.document_task_repository import DocumentTaskRepository
+    from app.services.document_task_service import DocumentTaskService
+    
+    progress = DocumentTaskService(DocumentTaskRepository(db)).get_batch_progress(
+        batch_id,
+        current_user.tenant_id or ""
+    )
+    if not progress:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="批次不存在")
+    return DocumentTaskBatchProgressResponse(**progress)
+
+
+# 文档任务接口（处理队列 + 待办表）
 @router.get("/tasks", response_model=DocumentTaskListResponse)
 def list_document_tasks(
     task_type: Optional[str] = None,
+    task_status: Optional[str] = Query(None, alias="status", description="状态：pending/running/succeeded/failed"),
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     _=Depends(require_permission("doc:file:read"))
 ):
-    """
-    查询文档任务列表（待办表）
-    
-    注意：此功能暂未实现，仅作为占位接口
-    """
+    """查询文档任务列表（按状态过滤，failed即待办）"""
     from app.repositories.document_task_repository import DocumentTaskRepository
     from app.services.document_task_service import DocumentTaskService
     
@@ -563,7 +606,8 @@ def list_document_tasks(
         tenant_id=current_user.tenant_id or "",
         task_type=task_type,
         skip=skip,
-        limit=limit
+        limit=limit,
+        status=task_status
     )
     
     return DocumentTaskListResponse(
@@ -579,11 +623,7 @@ def get_document_task(
     current_user: User = Depends(get_current_user),
     _=Depends(require_permission("doc:file:read"))
 ):
-    """
-    获取文档任务详情
-    
-    注意：此功能暂未实现，仅作为占位接口
-    """
+    """获取文档任务详情"""
     from app.repositories.document_task_repository import DocumentTaskRepository
     from app.services.document_task_service import DocumentTaskService
     
@@ -605,6 +645,35 @@ def get_document_task(
     return DocumentTaskResponse.from_orm(task)
 
 
+@router.post("/tasks/{task_id}/retry", response_model=DocumentTaskResponse)
+def retry_document_task(
+    task_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _=Depends(require_permission("doc:file:upload"))
+):
+    """重新提交失败的文档任务"""
+    from app.repositories.document_task_repository import DocumentTaskRepository
+    from app.services.document_task_service import DocumentTaskService
+    
+    task_repo = DocumentTaskRepository(db)
+    task_service = DocumentTaskService(task_repo)
+    
+    task = task_service.retry_task(
+        task_id=task_id,
+        user_id=current_user.id,
+        tenant_id=current_user.tenant_id or ""
+    )
+    
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在或不是失败状态"
+        )
+    
+    return DocumentTaskResponse.from_orm(task)
+
+
 @router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_document_task(
     task_id: str,
@@ -612,11 +681,7 @@ def delete_document_task(
     current_user: User = Depends(get_current_user),
     _=Depends(require_permission("doc:file:delete"))
 ):
-    """
-    删除文档任务
-    
-    注意：此功能暂未实现，仅作为占位接口
-    """
+    """删除文档任务（执行中的任务不可删除）"""
     from app.repositories.document_task_repository import DocumentTaskRepository
     from app.services.document_task_service import DocumentTaskService
     
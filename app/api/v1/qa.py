@@ -18,6 +18,7 @@ from app.repositories.folder_repository import FolderRepository
 from app.repositories.document_chunk_repository import DocumentChunkRepository
 from app.repositories.document_repository import DocumentRepository
 from app.repositories.config_repository import ConfigRepository
+from app.repositories.index_generation_repository import IndexGenerationRepository
 from app.services.conversation_service import ConversationService
 from app.services.message_service import MessageService
 from app.services.retrieval_service import RetrievalService
@@ -26,6 +27,7 @@ from app.services.llm_service import LLMService
 from app.services.qa_service import QAService
 from app.services.embedding_service import EmbeddingService
 from app.services.config_service import ConfigService
+from app.services.index_generation_service import IndexGenerationService
 from app.core.permissions import require_permission
 from app.models.user import User
 
@@ -54,7 +56,8 @@ def _build_qa_service(db: Session) -> QAService:
         folder_repo=folder_repo,
         chunk_repo=chunk_repo,
         document_repo=document_repo,
-        reranker_service=reranker_service
+        reranker_service=reranker_service,
+        index_generation_service=IndexGenerationService(IndexGenerationRepository(db))
     )
     
     llm_service = LLMService(config_service, config_repo)
@@ -106,6 +109,8 @@ def create_conversation(
         config["use_rerank"] = conversation.use_rerank
     if conversation.rerank_top_n is not None:
         config["rerank_top_n"] = conversation.rerank_top_n
+    if conversation.retrieval_mode is not None:
+        config["retrieval_mode"] = conversation.retrieval_mode
     
     created = service.create_conversation(
         tenant_id=current_user.tenant_id or "",
@@ -218,6 +223,8 @@ def update_conversation(
         config_dict["use_rerank"] = conversation.use_rerank
     if conversation.rerank_top_n is not None:
         config_dict["rerank_top_n"] = conversation.rerank_top_n
+    if conversation.retrieval_mode is not None:
+        config_dict["retrieval_mode"] = conversation.retrieval_mode
     
     if config_dict:
         config = config_dict
@@ -376,6 +383,7 @@ async def chat(
         similarity_threshold=chat_request.similarity_threshold,
         use_rerank=chat_request.use_rerank or False,
         rerank_top_n=chat_request.rerank_top_n,
+        retrieval_mode=chat_request.retrieval_mode,
         stream=False
     )
     
@@ -403,7 +411,8 @@ async def chat_stream(
             top_k=chat_request.top_k or 5,
             similarity_threshold=chat_request.similarity_threshold,
             use_rerank=chat_request.use_rerank or False,
-            rerank_top_n=chat_request.rerank_top_n
+            rerank_top_n=chat_request.rerank_top_n,
+            retrieval_mode=chat_request.retrieval_mode
         ):
             yield chunk
     
@@ -14,6 +14,8 @@ from typing import Optional, List
 from app.repositories.user_repository import UserRepository
 from app.repositories.role_repository import RoleRepository
 from app.core.security import password_hasher
+from app.core.embedding_scheduler import embedding_scheduler_registry
+from app.core.parse_pool import parse_pool
 from app.models.user import User
 
 logger = logging.getLogger(__name__)
@@ -154,3 +156,27 @@ def set_rate_limit(
     quota_service = QuotaService()
     return quota_service.set_rate_limit(payload)
 
+
+@router.get("/embedding-metrics", status_code=status.HTTP_200_OK)
+def get_embedding_metrics(
+    current_user=Depends(get_current_user),
+    _=Depends(require_permission("system:admin:read")),
+):
+    """
+    获取本进程内各embedding配置的批量调度吞吐量指标
+    （请求数、文本数、估算token数、限流/重试次数、当前并发上限、吞吐量等）
+    """
+    return embedding_scheduler_registry.metrics()
+
+
+@router.get("/parse-metrics", status_code=status.HTTP_200_OK)
+def get_parse_metrics(
+    current_user=Depends(get_current_user),
+    _=Depends(require_permission("system:admin:read")),
+):
+    """
+    获取本进程内文档解析进程池的指标（排队深度、解析中文件数、进程池回收次数、各文件类型的解析耗时）
+
+    队列模式（DOCUMENT_PROCESSING_MODE=queue）下解析在worker进程中执行，请查看worker日志中的解析统计
+    """
+    return parse_pool.stats()
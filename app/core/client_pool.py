@@ -0,0 +1,200 @@
+"""
+模型服务客户端池
+按解析后的提供商配置（含API key）的哈希复用Embedding/LLM/Reranker客户端及其底层HTTP连接池，
+避免每次请求重新创建客户端和重新握手TLS；配置变更时失效，应用关闭时统一关闭
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  HTTP/2需要h2（httpx[http2]），未安装时使用HTTP/1.1 keep-alive
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def config_fingerprint(category: str, config: Dict[str, Any]) -> str:
+    """解析后配置的哈希（配置任一字段变化即得到新的客户端）"""
+    payload = json.dumps({"category": category, "config": config}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClientRegistry:
+    """
+    进程内客户端注册表
+
+    - HTTP连接池按配置哈希共享：同步客户端全进程一个，异步客户端按事件循环各一个（连接不能跨事件循环复用）
+    - 构建好的高层客户端（OpenAIEmbeddings、ChatOpenAI等）按 (类别, 配置哈希, 变体) 以LRU缓存
+    - 配置变更时按类别失效：被替换的连接池延迟RETIRE_GRACE_SECONDS后关闭，保证进行中的请求不被中断
+    """
+
+    RETIRE_GRACE_SECONDS = 300
+
+    def __init__(self, max_clients: int = 256):
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[Tuple[str, str, Hashable], Any]" = OrderedDict()
+        self._http_clients: Dict[str, Tuple[str, httpx.Client]] = {}
+        self._async_http_clients: Dict[Tuple[str, int], Tuple[str, httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+        self._retired: List[Tuple[float, Any, Optional[asyncio.AbstractEventLoop]]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS,
+        )
+
+    @staticmethod
+    def _http2() -> bool:
+        return settings.HTTP_POOL_HTTP2 and HTTP2_AVAILABLE
+
+    def http_client(self, category: str, config: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Client:
+        """获取配置对应的共享同步HTTP客户端"""
+        fingerprint = config_fingerprint(category, config)
+        with self._lock:
+            self._close_retired()
+            entry = self._http_clients.get(fingerprint)
+            if entry is None:
+                client = httpx.Client(limits=self._limits(), http2=self._http2(), timeout=timeout)
+                entry = (category, client)
+                self._http_clients[fingerprint] = entry
+            return entry[1]
+
+    def async_http_client(self, category: str, config: Dict[str, Any], timeout: Optional[float] = None) -> httpx.AsyncClient:
+        """获取配置对应的共享异步HTTP客户端（当前事件循环内共享）"""
+        fingerprint = config_fingerprint(category, config)
+        loop = asyncio.get_running_loop()
+        key = (fingerprint, id(loop))
+        with self._lock:
+            self._close_retired()
+            entry = self._async_http_clients.get(key)
+            if entry is None or entry[2] is not loop:
+                client = httpx.AsyncClient(limits=self._limits(), http2=self._http2(), timeout=timeout)
+                entry = (category, client, loop)
+                self._async_http_clients[key] = entry
+            return entry[1]
+
+    def get_or_create(
+        self,
+        category: str,
+        config: Dict[str, Any],
+        factory: Callable[[], Any],
+        variant: Hashable = None
+    ) -> Any:
+        """
+        获取缓存的高层客户端，不存在时调用factory构建
+
+        Args:
+            category: 配置类别（embedding/llm/rerank）
+            config: 解析后的提供商配置
+            factory: 构建函数（通常内部通过http_client/async_http_client复用连接池）
+            variant: 同一配置下的变体（如LLM的temperature、是否流式）
+        """
+        key = (category, config_fingerprint(category, config), variant)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+        client = factory()
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate(self, category: Optional[str] = None) -> int:
+        """失效指定类别（为None时全部）的客户端，返回失效的连接池数"""
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k in self._clients if category is None or k[0] == category]:
+                del self._clients[key]
+            retired = 0
+            for fingerprint, (client_category, client) in list(self._http_clients.items()):
+                if category is None or client_category == category:
+                    del self._http_clients[fingerprint]
+                    self._retired.append((now, client, None))
+                    retired += 1
+            for key, (client_category, client, loop) in list(self._async_http_clients.items()):
+                if category is None or client_category == category:
+                    del self._async_http_clients[key]
+                    self._retired.append((now, client, loop))
+                    retired += 1
+        if retired:
+            logger.info(f"{category or '全部'}配置已变更，{retired} 个连接池将在 {self.RETIRE_GRACE_SECONDS}s 后关闭")
+        return retired
+
+    def _close_retired(self, force: bool = False) -> None:
+        """关闭超过宽限期的旧连接池（调用方持有锁）"""
+        if not self._retired:
+            return
+        deadline = time.monotonic() - self.RETIRE_GRACE_SECONDS
+        remaining = []
+        for retired_at, client, loop in self._retired:
+            if not force and retired_at > deadline:
+                remaining.append((retired_at, client, loop))
+                continue
+            self._close_client(client, loop)
+        self._retired = remaining
+
+    @staticmethod
+    def _close_client(client: Any, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        try:
+            if isinstance(client, httpx.AsyncClient):
+                # 异步客户端只能在所属事件循环中关闭，事件循环已结束时其连接已不可用，交给GC
+                if loop is not None and loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                client.close()
+        except Exception as e:
+            logger.warning(f"关闭HTTP客户端失败: {e}")
+
+    async def aclose(self) -> None:
+        """关闭所有连接池（应用关闭时调用）"""
+        current_loop = asyncio.get_running_loop()
+        with self._lock:
+            self._clients.clear()
+            sync_clients = [client for _, client in self._http_clients.values()]
+            async_clients = list(self._async_http_clients.values())
+            retired = self._retired
+            self._http_clients.clear()
+            self._async_http_clients.clear()
+            self._retired = []
+        for client in sync_clients:
+            client.close()
+        for _, client, loop in async_clients:
+            if loop is current_loop:
+                await client.aclose()
+            else:
+                self._close_client(client, loop)
+        for _, client, loop in retired:
+            if loop is current_loop:
+                await client.aclose()
+            else:
+                self._close_client(client, loop)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "http_clients": len(self._http_clients),
+                "async_http_clients": len(self._async_http_clients),
+                "retired": len(self._retired),
+            }
+
+
+# 全局客户端注册表
+client_registry = ClientRegistry()
@@ -25,6 +25,68 @@ class Settings(BaseSettings):
     
     # 向量库配置
     VECTOR_STORE_BASE_PATH: str = "./vector_store"
+    CHROMA_COLLECTION_CACHE_SIZE: int = 256  # 进程内缓存的Chroma collection句柄数
+    NUMPY_COLLECTION_CACHE_SIZE: int = 256  # 进程内常驻的NumPy/IVF collection数（每个collection保持向量memmap和元数据）
+    
+    # 文档解析进程池配置（PDF/Word解析在子进程中执行，不阻塞事件循环）
+    PARSE_POOL_MAX_WORKERS: int = 2  # 解析子进程数，0为在线程中解析
+    PARSE_POOL_MAX_PENDING: int = 16  # 排队中的文件数上限，超出后提交方等待
+    PARSE_TIMEOUT_SECONDS: float = 300  # 单文件解析超时，超时后终止子进程
+    PARSE_MEMORY_LIMIT_MB: int = 2048  # 解析子进程的内存上限（仅Linux/macOS），0为不限制
+    PARSE_WORKER_MAX_TASKS: int = 50  # 每个子进程平均处理的文件数，达到后回收进程池，0为不回收
+    PARSE_RESULT_CACHE_ENABLED: bool = True  # 按 (租户, 文件哈希, 解析器版本) 复用解析结果，重复上传的文件跳过解析
+    
+    # 流式向量化配置（每批embedding并写入向量库的chunk数，写入后即可检索并作为重试的检查点）
+    VECTORIZE_BATCH_SIZE: int = 256
+    
+    # 文档处理任务队列配置（queue：写入document_tasks由worker进程执行；inline：在API进程的后台任务中执行）
+    DOCUMENT_PROCESSING_MODE: str = "queue"
+    DOCUMENT_WORKER_CONCURRENCY: int = 2  # 单个worker进程同时处理的任务数
+    DOCUMENT_WORKER_POLL_SECONDS: float = 2.0  # 无任务时的轮询间隔
+    DOCUMENT_WORKER_STATS_LOG_SECONDS: float = 300  # worker输出解析进程池统计（排队深度、各文件类型解析耗时）的间隔，0为不输出
+    DOCUMENT_TASK_LEASE_SECONDS: int = 300  # 任务租约时长，worker运行期间定期续约，失联后由其他worker接管
+    DOCUMENT_TASK_MAX_RETRIES: int = 3  # 首次执行失败后的最大重试次数
+    DOCUMENT_TASK_RETRY_BACKOFF_SECONDS: float = 30  # 重试退避基数（指数增长，最长1小时）
+    DOCUMENT_RECHUNK_MAX_RUNNING: int = 1  # 所有worker同时执行的重新切分任务上限（0为不限制），避免批量重新切分挤占新上传文档的处理
+    
+    # 查询Embedding缓存配置
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+    QUERY_EMBEDDING_CACHE_PATH: Optional[str] = None  # 为空时不持久化
+    QUERY_EMBEDDING_COALESCE_WINDOW_MS: float = 5.0  # 并发查询embedding的合批窗口，0为不合批
+    QUERY_EMBEDDING_COALESCE_MAX_BATCH: int = 32  # 单个合批批次的最大文本数
+    
+    # Chunk Embedding持久化缓存配置（按模型+文本哈希复用向量）
+    CHUNK_EMBEDDING_CACHE_PATH: Optional[str] = "./cache/chunk_embeddings.db"  # 为空时不启用
+    CHUNK_EMBEDDING_CACHE_MAX_MB: int = 1024  # 磁盘占用上限，超出后按LRU淘汰
+    
+    # 批量Embedding调度配置（embedding.default未配置max_concurrency时的默认并发上限）
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    
+    # 模型服务HTTP连接池配置（按配置复用的Embedding/LLM/Reranker客户端）
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP_POOL_HTTP2: bool = True  # 需要安装h2（httpx[http2]），未安装时自动使用HTTP/1.1
+    
+    # 解析后配置缓存（按作用域版本号失效，TTL用于限制多进程部署下的过期时间，0为不缓存）
+    CONFIG_CACHE_TTL_SECONDS: float = 60
+    
+    # 检索结果缓存配置
+    RETRIEVAL_CACHE_SIZE: int = 1024
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 600
+    INDEX_GENERATION_CHECK_SECONDS: float = 1.0  # 检索前与数据库中的用户索引代数比对的最小间隔（吸收worker写入的向量变更），0为每次检索都比对
+    
+    # 文件夹子树缓存（文件夹变更时按用户失效，TTL用于限制多进程部署下的过期时间，0为不缓存）
+    FOLDER_TREE_CACHE_TTL_SECONDS: int = 60
+    
+    # BM25词法索引配置
+    LEXICAL_INDEX_MAX_USERS: int = 256  # 内存中最多保留的用户索引数
+    LEXICAL_INDEX_TTL_SECONDS: int = 1800  # 超时后从数据库重建，吸收其他进程写入的chunk
+    
+    # 多collection并行检索配置
+    VECTOR_SEARCH_MAX_WORKERS: int = 16  # 进程内共享检索线程池大小
+    VECTOR_SEARCH_MAX_CONCURRENCY_PER_REQUEST: int = 4  # 单次请求最多同时占用的检索线程数
     
     class Config:
         env_file = ".env"
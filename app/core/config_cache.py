@@ -0,0 +1,101 @@
+"""
+解析后配置缓存
+按作用域（system / tenant:<id> / user:<id>）缓存解密后的配置字典，每个作用域维护版本号，
+配置更新时递增，缓存条目版本不一致即视为失效。热路径（QA、检索、向量化）稳态下不再查询配置表
+"""
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+
+ScopeKey = Tuple[str, Optional[str]]
+ConfigDict = Dict[str, Dict[str, Any]]
+
+
+class ResolvedConfigCache:
+    """
+    解析后配置缓存（按作用域版本号失效 + TTL）
+
+    注意：进程内实现，多进程部署时配置更新只会递增当前进程的版本号，TTL用于限制其他进程的过期时间
+    """
+
+    def __init__(self, ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, Optional[str], Hashable], Tuple[int, float, ConfigDict]] = {}
+        self._versions: Dict[ScopeKey, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    # -------- 版本号 --------
+    def version(self, scope: str, scope_id: Optional[str]) -> int:
+        """获取作用域当前的版本号"""
+        with self._lock:
+            return self._versions.get((scope, scope_id), 0)
+
+    def bump(self, scope: str, scope_id: Optional[str]) -> int:
+        """递增作用域的版本号（该作用域的配置更新后调用），返回新的版本号"""
+        with self._lock:
+            scope_key = (scope, scope_id)
+            self._versions[scope_key] = self._versions.get(scope_key, 0) + 1
+            for key in [k for k in self._entries if k[:2] == scope_key]:
+                del self._entries[key]
+            return self._versions[scope_key]
+
+    # -------- 缓存读写 --------
+    def get_or_load(
+        self,
+        scope: str,
+        scope_id: Optional[str],
+        variant: Hashable,
+        loader: Callable[[], ConfigDict]
+    ) -> ConfigDict:
+        """
+        获取作用域配置（深拷贝，调用方可以修改），未命中时调用loader加载
+
+        Args:
+            scope: 作用域（system/tenant/user）
+            scope_id: 租户ID或用户ID（system为None）
+            variant: 同一作用域的不同视图（如脱敏/未脱敏）
+            loader: 从数据库加载并解析配置的函数
+        """
+        if not self.enabled:
+            return loader()
+        key = (scope, scope_id, variant)
+        now = time.time()
+        with self._lock:
+            current_version = self._versions.get((scope, scope_id), 0)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == current_version and entry[1] >= now:
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            self.misses += 1
+        # 加载期间如果版本号变化，写入的条目版本落后，下次读取时重新加载
+        value = loader()
+        with self._lock:
+            self._entries[key] = (current_version, now + self.ttl_seconds, value)
+        return copy.deepcopy(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# 全局解析后配置缓存
+resolved_config_cache = ResolvedConfigCache(ttl_seconds=settings.CONFIG_CACHE_TTL_SECONDS)
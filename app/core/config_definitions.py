@@ -53,6 +53,10 @@ CONFIG_DEFINITIONS: Dict[str, Dict[str, Dict[str, Any]]] = {
             "base_url": {"type": str, "required": False},
             "api_key": {"type": str, "required": False, "sensitive": True},
             "model": {"type": str, "required": True},
+            "dimensions": {"type": (int, float), "required": False, "min": 16, "max": 8192},
+            "rpm": {"type": (int, float), "required": False, "min": 1, "max": 1000000},
+            "tpm": {"type": (int, float), "required": False, "min": 1, "max": 100000000},
+            "max_concurrency": {"type": (int, float), "required": False, "min": 1, "max": 64},
         }
     },
     "vector_store": {
@@ -61,6 +65,11 @@ CONFIG_DEFINITIONS: Dict[str, Dict[str, Dict[str, Any]]] = {
             "base_url": {"type": str, "required": True},
             "api_key": {"type": str, "required": False, "sensitive": True},
             "collection_prefix": {"type": str, "required": False},
+            "collection_mode": {"type": str, "required": False, "allowed_values": ["folder", "user"]},
+            "nlist": {"type": (int, float), "required": False, "min": 1, "max": 65536},
+            "nprobe": {"type": (int, float), "required": False, "min": 1, "max": 65536},
+            "quantization": {"type": str, "required": False, "allowed_values": ["none", "int8", "pq"]},
+            "pq_subvectors": {"type": (int, float), "required": False, "min": 1, "max": 1024},
         }
     },
     "doc": {
@@ -109,7 +118,16 @@ FIELD_LABELS: Dict[str, str] = {
     "model": "模型",
     "timeout": "超时(s)",
     "temperature": "Temperature",
+    "dimensions": "向量维度",
+    "rpm": "每分钟请求数上限",
+    "tpm": "每分钟Token数上限",
+    "max_concurrency": "最大并发批次数",
     "collection_prefix": "Collection 前缀",
+    "collection_mode": "Collection 模式",
+    "nlist": "IVF 列表数",
+    "nprobe": "IVF 探查列表数",
+    "quantization": "向量量化",
+    "pq_subvectors": "PQ 子向量数",
     "upload_types": "允许类型",
     "max_file_size_mb": "单文件大小(MB)",
     "strategy": "策略",
@@ -125,13 +143,22 @@ FIELD_LABELS: Dict[str, str] = {
 
 # 字段占位符映射
 FIELD_PLACEHOLDERS: Dict[str, str] = {
-    "provider": "openai / azure / aliyun ...",
+    "provider": "openai / azure / aliyun / local（仅embedding，本地计算）...",
     "base_url": "https://api.openai.com/v1",
     "api_key": "请输入密钥",
     "model": "gpt-4o-mini",
     "timeout": "",
     "temperature": "",
+    "dimensions": "仅local，默认512（更换后需重新向量化）",
+    "rpm": "可选，不填则不限制",
+    "tpm": "可选，不填则不限制",
+    "max_concurrency": "可选，默认4，遇到限流时自动降低",
     "collection_prefix": "可选",
+    "collection_mode": "folder（按文件夹）/ user（按用户合并）",
+    "nlist": "仅ivf，可选，默认按数据量自动确定",
+    "nprobe": "仅ivf，默认8，越大召回越高",
+    "quantization": "仅numpy/ivf：none / int8（4倍压缩）/ pq（乘积量化）",
+    "pq_subvectors": "仅pq，默认16，需整除向量维度",
     "upload_types": "",
     "max_file_size_mb": "",
     "strategy": "",
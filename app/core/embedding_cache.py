@@ -0,0 +1,339 @@
+"""
+Embedding缓存
+- 查询Embedding缓存：对相同问题的查询向量进行进程内LRU缓存（带TTL），避免重复调用远端Embedding服务
+- Chunk Embedding缓存：按 (embedding模型, chunk文本sha256) 持久化到磁盘，文档新版本/重新上传时只需embedding变化的chunk
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def _frozen_vector(vector: Sequence[float]) -> np.ndarray:
+    """转为只读的一维float32向量（缓存中的向量被多个调用方共享，禁止原地修改）"""
+    array = np.array(vector, dtype=np.float32).reshape(-1)
+    array.flags.writeable = False
+    return array
+
+
+def normalize_query_text(text: str) -> str:
+    """规范化查询文本（NFKC全半角统一、合并空白字符）"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    查询Embedding缓存（LRU + TTL）
+
+    缓存键为 (tenant_id, provider, model, 规范化文本)，
+    租户或系统的 embedding.default 配置变更时由ConfigService触发失效
+    """
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: int = 3600, persist_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[CacheKey, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(tenant_id: Optional[str], provider: str, model: str, text: str) -> CacheKey:
+        """构建缓存键"""
+        return (tenant_id or "", provider or "", model or "", normalize_query_text(text))
+
+    def get(self, key: CacheKey) -> Optional[np.ndarray]:
+        """获取缓存的向量（只读float32数组），未命中或已过期返回None"""
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: CacheKey, vector: Sequence[float]) -> np.ndarray:
+        """写入向量，返回缓存中保存的只读float32数组"""
+        vector = _frozen_vector(vector)
+        if self.max_size <= 0:
+            return vector
+        self._ensure_loaded()
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def invalidate_tenant(self, tenant_id: Optional[str]) -> int:
+        """失效指定租户的缓存，返回失效条目数"""
+        tenant_key = tenant_id or ""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == tenant_key]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """清空缓存（系统级配置变更时调用，影响所有回退到系统配置的租户）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    # -------- 持久化 --------
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.persist_path:
+            self.load(self.persist_path)
+
+    def load(self, path: str) -> int:
+        """从磁盘加载未过期的缓存条目，返回加载条目数"""
+        if not os.path.exists(path):
+            return 0
+        now = time.time()
+        loaded = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["expires_at"] < now:
+                        continue
+                    with self._lock:
+                        self._entries[tuple(record["key"])] = (record["expires_at"], _frozen_vector(record["vector"]))
+                    loaded += 1
+        except Exception as e:
+            logger.warning(f"加载查询Embedding缓存失败: {path}, 错误: {e}")
+        logger.info(f"已加载 {loaded} 条查询Embedding缓存")
+        return loaded
+
+    def save(self, path: Optional[str] = None) -> int:
+        """将未过期的缓存条目写入磁盘（原子替换），返回写入条目数"""
+        path = path or self.persist_path
+        if not path:
+            return 0
+        now = time.time()
+        with self._lock:
+            records = [
+                {"key": list(key), "expires_at": expires_at, "vector": vector.tolist()}
+                for key, (expires_at, vector) in self._entries.items()
+                if expires_at >= now
+            ]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+        return len(records)
+
+
+class ChunkEmbeddingCache:
+    """
+    Chunk Embedding持久化缓存（SQLite，按磁盘占用上限LRU淘汰）
+
+    缓存键为 (模型标识, chunk文本的sha256)，与租户无关：相同模型对相同文本的向量相同，
+    同一文件的不同版本、重复上传以及不同用户上传的相同内容都可以复用。
+    向量以float32存储；多进程共享同一文件时依赖SQLite的WAL模式和写锁
+    """
+
+    EVICT_TARGET_RATIO = 0.9  # 超出上限时淘汰到上限的90%，避免每次写入都触发淘汰
+
+    def __init__(self, path: Optional[str], max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._approx_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.max_bytes > 0
+
+    @staticmethod
+    def make_model_key(provider: Optional[str], model: Optional[str], base_url: Optional[str] = None) -> str:
+        """模型标识（同名模型在不同服务地址上可能不同，一并计入）"""
+        return f"{provider or ''}|{base_url or ''}|{model or ''}"
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库（调用方持有锁）"""
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+                "model_key TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model_key, text_hash))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_embeddings_last_used ON chunk_embeddings (last_used)")
+            conn.commit()
+            self._approx_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunk_embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model_key: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """批量查询，返回与texts对齐的只读float32向量列表（未命中为None），命中的条目刷新最近使用时间"""
+        if not self.enabled or not texts:
+            return [None] * len(texts)
+        hashes = [self.hash_text(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connect()
+            # SQLite单条语句的参数数量有限，分批查询
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM chunk_embeddings WHERE model_key = ? AND text_hash IN ({placeholders})",
+                    [model_key, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE chunk_embeddings SET last_used = ? WHERE model_key = ? AND text_hash = ?",
+                    [(now, model_key, text_hash) for text_hash in found]
+                )
+                conn.commit()
+            results = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model_key: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """批量写入，超过磁盘占用上限时按最近使用时间淘汰"""
+        if not self.enabled or not texts:
+            return
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((model_key, self.hash_text(text), blob, len(blob), now))
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (model_key, text_hash, vector, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            self._approx_bytes += sum(row[3] for row in rows)
+            if self._approx_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按LRU淘汰到上限的EVICT_TARGET_RATIO（调用方持有锁）"""
+        # 其他进程也可能写入或淘汰，先以数据库中的实际占用为准
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunk_embeddings").fetchone()[0]
+        target = int(self.max_bytes * self.EVICT_TARGET_RATIO)
+        evicted = 0
+        while total > target:
+            rows = conn.execute(
+                "SELECT rowid, size FROM chunk_embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            doomed = []
+            for rowid, size in rows:
+                if total <= target:
+                    break
+                doomed.append((rowid,))
+                total -= size
+            conn.executemany("DELETE FROM chunk_embeddings WHERE rowid = ?", doomed)
+            evicted += len(doomed)
+        conn.commit()
+        self._approx_bytes = total
+        self.evictions += evicted
+        if evicted:
+            logger.info(f"Chunk Embedding缓存淘汰 {evicted} 条，当前占用约 {total / 1024 / 1024:.1f}MB")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM chunk_embeddings")
+            conn.commit()
+            self._approx_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "bytes": self._approx_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# 全局查询Embedding缓存实例
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    persist_path=settings.QUERY_EMBEDDING_CACHE_PATH,
+)
+
+# 全局Chunk Embedding缓存实例
+chunk_embedding_cache = ChunkEmbeddingCache(
+    path=settings.CHUNK_EMBEDDING_CACHE_PATH,
+    max_bytes=settings.CHUNK_EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+)
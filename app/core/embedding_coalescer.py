@@ -0,0 +1,123 @@
+"""
+查询Embedding合批器
+把短时间窗口内并发到达的单条embedding请求（同一租户、同一embedding配置）合并为一次批量调用，
+再把结果分发给各个等待的调用方，降低突发流量下的远端请求数和尾延迟
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+FlushFunc = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class _PendingBatch:
+    """正在收集中的批次"""
+
+    __slots__ = ("flush", "max_batch", "items", "timer")
+
+    def __init__(self, flush: FlushFunc, max_batch: int):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.items: List[Tuple[str, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingCoalescer:
+    """
+    Embedding合批器
+
+    同一键的第一个请求开启一个收集窗口（window_seconds），窗口结束或收集满max_batch条时发出批量调用；
+    批次内相同文本只计算一次。所有状态只在事件循环线程内访问，按事件循环区分批次
+    """
+
+    def __init__(self, window_seconds: float = 0.005, max_batch: int = 32):
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending: Dict[Tuple[Hashable, int], _PendingBatch] = {}
+        # 进行中的批量调用（事件循环只弱引用任务，需持有引用直到完成）
+        self._running: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0 and self.max_batch > 1
+
+    async def embed(self, key: Hashable, text: str, flush: FlushFunc, max_batch: Optional[int] = None) -> List[float]:
+        """
+        提交单条文本，等待所在批次完成后返回其向量
+
+        Args:
+            key: 合批键（相同键的请求才会合并，通常为租户+embedding配置）
+            text: 文本
+            flush: 批量embedding函数（同一键的调用方传入的函数应等价，批次使用第一个调用方的函数）
+            max_batch: 本键的批量上限（如提供商限制），不超过全局max_batch
+        """
+        self.requests += 1
+        limit = min(self.max_batch, max_batch or self.max_batch)
+        if not self.enabled or limit <= 1:
+            self.batches += 1
+            return (await flush([text]))[0]
+
+        loop = asyncio.get_running_loop()
+        batch_key = (key, id(loop))
+        batch = self._pending.get(batch_key)
+        if batch is None:
+            batch = _PendingBatch(flush, limit)
+            self._pending[batch_key] = batch
+            batch.timer = loop.call_later(self.window_seconds, self._dispatch, batch_key, batch)
+
+        future = loop.create_future()
+        batch.items.append((text, future))
+        if len(batch.items) >= batch.max_batch:
+            batch.timer.cancel()
+            self._dispatch(batch_key, batch)
+        return await future
+
+    def _dispatch(self, batch_key: Tuple[Hashable, int], batch: _PendingBatch) -> None:
+        """结束收集并发出批量调用"""
+        if self._pending.get(batch_key) is batch:
+            del self._pending[batch_key]
+        self.batches += 1
+        running = asyncio.ensure_future(self._run(batch))
+        self._running.add(running)
+        running.add_done_callback(self._running.discard)
+
+    @staticmethod
+    async def _run(batch: _PendingBatch) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch.items))
+        try:
+            vectors = await batch.flush(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"批量embedding数量不匹配: 期望 {len(texts)}, 实际 {len(vectors)}")
+            by_text = dict(zip(texts, vectors))
+            for text, future in batch.items:
+                if not future.done():  # 调用方可能已取消
+                    future.set_result(by_text[text])
+        except Exception as e:
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # 批次任务被取消（如事件循环关闭）等情况下，不能让调用方永远等待
+            for _, future in batch.items:
+                if not future.done():
+                    future.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        """合批统计"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+# 全局查询Embedding合批器
+query_embedding_coalescer = EmbeddingCoalescer(
+    window_seconds=settings.QUERY_EMBEDDING_COALESCE_WINDOW_MS / 1000.0,
+    max_batch=settings.QUERY_EMBEDDING_COALESCE_MAX_BATCH,
+)
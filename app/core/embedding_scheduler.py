@@ -0,0 +1,261 @@
+"""
+批量Embedding调度器
+按embedding配置（服务地址+模型+API key）限制每分钟请求数（RPM）和每分钟token数（TPM），
+多个批次并发调用远端服务，遇到429时遵循Retry-After并按AIMD（加性增、乘性减）调整并发度
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中日韩字符按1个token，其余字符按4个字符1个token）"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4 + 1
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """判断异常是否为远端限流（HTTP 429）"""
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """从429响应头读取Retry-After（秒），没有时返回None"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class TokenBucket:
+    """
+    令牌桶（每分钟补满capacity个令牌，线程安全）
+
+    单次申请超过容量时按容量计，保证超大批次也能在一分钟内被放行
+    """
+
+    def __init__(self, per_minute: Optional[float]):
+        self.capacity = float(per_minute) if per_minute else None
+        self.tokens = self.capacity or 0.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """预留令牌，返回需要等待的秒数（令牌可以透支，等待期间由后续补充抵消）"""
+        if self.capacity is None:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / 60.0)
+            self.updated_at = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens * 60.0 / self.capacity
+
+
+class EmbeddingScheduler:
+    """
+    单个embedding配置的调度器
+
+    - 每个批次先按RPM/TPM预留令牌，再占用一个并发槽位后调用远端服务
+    - 并发上限初始为1，每个成功批次加 1/当前上限（约每轮加1），最多到max_concurrency；
+      遇到429时减半并等待Retry-After（没有时指数退避）后重试
+    """
+
+    MAX_RETRIES = 5
+    BASE_BACKOFF_SECONDS = 1.0
+    MAX_BACKOFF_SECONDS = 60.0
+    SLOT_POLL_SECONDS = 0.02
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: int = 4):
+        self._lock = threading.Lock()
+        self.configure(rpm, tpm, max_concurrency)
+        self.concurrency_limit = 1.0
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._started_at = time.monotonic()
+        self._metrics = {
+            "requests": 0,
+            "texts": 0,
+            "tokens": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "errors": 0,
+            "request_seconds": 0.0,
+        }
+
+    def configure(self, rpm: Optional[float], tpm: Optional[float], max_concurrency: int) -> None:
+        """更新限额（配置变更后由注册表调用，令牌桶按新容量重建）"""
+        limits = (rpm or None, tpm or None, max(1, int(max_concurrency)))
+        if getattr(self, "_limits", None) == limits:
+            return
+        self._limits = limits
+        self.rpm, self.tpm, self.max_concurrency = limits
+        self.request_bucket = TokenBucket(self.rpm)
+        self.token_bucket = TokenBucket(self.tpm)
+        if hasattr(self, "concurrency_limit"):
+            self.concurrency_limit = min(self.concurrency_limit, self.max_concurrency)
+
+    # -------- 并发控制 --------
+    async def _acquire_slot(self) -> None:
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.concurrency_limit):
+                    self.in_flight += 1
+                    return
+            await asyncio.sleep(max(wait, self.SLOT_POLL_SECONDS))
+
+    def _release_slot(self, succeeded: bool, rate_limited: bool = False, pause_seconds: float = 0.0) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if rate_limited:
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+                self._paused_until = max(self._paused_until, time.monotonic() + pause_seconds)
+            elif succeeded:
+                self.concurrency_limit = min(
+                    float(self.max_concurrency), self.concurrency_limit + 1.0 / self.concurrency_limit
+                )
+
+    def _record(self, **deltas: float) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self._metrics[name] += delta
+
+    # -------- 调度 --------
+    async def run_batch(self, texts: List[str], call: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """按限额调度单个批次（call为阻塞函数，在线程池中执行）"""
+        tokens = sum(estimate_tokens(text) for text in texts)
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(tokens))
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._acquire_slot()
+            started = time.monotonic()
+            try:
+                vectors = await loop.run_in_executor(None, call, texts)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= self.MAX_RETRIES:
+                    self._release_slot(succeeded=False)
+                    self._record(errors=1)
+                    raise
+                pause = retry_after_seconds(e)
+                if pause is None:
+                    pause = min(self.BASE_BACKOFF_SECONDS * 2 ** attempt, self.MAX_BACKOFF_SECONDS)
+                attempt += 1
+                self._release_slot(succeeded=False, rate_limited=True, pause_seconds=pause)
+                self._record(rate_limited=1, retries=1)
+                logger.warning(
+                    f"Embedding请求被限流，{pause:.1f}s后重试（第{attempt}次），"
+                    f"并发上限降为 {int(self.concurrency_limit)}"
+                )
+                continue
+            except BaseException:
+                # 批次被取消（如run()中其他批次失败）时也要归还并发槽位
+                self._release_slot(succeeded=False)
+                raise
+            self._release_slot(succeeded=True)
+            self._record(
+                requests=1, texts=len(texts), tokens=tokens,
+                request_seconds=time.monotonic() - started
+            )
+            return vectors
+
+    async def run(
+        self,
+        batches: Sequence[List[str]],
+        call: Callable[[List[str]], List[List[float]]]
+    ) -> np.ndarray:
+        """并发调度多个批次，按输入顺序拼接为float32矩阵；任一批次最终失败时取消其余批次并抛出异常"""
+        tasks = [asyncio.ensure_future(self.run_batch(batch, call)) for batch in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return np.concatenate([np.asarray(batch_vectors, dtype=np.float32) for batch_vectors in results])
+
+    def metrics(self) -> Dict[str, Any]:
+        """吞吐量指标"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            elapsed = max(time.monotonic() - self._started_at, 1e-9)
+            metrics.update({
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "max_concurrency": self.max_concurrency,
+                "concurrency_limit": int(self.concurrency_limit),
+                "in_flight": self.in_flight,
+                "texts_per_second": metrics["texts"] / elapsed,
+                "tokens_per_minute": metrics["tokens"] * 60.0 / elapsed,
+                "avg_request_seconds": metrics["request_seconds"] / metrics["requests"] if metrics["requests"] else 0.0,
+            })
+        return metrics
+
+
+class EmbeddingSchedulerRegistry:
+    """按embedding配置（服务地址+模型+API key）维护调度器，同一配额下的所有请求共享限额"""
+
+    def __init__(self):
+        self._schedulers: Dict[str, EmbeddingScheduler] = {}
+        self._labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(config: Dict[str, Any]) -> str:
+        api_key_hash = hashlib.sha256(str(config.get("api_key") or "").encode("utf-8")).hexdigest()[:16]
+        return f"{config.get('provider') or ''}|{config.get('base_url') or ''}|{config.get('model') or ''}|{api_key_hash}"
+
+    def get(self, config: Dict[str, Any]) -> EmbeddingScheduler:
+        """获取（或创建）配置对应的调度器，并应用配置中的rpm/tpm/max_concurrency"""
+        key = self.make_key(config)
+        max_concurrency = config.get("max_concurrency") or settings.EMBEDDING_MAX_CONCURRENCY
+        with self._lock:
+            scheduler = self._schedulers.get(key)
+            if scheduler is None:
+                scheduler = EmbeddingScheduler(config.get("rpm"), config.get("tpm"), max_concurrency)
+                self._schedulers[key] = scheduler
+                self._labels[key] = f"{config.get('provider') or ''}/{config.get('model') or ''}"
+            else:
+                scheduler.configure(config.get("rpm"), config.get("tpm"), max_concurrency)
+        return scheduler
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """所有调度器的吞吐量指标（不包含API key）"""
+        with self._lock:
+            items = list(self._schedulers.items())
+        return [{"embedding": self._labels[key], **scheduler.metrics()} for key, scheduler in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._schedulers.clear()
+            self._labels.clear()
+
+
+# 全局Embedding调度器注册表
+embedding_scheduler_registry = EmbeddingSchedulerRegistry()
@@ -0,0 +1,78 @@
+"""
+文件夹子树缓存
+按用户缓存知识库解析得到的文件夹ID列表，文件夹增删改时按用户失效
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, List, Optional
+from app.core.config import settings
+
+
+class FolderTreeCache:
+    """
+    文件夹子树缓存（进程内，按用户LRU淘汰 + TTL）
+
+    注意：多进程部署时每个进程各自维护缓存，文件夹变更只会失效当前进程的缓存，TTL用于限制其他进程的过期时间
+    """
+
+    ALL_FOLDERS = frozenset(["*"])  # 表示"用户的全部文件夹"的缓存键
+
+    def __init__(self, max_users: int = 10000, ttl_seconds: float = 60):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        # (tenant_id, user_id) -> {子树根文件夹ID集合: (过期时间, 子树文件夹ID列表)}
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str, user_id: str, folder_ids: FrozenSet[str]) -> Optional[List[str]]:
+        """
+        获取缓存的子树文件夹ID列表
+
+        Args:
+            tenant_id: 租户ID
+            user_id: 用户ID
+            folder_ids: 作为子树根的文件夹ID集合（ALL_FOLDERS表示全部文件夹）
+
+        Returns:
+            文件夹ID列表，未命中或已过期返回None
+        """
+        user_key = (tenant_id, user_id)
+        with self._lock:
+            entries = self._users.get(user_key)
+            if entries is None:
+                return None
+            self._users.move_to_end(user_key)
+            cached = entries.get(folder_ids)
+            if cached is None:
+                return None
+            if cached[0] < time.time():
+                del entries[folder_ids]
+                return None
+            return list(cached[1])
+
+    def set(self, tenant_id: str, user_id: str, folder_ids: FrozenSet[str], subtree_ids: List[str]) -> None:
+        """写入子树文件夹ID列表"""
+        if self.ttl_seconds <= 0:
+            return
+        user_key = (tenant_id, user_id)
+        with self._lock:
+            entries = self._users.setdefault(user_key, {})
+            entries[folder_ids] = (time.time() + self.ttl_seconds, list(subtree_ids))
+            self._users.move_to_end(user_key)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate(self, tenant_id: str, user_id: str) -> None:
+        """失效用户的全部缓存（文件夹创建/重命名/删除时调用）"""
+        with self._lock:
+            self._users.pop((tenant_id, user_id), None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._users.clear()
+
+
+# 全局文件夹子树缓存实例
+folder_tree_cache = FolderTreeCache(ttl_seconds=settings.FOLDER_TREE_CACHE_TTL_SECONDS)
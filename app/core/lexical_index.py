@@ -0,0 +1,360 @@
+"""
+BM25词法索引
+基于DocumentChunk内容构建的进程内倒排索引，用于弥补向量检索对精确标识符（错误码、型号等）召回不足的问题
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+# 连续的CJK字符（中日韩统一表意文字、平假名、片假名、韩文）
+_CJK_RUN = "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+"
+# 字母数字标识符，允许以 - _ . 连接（如 err-1024、v2.3.1）
+_WORD_RUN = r"[0-9a-z]+(?:[-_.][0-9a-z]+)*"
+_TOKEN_PATTERN = re.compile(f"{_CJK_RUN}|{_WORD_RUN}")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词（CJK字符二元组 + 字母数字标识符）
+
+    CJK连续片段切分为重叠的二元组（单字片段保留单字）；
+    带连接符的标识符保留整体，同时拆出各组成部分，以便部分匹配
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        run = match.group(0)
+        if run[0].isascii():
+            tokens.append(run)
+            parts = re.split(r"[-_.]", run)
+            if len(parts) > 1:
+                tokens.extend(part for part in parts if part)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    单个用户的BM25倒排索引
+
+    以vector_id作为文档键（与向量库中的向量一一对应），便于与向量检索结果融合；
+    只保存倒排表、长度和融合所需的元数据，不保存chunk内容（检索结果的text为None，由调用方按vector_id回查）
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._chunks: Dict[str, Dict[str, Any]] = {}
+        self._document_chunks: Dict[str, List[str]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add_chunk(
+        self,
+        vector_id: str,
+        document_id: str,
+        chunk_index: int,
+        content: str,
+        folder_id: Optional[str] = None
+    ) -> None:
+        """添加chunk（vector_id已存在时先移除旧条目）"""
+        if vector_id in self._chunks:
+            self._remove_chunk(vector_id)
+        term_freqs = Counter(tokenize(content))
+        for term, tf in term_freqs.items():
+            self._postings.setdefault(term, {})[vector_id] = tf
+        length = sum(term_freqs.values())
+        self._lengths[vector_id] = length
+        self._total_length += length
+        self._chunks[vector_id] = {
+            "document_id": document_id,
+            "chunk_index": chunk_index,
+            "folder_id": folder_id,
+            "terms": tuple(term_freqs),
+        }
+        self._document_chunks.setdefault(document_id, []).append(vector_id)
+
+    def remove_document(self, document_id: str) -> int:
+        """移除文档的所有chunk，返回移除数量"""
+        vector_ids = self._document_chunks.pop(document_id, [])
+        for vector_id in vector_ids:
+            self._remove_chunk(vector_id, unlink_document=False)
+        return len(vector_ids)
+
+    def remove_chunks(self, vector_ids: Iterable[str]) -> int:
+        """按vector_id移除chunk（不存在的忽略），返回移除数量"""
+        removed = 0
+        for vector_id in vector_ids:
+            if vector_id in self._chunks:
+                self._remove_chunk(vector_id)
+                removed += 1
+        return removed
+
+    def _remove_chunk(self, vector_id: str, unlink_document: bool = True) -> None:
+        chunk = self._chunks.pop(vector_id)
+        for term in chunk["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(vector_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(vector_id, 0)
+        if unlink_document:
+            siblings = self._document_chunks.get(chunk["document_id"], [])
+            if vector_id in siblings:
+                siblings.remove(vector_id)
+            if not siblings:
+                self._document_chunks.pop(chunk["document_id"], None)
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        folder_ids: Optional[Iterable[Optional[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            folder_ids: 限定的文件夹ID列表（None表示根目录），为None时不限定
+
+        Returns:
+            按分数降序的结果列表，每项包含 id、text（恒为None）、score、metadata
+        """
+        total = len(self._chunks)
+        if total == 0 or top_k <= 0:
+            return []
+        folder_filter = set(folder_ids) if folder_ids is not None else None
+        avg_length = self._total_length / total if total else 0.0
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for vector_id, tf in postings.items():
+                if folder_filter is not None and self._chunks[vector_id]["folder_id"] not in folder_filter:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[vector_id] / avg_length) if avg_length else self.k1
+                scores[vector_id] = scores.get(vector_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        results = []
+        for vector_id, score in ranked:
+            chunk = self._chunks[vector_id]
+            results.append({
+                "id": vector_id,
+                "text": None,
+                "score": score,
+                "metadata": {
+                    "document_id": chunk["document_id"],
+                    "chunk_index": chunk["chunk_index"],
+                    "folder_id": chunk["folder_id"] or "root",
+                },
+            })
+        return results
+
+
+ChunkRow = Tuple[str, str, int, str, Optional[str]]  # (vector_id, document_id, chunk_index, content, folder_id)
+
+
+class _UserIndex:
+    """单个用户的索引条目（索引读写由条目自身的锁保护，不同用户之间互不阻塞）"""
+
+    __slots__ = ("index", "expires_at", "lock", "build_lock", "pending")
+
+    def __init__(self):
+        self.index: Optional[BM25Index] = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        # 重建期间到达的增量变更，新索引装载前按顺序重放（None表示当前没有在重建）
+        self.pending: Optional[List[Tuple[str, Any]]] = None
+
+    def apply(self, op: str, payload: Any) -> int:
+        """在当前索引上执行增量变更，重建期间同时记录下来（调用方需持有lock）"""
+        if self.pending is not None:
+            self.pending.append((op, payload))
+        if self.index is None:
+            return 0
+        return _apply_change(self.index, op, payload)
+
+
+def _apply_change(index: BM25Index, op: str, payload: Any) -> int:
+    if op == "add":
+        for vector_id, document_id, chunk_index, content, folder_id in payload:
+            index.add_chunk(vector_id, document_id, chunk_index, content, folder_id)
+        return len(payload)
+    if op == "remove_chunks":
+        return index.remove_chunks(payload)
+    return index.remove_document(payload)
+
+
+class LexicalIndexRegistry:
+    """
+    按 (tenant_id, user_id) 管理BM25索引
+
+    索引在首次检索时从数据库懒加载，向量化/删除文档时增量维护；
+    进程内实现，超过TTL后重新从数据库构建，以吸收其他进程写入的chunk。
+    注册表锁只保护用户条目的增删，检索和增量维护只持有对应用户的锁；
+    重建期间到达的增量变更会在新索引装载前重放，不会丢失
+    """
+
+    def __init__(self, max_users: int = 256, ttl_seconds: int = 1800):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._indexes: "OrderedDict[Tuple[str, str], _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, tenant_id: str, user_id: str, create: bool = False) -> Optional[_UserIndex]:
+        user_key = (tenant_id, user_id)
+        with self._lock:
+            entry = self._indexes.get(user_key)
+            if entry is None and create:
+                entry = _UserIndex()
+                self._indexes[user_key] = entry
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+            if entry is not None:
+                self._indexes.move_to_end(user_key)
+            return entry
+
+    def _get_or_build_entry(
+        self,
+        tenant_id: str,
+        user_id: str,
+        loader: Callable[[], Iterable[ChunkRow]]
+    ) -> _UserIndex:
+        entry = self._get_entry(tenant_id, user_id, create=True)
+        if entry.index is not None and entry.expires_at >= time.time():
+            return entry
+
+        # 同一用户只允许一个线程重建，其他线程等待后复用重建结果
+        with entry.build_lock:
+            if entry.index is not None and entry.expires_at >= time.time():
+                return entry
+            with entry.lock:
+                entry.pending = []
+            try:
+                index = BM25Index()
+                for vector_id, document_id, chunk_index, content, folder_id in loader():
+                    if vector_id:
+                        index.add_chunk(vector_id, document_id, chunk_index, content, folder_id)
+            except BaseException:
+                with entry.lock:
+                    entry.pending = None
+                raise
+            with entry.lock:
+                for op, payload in entry.pending:
+                    _apply_change(index, op, payload)
+                entry.pending = None
+                entry.index = index
+                entry.expires_at = time.time() + self.ttl_seconds
+        return entry
+
+    def get_or_build(
+        self,
+        tenant_id: str,
+        user_id: str,
+        loader: Callable[[], Iterable[ChunkRow]]
+    ) -> BM25Index:
+        """获取用户索引，不存在或已过期时通过loader从数据库构建"""
+        return self._get_or_build_entry(tenant_id, user_id, loader).index
+
+    def add_chunks(self, tenant_id: str, user_id: str, rows: Iterable[ChunkRow]) -> None:
+        """增量添加chunk（索引尚未加载且没有在构建时跳过，首次检索时会从数据库完整构建）"""
+        entry = self._get_entry(tenant_id, user_id)
+        if entry is None:
+            return
+        with entry.lock:
+            entry.apply("add", list(rows))
+
+    def remove_document(self, tenant_id: str, user_id: str, document_id: str) -> int:
+        """移除文档的所有chunk，返回移除数量"""
+        entry = self._get_entry(tenant_id, user_id)
+        if entry is None:
+            return 0
+        with entry.lock:
+            return entry.apply("remove", document_id)
+
+    def remove_chunks(self, tenant_id: str, user_id: str, vector_ids: Iterable[str]) -> int:
+        """按vector_id移除chunk（如重新切分后的旧版本chunk），返回移除数量"""
+        entry = self._get_entry(tenant_id, user_id)
+        if entry is None:
+            return 0
+        with entry.lock:
+            return entry.apply("remove_chunks", list(vector_ids))
+
+    def search(
+        self,
+        tenant_id: str,
+        user_id: str,
+        query: str,
+        top_k: int,
+        folder_ids: Optional[Iterable[Optional[str]]],
+        loader: Callable[[], Iterable[ChunkRow]]
+    ) -> List[Dict[str, Any]]:
+        """在用户索引中检索（阻塞调用，异步代码中应放到线程池执行）"""
+        entry = self._get_or_build_entry(tenant_id, user_id, loader)
+        with entry.lock:
+            return entry.index.search(query, top_k, folder_ids)
+
+    def invalidate(self, tenant_id: str, user_id: str) -> None:
+        """丢弃用户索引（下次检索时重新构建）"""
+        with self._lock:
+            self._indexes.pop((tenant_id, user_id), None)
+
+    def clear(self) -> None:
+        """清空所有索引"""
+        with self._lock:
+            self._indexes.clear()
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Dict[str, Any]]],
+    key: Callable[[Dict[str, Any]], Any],
+    k: int = 60
+) -> List[Tuple[Any, float]]:
+    """
+    倒数排名融合（RRF）
+
+    Args:
+        ranked_lists: 多路已排序的结果列表
+        key: 从结果中提取去重键的函数
+        k: 平滑常数（论文推荐值60）
+
+    Returns:
+        按融合分数降序的 (键, 分数) 列表
+    """
+    scores: Dict[Any, float] = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, 1):
+            item_key = key(item)
+            scores[item_key] = scores.get(item_key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+# 全局词法索引实例
+lexical_index = LexicalIndexRegistry(
+    max_users=settings.LEXICAL_INDEX_MAX_USERS,
+    ttl_seconds=settings.LEXICAL_INDEX_TTL_SECONDS,
+)
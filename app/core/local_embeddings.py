@@ -0,0 +1,110 @@
+"""
+本地哈希n-gram Embedding
+不依赖远端服务：文本按字符n-gram（中日韩文字）和词+词内字符三元组（其他文字）提取特征，
+哈希到固定维度后按TF-IDF风格加权并L2归一化。结果只取决于文本本身，可用于离线压测和零成本的词法-语义检索
+"""
+import math
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+LOCAL_PROVIDER = "local"
+DEFAULT_DIMENSIONS = 512
+
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+# 按n-gram阶数的权重（近似IDF：越长的n-gram越少见、区分度越高）
+_CJK_ORDER_WEIGHTS = {1: 0.4, 2: 1.0, 3: 1.2}
+_WORD_WEIGHT = 1.0
+_TRIGRAM_WEIGHT = 0.5
+
+# 高频虚词降权（近似IDF：几乎所有文档都包含，区分度低）
+_STOPWORDS = frozenset(
+    "的 了 是 在 和 与 及 或 也 就 都 而 被 把 对 从 之 其 这 那 个 一 有 为 以 于 中 上 下 不 我 你 他 她 它 们 吗 呢 吧 啊 "
+    "the a an of to in on for and or is are was were be been with as by at from that this it its not no "
+    "what which who how why when where do does did can could will would should".split()
+)
+_STOPWORD_WEIGHT = 0.1
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _features(text: str) -> Dict[str, float]:
+    """提取特征及其权重（次线性词频 1+log(tf) × 固定权重）"""
+    counts: Dict[str, int] = {}
+    base_weights: Dict[str, float] = {}
+
+    def add(feature: str, weight: float) -> None:
+        counts[feature] = counts.get(feature, 0) + 1
+        base_weights[feature] = weight
+
+    text = _normalize(text)
+    for run in _CJK_RUN.findall(text):
+        for n, weight in _CJK_ORDER_WEIGHTS.items():
+            for i in range(len(run) - n + 1):
+                gram = run[i:i + n]
+                add(f"c{n}:{gram}", _STOPWORD_WEIGHT if n == 1 and gram in _STOPWORDS else weight)
+    for word in _WORD.findall(_CJK_RUN.sub(" ", text)):
+        if word in _STOPWORDS:
+            add(f"w:{word}", _STOPWORD_WEIGHT)
+            continue
+        add(f"w:{word}", _WORD_WEIGHT)
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            add(f"t:{padded[i:i + 3]}", _TRIGRAM_WEIGHT)
+    return {feature: base_weights[feature] * (1.0 + math.log(count)) for feature, count in counts.items()}
+
+
+def _hash(feature: str) -> int:
+    """稳定的32位哈希（不受PYTHONHASHSEED影响）"""
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class LocalHashEmbeddings(Embeddings):
+    """
+    哈希n-gram TF-IDF向量（provider: local）
+
+    - 特征哈希到dimensions个桶，哈希的最高位决定符号，抵消碰撞带来的偏差
+    - 词频取次线性 1+log(tf)，乘以按n-gram阶数/虚词确定的固定权重（近似IDF，
+      不依赖语料统计，保证已入库的向量与新查询向量始终可比）
+    - 批量计算时用NumPy一次性把所有特征散列累加到矩阵并归一化
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = int(dimensions)
+
+    def _rows(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rows, buckets, weights = [], [], []
+        for row, text in enumerate(texts):
+            for feature, weight in _features(text).items():
+                hashed = _hash(feature)
+                rows.append(row)
+                buckets.append(hashed % self.dimensions)
+                weights.append(weight if hashed & 0x80000000 else -weight)
+        return (
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(buckets, dtype=np.int64),
+            np.asarray(weights, dtype=np.float32),
+        )
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """批量计算向量，返回 (len(texts), dimensions) 的float32矩阵"""
+        rows, buckets, weights = self._rows(texts)
+        size = len(texts) * self.dimensions
+        matrix = np.bincount(rows * self.dimensions + buckets, weights=weights, minlength=size).astype(np.float32)
+        matrix = matrix.reshape(len(texts), self.dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
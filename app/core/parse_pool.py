@@ -0,0 +1,246 @@
+"""
+文档解析进程池
+PDF/Word文本提取是CPU密集的同步操作，放在事件循环里会阻塞整个uvicorn worker（包括其他用户的SSE流），
+这里把解析派发到有界的子进程池中执行：单文件超时、子进程内存上限、子进程处理N个文件后回收，
+并统计排队深度和各文件类型的解析耗时
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ParseTimeoutError(TimeoutError):
+    """单文件解析超时"""
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """子进程初始化：限制地址空间，超限的解析在子进程内抛出MemoryError，不影响主进程"""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:  # Windows无resource模块
+        logger.warning(f"解析子进程设置内存上限失败: {e}")
+
+
+def parse_file(
+    file_type: str,
+    file_path: Optional[str] = None,
+    content: Optional[bytes] = None,
+    filename: str = "",
+    output_path: Optional[str] = None
+) -> Tuple[Dict[str, Any], float]:
+    """
+    解析本地文件或内存中的文件内容（在子进程中执行），返回解析结果（含元数据）和解析耗时
+
+    指定output_path时Markdown内容逐段（PDF逐页）写入该文件，返回的结果不含content
+    """
+    from app.core.parsers import ParserFactory
+
+    start = time.perf_counter()
+    parser = ParserFactory.get_parser_by_type(file_type)
+    if file_path is not None:
+        fileobj = open(file_path, "rb")
+        filename = filename or file_path
+    else:
+        fileobj = io.BytesIO(content or b"")
+    with fileobj:
+        if output_path is None:
+            result = parser.parse_stream(fileobj, filename)
+        else:
+            with open(output_path, "w", encoding="utf-8") as output:
+                result = parser.parse_to(fileobj, filename, output.write)
+    return result, time.perf_counter() - start
+
+
+class ParsePool:
+    """
+    文档解析进程池
+
+    子进程使用spawn方式启动（不继承主进程的线程、数据库连接和已加载的模型）；
+    进程池累计处理max_tasks_per_worker个文件后整体替换，旧进程池处理完已提交的文件后退出。
+    max_workers为0时在线程中解析（不隔离CPU，但不阻塞事件循环）
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 16,
+        timeout_seconds: float = 300,
+        memory_limit_mb: int = 2048,
+        max_tasks_per_worker: int = 50
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max(1, max_pending)
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_tasks = 0
+        self._lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        # 统计
+        self.pending = 0
+        self.in_flight = 0
+        self.recycled = 0
+        self._by_type: Dict[str, Dict[str, float]] = {}
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.memory_limit_mb,)
+        )
+
+    def _submit(self, *args) -> Tuple[Future, ProcessPoolExecutor]:
+        """提交到当前进程池，达到回收阈值后替换进程池"""
+        with self._lock:
+            if self._executor is None or (
+                self.max_tasks_per_worker > 0 and self._executor_tasks >= self.max_tasks_per_worker * self.max_workers
+            ):
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self.recycled += 1
+                self._executor = self._new_executor()
+                self._executor_tasks = 0
+            self._executor_tasks += 1
+            executor = self._executor
+        return executor.submit(parse_file, *args), executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """终止超时解析所在的进程池（运行中的子进程无法单独取消），同池中其他文件的解析会失败并由调用方重试"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.recycled += 1
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """排队上限（按事件循环创建）"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    async def parse(
+        self,
+        file_type: str,
+        file_path: Optional[str] = None,
+        content: Optional[bytes] = None,
+        filename: str = "",
+        output_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        解析本地文件（file_path）或内存中的文件内容（content），不阻塞事件循环
+
+        指定output_path时Markdown内容由子进程逐页写入该文件，不经过主进程内存
+
+        Raises:
+            ParseTimeoutError: 解析超过timeout_seconds
+        """
+        start = time.perf_counter()
+        self.pending += 1
+        try:
+            async with self._get_slots():
+                self.in_flight += 1
+                try:
+                    if self.max_workers <= 0:
+                        result, parse_seconds = await asyncio.wait_for(
+                            asyncio.to_thread(parse_file, file_type, file_path, content, filename, output_path),
+                            timeout=self.timeout_seconds or None
+                        )
+                    else:
+                        future, executor = self._submit(file_type, file_path, content, filename, output_path)
+                        try:
+                            result, parse_seconds = await asyncio.wait_for(
+                                asyncio.wrap_future(future),
+                                timeout=self.timeout_seconds or None
+                            )
+                        except asyncio.TimeoutError:
+                            self._discard(executor)
+                            raise
+                finally:
+                    self.in_flight -= 1
+        except asyncio.TimeoutError:
+            self._record(file_type, time.perf_counter() - start, None, timeout=True)
+            raise ParseTimeoutError(f"解析超时（{self.timeout_seconds}秒）: {file_path or filename}")
+        except Exception:
+            self._record(file_type, time.perf_counter() - start, None, failed=True)
+            raise
+        finally:
+            self.pending -= 1
+
+        total_seconds = time.perf_counter() - start
+        self._record(file_type, total_seconds, parse_seconds)
+        logger.info(
+            f"解析完成: {file_type}，解析耗时 {parse_seconds:.2f}s，排队 {total_seconds - parse_seconds:.2f}s"
+        )
+        return result
+
+    def _record(
+        self,
+        file_type: str,
+        total_seconds: float,
+        parse_seconds: Optional[float],
+        failed: bool = False,
+        timeout: bool = False
+    ) -> None:
+        entry = self._by_type.setdefault(file_type, {
+            "files": 0, "failures": 0, "timeouts": 0,
+            "parse_seconds": 0.0, "max_parse_seconds": 0.0, "wait_seconds": 0.0,
+        })
+        entry["files"] += 1
+        entry["failures"] += int(failed)
+        entry["timeouts"] += int(timeout)
+        if parse_seconds is not None:
+            entry["parse_seconds"] += parse_seconds
+            entry["max_parse_seconds"] = max(entry["max_parse_seconds"], parse_seconds)
+            entry["wait_seconds"] += total_seconds - parse_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """排队深度和各文件类型的解析耗时统计"""
+        by_type = {}
+        for file_type, entry in self._by_type.items():
+            succeeded = entry["files"] - entry["failures"] - entry["timeouts"]
+            by_type[file_type] = {
+                **entry,
+                "avg_parse_seconds": entry["parse_seconds"] / succeeded if succeeded else 0.0,
+            }
+        return {
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "queued": self.pending - self.in_flight,
+            "recycled": self.recycled,
+            "by_type": by_type,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# 全局文档解析进程池
+parse_pool = ParsePool(
+    max_workers=settings.PARSE_POOL_MAX_WORKERS,
+    max_pending=settings.PARSE_POOL_MAX_PENDING,
+    timeout_seconds=settings.PARSE_TIMEOUT_SECONDS,
+    memory_limit_mb=settings.PARSE_MEMORY_LIMIT_MB,
+    max_tasks_per_worker=settings.PARSE_WORKER_MAX_TASKS,
+)
@@ -3,7 +3,7 @@ Markdown文件解析器
 """
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO
 from app.core.parsers.parser_interface import ParserInterface
 import re
 
@@ -15,30 +15,20 @@ class MarkdownParser(ParserInterface):
     
     def parse(self, file_path: str) -> Dict[str, Any]:
         """解析Markdown文件"""
-        file = Path(file_path)
-        
-        if not file.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        # 读取文件内容
-        try:
-            content = file.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
-            try:
-                content = file.read_text(encoding="gbk")
-            except UnicodeDecodeError:
-                content = file.read_text(encoding="latin-1")
-        
-        # 去除BOM
-        if content.startswith("\ufeff"):
-            content = content[1:]
+        return self.parse_path(file_path)
+    
+    def parse_stream(self, fileobj: BinaryIO, filename: str = "") -> Dict[str, Any]:
+        """从文件对象解析Markdown内容"""
+        raw = fileobj.read()
+        content = self._decode_text(raw)
         
         # 提取标题（第一个#标题或文件名）
         title_match = re.search(r"^#\s+(.+)$", content, re.MULTILINE)
+        stem = Path(filename).stem if filename else ""
         if title_match:
             title = title_match.group(1).strip()[:500]
         else:
-            title = file.stem[:500] if file.stem else "无标题"
+            title = stem[:500] if stem else "无标题"
         
         # 提取摘要（去除标题和代码块后的前200个字符）
         summary_content = re.sub(r"```[\s\S]*?```", "", content)  # 移除代码块
@@ -49,7 +39,10 @@ class MarkdownParser(ParserInterface):
             "content": content,
             "title": title,
             "summary": summary,
-            "metadata": {}
+            "metadata": {
+                "page_count": None,
+                "file_size": len(raw),
+            }
         }
     
     def extract_metadata(self, file_path: str) -> Dict[str, Any]:
@@ -26,6 +26,17 @@ class ParserFactory:
         "docx": WordParser,
     }
     
+    # 文档文件类型（txt/md/pdf/word）到解析器的映射
+    _type_map: Dict[str, type] = {
+        "txt": TextParser,
+        "md": MarkdownParser,
+        "markdown": MarkdownParser,
+        "pdf": PDFParser,
+        "word": WordParser,
+        "doc": WordParser,
+        "docx": WordParser,
+    }
+    
     @classmethod
     def get_parser(cls, file_path: str) -> ParserInterface:
         """
@@ -58,22 +69,30 @@ class ParserFactory:
         Returns:
             解析器实例
         """
-        type_map = {
-            "txt": TextParser,
-            "md": MarkdownParser,
-            "markdown": MarkdownParser,
-            "pdf": PDFParser,
-            "word": WordParser,
-            "doc": WordParser,
-            "docx": WordParser,
-        }
+        return cls._get_parser_class(file_type)()
+    
+    @classmethod
+    def get_parser_version(cls, file_type: str) -> str:
+        """
+        解析器版本标识（解析器类名 + 输出版本），用作解析结果缓存键的一部分
         
-        parser_class = type_map.get(file_type.lower())
+        Args:
+            file_type: 文件类型（txt/md/pdf/word）
+        
+        Returns:
+            版本标识，如 PDFParser:1
+        """
+        parser_class = cls._get_parser_class(file_type)
+        return f"{parser_class.__name__}:{parser_class.version}"
+    
+    @classmethod
+    def _get_parser_class(cls, file_type: str) -> type:
+        parser_class = cls._type_map.get(file_type.lower())
         
         if parser_class is None:
             raise ValueError(f"不支持的文件类型: {file_type}")
         
-        return parser_class()
+        return parser_class
     
     @classmethod
     def is_supported(cls, file_path: str) -> bool:
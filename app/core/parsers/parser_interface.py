@@ -1,13 +1,19 @@
 """
 解析器接口抽象
 """
+import os
+import tempfile
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, BinaryIO, Callable
 
 
 class ParserInterface(ABC):
     """解析器接口抽象类"""
     
+    # 解析输出的版本，输出内容变化时递增（使按文件哈希缓存的解析结果失效）
+    version = "1"
+    
     @abstractmethod
     def parse(self, file_path: str) -> Dict[str, Any]:
         """
@@ -41,4 +47,73 @@ class ParserInterface(ABC):
             - 其他文件特定元数据
         """
         pass
-
+    
+    def parse_stream(self, fileobj: BinaryIO, filename: str = "") -> Dict[str, Any]:
+        """
+        从文件对象（内存缓冲区或已打开的文件）解析，一次读取同时返回元数据
+        
+        默认实现写入临时文件后调用parse和extract_metadata，内置解析器均覆盖为直接读取文件对象
+        
+        Args:
+            fileobj: 二进制文件对象
+            filename: 原文件名（用于推断标题），可为空
+        
+        Returns:
+            与parse相同的解析结果，metadata中包含extract_metadata的字段
+        """
+        suffix = Path(filename).suffix if filename else ""
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+            tmp_file.write(fileobj.read())
+            tmp_path = tmp_file.name
+        try:
+            result = self.parse(tmp_path)
+            result["metadata"].update(self.extract_metadata(tmp_path))
+            return result
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+    
+    def parse_to(self, fileobj: BinaryIO, filename: str, write: Callable[[str], Any]) -> Dict[str, Any]:
+        """
+        流式解析：Markdown内容通过write逐段输出（如逐页），不在内存中拼接完整内容
+        
+        默认实现整体解析后一次性输出，支持分页的解析器（PDF）覆盖为逐页输出
+        
+        Returns:
+            不含content的解析结果（title/summary/metadata）
+        """
+        result = self.parse_stream(fileobj, filename)
+        write(result.pop("content"))
+        return result
+    
+    def parse_path(self, file_path: str) -> Dict[str, Any]:
+        """解析本地文件，一次读取同时返回元数据"""
+        if not Path(file_path).exists():
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        with open(file_path, "rb") as f:
+            return self.parse_stream(f, file_path)
+    
+    @staticmethod
+    def _stream_size(fileobj: BinaryIO) -> int:
+        """文件对象的字节数（不改变当前读取位置）"""
+        position = fileobj.tell()
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(position)
+        return size
+    
+    @staticmethod
+    def _decode_text(raw: bytes) -> str:
+        """按UTF-8/GBK/Latin-1依次尝试解码文本，去除BOM并统一换行符"""
+        try:
+            content = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            try:
+                content = raw.decode("gbk")
+            except UnicodeDecodeError:
+                content = raw.decode("latin-1")
+        # 去除BOM
+        if content.startswith("\ufeff"):
+            content = content[1:]
+        return content.replace("\r\n", "\n").replace("\r", "\n")
@@ -3,7 +3,7 @@ PDF文件解析器
 """
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, BinaryIO, Callable, Dict, Iterator
 from app.core.parsers.parser_interface import ParserInterface
 
 logger = logging.getLogger(__name__)
@@ -21,47 +21,61 @@ class PDFParser(ParserInterface):
     
     def parse(self, file_path: str) -> Dict[str, Any]:
         """解析PDF文件为Markdown"""
+        return self.parse_path(file_path)
+    
+    def parse_stream(self, fileobj: BinaryIO, filename: str = "") -> Dict[str, Any]:
+        """从文件对象解析PDF（只打开一次，同时返回页数等元数据）"""
+        pages_text = []
+        result = self.parse_to(fileobj, filename, pages_text.append)
+        result["content"] = "".join(pages_text)
+        return result
+    
+    def parse_to(self, fileobj: BinaryIO, filename: str, write: Callable[[str], Any]) -> Dict[str, Any]:
+        """逐页解析PDF，每页的Markdown提取后立即通过write输出，内存中只保留当前页"""
         if not PDF_AVAILABLE:
             raise ImportError("PyPDF2未安装，无法解析PDF文件。请运行: pip install PyPDF2")
         
-        file = Path(file_path)
+        file_size = self._stream_size(fileobj)
+        pdf_reader = PyPDF2.PdfReader(fileobj)
         
-        if not file.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
+        # 逐页提取文本，页与页之间以换行分隔
+        first_page_text = None
+        for page_text in self._iter_pages(pdf_reader):
+            if first_page_text is None:
+                first_page_text = page_text
+                write(page_text)
+            else:
+                write("\n" + page_text)
         
-        # 读取PDF
-        with open(file_path, "rb") as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            
-            # 提取所有页面的文本
-            pages_text = []
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    text = page.extract_text()
-                    if text.strip():
-                        pages_text.append(f"## 第 {page_num + 1} 页\n\n{text}\n\n")
-                except Exception as e:
-                    logger.warning(f"提取第 {page_num + 1} 页文本失败: {e}")
-            
-            content = "\n".join(pages_text)
-            
-            # 提取标题（第一页的第一行或文件名）
-            first_page_text = pages_text[0] if pages_text else ""
-            title_lines = [line.strip() for line in first_page_text.split("\n") if line.strip() and not line.startswith("#")]
-            title = title_lines[0][:500] if title_lines else file.stem[:500] if file.stem else "无标题"
-            
-            # 提取摘要（第一页的前200个字符）
-            summary_text = first_page_text.replace("## 第 1 页\n\n", "").strip()
-            summary = summary_text[:200] if summary_text else ""
-            
-            return {
-                "content": content,
-                "title": title,
-                "summary": summary,
-                "metadata": {
-                    "page_count": len(pdf_reader.pages)
-                }
+        # 提取标题（第一页的第一行或文件名）
+        stem = Path(filename).stem if filename else ""
+        first_page_text = first_page_text or ""
+        title_lines = [line.strip() for line in first_page_text.split("\n") if line.strip() and not line.startswith("#")]
+        title = title_lines[0][:500] if title_lines else stem[:500] if stem else "无标题"
+        
+        # 提取摘要（第一页的前200个字符）
+        summary_text = first_page_text.replace("## 第 1 页\n\n", "").strip()
+        summary = summary_text[:200] if summary_text else ""
+        
+        return {
+            "title": title,
+            "summary": summary,
+            "metadata": {
+                "page_count": len(pdf_reader.pages),
+                "file_size": file_size,
             }
+        }
+    
+    @staticmethod
+    def _iter_pages(pdf_reader) -> Iterator[str]:
+        """产出有文本的页面的Markdown"""
+        for page_num, page in enumerate(pdf_reader.pages):
+            try:
+                text = page.extract_text()
+                if text.strip():
+                    yield f"## 第 {page_num + 1} 页\n\n{text}\n\n"
+            except Exception as e:
+                logger.warning(f"提取第 {page_num + 1} 页文本失败: {e}")
     
     def extract_metadata(self, file_path: str) -> Dict[str, Any]:
         """提取PDF文件元数据"""
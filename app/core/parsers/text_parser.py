@@ -3,7 +3,7 @@ TXT文件解析器
 """
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO
 from app.core.parsers.parser_interface import ParserInterface
 
 logger = logging.getLogger(__name__)
@@ -14,25 +14,12 @@ class TextParser(ParserInterface):
     
     def parse(self, file_path: str) -> Dict[str, Any]:
         """解析TXT文件为Markdown"""
-        file = Path(file_path)
-        
-        if not file.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        # 读取文件内容
-        try:
-            # 尝试UTF-8编码
-            content = file.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
-            # 尝试其他编码
-            try:
-                content = file.read_text(encoding="gbk")
-            except UnicodeDecodeError:
-                content = file.read_text(encoding="latin-1")
-        
-        # 去除BOM
-        if content.startswith("\ufeff"):
-            content = content[1:]
+        return self.parse_path(file_path)
+    
+    def parse_stream(self, fileobj: BinaryIO, filename: str = "") -> Dict[str, Any]:
+        """从文件对象解析TXT内容"""
+        raw = fileobj.read()
+        content = self._decode_text(raw)
         
         # 提取标题（第一行或前100个字符）
         lines = content.strip().split("\n")
@@ -48,7 +35,10 @@ class TextParser(ParserInterface):
             "content": markdown_content,
             "title": title,
             "summary": summary,
-            "metadata": {}
+            "metadata": {
+                "page_count": None,
+                "file_size": len(raw),
+            }
         }
     
     def extract_metadata(self, file_path: str) -> Dict[str, Any]:
@@ -3,7 +3,7 @@ Word文件解析器
 """
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO
 from app.core.parsers.parser_interface import ParserInterface
 
 logger = logging.getLogger(__name__)
@@ -21,16 +21,15 @@ class WordParser(ParserInterface):
     
     def parse(self, file_path: str) -> Dict[str, Any]:
         """解析Word文件为Markdown"""
+        return self.parse_path(file_path)
+    
+    def parse_stream(self, fileobj: BinaryIO, filename: str = "") -> Dict[str, Any]:
+        """从文件对象解析Word（只打开一次，同时返回页数等元数据）"""
         if not WORD_AVAILABLE:
             raise ImportError("python-docx未安装，无法解析Word文件。请运行: pip install python-docx")
         
-        file = Path(file_path)
-        
-        if not file.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        # 读取Word文档
-        doc = DocxDocument(file_path)
+        file_size = self._stream_size(fileobj)
+        doc = DocxDocument(fileobj)
         
         # 提取所有段落
         paragraphs = []
@@ -51,7 +50,8 @@ class WordParser(ParserInterface):
         content = "".join(paragraphs)
         
         # 提取标题（第一个段落或文件名）
-        title = doc.paragraphs[0].text.strip()[:500] if doc.paragraphs and doc.paragraphs[0].text.strip() else file.stem[:500] if file.stem else "无标题"
+        stem = Path(filename).stem if filename else ""
+        title = doc.paragraphs[0].text.strip()[:500] if doc.paragraphs and doc.paragraphs[0].text.strip() else stem[:500] if stem else "无标题"
         
         # 提取摘要（前几个段落的前200个字符）
         summary_text = " ".join([p.text.strip() for p in doc.paragraphs[:3] if p.text.strip()])
@@ -62,7 +62,9 @@ class WordParser(ParserInterface):
             "title": title,
             "summary": summary,
             "metadata": {
-                "page_count": len(doc.paragraphs) // 20  # 粗略估算页数
+                # 粗略估算页数（每页约20个段落）
+                "page_count": len(doc.paragraphs) // 20 if doc.paragraphs else 1,
+                "file_size": file_size,
             }
         }
     
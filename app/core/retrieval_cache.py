@@ -0,0 +1,163 @@
+"""
+检索结果缓存
+按用户维护索引代数（generation），向量写入/删除时递增，缓存条目代数不一致即视为失效
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.core.embedding_cache import normalize_query_text
+
+
+class RetrievalCache:
+    """
+    检索结果缓存（LRU + TTL + 按用户索引代数失效）
+
+    进程内维护本地索引代数；多进程部署时，各进程写入向量后同时递增数据库中的用户索引代数，
+    检索前按generation_check_seconds的间隔与数据库代数比对（sync_generation），不一致时递增本地代数。
+    TTL作为兜底，限制数据库代数读取失败时的过期时间
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 600, generation_check_seconds: float = 1.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.generation_check_seconds = generation_check_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[int, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._generations: Dict[Tuple[str, str], int] = {}
+        # 最近一次看到的数据库索引代数和比对时间
+        self._stored_generations: Dict[Tuple[str, str], int] = {}
+        self._checked_at: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # -------- 索引代数 --------
+    def generation(self, tenant_id: str, user_id: str) -> int:
+        """获取用户当前的索引代数"""
+        with self._lock:
+            return self._generations.get((tenant_id, user_id), 0)
+
+    def bump_generation(self, tenant_id: str, user_id: str) -> int:
+        """递增用户的索引代数（用户的向量发生变化时调用），返回新的代数"""
+        with self._lock:
+            user_key = (tenant_id, user_id)
+            self._generations[user_key] = self._generations.get(user_key, 0) + 1
+            return self._generations[user_key]
+
+    def generation_check_due(self, tenant_id: str, user_id: str) -> bool:
+        """距上次与数据库代数比对是否已超过检查间隔"""
+        with self._lock:
+            checked_at = self._checked_at.get((tenant_id, user_id))
+        return checked_at is None or time.monotonic() - checked_at >= self.generation_check_seconds
+
+    def sync_generation(self, tenant_id: str, user_id: str, stored_generation: int) -> bool:
+        """
+        与数据库中的用户索引代数比对
+
+        与上次看到的代数不一致（其他进程写入了向量，或首次比对）时递增本地代数，使缓存条目失效
+
+        Returns:
+            是否发生了变化（调用方据此丢弃其他进程内维护的索引，如BM25词法索引）
+        """
+        user_key = (tenant_id, user_id)
+        with self._lock:
+            self._checked_at[user_key] = time.monotonic()
+            if self._stored_generations.get(user_key) == stored_generation:
+                return False
+            self._stored_generations[user_key] = stored_generation
+            self._generations[user_key] = self._generations.get(user_key, 0) + 1
+            return True
+
+    def record_stored_generation(self, tenant_id: str, user_id: str, stored_generation: int) -> None:
+        """
+        记录本进程递增后的数据库代数
+
+        只有递增前的代数正是上次看到的代数时才记录（期间没有其他进程写入），
+        否则保留旧值，下次比对时按其他进程的变更处理
+        """
+        user_key = (tenant_id, user_id)
+        with self._lock:
+            if self._stored_generations.get(user_key) == stored_generation - 1:
+                self._stored_generations[user_key] = stored_generation
+
+    # -------- 缓存读写 --------
+    @staticmethod
+    def make_key(
+        tenant_id: str,
+        user_id: str,
+        folder_ids: Iterable[Optional[str]],
+        query: str,
+        top_k: int,
+        similarity_threshold: Optional[float],
+        use_rerank: bool,
+        rerank_top_n: Optional[int],
+        **extra: Any
+    ) -> Tuple:
+        """构建缓存键"""
+        query_hash = hashlib.sha256(normalize_query_text(query).encode("utf-8")).hexdigest()
+        folder_part = tuple(sorted(fid or "" for fid in set(folder_ids)))
+        extra_part = tuple(sorted(extra.items()))
+        return (
+            tenant_id, user_id, folder_part, query_hash,
+            top_k, similarity_threshold, bool(use_rerank), rerank_top_n, extra_part
+        )
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """获取缓存的检索结果（深拷贝），索引代数变化或过期返回None"""
+        current_generation = self.generation(key[0], key[1])
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != current_generation or entry[1] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            results = entry[2]
+        return copy.deepcopy(results)
+
+    def set(self, key: Tuple, generation: int, results: List[Dict[str, Any]]) -> None:
+        """
+        写入检索结果
+
+        Args:
+            key: 缓存键
+            generation: 开始检索前读取的索引代数（检索期间向量变化时该条目会自动失效）
+            results: 检索结果
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, time.time() + self.ttl_seconds, copy.deepcopy(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# 全局检索结果缓存实例
+retrieval_cache = RetrievalCache(
+    max_size=settings.RETRIEVAL_CACHE_SIZE,
+    ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+    generation_check_seconds=settings.INDEX_GENERATION_CHECK_SECONDS,
+)
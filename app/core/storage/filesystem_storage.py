@@ -4,7 +4,7 @@
 import os
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 from app.core.storage.storage_interface import StorageInterface
 from app.core.config import settings
 
@@ -73,6 +73,35 @@ class FilesystemStorage(StorageInterface):
         full_path = self.base_path / path
         return full_path.exists()
     
+    def get_local_path(self, path: str) -> Optional[str]:
+        """获取文件的真实路径（文件系统存储直接返回，不复制文件）"""
+        full_path = self.base_path / path
+        return str(full_path.resolve()) if full_path.is_file() else None
+    
+    def get_local_write_path(self, path: str) -> Optional[str]:
+        """获取可直接写入的真实路径（创建父目录）"""
+        full_path = self.base_path / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        return str(full_path.resolve())
+    
+    async def iter_file(self, path: str, block_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """按块读取文件（使用线程池执行同步读取，内存中只保留一个块）"""
+        full_path = self.base_path / path
+        
+        if not full_path.exists():
+            raise FileNotFoundError(f"文件不存在: {full_path}")
+        
+        import asyncio
+        f = await asyncio.to_thread(open, full_path, "rb")
+        try:
+            while True:
+                block = await asyncio.to_thread(f.read, block_size)
+                if not block:
+                    break
+                yield block
+        finally:
+            f.close()
+    
     def generate_path(self, tenant_id: str, user_id: str, folder_path: str, filename: str) -> str:
         """
         生成文件存储路径
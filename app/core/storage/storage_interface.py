@@ -2,7 +2,7 @@
 存储接口抽象
 """
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 
 class StorageInterface(ABC):
@@ -90,4 +90,37 @@ class StorageInterface(ABC):
             文件访问URL
         """
         pass
-
+    
+    def get_local_path(self, path: str) -> Optional[str]:
+        """
+        获取文件在本机文件系统上的真实路径（用于解析等只读场景，避免读入内存再写临时文件）
+        
+        Args:
+            path: 文件路径（相对路径）
+        
+        Returns:
+            本地绝对路径，非本地存储或文件不存在时返回None
+        """
+        return None
+    
+    def get_local_write_path(self, path: str) -> Optional[str]:
+        """
+        获取可直接写入的本地路径（用于流式写入大文件，如逐页输出的Markdown）
+        
+        Args:
+            path: 文件路径（相对路径）
+        
+        Returns:
+            本地绝对路径（父目录已创建），非本地存储返回None
+        """
+        return None
+    
+    async def iter_file(self, path: str, block_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """
+        分块读取文件（默认实现一次读入，本地存储覆盖为按块读取）
+        
+        Args:
+            path: 文件路径（相对路径）
+            block_size: 每块字节数
+        """
+        yield await self.read_file(path)
@@ -28,6 +28,20 @@ class DocumentStatus(str, Enum):
         return status in [cls.UPLOAD_FAILED, cls.PARSE_FAILED, cls.VECTORIZE_FAILED]
 
 
+class DocumentTaskStatus(str, Enum):
+    """文档任务状态枚举"""
+    PENDING = "pending"  # 等待执行（含等待重试）
+    RUNNING = "running"  # 已被worker领取（租约有效期内）
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"  # 重试次数用尽（待办）
+
+
+class DocumentTaskType(str, Enum):
+    """文档任务类型枚举"""
+    PROCESS_DOCUMENT = "process_document"  # 解析 + 向量化
+    RECHUNK_DOCUMENT = "rechunk_document"  # 按新的切分配置重新切分 + 向量化（复用已解析的Markdown）
+
+
 @dataclass
 class FileUploadConfig:
     """文件上传配置值对象"""
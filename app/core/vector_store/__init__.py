@@ -2,12 +2,18 @@
 向量库模块
 """
 from app.core.vector_store.vector_store_interface import VectorStoreInterface
+from app.core.vector_store.base_vector_store import BaseVectorStore
 from app.core.vector_store.chroma_vector_store import ChromaVectorStore
+from app.core.vector_store.numpy_vector_store import NumpyVectorStore
+from app.core.vector_store.ivf_vector_store import IVFVectorStore
 from app.core.vector_store.vector_store_factory import VectorStoreFactory
 
 __all__ = [
     "VectorStoreInterface",
+    "BaseVectorStore",
     "ChromaVectorStore",
+    "NumpyVectorStore",
+    "IVFVectorStore",
     "VectorStoreFactory",
 ]
 
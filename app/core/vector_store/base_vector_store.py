@@ -0,0 +1,86 @@
+"""
+向量库公共基类
+封装collection命名、向量库配置读取和where条件组合等各实现共用的逻辑
+"""
+from typing import Dict, Any, Optional
+from app.core.vector_store.vector_store_interface import VectorStoreInterface
+from app.services.config_service import ConfigService
+
+
+class BaseVectorStore(VectorStoreInterface):
+    """基于系统/租户配置的向量库基类"""
+    
+    def __init__(self, config_service: ConfigService):
+        self.config_service = config_service
+    
+    def get_collection_name(
+        self,
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> str:
+        """获取collection名称"""
+        # 获取collection前缀
+        vector_store_config = self._get_vector_store_config(tenant_id)
+        prefix = vector_store_config.get("collection_prefix", "doc_qa")
+        
+        if self._is_user_mode(vector_store_config):
+            # user模式：同一用户的所有文件夹共用一个collection，文件夹通过元数据folder_id区分
+            # 命名格式：{prefix}_{tenant_id}_{user_id}
+            collection_name = f"{prefix}_{tenant_id}_{user_id}"
+        else:
+            # folder_id为空时使用"root"
+            folder_part = folder_id if folder_id else "root"
+            
+            # 命名格式：{prefix}_{tenant_id}_{user_id}_{folder_id}
+            collection_name = f"{prefix}_{tenant_id}_{user_id}_{folder_part}"
+        
+        # Chroma collection名称限制：只能包含字母、数字、下划线和连字符
+        # 替换UUID中的连字符为下划线
+        collection_name = collection_name.replace("-", "_")
+        
+        return collection_name
+    
+    @staticmethod
+    def _is_user_mode(vector_store_config: Dict[str, Any]) -> bool:
+        """是否为按用户合并的collection模式"""
+        return vector_store_config.get("collection_mode", "folder") == "user"
+    
+    @staticmethod
+    def _folder_filter_value(folder_id: Optional[str]) -> str:
+        """文件夹在向量元数据中的取值（根目录为"root"）"""
+        return folder_id if folder_id else "root"
+    
+    @staticmethod
+    def _merge_where(*conditions: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """合并多个where条件（多个条件使用$and组合）"""
+        conditions = [c for c in conditions if c]
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": list(conditions)}
+    
+    def _get_vector_store_config(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """获取向量库配置（系统/租户级）"""
+        # 先尝试获取租户级配置
+        if tenant_id:
+            configs = self.config_service.list_scope_configs("tenant", tenant_id)
+            vector_store_config = configs.get("vector_store", {}).get("default")
+            if vector_store_config:
+                return vector_store_config
+        
+        # 使用系统级配置
+        configs = self.config_service.list_scope_configs("system", None)
+        vector_store_config = configs.get("vector_store", {}).get("default")
+        
+        if not vector_store_config:
+            # 使用默认配置
+            return {
+                "provider": "chroma",
+                "base_url": "",
+                "api_key": "",
+                "collection_prefix": "doc_qa"
+            }
+        
+        return vector_store_config
@@ -1,56 +1,53 @@
 """
 Chroma向量库实现
 """
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
+import numpy as np
 import chromadb
 from chromadb.config import Settings as ChromaSettings
-from app.core.vector_store.vector_store_interface import VectorStoreInterface
+from app.core.vector_store.base_vector_store import BaseVectorStore
+from app.core.vector_store.vector_store_interface import QueryVector, Vectors, as_query_vector, as_vector_matrix
 from app.core.config import settings
 from app.services.config_service import ConfigService
 import os
 
 
-class ChromaVectorStore(VectorStoreInterface):
-    """Chroma向量库实现"""
+class ChromaVectorStore(BaseVectorStore):
+    """
+    Chroma向量库实现
+
+    PersistentClient按存储路径在进程内共享；collection句柄以LRU缓存（CHROMA_COLLECTION_CACHE_SIZE），
+    同一用户的重复检索直接复用已打开的collection
+    """
+    
+    _clients: Dict[str, Any] = {}
+    _collection_handles = OrderedDict()  # (存储路径, collection名) -> collection句柄
+    _lock = threading.Lock()
     
     def __init__(self, config_service: ConfigService):
-        self.config_service = config_service
+        super().__init__(config_service)
         self.base_path = settings.VECTOR_STORE_BASE_PATH
-        
-        # 确保目录存在
-        os.makedirs(self.base_path, exist_ok=True)
-        
-        # 创建持久化客户端
-        self.client = chromadb.PersistentClient(
-            path=self.base_path,
-            settings=ChromaSettings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        self.client = self._get_client(self.base_path)
     
-    def get_collection_name(
-        self,
-        tenant_id: str,
-        user_id: str,
-        folder_id: Optional[str] = None
-    ) -> str:
-        """获取collection名称"""
-        # 获取collection前缀
-        vector_store_config = self._get_vector_store_config(tenant_id)
-        prefix = vector_store_config.get("collection_prefix", "doc_qa")
-        
-        # folder_id为空时使用"root"
-        folder_part = folder_id if folder_id else "root"
-        
-        # 命名格式：{prefix}_{tenant_id}_{user_id}_{folder_id}
-        collection_name = f"{prefix}_{tenant_id}_{user_id}_{folder_part}"
-        
-        # Chroma collection名称限制：只能包含字母、数字、下划线和连字符
-        # 替换UUID中的连字符为下划线
-        collection_name = collection_name.replace("-", "_")
-        
-        return collection_name
+    @classmethod
+    def _get_client(cls, base_path: str):
+        """获取存储路径对应的共享持久化客户端（首次访问时创建目录和客户端）"""
+        with cls._lock:
+            client = cls._clients.get(base_path)
+            if client is None:
+                # 确保目录存在
+                os.makedirs(base_path, exist_ok=True)
+                client = chromadb.PersistentClient(
+                    path=base_path,
+                    settings=ChromaSettings(
+                        anonymized_telemetry=False,
+                        allow_reset=True
+                    )
+                )
+                cls._clients[base_path] = client
+            return client
     
     def _get_collection(
         self,
@@ -58,47 +55,42 @@ class ChromaVectorStore(VectorStoreInterface):
         user_id: str,
         folder_id: Optional[str] = None
     ):
-        """获取或创建collection"""
+        """获取或创建collection（句柄在进程内LRU缓存）"""
         collection_name = self.get_collection_name(tenant_id, user_id, folder_id)
+        handle_key = (self.base_path, collection_name)
+        with self._lock:
+            collection = self._collection_handles.get(handle_key)
+            if collection is not None:
+                self._collection_handles.move_to_end(handle_key)
+                return collection
         
         try:
             collection = self.client.get_collection(name=collection_name)
         except Exception:
             # Collection不存在，创建新的
-            collection = self.client.create_collection(
+            metadata = {"tenant_id": tenant_id, "user_id": user_id}
+            if not self._is_user_mode(self._get_vector_store_config(tenant_id)):
+                metadata["folder_id"] = folder_id or "root"
+            collection = self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"tenant_id": tenant_id, "user_id": user_id, "folder_id": folder_id or "root"}
+                metadata=metadata
             )
         
+        with self._lock:
+            self._collection_handles[handle_key] = collection
+            self._collection_handles.move_to_end(handle_key)
+            while len(self._collection_handles) > settings.CHROMA_COLLECTION_CACHE_SIZE:
+                self._collection_handles.popitem(last=False)
         return collection
     
-    def _get_vector_store_config(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
-        """获取向量库配置（系统/租户级）"""
-        # 先尝试获取租户级配置
-        if tenant_id:
-            configs = self.config_service.list_scope_configs("tenant", tenant_id)
-            vector_store_config = configs.get("vector_store", {}).get("default")
-            if vector_store_config:
-                return vector_store_config
-        
-        # 使用系统级配置
-        configs = self.config_service.list_scope_configs("system", None)
-        vector_store_config = configs.get("vector_store", {}).get("default")
-        
-        if not vector_store_config:
-            # 使用默认配置
-            return {
-                "provider": "chroma",
-                "base_url": "",
-                "api_key": "",
-                "collection_prefix": "doc_qa"
-            }
-        
-        return vector_store_config
+    def _forget_collection(self, collection_name: str) -> None:
+        """丢弃缓存的collection句柄（collection被删除或句柄失效时调用，下次访问重新获取）"""
+        with self._lock:
+            self._collection_handles.pop((self.base_path, collection_name), None)
     
     def add_vectors(
         self,
-        vectors: List[List[float]],
+        vectors: Vectors,
         texts: List[str],
         metadatas: List[Dict[str, Any]],
         ids: List[str],
@@ -117,7 +109,7 @@ class ChromaVectorStore(VectorStoreInterface):
             
             # 添加向量
             collection.add(
-                embeddings=vectors,
+                embeddings=as_vector_matrix(vectors),
                 documents=texts,
                 metadatas=metadatas,
                 ids=ids
@@ -127,11 +119,12 @@ class ChromaVectorStore(VectorStoreInterface):
             return True
         except Exception as e:
             logger.error(f"添加向量失败: {e}", exc_info=True)
+            self._forget_collection(self.get_collection_name(tenant_id, user_id, folder_id))
             return False
     
     def search(
         self,
-        query_vector: List[float],
+        query_vector: QueryVector,
         top_k: int,
         tenant_id: str,
         user_id: str,
@@ -139,17 +132,66 @@ class ChromaVectorStore(VectorStoreInterface):
         filter_metadata: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """搜索相似向量"""
+        folder_where = None
+        if self._is_user_mode(self._get_vector_store_config(tenant_id)):
+            # user模式下collection包含用户所有文件夹，需要按folder_id过滤
+            folder_where = {"folder_id": self._folder_filter_value(folder_id)}
+        return self._query(
+            query_vector,
+            top_k,
+            tenant_id,
+            user_id,
+            folder_id,
+            self._merge_where(folder_where, filter_metadata)
+        )
+    
+    def search_folders(
+        self,
+        query_vector: QueryVector,
+        top_k: int,
+        tenant_id: str,
+        user_id: str,
+        folder_ids: List[Optional[str]],
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """在多个文件夹中搜索相似向量（user模式下为单次查询）"""
+        if not folder_ids:
+            return []
+        if not self._is_user_mode(self._get_vector_store_config(tenant_id)):
+            return super().search_folders(
+                query_vector, top_k, tenant_id, user_id, folder_ids, filter_metadata
+            )
+        
+        folder_values = list(dict.fromkeys(self._folder_filter_value(fid) for fid in folder_ids))
+        folder_where = {"folder_id": {"$in": folder_values}}
+        return self._query(
+            query_vector,
+            top_k,
+            tenant_id,
+            user_id,
+            None,
+            self._merge_where(folder_where, filter_metadata)
+        )
+    
+    def _query(
+        self,
+        query_vector: QueryVector,
+        top_k: int,
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str],
+        where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """在collection中执行向量查询并格式化结果（查询失败时丢弃collection句柄并抛出异常）"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
         try:
             collection = self._get_collection(tenant_id, user_id, folder_id)
             
-            # 构建where条件
-            where = None
-            if filter_metadata:
-                where = filter_metadata
-            
             # 搜索
             results = collection.query(
-                query_embeddings=[query_vector],
+                query_embeddings=as_query_vector(query_vector)[None, :],
                 n_results=top_k,
                 where=where
             )
@@ -167,8 +209,54 @@ class ChromaVectorStore(VectorStoreInterface):
             
             return formatted_results
         except Exception as e:
-            print(f"搜索向量失败: {e}")
-            return []
+            logger.error(f"搜索向量失败: {e}")
+            self._forget_collection(self.get_collection_name(tenant_id, user_id, folder_id))
+            raise
+    
+    def get_vectors(
+        self,
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """读取已有向量"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        try:
+            collection = self._get_collection(tenant_id, user_id, folder_id)
+            results = collection.get(ids=ids, include=["embeddings"])
+            return {
+                vector_id: as_query_vector(embedding)
+                for vector_id, embedding in zip(results["ids"], results["embeddings"])
+            }
+        except Exception as e:
+            logger.error(f"读取向量失败: {e}", exc_info=True)
+            self._forget_collection(self.get_collection_name(tenant_id, user_id, folder_id))
+            return {}
+    
+    def delete_by_ids(
+        self,
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> bool:
+        """根据向量ID删除向量"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        if not ids:
+            return True
+        try:
+            collection = self._get_collection(tenant_id, user_id, folder_id)
+            collection.delete(ids=ids)
+            return True
+        except Exception as e:
+            logger.error(f"删除向量失败: {e}", exc_info=True)
+            self._forget_collection(self.get_collection_name(tenant_id, user_id, folder_id))
+            return False
     
     def delete_by_document_id(
         self,
@@ -193,5 +281,75 @@ class ChromaVectorStore(VectorStoreInterface):
             return True
         except Exception as e:
             print(f"删除向量失败: {e}")
+            self._forget_collection(self.get_collection_name(tenant_id, user_id, folder_id))
             return False
 
+    
+    def consolidate_user_collections(self, batch_size: int = 500, drop_source: bool = True) -> Dict[str, int]:
+        """
+        将按文件夹划分的collection（{prefix}_{tenant}_{user}_{folder}）合并为按用户划分的collection
+        
+        依赖collection创建时写入的tenant_id/user_id/folder_id元数据识别来源，
+        迁移完成后需将租户的vector_store.default.collection_mode设置为"user"
+        
+        Args:
+            batch_size: 每批复制的向量数量
+            drop_source: 复制完成后是否删除源collection
+        
+        Returns:
+            迁移统计：collections（处理的collection数）、vectors（复制的向量数）、
+            failed（迁移失败的collection数，失败的源collection保留不删除，可重新执行）
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        stats = {"collections": 0, "vectors": 0, "failed": 0}
+        for item in self.client.list_collections():
+            name = item if isinstance(item, str) else item.name
+            try:
+                source = self.client.get_collection(name=name)
+                metadata = source.metadata or {}
+                tenant_id = metadata.get("tenant_id")
+                user_id = metadata.get("user_id")
+                if not tenant_id or not user_id or "folder_id" not in metadata:
+                    # 已经是user模式的collection或非本系统创建的collection
+                    continue
+                
+                prefix = self._get_vector_store_config(tenant_id).get("collection_prefix", "doc_qa")
+                target_name = f"{prefix}_{tenant_id}_{user_id}".replace("-", "_")
+                if target_name == name:
+                    continue
+                target = self.client.get_or_create_collection(
+                    name=target_name,
+                    metadata={"tenant_id": tenant_id, "user_id": user_id}
+                )
+                
+                offset = 0
+                while True:
+                    batch = source.get(
+                        include=["embeddings", "documents", "metadatas"],
+                        limit=batch_size,
+                        offset=offset
+                    )
+                    if not batch["ids"]:
+                        break
+                    target.upsert(
+                        ids=batch["ids"],
+                        embeddings=batch["embeddings"],
+                        documents=batch["documents"],
+                        metadatas=batch["metadatas"]
+                    )
+                    stats["vectors"] += len(batch["ids"])
+                    offset += len(batch["ids"])
+                
+                if drop_source:
+                    self.client.delete_collection(name=name)
+                    self._forget_collection(name)
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error(f"合并collection {name} 失败，已保留源collection: {e}", exc_info=True)
+                continue
+            stats["collections"] += 1
+            logger.info(f"已将collection {name} 合并到 {target_name}（{offset} 个向量）")
+        
+        return stats
@@ -0,0 +1,193 @@
+"""
+IVF近似最近邻向量库实现
+在NumPy平铺存储之上增加k-means粗量化倒排列表，检索时只对nprobe个最近列表中的行精确计算距离
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+import numpy as np
+from app.core.vector_store.numpy_vector_store import FlatCollection, NumpyVectorStore, _file_lock
+from app.core.vector_store.quantization import assign_nearest, kmeans
+
+logger = logging.getLogger(__name__)
+
+
+class IVFCollection(FlatCollection):
+    """
+    IVF-Flat索引（倒排文件 + 精确重算）
+
+    额外文件 ivf.npz：聚类中心、每行所属列表（与矩阵行对齐）、训练时的行数、所属段目录；
+    行数低于训练阈值时退化为平铺检索，存活行数增长到上次训练的RETRAIN_GROWTH倍时重新训练，
+    新写入的行按最近中心增量分配列表
+    """
+
+    MIN_TRAIN_SIZE = 1024
+    RETRAIN_GROWTH = 4.0
+    KMEANS_ITERATIONS = 10
+    SAMPLE_PER_LIST = 64
+    MAX_TRAIN_SAMPLE = 65536
+    DEFAULT_NPROBE = 8
+
+    def _reset(self) -> None:
+        super()._reset()
+        self.centroids: Optional[np.ndarray] = None
+        self.centroid_sq_norms: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_count = 0
+
+    @property
+    def _ivf_path(self) -> str:
+        return os.path.join(self.path, "ivf.npz")
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    # -------- 加载/保存 --------
+    def _load(self) -> None:
+        super()._load()
+        if not self.manifest["count"] or not os.path.exists(self._ivf_path):
+            return
+        with np.load(self._ivf_path) as data:
+            if str(data["segment"]) != self.manifest["segment"] or len(data["assignments"]) > self.manifest["count"]:
+                # 压缩前保存的索引与当前行号不再对齐，下次写入时重新训练
+                return
+            self._set_centroids(data["centroids"])
+            self.trained_count = int(data["trained_count"])
+            assignments = data["assignments"]
+        self.assignments = np.concatenate([assignments, self._assign(self.vectors[len(assignments):])])
+
+    def _save_ivf(self) -> None:
+        """原子写入索引文件（调用方持有文件锁）"""
+        tmp_path = f"{self._ivf_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                trained_count=self.trained_count,
+                segment=self.manifest["segment"],
+            )
+        os.replace(tmp_path, self._ivf_path)
+
+    def _set_centroids(self, centroids: np.ndarray) -> None:
+        self.centroids = centroids.astype(np.float32, copy=False)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    # -------- 聚类 --------
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """为每行分配最近的聚类中心"""
+        return assign_nearest(vectors, self.centroids, self.centroid_sq_norms)
+
+    def _train(self, nlist: Optional[int] = None) -> None:
+        """在存活行的采样上训练k-means中心，并重新分配所有行"""
+        live_rows = np.flatnonzero(self.alive)
+        if nlist is None:
+            nlist = int(np.clip(4 * np.sqrt(len(live_rows)), 16, 4096))
+        nlist = max(1, min(int(nlist), len(live_rows)))
+
+        rng = np.random.default_rng(0)
+        sample_size = min(len(live_rows), nlist * self.SAMPLE_PER_LIST, max(self.MAX_TRAIN_SAMPLE, nlist))
+        sample = np.sort(rng.choice(live_rows, sample_size, replace=False))
+        self._set_centroids(kmeans(self.vectors[sample], nlist, self.KMEANS_ITERATIONS, rng))
+
+        self.assignments = self._assign(self.vectors)
+        self.trained_count = len(live_rows)
+        logger.info(f"IVF索引 {self.path} 训练完成：{len(live_rows)} 行，{nlist} 个列表")
+
+    def _needs_training(self) -> bool:
+        live = int(self.alive.sum())
+        if not self.is_trained:
+            return live >= self.MIN_TRAIN_SIZE
+        return live >= self.RETRAIN_GROWTH * self.trained_count
+
+    # -------- 写入 --------
+    def add(
+        self,
+        vectors: np.ndarray,
+        texts: List[Optional[str]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        nlist: Optional[int] = None,
+        **index_options: Any
+    ) -> None:
+        """追加向量并增量分配倒排列表，达到阈值时（重新）训练"""
+        with self.lock:
+            super().add(vectors, texts, metadatas, ids, **index_options)
+            with _file_lock(os.path.join(self.path, ".lock")):
+                if self.is_trained and len(self.assignments) < len(self.ids):
+                    self.assignments = np.concatenate([
+                        self.assignments, self._assign(self.vectors[len(self.assignments):])
+                    ])
+                if self._needs_training():
+                    self._train(nlist)
+                if self.is_trained:
+                    self._save_ivf()
+
+    def _compact(self) -> None:
+        """压缩时保留聚类中心，倒排列表随存活行一起重排"""
+        if not self.is_trained:
+            super()._compact()
+            return
+        centroids, trained_count = self.centroids, self.trained_count
+        live_assignments = self.assignments[self.alive]
+        super()._compact()
+        self._set_centroids(centroids)
+        self.trained_count = trained_count
+        self.assignments = live_assignments
+        self._save_ivf()
+
+    # -------- 检索 --------
+    def _restrict_candidates(
+        self,
+        query_vector: np.ndarray,
+        mask: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        **search_options: Any
+    ) -> np.ndarray:
+        """
+        只保留最近nprobe个列表中的行
+
+        过滤条件较严格导致候选不足top_k时，按距离顺序逐步扩大探查的列表数
+        """
+        if not self.is_trained or len(self.assignments) != len(mask):
+            return mask
+        nlist = len(self.centroids)
+        nprobe = max(1, min(int(nprobe or self.DEFAULT_NPROBE), nlist))
+        centroid_distances = self.centroid_sq_norms - 2.0 * (self.centroids @ query_vector)
+        probe_order = np.argsort(centroid_distances)
+
+        list_mask = np.zeros(nlist, dtype=bool)
+        while True:
+            list_mask[probe_order[:nprobe]] = True
+            restricted = mask & list_mask[self.assignments]
+            if nprobe >= nlist or restricted.sum() >= top_k:
+                return restricted
+            nprobe = min(nprobe * 2, nlist)
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """
+    IVF近似最近邻向量库实现（provider: ivf）
+
+    nlist（列表数，默认按数据量自动确定）、nprobe（检索探查的列表数，越大召回越高、延迟越高）
+    通过 vector_store.default 配置，可按租户调整
+    """
+
+    collection_class = IVFCollection
+    storage_dir = "ivf"
+    _collections: "OrderedDict[str, IVFCollection]" = OrderedDict()
+    _collections_lock = threading.Lock()
+
+    def _index_options(self, tenant_id: str) -> Dict[str, Any]:
+        """从向量库配置读取量化方式和nlist/nprobe"""
+        vector_store_config = self._get_vector_store_config(tenant_id)
+        options = super()._index_options(tenant_id)
+        if vector_store_config.get("nlist"):
+            options["nlist"] = int(vector_store_config["nlist"])
+        if vector_store_config.get("nprobe"):
+            options["nprobe"] = int(vector_store_config["nprobe"])
+        return options
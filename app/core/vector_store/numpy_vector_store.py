@@ -0,0 +1,725 @@
+"""
+NumPy平铺向量库实现
+每个collection以内存映射的float32矩阵存储，暴力矩阵乘法计算距离，适合单用户10万级chunk规模
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+import numpy as np
+from app.core.vector_store.base_vector_store import BaseVectorStore
+from app.core.vector_store.vector_store_interface import QueryVector, Vectors, as_query_vector, as_vector_matrix
+from app.core.vector_store.quantization import QUANTIZERS, ProductQuantizer, ScalarQuantizer
+from app.core.config import settings
+from app.services.config_service import ConfigService
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，退化为仅进程内加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """跨进程文件锁（写操作互斥）"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class FlatCollection:
+    """
+    单个collection的平铺存储
+
+    目录结构：
+    - manifest.json：维度、已提交行数、各文件已提交字节数、当前段目录
+    - {segment}/vectors.f32：按行追加的float32矩阵（无文件头，便于O(新增行数)追加），以memmap方式读取
+    - {segment}/rows.jsonl：与矩阵行一一对应的 id/text/metadata（内存中只保留id、metadata和行偏移，文本在命中后按偏移读取）
+    - {segment}/tombstones.jsonl：已删除的行号
+    - {segment}/quantizer_{version}.npz、codes_{version}.u8：可选的量化器参数和按行追加的量化编码
+
+    manifest原子替换作为提交点，崩溃时manifest之后写入的数据会被忽略；
+    墓碑比例超过阈值时压缩到新段目录，再切换manifest。
+    启用量化（int8/pq）时，检索先用常驻内存的量化编码计算近似距离筛选候选，再用float32原始向量精确重算
+    """
+
+    COMPACT_RATIO = 0.25
+    QUANTIZE_MIN_TRAIN_SIZE = 1024
+    QUANTIZE_RETRAIN_GROWTH = 4.0
+    QUANTIZE_MAX_TRAIN_SAMPLE = 65536
+    MASK_CACHE_SIZE = 64
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self._manifest_mtime = None
+        self._reset()
+
+    def _reset(self) -> None:
+        if getattr(self, "_rows_file", None) is not None:
+            self._rows_file.close()
+        self._rows_file = None
+        self.manifest = {"dim": 0, "count": 0, "rows_bytes": 0, "tombstones_bytes": 0, "segment": "seg_0"}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.sq_norms = np.zeros(0, dtype=np.float32)
+        self.ids: List[str] = []
+        self.row_offsets = np.zeros(0, dtype=np.int64)
+        self.metadatas: List[Dict[str, Any]] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.id_to_row: Dict[str, int] = {}
+        self._mask_cache = OrderedDict()  # (key, value) -> 布尔掩码
+        self.quantizer = None
+        self.quantizer_trained_count = 0
+        self.codes = np.zeros((0, 0), dtype=np.uint8)
+        self.code_norms = np.zeros(0, dtype=np.float32)
+
+    # -------- 路径 --------
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def _segment_file(self, name: str, segment: Optional[str] = None) -> str:
+        return os.path.join(self.path, segment or self.manifest["segment"], name)
+
+    # -------- 加载 --------
+    def refresh(self) -> None:
+        """manifest被其他进程更新时重新加载"""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self._load()
+            self._manifest_mtime = mtime
+
+    def _load(self) -> None:
+        self._reset()
+        if not os.path.exists(self._manifest_path):
+            return
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        count, dim = self.manifest["count"], self.manifest["dim"]
+        if count:
+            self.vectors = np.memmap(self._segment_file("vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+            self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+        data = self._read_rows_bytes(0, self.manifest["rows_bytes"])
+        offsets = []
+        position = 0
+        for line in data.splitlines(keepends=True):
+            row = json.loads(line)
+            self.id_to_row[row["id"]] = len(self.ids)
+            self.ids.append(row["id"])
+            self.metadatas.append(row.get("metadata") or {})
+            offsets.append(position)
+            position += len(line)
+        self.row_offsets = np.array(offsets, dtype=np.int64)
+
+        self.alive = np.ones(count, dtype=bool)
+        tombstones_path = self._segment_file("tombstones.jsonl")
+        if self.manifest["tombstones_bytes"] and os.path.exists(tombstones_path):
+            with open(tombstones_path, "rb") as f:
+                data = f.read(self.manifest["tombstones_bytes"])
+            for line in data.splitlines():
+                rows = json.loads(line)
+                self.alive[rows] = False
+                for row in rows:
+                    self.id_to_row.pop(self.ids[row], None)
+
+        self._load_quantizer()
+
+    def _commit_manifest(self) -> None:
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+
+    @staticmethod
+    def _append_bytes(path: str, committed_bytes: int, payload: bytes) -> int:
+        """截断到已提交长度后追加，返回新的提交长度"""
+        with open(path, "ab") as f:
+            f.truncate(committed_bytes)
+            f.write(payload)
+        return committed_bytes + len(payload)
+
+    def _read_rows_bytes(self, start: int, end: int) -> bytes:
+        """读取rows.jsonl的字节区间（文件句柄在段加载后保持打开，段目录被其他进程压缩删除后仍可读取）"""
+        if end <= start:
+            return b""
+        if self._rows_file is None:
+            self._rows_file = open(self._segment_file("rows.jsonl"), "rb", buffering=0)
+        self._rows_file.seek(start)
+        return self._rows_file.read(end - start)
+
+    def _read_texts(self, rows: List[int]) -> List[Optional[str]]:
+        """按行号从rows.jsonl读取文本（只用于最终命中的行和元数据更新）"""
+        texts = []
+        for row in rows:
+            end = int(self.row_offsets[row + 1]) if row + 1 < len(self.row_offsets) else self.manifest["rows_bytes"]
+            texts.append(json.loads(self._read_rows_bytes(int(self.row_offsets[row]), end)).get("text"))
+        return texts
+
+    # -------- 写入 --------
+    def add(
+        self,
+        vectors: np.ndarray,
+        texts: List[Optional[str]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        quantization: Optional[str] = None,
+        pq_subvectors: Optional[int] = None,
+        **index_options: Any
+    ) -> None:
+        """追加向量（id已存在时旧行标记删除，语义等同upsert），并维护量化编码"""
+        with self.lock, _file_lock(os.path.join(self.path, ".lock")):
+            self.refresh()
+            count, dim = self.manifest["count"], self.manifest["dim"]
+            if count and vectors.shape[1] != dim:
+                raise ValueError(f"向量维度不匹配: 期望 {dim}, 实际 {vectors.shape[1]}")
+            if not count:
+                dim = vectors.shape[1]
+                os.makedirs(os.path.join(self.path, self.manifest["segment"]), exist_ok=True)
+
+            replaced = [self.id_to_row[vid] for vid in ids if vid in self.id_to_row]
+            if replaced:
+                self._write_tombstones(replaced)
+
+            self._append_bytes(self._segment_file("vectors.f32"), count * dim * 4, vectors.tobytes())
+            row_lines = [
+                (json.dumps({"id": vid, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n").encode("utf-8")
+                for vid, text, metadata in zip(ids, texts, metadatas)
+            ]
+            rows_start = self.manifest["rows_bytes"]
+            self.manifest["rows_bytes"] = self._append_bytes(
+                self._segment_file("rows.jsonl"), rows_start, b"".join(row_lines)
+            )
+            self.manifest["dim"] = dim
+            self.manifest["count"] = count + len(ids)
+
+            # 增量更新内存状态（memmap重新映射新的长度）
+            new_count = self.manifest["count"]
+            self.vectors = np.memmap(self._segment_file("vectors.f32"), dtype=np.float32, mode="r", shape=(new_count, dim))
+            self.sq_norms = np.concatenate([self.sq_norms, np.einsum("ij,ij->i", vectors, vectors)])
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            line_lengths = np.fromiter((len(line) for line in row_lines), dtype=np.int64, count=len(row_lines))
+            self.row_offsets = np.concatenate([self.row_offsets, rows_start + np.cumsum(line_lengths) - line_lengths])
+            for vid, metadata in zip(ids, metadatas):
+                self.id_to_row[vid] = len(self.ids)
+                self.ids.append(vid)
+                self.metadatas.append(metadata)
+            self._mask_cache.clear()
+
+            try:
+                self._maintain_quantizer(vectors, quantization, pq_subvectors)
+            except Exception as e:
+                # 量化只用于加速检索，失败时退化为精确检索
+                logger.warning(f"向量collection {self.path} 量化编码失败，已停用量化: {e}", exc_info=True)
+                self._drop_quantizer()
+            self._commit_manifest()
+            self._cleanup_quantizer_files()
+
+    def delete(self, where: Dict[str, Any]) -> int:
+        """按where条件删除（写墓碑），返回删除行数"""
+        with self.lock, _file_lock(os.path.join(self.path, ".lock")):
+            self.refresh()
+            return self._delete_rows(np.flatnonzero(self.where_mask(where)).tolist())
+
+    def delete_ids(self, ids: List[str]) -> int:
+        """按向量ID删除（写墓碑），不存在的ID忽略，返回删除行数"""
+        with self.lock, _file_lock(os.path.join(self.path, ".lock")):
+            self.refresh()
+            return self._delete_rows([self.id_to_row[vid] for vid in set(ids) if vid in self.id_to_row])
+
+    def _delete_rows(self, rows: List[int]) -> int:
+        """写墓碑并提交，删除过多时压缩（调用方需持有锁）"""
+        if not rows:
+            return 0
+        self._write_tombstones(rows)
+        self._commit_manifest()
+        self._mask_cache.clear()
+
+        dead = int(len(self.alive) - self.alive.sum())
+        if dead > self.COMPACT_RATIO * len(self.alive):
+            self._compact()
+        return len(rows)
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """读取存活的向量（返回副本），不存在的ID不包含在内"""
+        with self.lock:
+            self.refresh()
+            found = [(vid, self.id_to_row[vid]) for vid in ids if vid in self.id_to_row]
+            if not found:
+                return {}
+            vectors = np.array(self.vectors[[row for _, row in found]], dtype=np.float32)
+            return {vid: vector for (vid, _), vector in zip(found, vectors)}
+
+    def _write_tombstones(self, rows: List[int]) -> None:
+        """写入墓碑（调用方负责提交manifest）"""
+        payload = (json.dumps(rows) + "\n").encode("utf-8")
+        self.manifest["tombstones_bytes"] = self._append_bytes(
+            self._segment_file("tombstones.jsonl"), self.manifest["tombstones_bytes"], payload
+        )
+        self.alive[rows] = False
+        for row in rows:
+            self.id_to_row.pop(self.ids[row], None)
+
+    def _compact(self) -> None:
+        """将存活行写入新段目录并切换manifest"""
+        old_segment = self.manifest["segment"]
+        new_segment = f"seg_{int(old_segment.split('_')[1]) + 1}"
+        os.makedirs(os.path.join(self.path, new_segment), exist_ok=True)
+
+        live_rows = np.flatnonzero(self.alive)
+        with open(self._segment_file("vectors.f32", new_segment), "wb") as f:
+            for start in range(0, len(live_rows), 4096):
+                f.write(np.ascontiguousarray(self.vectors[live_rows[start:start + 4096]]).tobytes())
+        # 行的JSON与内存中的元数据一致（元数据更新会追加新行），直接复制存活行的原始字节
+        data = self._read_rows_bytes(0, self.manifest["rows_bytes"])
+        ends = np.append(self.row_offsets[1:], len(data))
+        rows_bytes = 0
+        with open(self._segment_file("rows.jsonl", new_segment), "wb") as f:
+            for row in live_rows:
+                line = data[self.row_offsets[row]:ends[row]]
+                f.write(line)
+                rows_bytes += len(line)
+        del data
+
+        quantizer_state = None
+        if self._quantizer_aligned():
+            # 量化编码随存活行一起重排，无需重新训练
+            quantizer_state = dict(self.manifest["quantizer"], code_count=int(len(live_rows)))
+            self._save_quantizer(new_segment, quantizer_state["version"])
+            with open(self._segment_file(f"codes_{quantizer_state['version']}.u8", new_segment), "wb") as f:
+                f.write(np.ascontiguousarray(self.codes[live_rows]).tobytes())
+
+        self.manifest = {
+            "dim": self.manifest["dim"],
+            "count": int(len(live_rows)),
+            "rows_bytes": rows_bytes,
+            "tombstones_bytes": 0,
+            "segment": new_segment,
+        }
+        if quantizer_state:
+            self.manifest["quantizer"] = quantizer_state
+        self._commit_manifest()
+        self._load()
+        shutil.rmtree(os.path.join(self.path, old_segment), ignore_errors=True)
+        logger.info(f"向量collection {self.path} 压缩完成，剩余 {len(live_rows)} 行")
+
+    # -------- 量化 --------
+    def _quantizer_aligned(self) -> bool:
+        """量化编码是否覆盖所有行"""
+        return self.quantizer is not None and len(self.codes) == len(self.ids) and "quantizer" in self.manifest
+
+    def _set_codes(self, codes: np.ndarray) -> None:
+        self.codes = codes
+        self.code_norms = self.quantizer.code_norms(codes)
+
+    def _load_quantizer(self) -> None:
+        state = self.manifest.get("quantizer")
+        if not state or not self.manifest["count"]:
+            return
+        version = state["version"]
+        with np.load(self._segment_file(f"quantizer_{version}.npz")) as data:
+            self.quantizer = QUANTIZERS[str(data["kind"])].from_arrays(data)
+            self.quantizer_trained_count = int(data["trained_count"])
+        code_count = min(state["code_count"], self.manifest["count"])
+        code_size = self.quantizer.code_size
+        codes = np.fromfile(
+            self._segment_file(f"codes_{version}.u8"), dtype=np.uint8, count=code_count * code_size
+        ).reshape(code_count, code_size)
+        # manifest记录之后写入的行（其他进程未编码）在内存中补齐，下次写入时落盘
+        self._set_codes(np.concatenate([codes, self.quantizer.encode(self.vectors[code_count:])]))
+
+    def _save_quantizer(self, segment: str, version: str) -> None:
+        with open(self._segment_file(f"quantizer_{version}.npz", segment), "wb") as f:
+            np.savez(f, kind=self.quantizer.kind, trained_count=self.quantizer_trained_count, **self.quantizer.to_arrays())
+
+    def _maintain_quantizer(
+        self,
+        new_vectors: np.ndarray,
+        quantization: Optional[str],
+        pq_subvectors: Optional[int]
+    ) -> None:
+        """写入后维护量化编码（调用方负责提交manifest）"""
+        if quantization not in QUANTIZERS:
+            if self.quantizer is not None:
+                self._drop_quantizer()
+            return
+
+        live = int(self.alive.sum())
+        stale = (
+            self.quantizer is None
+            or self.quantizer.kind != quantization
+            or (quantization == ProductQuantizer.kind and pq_subvectors
+                and ProductQuantizer.fit_subvectors(self.manifest["dim"], int(pq_subvectors)) != self.quantizer.subvectors)
+            or live >= self.QUANTIZE_RETRAIN_GROWTH * self.quantizer_trained_count
+        )
+        if stale:
+            if live >= self.QUANTIZE_MIN_TRAIN_SIZE:
+                self._train_quantizer(quantization, pq_subvectors)
+            elif self.quantizer is not None and self.quantizer.kind != quantization:
+                self._drop_quantizer()
+            elif self.quantizer is not None:
+                self._append_codes(new_vectors)
+            return
+        self._append_codes(new_vectors)
+
+    def _append_codes(self, new_vectors: np.ndarray) -> None:
+        """编码新写入的行并追加到编码文件"""
+        state = self.manifest["quantizer"]
+        self._set_codes(np.concatenate([self.codes, self.quantizer.encode(new_vectors)]))
+        code_count = state["code_count"]
+        code_size = self.quantizer.code_size
+        self._append_bytes(
+            self._segment_file(f"codes_{state['version']}.u8"),
+            code_count * code_size,
+            np.ascontiguousarray(self.codes[code_count:]).tobytes()
+        )
+        state["code_count"] = len(self.codes)
+
+    def _train_quantizer(self, kind: str, pq_subvectors: Optional[int]) -> None:
+        """在存活行采样上训练量化器并重新编码所有行（写入新版本文件）"""
+        rng = np.random.default_rng(0)
+        live_rows = np.flatnonzero(self.alive)
+        sample = np.sort(rng.choice(live_rows, min(len(live_rows), self.QUANTIZE_MAX_TRAIN_SAMPLE), replace=False))
+        quantizer = ProductQuantizer(int(pq_subvectors or 16)) if kind == ProductQuantizer.kind else ScalarQuantizer()
+        quantizer.train(np.asarray(self.vectors[sample], dtype=np.float32), rng)
+
+        self.quantizer = quantizer
+        self.quantizer_trained_count = len(live_rows)
+        codes = np.concatenate([
+            quantizer.encode(self.vectors[start:start + 8192]) for start in range(0, len(self.ids), 8192)
+        ])
+        self._set_codes(codes)
+
+        version = uuid.uuid4().hex[:12]
+        self._save_quantizer(self.manifest["segment"], version)
+        with open(self._segment_file(f"codes_{version}.u8"), "wb") as f:
+            f.write(codes.tobytes())
+        self.manifest["quantizer"] = {"version": version, "kind": kind, "code_count": len(codes)}
+        logger.info(
+            f"向量collection {self.path} 量化器训练完成：{kind}，每行 {quantizer.code_size} 字节"
+            f"（原始 {self.manifest['dim'] * 4} 字节）"
+        )
+
+    def _drop_quantizer(self) -> None:
+        """停用量化（调用方负责提交manifest）"""
+        self.manifest.pop("quantizer", None)
+        self.quantizer = None
+        self.quantizer_trained_count = 0
+        self.codes = np.zeros((0, 0), dtype=np.uint8)
+        self.code_norms = np.zeros(0, dtype=np.float32)
+
+    def _cleanup_quantizer_files(self) -> None:
+        """删除当前段中未被manifest引用的量化文件"""
+        segment_dir = os.path.join(self.path, self.manifest["segment"])
+        current = (self.manifest.get("quantizer") or {}).get("version")
+        for name in os.listdir(segment_dir):
+            if name.startswith(("quantizer_", "codes_")) and (current is None or current not in name):
+                os.remove(os.path.join(segment_dir, name))
+
+    def _shortlist(self, query_vector: np.ndarray, candidates: np.ndarray, top_k: int) -> np.ndarray:
+        """用量化编码的近似距离从候选中筛选出需要精确重算的行"""
+        rescore_k = max(top_k * self.quantizer.RESCORE_FACTOR, self.quantizer.RESCORE_MIN)
+        if len(candidates) <= rescore_k:
+            return candidates
+        if len(candidates) < len(self.ids) // 4:
+            approx = self.quantizer.distances(query_vector, self.codes[candidates], self.code_norms[candidates])
+        else:
+            approx = self.quantizer.distances(query_vector, self.codes, self.code_norms)[candidates]
+        return np.sort(candidates[np.argpartition(approx, rescore_k - 1)[:rescore_k]])
+
+    # -------- 查询 --------
+    def _eq_mask(self, key: str, value: Any) -> np.ndarray:
+        """单个 key == value 的布尔掩码（按需计算并LRU缓存，写入后失效）"""
+        cache_key = (key, value)
+        mask = self._mask_cache.get(cache_key)
+        if mask is not None:
+            self._mask_cache.move_to_end(cache_key)
+            return mask
+        mask = np.fromiter(
+            (metadata.get(key) == value for metadata in self.metadatas),
+            dtype=bool,
+            count=len(self.metadatas)
+        )
+        self._mask_cache[cache_key] = mask
+        while len(self._mask_cache) > self.MASK_CACHE_SIZE:
+            self._mask_cache.popitem(last=False)
+        return mask
+
+    def _condition_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(len(self.metadatas), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._condition_mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.metadatas), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._condition_mask(sub)
+                mask &= any_mask
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    if op == "$eq":
+                        mask &= self._eq_mask(key, value)
+                    elif op == "$ne":
+                        mask &= ~self._eq_mask(key, value)
+                    elif op in ("$in", "$nin"):
+                        in_mask = np.zeros(len(self.metadatas), dtype=bool)
+                        for item in value:
+                            in_mask |= self._eq_mask(key, item)
+                        mask &= in_mask if op == "$in" else ~in_mask
+                    else:
+                        raise ValueError(f"不支持的过滤操作符: {op}")
+            else:
+                mask &= self._eq_mask(key, condition)
+        return mask
+
+    def where_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """存活且满足where条件的行掩码"""
+        if not where:
+            return self.alive.copy()
+        return self.alive & self._condition_mask(where)
+
+    def _restrict_candidates(
+        self,
+        query_vector: np.ndarray,
+        mask: np.ndarray,
+        top_k: int,
+        **search_options: Any
+    ) -> np.ndarray:
+        """进一步缩小候选行（平铺存储不做限制，近似索引子类覆盖）"""
+        return mask
+
+    def query(
+        self,
+        query_vector: np.ndarray,
+        top_k: int,
+        where: Optional[Dict[str, Any]],
+        quantization: Optional[str] = None,
+        **search_options: Any
+    ) -> List[Dict[str, Any]]:
+        """
+        检索top_k（距离为平方L2，与Chroma默认度量一致）
+
+        启用量化时先用近似距离筛选候选（数量由量化器的RESCORE_FACTOR/RESCORE_MIN决定）再精确重算；
+        候选行较少时只对候选子集计算，否则整体矩阵乘法后屏蔽不满足条件的行
+        """
+        with self.lock:
+            self.refresh()
+            if not len(self.ids) or top_k <= 0:
+                return []
+            query_vector = query_vector.astype(np.float32, copy=False)
+            mask = self._restrict_candidates(query_vector, self.where_mask(where), top_k, **search_options)
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            if quantization and self._quantizer_aligned() and self.quantizer.kind == quantization:
+                candidates = self._shortlist(query_vector, candidates, top_k)
+                mask = np.zeros(len(self.ids), dtype=bool)
+                mask[candidates] = True
+
+            query_sq = float(query_vector @ query_vector)
+            if len(candidates) < len(mask) // 4:
+                distances = self.sq_norms[candidates] + query_sq - 2.0 * (self.vectors[candidates] @ query_vector)
+                rows = candidates
+            else:
+                distances = self.sq_norms + query_sq - 2.0 * (self.vectors @ query_vector)
+                distances = np.where(mask, distances, np.inf)
+                rows = None
+
+            k = min(top_k, len(candidates))
+            top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+            top = top[np.argsort(distances[top], kind="stable")]
+
+            top_rows = [int(rows[position]) if rows is not None else int(position) for position in top]
+            texts = self._read_texts(top_rows)
+            results = []
+            for position, row, text in zip(top, top_rows, texts):
+                results.append({
+                    "id": self.ids[row],
+                    "text": text,
+                    "metadata": dict(self.metadatas[row]),
+                    "distance": max(float(distances[position]), 0.0)
+                })
+            return results
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """
+    NumPy平铺向量库实现（provider: numpy）
+
+    collection对象在进程内共享（同一路径只加载一次，按NUMPY_COLLECTION_CACHE_SIZE做LRU淘汰），
+    写入通过文件锁在进程间互斥
+    """
+
+    collection_class = FlatCollection
+    storage_dir = "numpy"
+    _collections: "OrderedDict[str, FlatCollection]" = OrderedDict()
+    _collections_lock = threading.Lock()
+
+    def __init__(self, config_service: ConfigService):
+        super().__init__(config_service)
+        self.base_path = os.path.join(settings.VECTOR_STORE_BASE_PATH, self.storage_dir)
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def _get_collection(self, tenant_id: str, user_id: str, folder_id: Optional[str] = None) -> FlatCollection:
+        """获取collection（首次访问时加载，超出缓存上限时淘汰最久未使用的collection）"""
+        path = os.path.join(self.base_path, self.get_collection_name(tenant_id, user_id, folder_id))
+        with self._collections_lock:
+            collection = self._collections.get(path)
+            if collection is None:
+                os.makedirs(path, exist_ok=True)
+                collection = self.collection_class(path)
+                self._collections[path] = collection
+            self._collections.move_to_end(path)
+            while len(self._collections) > settings.NUMPY_COLLECTION_CACHE_SIZE:
+                self._collections.popitem(last=False)
+        return collection
+
+    def _index_options(self, tenant_id: str) -> Dict[str, Any]:
+        """collection写入/检索时的索引参数（量化方式等，从向量库配置读取）"""
+        vector_store_config = self._get_vector_store_config(tenant_id)
+        options = {}
+        quantization = vector_store_config.get("quantization")
+        if quantization and quantization != "none":
+            options["quantization"] = quantization
+        if vector_store_config.get("pq_subvectors"):
+            options["pq_subvectors"] = int(vector_store_config["pq_subvectors"])
+        return options
+
+    def add_vectors(
+        self,
+        vectors: Vectors,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> bool:
+        """添加向量到向量库"""
+        try:
+            collection = self._get_collection(tenant_id, user_id, folder_id)
+            collection.add(
+                as_vector_matrix(vectors), texts, metadatas, ids,
+                **self._index_options(tenant_id)
+            )
+            logger.info(f"成功添加 {len(ids)} 个向量到 collection: {collection.path}")
+            return True
+        except Exception as e:
+            logger.error(f"添加向量失败: {e}", exc_info=True)
+            return False
+
+    def search(
+        self,
+        query_vector: QueryVector,
+        top_k: int,
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """搜索相似向量"""
+        folder_where = None
+        if self._is_user_mode(self._get_vector_store_config(tenant_id)):
+            folder_where = {"folder_id": self._folder_filter_value(folder_id)}
+        return self._query(query_vector, top_k, tenant_id, user_id, folder_id, self._merge_where(folder_where, filter_metadata))
+
+    def search_folders(
+        self,
+        query_vector: QueryVector,
+        top_k: int,
+        tenant_id: str,
+        user_id: str,
+        folder_ids: List[Optional[str]],
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """在多个文件夹中搜索相似向量（user模式下为单次查询）"""
+        if not folder_ids:
+            return []
+        if not self._is_user_mode(self._get_vector_store_config(tenant_id)):
+            return super().search_folders(query_vector, top_k, tenant_id, user_id, folder_ids, filter_metadata)
+
+        folder_values = list(dict.fromkeys(self._folder_filter_value(fid) for fid in folder_ids))
+        folder_where = {"folder_id": {"$in": folder_values}}
+        return self._query(query_vector, top_k, tenant_id, user_id, None, self._merge_where(folder_where, filter_metadata))
+
+    def _query(
+        self,
+        query_vector: QueryVector,
+        top_k: int,
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str],
+        where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        try:
+            collection = self._get_collection(tenant_id, user_id, folder_id)
+            return collection.query(
+                as_query_vector(query_vector), top_k, where,
+                **self._index_options(tenant_id)
+            )
+        except Exception as e:
+            logger.error(f"搜索向量失败: {e}", exc_info=True)
+            raise
+
+    def get_vectors(
+        self,
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """读取已有向量"""
+        try:
+            return self._get_collection(tenant_id, user_id, folder_id).get_vectors(ids)
+        except Exception as e:
+            logger.error(f"读取向量失败: {e}", exc_info=True)
+            return {}
+
+    def delete_by_ids(
+        self,
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> bool:
+        """根据向量ID删除向量"""
+        try:
+            self._get_collection(tenant_id, user_id, folder_id).delete_ids(ids)
+            return True
+        except Exception as e:
+            logger.error(f"删除向量失败: {e}", exc_info=True)
+            return False
+
+    def delete_by_document_id(
+        self,
+        document_id: str,
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> bool:
+        """根据文档ID删除向量"""
+        try:
+            collection = self._get_collection(tenant_id, user_id, folder_id)
+            collection.delete({"document_id": document_id})
+            return True
+        except Exception as e:
+            logger.error(f"删除向量失败: {e}", exc_info=True)
+            return False
@@ -0,0 +1,86 @@
+"""
+多collection并行检索
+阻塞的向量库查询在进程内共享的有界线程池中执行，单次请求的并发数受限，结果用top-k堆流式合并
+"""
+import heapq
+import itertools
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+from app.core.config import settings
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """获取共享检索线程池（首次使用时创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.VECTOR_SEARCH_MAX_WORKERS),
+                    thread_name_prefix="vector-search"
+                )
+    return _executor
+
+
+def run_bounded(calls: List[Callable[[], Any]], max_concurrency: Optional[int] = None) -> Iterator[Any]:
+    """
+    在共享线程池中执行调用，同一批调用最多同时占用max_concurrency个线程
+
+    按完成顺序产出结果，任一调用抛出异常时取消尚未开始的调用并向上抛出
+    """
+    if max_concurrency is None:
+        max_concurrency = settings.VECTOR_SEARCH_MAX_CONCURRENCY_PER_REQUEST
+    max_concurrency = max(1, max_concurrency)
+    if len(calls) <= 1 or max_concurrency == 1:
+        # 单个调用不经过线程池，避免线程切换开销
+        for call in calls:
+            yield call()
+        return
+
+    executor = get_search_executor()
+    pending_calls = iter(calls)
+    running: Set[Future] = set()
+    try:
+        for call in itertools.islice(pending_calls, max_concurrency):
+            running.add(executor.submit(call))
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                next_call = next(pending_calls, None)
+                if next_call is not None:
+                    running.add(executor.submit(next_call))
+                yield future.result()
+    finally:
+        for future in running:
+            future.cancel()
+
+
+def _distance(result: Dict[str, Any]) -> float:
+    distance = result.get("distance")
+    return distance if distance is not None else float("inf")
+
+
+def merge_top_k(result_lists: Iterable[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    流式合并多路检索结果，只保留distance最小的top_k个
+
+    使用大小为top_k的最大堆，每路结果到达时即合并，不需要先收集全部结果再排序
+    """
+    if top_k <= 0:
+        for _ in result_lists:
+            pass
+        return []
+    heap: List[Any] = []
+    sequence = itertools.count()  # 距离相同时保持到达顺序，且避免比较dict
+    for results in result_lists:
+        for result in results:
+            item = (-_distance(result), -next(sequence), result)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+    return [item[2] for item in sorted(heap, key=lambda item: (-item[0], -item[1]))]
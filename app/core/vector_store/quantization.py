@@ -0,0 +1,176 @@
+"""
+向量量化编解码
+int8标量量化（4倍压缩）和乘积量化（PQ，按子向量数可达数十倍压缩），用于缩小常驻内存的向量索引，
+近似距离筛选出候选后再用float32原始向量精确重算
+"""
+from typing import Dict, Optional
+import numpy as np
+
+
+def assign_nearest(
+    vectors: np.ndarray,
+    centroids: np.ndarray,
+    centroid_sq_norms: Optional[np.ndarray] = None,
+    block_size: int = 8192
+) -> np.ndarray:
+    """为每个向量分配最近的中心（平方L2）"""
+    if centroid_sq_norms is None:
+        centroid_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        distances = centroid_sq_norms[None, :] - 2.0 * (block @ centroids.T)
+        labels[start:start + block_size] = np.argmin(distances, axis=1)
+    return labels
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd k-means（随机样本初始化，空簇用随机样本重新初始化），返回中心矩阵"""
+    data = np.asarray(data, dtype=np.float32)
+    k = max(1, min(k, len(data)))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_nearest(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        non_empty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts[non_empty])[:-1]])
+        centroids[non_empty] = np.add.reduceat(data[order], starts, axis=0) / counts[non_empty, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class ScalarQuantizer:
+    """
+    int8标量量化（逐维按训练样本的min/max线性映射到0~255）
+
+    近似平方L2距离展开为 Σ(s·c)² + 2·c·(s⊙(lo-q)) + ||lo-q||²，
+    第一项在编码时按行预计算，检索时只需一次uint8矩阵与向量的乘法
+    """
+
+    kind = "int8"
+    # 近似距离筛选出 max(top_k×RESCORE_FACTOR, RESCORE_MIN) 个候选再精确重算
+    RESCORE_FACTOR = 4
+    RESCORE_MIN = 64
+
+    def __init__(self, minimum: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None):
+        self.minimum = minimum
+        self.scale = scale
+
+    @property
+    def code_size(self) -> int:
+        return len(self.minimum)
+
+    def train(self, data: np.ndarray, rng: np.random.Generator) -> None:
+        data = np.asarray(data, dtype=np.float32)
+        self.minimum = data.min(axis=0)
+        scale = (data.max(axis=0) - self.minimum) / 255.0
+        scale[scale == 0] = 1.0
+        self.scale = scale.astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.minimum) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def code_norms(self, codes: np.ndarray) -> np.ndarray:
+        """每行的 Σ(s·c)²（编码后预计算）"""
+        scaled = codes.astype(np.float32) * self.scale
+        return np.einsum("ij,ij->i", scaled, scaled)
+
+    def distances(self, query: np.ndarray, codes: np.ndarray, code_norms: np.ndarray, block_size: int = 16384) -> np.ndarray:
+        offset = self.minimum - query
+        weights = self.scale * offset
+        constant = float(offset @ offset)
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            block = codes[start:start + block_size].astype(np.float32)
+            result[start:start + block_size] = code_norms[start:start + block_size] + 2.0 * (block @ weights) + constant
+        return result
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ScalarQuantizer":
+        return cls(arrays["minimum"], arrays["scale"])
+
+
+class ProductQuantizer:
+    """
+    乘积量化（向量切分为m个子向量，每个子空间256个中心，每个子向量编码为1字节）
+
+    检索时为查询向量构建 m×256 的距离查找表，近似距离为各子空间查表结果之和
+    """
+
+    kind = "pq"
+    KMEANS_ITERATIONS = 10
+    # PQ近似误差较大，需要更多候选参与精确重算
+    RESCORE_FACTOR = 32
+    RESCORE_MIN = 512
+
+    def __init__(self, subvectors: int = 16, codebooks: Optional[np.ndarray] = None):
+        self.subvectors = subvectors
+        self.codebooks = codebooks  # (m, 256, d/m)
+
+    @property
+    def code_size(self) -> int:
+        return self.subvectors
+
+    @staticmethod
+    def fit_subvectors(dim: int, requested: int) -> int:
+        """取不超过requested且能整除维度的最大子向量数"""
+        for m in range(max(1, min(requested, dim)), 0, -1):
+            if dim % m == 0:
+                return m
+        return 1
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors.reshape(len(vectors), self.subvectors, vectors.shape[1] // self.subvectors)
+
+    def train(self, data: np.ndarray, rng: np.random.Generator) -> None:
+        self.subvectors = self.fit_subvectors(data.shape[1], self.subvectors)
+        parts = self._split(data)
+        codebooks = np.zeros((self.subvectors, 256, parts.shape[2]), dtype=np.float32)
+        for j in range(self.subvectors):
+            centroids = kmeans(parts[:, j, :], 256, self.KMEANS_ITERATIONS, rng)
+            codebooks[j, :len(centroids)] = centroids
+            # 样本不足256时，多余的码字复制已有中心（不会被分配到）
+            codebooks[j, len(centroids):] = centroids[0]
+        self.codebooks = codebooks
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(vectors)
+        codes = np.empty((len(parts), self.subvectors), dtype=np.uint8)
+        for j in range(self.subvectors):
+            codes[:, j] = assign_nearest(parts[:, j, :], self.codebooks[j])
+        return codes
+
+    def code_norms(self, codes: np.ndarray) -> np.ndarray:
+        """PQ距离通过查表计算，不需要预计算行范数"""
+        return np.zeros(len(codes), dtype=np.float32)
+
+    def distances(self, query: np.ndarray, codes: np.ndarray, code_norms: np.ndarray, block_size: int = 16384) -> np.ndarray:
+        query_parts = np.asarray(query, dtype=np.float32).reshape(self.subvectors, 1, -1)
+        table = ((self.codebooks - query_parts) ** 2).sum(axis=2)  # (m, 256)
+        subspaces = np.arange(self.subvectors)
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            result[start:start + block_size] = table[subspaces, codes[start:start + block_size]].sum(axis=1)
+        return result
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ProductQuantizer":
+        codebooks = arrays["codebooks"]
+        return cls(codebooks.shape[0], codebooks)
+
+
+QUANTIZERS = {
+    ScalarQuantizer.kind: ScalarQuantizer,
+    ProductQuantizer.kind: ProductQuantizer,
+}
@@ -4,6 +4,8 @@
 from typing import Optional
 from app.core.vector_store.vector_store_interface import VectorStoreInterface
 from app.core.vector_store.chroma_vector_store import ChromaVectorStore
+from app.core.vector_store.numpy_vector_store import NumpyVectorStore
+from app.core.vector_store.ivf_vector_store import IVFVectorStore
 from app.services.config_service import ConfigService
 
 
@@ -19,7 +21,7 @@ class VectorStoreFactory:
         根据provider创建向量库实例
         
         Args:
-            provider: 向量库provider（chroma/pgvector/milvus等）
+            provider: 向量库provider（chroma/numpy/ivf/pgvector/milvus等）
             config_service: 配置服务
             
         Returns:
@@ -27,6 +29,10 @@ class VectorStoreFactory:
         """
         if provider == "chroma":
             return ChromaVectorStore(config_service)
+        elif provider == "numpy":
+            return NumpyVectorStore(config_service)
+        elif provider == "ivf":
+            return IVFVectorStore(config_service)
         elif provider == "pgvector":
             # TODO: 实现PGVector
             raise NotImplementedError("PGVector暂未实现")
@@ -51,17 +57,8 @@ class VectorStoreFactory:
         Returns:
             向量库实例
         """
-        # 获取向量库配置
-        if tenant_id:
-            configs = config_service.list_scope_configs("tenant", tenant_id)
-            vector_store_config = configs.get("vector_store", {}).get("default")
-            if vector_store_config:
-                provider = vector_store_config.get("provider", "chroma")
-                return VectorStoreFactory.create_vector_store(provider, config_service)
-        
-        # 使用系统默认配置
-        configs = config_service.list_scope_configs("system", None)
-        vector_store_config = configs.get("vector_store", {}).get("default")
+        # 获取向量库配置（租户级优先，否则系统级；经解析后配置缓存，不查询配置表）
+        vector_store_config = config_service.get_resolved_config("vector_store", "default", tenant_id)
         
         if not vector_store_config:
             # 默认使用Chroma
@@ -69,4 +66,3 @@ class VectorStoreFactory:
         
         provider = vector_store_config.get("provider", "chroma")
         return VectorStoreFactory.create_vector_store(provider, config_service)
-
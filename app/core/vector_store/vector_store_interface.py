@@ -2,7 +2,26 @@
 向量库接口
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Union
+import numpy as np
+from app.core.vector_store.parallel_search import merge_top_k, run_bounded
+
+# 向量参数既可以是float32矩阵/向量（推荐，避免装箱float），也兼容嵌套列表
+Vectors = Union[np.ndarray, Sequence[Sequence[float]]]
+QueryVector = Union[np.ndarray, Sequence[float]]
+
+
+def as_vector_matrix(vectors: Vectors) -> np.ndarray:
+    """转换为C连续的二维float32矩阵（已是float32矩阵时不复制）"""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    return matrix
+
+
+def as_query_vector(query_vector: QueryVector) -> np.ndarray:
+    """转换为一维float32向量（已是float32向量时不复制）"""
+    return np.ascontiguousarray(query_vector, dtype=np.float32).reshape(-1)
 
 
 class VectorStoreInterface(ABC):
@@ -11,7 +30,7 @@ class VectorStoreInterface(ABC):
     @abstractmethod
     def add_vectors(
         self,
-        vectors: List[List[float]],
+        vectors: Vectors,
         texts: List[str],
         metadatas: List[Dict[str, Any]],
         ids: List[str],
@@ -23,7 +42,7 @@ class VectorStoreInterface(ABC):
         添加向量到向量库
         
         Args:
-            vectors: 向量列表
+            vectors: 向量矩阵（float32 ndarray，或嵌套列表）
             texts: 文本列表
             metadatas: 元数据列表
             ids: 向量ID列表
@@ -39,7 +58,7 @@ class VectorStoreInterface(ABC):
     @abstractmethod
     def search(
         self,
-        query_vector: List[float],
+        query_vector: QueryVector,
         top_k: int,
         tenant_id: str,
         user_id: str,
@@ -50,7 +69,7 @@ class VectorStoreInterface(ABC):
         搜索相似向量
         
         Args:
-            query_vector: 查询向量
+            query_vector: 查询向量（float32 ndarray，或列表）
             top_k: 返回前k个结果
             tenant_id: 租户ID
             user_id: 用户ID
@@ -59,9 +78,100 @@ class VectorStoreInterface(ABC):
             
         Returns:
             搜索结果列表，每个结果包含：id, text, metadata, distance/score
+            
+        Raises:
+            Exception: 检索失败时抛出（不返回空列表，调用方据此区分"没有结果"和"检索失败"）
         """
         pass
     
+    def search_folders(
+        self,
+        query_vector: QueryVector,
+        top_k: int,
+        tenant_id: str,
+        user_id: str,
+        folder_ids: List[Optional[str]],
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        在多个文件夹中搜索相似向量
+
+        默认实现在共享检索线程池中并行调用各文件夹的search（单次请求并发数受限），
+        并用top-k堆流式合并结果；支持单次多文件夹查询的实现应覆盖此方法
+
+        Args:
+            query_vector: 查询向量（float32 ndarray，或列表）
+            top_k: 返回前k个结果
+            tenant_id: 租户ID
+            user_id: 用户ID
+            folder_ids: 文件夹ID列表（None表示根目录）
+            filter_metadata: 元数据过滤条件
+
+        Returns:
+            按distance升序排列的搜索结果列表（最多top_k个）
+
+        Raises:
+            Exception: 任一文件夹检索失败时抛出
+        """
+        calls = [
+            lambda folder_id=folder_id: self.search(
+                query_vector=query_vector,
+                top_k=top_k,
+                tenant_id=tenant_id,
+                user_id=user_id,
+                folder_id=folder_id,
+                filter_metadata=filter_metadata
+            )
+            for folder_id in folder_ids
+        ]
+        return merge_top_k(run_bounded(calls), top_k)
+    
+    def get_vectors(
+        self,
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        读取已有向量，用于新版本文档复制未变化chunk的向量（不修改旧版本的数据）
+        
+        默认不支持，返回空字典，调用方改为embedding（命中chunk embedding缓存时不调用远端服务）
+        
+        Args:
+            ids: 向量ID列表
+            tenant_id: 租户ID
+            user_id: 用户ID
+            folder_id: 文件夹ID（可为空）
+        
+        Returns:
+            向量ID到一维float32向量的映射（不存在的ID不包含在内）
+        """
+        return {}
+    
+    def delete_by_ids(
+        self,
+        ids: List[str],
+        tenant_id: str,
+        user_id: str,
+        folder_id: Optional[str] = None
+    ) -> bool:
+        """
+        根据向量ID删除向量，用于重新切分完成后删除旧切分版本的向量
+        
+        默认不支持，返回False
+        
+        Args:
+            ids: 向量ID列表（不存在的ID忽略）
+            tenant_id: 租户ID
+            user_id: 用户ID
+            folder_id: 文件夹ID（可为空）
+        
+        Returns:
+            是否成功
+        """
+        return False
+    
     @abstractmethod
     def delete_by_document_id(
         self,
@@ -72,6 +72,27 @@ async def startup_event():
     logger.info("=" * 60)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时持久化进程内缓存，关闭模型服务连接池和文档解析进程池"""
+    from app.core.embedding_cache import query_embedding_cache
+    try:
+        saved = query_embedding_cache.save()
+        if saved:
+            logger.info(f"已持久化 {saved} 条查询Embedding缓存")
+    except Exception as e:
+        logger.warning(f"持久化查询Embedding缓存失败: {e}")
+    
+    from app.core.client_pool import client_registry
+    try:
+        await client_registry.aclose()
+    except Exception as e:
+        logger.warning(f"关闭模型服务连接池失败: {e}")
+    
+    from app.core.parse_pool import parse_pool
+    parse_pool.shutdown()
+
+
 @app.get("/")
 async def root():
     return {"message": "智能文档问答系统 API"}
@@ -18,6 +18,7 @@ class DocumentChunk(Base):
     tenant_id = Column(String, ForeignKey("tenants.id"), nullable=False, comment="租户ID")
     user_id = Column(String, ForeignKey("users.id"), nullable=False, comment="用户ID")
     chunk_index = Column(Integer, nullable=False, comment="Chunk索引（从0开始）")
+    revision = Column(Integer, nullable=False, default=0, server_default="0", comment="切分版本（重新切分时新旧两套chunk并存，完成后删除旧版本）")
     content = Column(Text, nullable=False, comment="Chunk文本内容")
     vector_id = Column(String(255), nullable=True, comment="向量库中的向量ID")
     chunk_metadata = Column(JSON, nullable=True, comment="元数据（JSON格式）")
@@ -18,6 +18,7 @@ class DocumentConfig(Base):
     chunk_overlap = Column(Integer, nullable=False, default=100, comment="文本切分重叠大小（默认100）")
     split_method = Column(String(20), nullable=False, default="length", comment="切分方法：length/paragraph/keyword")
     split_keyword = Column(String(100), nullable=True, comment="切分关键字（当split_method=keyword时使用）")
+    chunk_revision = Column(Integer, nullable=False, default=0, server_default="0", comment="按当前配置切分的chunk版本（配置变化时递增）")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, comment="创建时间")
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, comment="更新时间")
     
@@ -0,0 +1,33 @@
+"""
+文档解析结果缓存模型
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Index, Text, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+import uuid
+
+
+class DocumentParseResult(Base):
+    """
+    文档解析结果缓存实体
+    
+    按 (租户, 文件哈希, 解析器版本) 记录已解析的Markdown及标题、摘要、页数，
+    同一租户内不同文件夹或不同用户上传的相同文件直接复用，跳过解析
+    """
+    __tablename__ = "document_parse_results"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), comment="ID")
+    tenant_id = Column(String, nullable=False, comment="租户ID")
+    file_hash = Column(String(64), nullable=False, comment="文件哈希值（SHA256）")
+    parser_version = Column(String(100), nullable=False, comment="解析器版本（解析器类名:输出版本）")
+    markdown_path = Column(String(1000), nullable=False, comment="Markdown路径")
+    title = Column(String(500), nullable=True, comment="标题")
+    summary = Column(Text, nullable=True, comment="摘要")
+    page_count = Column(Integer, nullable=True, comment="页数")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, comment="创建时间")
+    
+    # 索引
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "file_hash", "parser_version", name="uq_parse_result_hash"),
+        Index("idx_parse_result_tenant", "tenant_id"),
+    )
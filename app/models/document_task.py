@@ -1,5 +1,5 @@
 """
-文档任务模型（待办表）
+文档任务模型（持久化任务队列 + 待办表）
 """
 from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, Text, JSON
 from sqlalchemy.sql import func
@@ -8,17 +8,29 @@ import uuid
 
 
 class DocumentTask(Base):
-    """文档任务实体（解析/向量化失败待办表）"""
+    """
+    文档任务实体
+    
+    上传后的解析/向量化作为任务写入本表，由独立的worker进程领取执行（租约 + 失败退避重试）；
+    重试次数用尽的任务保留为failed状态，作为待办供用户查看和重新提交
+    """
     __tablename__ = "document_tasks"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), comment="任务ID")
     document_id = Column(String, ForeignKey("documents.id"), nullable=False, comment="文档ID")
     tenant_id = Column(String, ForeignKey("tenants.id"), nullable=False, comment="租户ID")
     user_id = Column(String, ForeignKey("users.id"), nullable=False, comment="用户ID")
-    task_type = Column(String(50), nullable=False, comment="任务类型：parse_failed/vectorize_failed")
+    task_type = Column(String(50), nullable=False, comment="任务类型：process_document/rechunk_document")
+    status = Column(String(20), nullable=False, default="pending", comment="状态：pending/running/succeeded/failed")
     reason = Column(Text, nullable=True, comment="失败原因")
-    retries = Column(Integer, nullable=False, default=0, comment="重试次数")
-    task_data = Column(JSON, nullable=True, comment="任务数据（JSON格式，用于区分任务类型）")
+    retries = Column(Integer, nullable=False, default=0, comment="已执行次数")
+    max_retries = Column(Integer, nullable=False, default=3, comment="首次执行失败后的最大重试次数")
+    task_data = Column(JSON, nullable=True, comment="任务参数（JSON格式）")
+    batch_id = Column(String(36), nullable=True, comment="批次ID（批量提交的任务，用于查询整体进度）")
+    run_after = Column(DateTime(timezone=True), nullable=True, comment="最早执行时间（失败退避）")
+    locked_by = Column(String(100), nullable=True, comment="领取任务的worker")
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True, comment="租约到期时间（到期未续约视为worker失联）")
+    finished_at = Column(DateTime(timezone=True), nullable=True, comment="结束时间")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, comment="创建时间")
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, comment="更新时间")
     
@@ -28,5 +40,6 @@ class DocumentTask(Base):
         Index("idx_task_tenant_user", "tenant_id", "user_id"),
         Index("idx_task_type", "task_type"),
         Index("idx_task_created", "created_at"),
+        Index("idx_task_status_run_after", "status", "run_after"),
+        Index("idx_task_batch", "batch_id"),
     )
-
@@ -33,6 +33,7 @@ class Folder(Base):
         Index("idx_folder_tenant_user", "tenant_id", "user_id"),
         Index("idx_folder_parent", "parent_id"),
         Index("idx_folder_deleted", "deleted_at"),
+        Index("idx_folder_path", "path", postgresql_ops={"path": "varchar_pattern_ops"}),
     )
     
     # 领域方法
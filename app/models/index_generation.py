@@ -0,0 +1,28 @@
+"""
+用户索引代数模型
+"""
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+import uuid
+
+
+class IndexGeneration(Base):
+    """
+    用户索引代数实体
+    
+    用户的向量/chunk发生变化（向量化、删除、重新切分）时递增，
+    各进程检索前比较数据库中的代数，不一致时丢弃本进程的检索缓存和BM25词法索引
+    """
+    __tablename__ = "index_generations"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), comment="ID")
+    tenant_id = Column(String, nullable=False, comment="租户ID")
+    user_id = Column(String, nullable=False, comment="用户ID")
+    generation = Column(Integer, nullable=False, default=0, comment="索引代数")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, comment="更新时间")
+    
+    # 索引
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "user_id", name="uq_index_generation_user"),
+    )
@@ -1,8 +1,9 @@
 """
 文档Chunk Repository
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
 from app.models.document_chunk import DocumentChunk
 
 
@@ -28,19 +29,93 @@ class DocumentChunkRepository:
         """根据ID获取chunk"""
         return self.db.query(DocumentChunk).filter(DocumentChunk.id == chunk_id).first()
     
-    def get_by_document_id(self, document_id: str) -> List[DocumentChunk]:
-        """根据文档ID获取所有chunk"""
-        return self.db.query(DocumentChunk).filter(
-            DocumentChunk.document_id == document_id
-        ).order_by(DocumentChunk.chunk_index).all()
+    def _document_query(self, document_id: str, revision: Optional[int] = None, exclude_revision: Optional[int] = None):
+        """文档chunk查询，可限定或排除切分版本"""
+        query = self.db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id)
+        if revision is not None:
+            query = query.filter(DocumentChunk.revision == revision)
+        if exclude_revision is not None:
+            query = query.filter(DocumentChunk.revision != exclude_revision)
+        return query
     
-    def get_by_document_and_index(self, document_id: str, chunk_index: int) -> Optional[DocumentChunk]:
-        """根据文档ID和chunk索引获取chunk"""
-        return self.db.query(DocumentChunk).filter(
-            DocumentChunk.document_id == document_id,
+    def get_by_document_id(self, document_id: str, revision: Optional[int] = None) -> List[DocumentChunk]:
+        """根据文档ID获取所有chunk（可限定切分版本）"""
+        return self._document_query(document_id, revision).order_by(DocumentChunk.chunk_index).all()
+    
+    def count_by_document(self, document_id: str, revision: Optional[int] = None) -> int:
+        """统计文档的chunk数量（可限定切分版本）"""
+        return self._document_query(document_id, revision).count()
+    
+    def get_by_document_and_index(
+        self,
+        document_id: str,
+        chunk_index: int,
+        revision: Optional[int] = None
+    ) -> Optional[DocumentChunk]:
+        """根据文档ID和chunk索引获取chunk（可限定切分版本）"""
+        return self._document_query(document_id, revision).filter(
             DocumentChunk.chunk_index == chunk_index
         ).first()
     
+    def list_vector_ids(
+        self,
+        document_id: str,
+        revision: Optional[int] = None,
+        exclude_revision: Optional[int] = None
+    ) -> List[str]:
+        """获取文档chunk的向量ID（可限定或排除切分版本）"""
+        rows = self._document_query(document_id, revision, exclude_revision).with_entities(DocumentChunk.vector_id).all()
+        return [vector_id for vector_id, in rows if vector_id]
+    
+    def get_by_vector_ids(self, vector_ids: List[str]) -> List[DocumentChunk]:
+        """根据向量ID批量获取chunk（单次IN查询）"""
+        if not vector_ids:
+            return []
+        return self.db.query(DocumentChunk).filter(
+            DocumentChunk.vector_id.in_(list(set(vector_ids)))
+        ).all()
+    
+    def get_by_document_and_indexes(self, keys: List[Tuple[str, int]]) -> List[DocumentChunk]:
+        """根据(文档ID, chunk索引)批量获取chunk（单次查询）"""
+        if not keys:
+            return []
+        conditions = [
+            and_(DocumentChunk.document_id == document_id, DocumentChunk.chunk_index == chunk_index)
+            for document_id, chunk_index in set(keys)
+        ]
+        return self.db.query(DocumentChunk).filter(or_(*conditions)).all()
+    
+    def list_lexical_rows(self, tenant_id: str, user_id: str) -> List[Tuple[str, str, int, str, Optional[str]]]:
+        """获取用户全部chunk的 (vector_id, document_id, chunk_index, content, folder_id)，用于构建BM25索引"""
+        return self.db.query(
+            DocumentChunk.vector_id,
+            DocumentChunk.document_id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            DocumentChunk.folder_id
+        ).filter(
+            DocumentChunk.tenant_id == tenant_id,
+            DocumentChunk.user_id == user_id
+        ).all()
+    
+    def list_reuse_candidates(
+        self,
+        document_id: str,
+        tenant_id: str,
+        user_id: str
+    ) -> List[Tuple[str, Optional[str], Optional[str], Optional[Dict[str, Any]]]]:
+        """获取文档chunk的 (id, vector_id, folder_id, chunk_metadata)，用于新版本复用未变化的chunk（不加载内容）"""
+        return self.db.query(
+            DocumentChunk.id,
+            DocumentChunk.vector_id,
+            DocumentChunk.folder_id,
+            DocumentChunk.chunk_metadata
+        ).filter(
+            DocumentChunk.document_id == document_id,
+            DocumentChunk.tenant_id == tenant_id,
+            DocumentChunk.user_id == user_id
+        ).order_by(DocumentChunk.chunk_index).all()
+    
     def list_by_document(
         self,
         document_id: str,
@@ -52,11 +127,14 @@ class DocumentChunkRepository:
             DocumentChunk.document_id == document_id
         ).order_by(DocumentChunk.chunk_index).offset(skip).limit(limit).all()
     
-    def delete_by_document_id(self, document_id: str) -> int:
-        """根据文档ID删除所有chunk"""
-        deleted = self.db.query(DocumentChunk).filter(
-            DocumentChunk.document_id == document_id
-        ).delete()
+    def delete_by_document_id(
+        self,
+        document_id: str,
+        revision: Optional[int] = None,
+        exclude_revision: Optional[int] = None
+    ) -> int:
+        """根据文档ID删除chunk（可限定或排除切分版本，默认删除全部）"""
+        deleted = self._document_query(document_id, revision, exclude_revision).delete()
         return deleted
     
     def delete_by_folder_id(self, folder_id: str) -> int:
@@ -0,0 +1,54 @@
+"""
+文档解析结果缓存Repository
+"""
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models.document_parse_result import DocumentParseResult
+
+
+class DocumentParseResultRepository:
+    """文档解析结果缓存数据访问层"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get(self, tenant_id: str, file_hash: str, parser_version: str) -> Optional[DocumentParseResult]:
+        """根据 (租户, 文件哈希, 解析器版本) 查询解析结果"""
+        return self.db.query(DocumentParseResult).filter(
+            DocumentParseResult.tenant_id == tenant_id,
+            DocumentParseResult.file_hash == file_hash,
+            DocumentParseResult.parser_version == parser_version
+        ).first()
+    
+    def save(
+        self,
+        tenant_id: str,
+        file_hash: str,
+        parser_version: str,
+        markdown_path: str,
+        title: Optional[str] = None,
+        summary: Optional[str] = None,
+        page_count: Optional[int] = None
+    ) -> DocumentParseResult:
+        """保存解析结果（已存在时更新为最新一次解析的结果）"""
+        entry = self.get(tenant_id, file_hash, parser_version)
+        if entry is None:
+            entry = DocumentParseResult(tenant_id=tenant_id, file_hash=file_hash, parser_version=parser_version)
+            self.db.add(entry)
+        entry.markdown_path = markdown_path
+        entry.title = title[:500] if title else title
+        entry.summary = summary
+        entry.page_count = page_count
+        self.db.commit()
+        return entry
+    
+    def exists_by_markdown_path(self, markdown_path: str) -> bool:
+        """是否有解析结果指向该Markdown文件"""
+        return self.db.query(DocumentParseResult.id).filter(
+            DocumentParseResult.markdown_path == markdown_path
+        ).first() is not None
+    
+    def delete(self, entry: DocumentParseResult) -> None:
+        """删除解析结果"""
+        self.db.delete(entry)
+        self.db.commit()
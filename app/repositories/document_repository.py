@@ -3,8 +3,10 @@
 """
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, exists
 from app.models.document import Document
+from app.models.document_version import DocumentVersion
+from app.core.value_objects import DocumentStatus
 
 
 class DocumentRepository:
@@ -30,6 +32,18 @@ class DocumentRepository:
             query = query.filter(Document.tenant_id == tenant_id)
         return query.first()
     
+    def get_by_ids(self, document_ids: List[str], tenant_id: Optional[str] = None) -> List[Document]:
+        """根据ID列表批量查询文档（单次IN查询）"""
+        if not document_ids:
+            return []
+        query = self.db.query(Document).filter(
+            Document.id.in_(list(set(document_ids))),
+            Document.deleted_at.is_(None)
+        )
+        if tenant_id:
+            query = query.filter(Document.tenant_id == tenant_id)
+        return query.all()
+    
     def list_by_user(
         self,
         user_id: str,
@@ -51,6 +65,33 @@ class DocumentRepository:
             query = query.filter(Document.status == status)
         return query.order_by(desc(Document.created_at)).offset(skip).limit(limit).all()
     
+    def list_rechunkable(
+        self,
+        tenant_id: str,
+        user_id: Optional[str] = None,
+        folder_id: Optional[str] = None,
+        document_id: Optional[str] = None
+    ) -> List[Document]:
+        """查询可重新切分的文档：已解析出Markdown、不在处理中，且不是已被新版本替代的旧版本"""
+        superseded = exists().where(and_(
+            DocumentVersion.document_id == Document.id,
+            DocumentVersion.is_current.is_(False)
+        ))
+        query = self.db.query(Document).filter(
+            Document.tenant_id == tenant_id,
+            Document.deleted_at.is_(None),
+            Document.markdown_path.isnot(None),
+            Document.status.in_([DocumentStatus.COMPLETED.value, DocumentStatus.VECTORIZE_FAILED.value]),
+            ~superseded
+        )
+        if user_id:
+            query = query.filter(Document.user_id == user_id)
+        if folder_id:
+            query = query.filter(Document.folder_id == folder_id)
+        if document_id:
+            query = query.filter(Document.id == document_id)
+        return query.order_by(Document.created_at).all()
+    
     def check_duplicate(self, name: str, folder_id: Optional[str], tenant_id: str, user_id: str) -> Optional[Document]:
         """检查同名文件是否存在（在同一文件夹下）"""
         query = self.db.query(Document).filter(
@@ -73,6 +114,16 @@ class DocumentRepository:
             Document.deleted_at.is_(None)
         ).first()
     
+    def exists_by_markdown_path(self, markdown_path: str, exclude_document_id: Optional[str] = None) -> bool:
+        """是否有未删除的文档使用该Markdown文件（复用解析结果的文档共享同一文件）"""
+        query = self.db.query(Document.id).filter(
+            Document.markdown_path == markdown_path,
+            Document.deleted_at.is_(None)
+        )
+        if exclude_document_id:
+            query = query.filter(Document.id != exclude_document_id)
+        return query.first() is not None
+    
     def update(self, document: Document) -> Document:
         """更新文档"""
         self.db.commit()
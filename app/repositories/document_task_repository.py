@@ -1,10 +1,12 @@
 """
 文档任务数据访问层
 """
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, func, or_
 from app.models.document_task import DocumentTask
+from app.core.value_objects import DocumentTaskStatus
 
 
 class DocumentTaskRepository:
@@ -30,7 +32,8 @@ class DocumentTaskRepository:
         tenant_id: str,
         task_type: Optional[str] = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        status: Optional[str] = None
     ) -> List[DocumentTask]:
         """查询用户的任务列表"""
         query = self.db.query(DocumentTask).filter(
@@ -42,6 +45,8 @@ class DocumentTaskRepository:
         
         if task_type:
             query = query.filter(DocumentTask.task_type == task_type)
+        if status:
+            query = query.filter(DocumentTask.status == status)
         
         return query.order_by(desc(DocumentTask.created_at)).offset(skip).limit(limit).all()
     
@@ -68,3 +73,153 @@ class DocumentTaskRepository:
         self.db.commit()
         return count
 
+
+    # ---------- 任务队列 ----------
+    def claim(
+        self,
+        worker_id: str,
+        lease_seconds: float,
+        limit: int = 1,
+        type_limits: Optional[Dict[str, int]] = None
+    ) -> List[DocumentTask]:
+        """
+        领取可执行的任务：到达执行时间的pending任务，或租约已过期（worker失联）且仍有重试次数的running任务
+        
+        支持行锁的数据库（PostgreSQL/MySQL）用 FOR UPDATE SKIP LOCKED 选取候选，
+        再用带状态条件的UPDATE抢占，多个worker并发领取时每个任务只会被一个worker领到（SQLite依赖条件UPDATE）
+        
+        Args:
+            type_limits: 按任务类型限制同时执行的任务数（所有worker合计，{任务类型: 上限}）；
+                         各worker先统计再领取，并发领取时可能短暂超出上限
+        """
+        now = datetime.utcnow()
+        quotas = {}
+        for task_type, max_running in (type_limits or {}).items():
+            if max_running > 0:
+                running = self.db.query(DocumentTask).filter(
+                    DocumentTask.task_type == task_type,
+                    DocumentTask.status == DocumentTaskStatus.RUNNING.value,
+                    DocumentTask.lease_expires_at >= now
+                ).count()
+                quotas[task_type] = max(max_running - running, 0)
+        
+        claimable = and_(
+            DocumentTask.retries <= DocumentTask.max_retries,
+            or_(
+                and_(
+                    DocumentTask.status == DocumentTaskStatus.PENDING.value,
+                    or_(DocumentTask.run_after.is_(None), DocumentTask.run_after <= now)
+                ),
+                and_(
+                    DocumentTask.status == DocumentTaskStatus.RUNNING.value,
+                    DocumentTask.lease_expires_at < now
+                )
+            )
+        )
+        candidates = self.db.query(DocumentTask.id, DocumentTask.task_type).filter(claimable)
+        exhausted = [task_type for task_type, quota in quotas.items() if quota <= 0]
+        if exhausted:
+            candidates = candidates.filter(DocumentTask.task_type.notin_(exhausted))
+        candidates = candidates.order_by(DocumentTask.created_at).limit(limit)
+        if self.db.get_bind().dialect.name != "sqlite":
+            candidates = candidates.with_for_update(skip_locked=True)
+        
+        claimed_ids = []
+        for task_id, task_type in candidates.all():
+            if task_type in quotas:
+                if quotas[task_type] <= 0:
+                    continue
+                quotas[task_type] -= 1
+            updated = self.db.query(DocumentTask).filter(DocumentTask.id == task_id, claimable).update(
+                {
+                    DocumentTask.status: DocumentTaskStatus.RUNNING.value,
+                    DocumentTask.locked_by: worker_id,
+                    DocumentTask.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                    DocumentTask.retries: DocumentTask.retries + 1,
+                },
+                synchronize_session=False
+            )
+            if updated:
+                claimed_ids.append(task_id)
+        self.db.commit()
+        if not claimed_ids:
+            return []
+        return self.db.query(DocumentTask).filter(DocumentTask.id.in_(claimed_ids)).order_by(DocumentTask.created_at).all()
+    
+    def renew_lease(self, task_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """续约（仅当任务仍由该worker持有），返回是否成功"""
+        updated = self.db.query(DocumentTask).filter(
+            DocumentTask.id == task_id,
+            DocumentTask.locked_by == worker_id,
+            DocumentTask.status == DocumentTaskStatus.RUNNING.value
+        ).update(
+            {DocumentTask.lease_expires_at: datetime.utcnow() + timedelta(seconds=lease_seconds)},
+            synchronize_session=False
+        )
+        self.db.commit()
+        return bool(updated)
+    
+    def finish(self, task_id: str, worker_id: str, reason: Optional[str] = None, retry_delay: Optional[float] = None) -> Optional[str]:
+        """
+        结束一次执行（仅当任务仍由该worker持有）
+        
+        Args:
+            reason: 失败原因，为None表示执行成功
+            retry_delay: 失败后重新执行前的等待秒数，为None表示不再重试
+        
+        Returns:
+            任务的新状态，任务已不由该worker持有时返回None
+        """
+        now = datetime.utcnow()
+        if reason is None:
+            values = {DocumentTask.status: DocumentTaskStatus.SUCCEEDED.value, DocumentTask.reason: None, DocumentTask.finished_at: now}
+        elif retry_delay is not None:
+            values = {DocumentTask.status: DocumentTaskStatus.PENDING.value, DocumentTask.reason: reason,
+                      DocumentTask.run_after: now + timedelta(seconds=retry_delay)}
+        else:
+            values = {DocumentTask.status: DocumentTaskStatus.FAILED.value, DocumentTask.reason: reason, DocumentTask.finished_at: now}
+        values.update({DocumentTask.locked_by: None, DocumentTask.lease_expires_at: None})
+        updated = self.db.query(DocumentTask).filter(
+            DocumentTask.id == task_id,
+            DocumentTask.locked_by == worker_id
+        ).update(values, synchronize_session=False)
+        self.db.commit()
+        return values[DocumentTask.status] if updated else None
+    
+    def fail_expired(self) -> int:
+        """租约过期且重试次数已用尽的任务（反复导致worker崩溃）标记为失败，返回处理数量"""
+        now = datetime.utcnow()
+        count = self.db.query(DocumentTask).filter(
+            DocumentTask.status == DocumentTaskStatus.RUNNING.value,
+            DocumentTask.lease_expires_at < now,
+            DocumentTask.retries > DocumentTask.max_retries
+        ).update(
+            {
+                DocumentTask.status: DocumentTaskStatus.FAILED.value,
+                DocumentTask.reason: "任务执行超时（worker租约过期）",
+                DocumentTask.locked_by: None,
+                DocumentTask.lease_expires_at: None,
+                DocumentTask.finished_at: now,
+            },
+            synchronize_session=False
+        )
+        self.db.commit()
+        return count
+    
+    def count_by_batch(self, batch_id: str, tenant_id: str) -> Dict[str, int]:
+        """统计批次内各状态的任务数量"""
+        rows = self.db.query(DocumentTask.status, func.count(DocumentTask.id)).filter(
+            DocumentTask.batch_id == batch_id,
+            DocumentTask.tenant_id == tenant_id
+        ).group_by(DocumentTask.status).all()
+        return {task_status: count for task_status, count in rows}
+    
+    def requeue(self, task: DocumentTask) -> DocumentTask:
+        """重新提交失败的任务（重置重试次数）"""
+        task.status = DocumentTaskStatus.PENDING.value
+        task.retries = 0
+        task.run_after = None
+        task.finished_at = None
+        self.db.commit()
+        self.db.refresh(task)
+        return task
@@ -2,7 +2,7 @@
 文件夹Repository
 """
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy import and_, or_
 from app.models.folder import Folder
 
@@ -43,6 +43,45 @@ class FolderRepository:
             query = query.filter(Folder.parent_id == parent_id)
         return query.order_by(Folder.created_at.desc()).all()
     
+    def list_ids_by_user(self, user_id: str, tenant_id: str) -> List[str]:
+        """查询用户所有文件夹的ID（包括所有层级，单次查询）"""
+        rows = self.db.query(Folder.id).filter(
+            Folder.tenant_id == tenant_id,
+            Folder.user_id == user_id,
+            Folder.deleted_at.is_(None)
+        ).all()
+        return [row[0] for row in rows]
+    
+    def get_subtree_ids(self, folder_ids: List[str], tenant_id: str, user_id: str) -> List[str]:
+        """
+        查询文件夹及其所有子孙文件夹的ID（单次查询）
+        
+        基于物化路径：子文件夹的path为"{父文件夹path}/{父文件夹id}"，
+        因此子孙文件夹的path等于或以"{祖先path}/{祖先id}/"开头。
+        不存在、已删除或不属于该用户的文件夹不会出现在结果中。
+        """
+        if not folder_ids:
+            return []
+        ancestor = aliased(Folder)
+        ancestor_prefix = ancestor.path + "/" + ancestor.id
+        rows = self.db.query(Folder.id).join(
+            ancestor,
+            or_(
+                Folder.id == ancestor.id,
+                Folder.path == ancestor_prefix,
+                Folder.path.like(ancestor_prefix + "/%")
+            )
+        ).filter(
+            ancestor.id.in_(list(set(folder_ids))),
+            ancestor.tenant_id == tenant_id,
+            ancestor.user_id == user_id,
+            ancestor.deleted_at.is_(None),
+            Folder.tenant_id == tenant_id,
+            Folder.user_id == user_id,
+            Folder.deleted_at.is_(None)
+        ).distinct().all()
+        return [row[0] for row in rows]
+    
     def get_by_path(self, path: str, tenant_id: str, user_id: str) -> Optional[Folder]:
         """根据路径查询文件夹"""
         return self.db.query(Folder).filter(
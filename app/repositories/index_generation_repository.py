@@ -0,0 +1,43 @@
+"""
+用户索引代数Repository
+"""
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.models.index_generation import IndexGeneration
+
+
+class IndexGenerationRepository:
+    """用户索引代数数据访问层"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get(self, tenant_id: str, user_id: str) -> int:
+        """获取用户的索引代数（没有记录时为0）"""
+        generation = self.db.query(IndexGeneration.generation).filter(
+            IndexGeneration.tenant_id == tenant_id,
+            IndexGeneration.user_id == user_id
+        ).scalar()
+        return generation or 0
+    
+    def bump(self, tenant_id: str, user_id: str) -> int:
+        """递增用户的索引代数并提交，返回递增后的代数（多进程并发递增时由数据库保证原子性）"""
+        updated = self.db.query(IndexGeneration).filter(
+            IndexGeneration.tenant_id == tenant_id,
+            IndexGeneration.user_id == user_id
+        ).update(
+            {IndexGeneration.generation: IndexGeneration.generation + 1, IndexGeneration.updated_at: func.now()},
+            synchronize_session=False
+        )
+        if not updated:
+            self.db.add(IndexGeneration(tenant_id=tenant_id, user_id=user_id, generation=1))
+            try:
+                self.db.commit()
+                return 1
+            except IntegrityError:
+                # 其他进程同时创建了记录，改为递增
+                self.db.rollback()
+                return self.bump(tenant_id, user_id)
+        self.db.commit()
+        return self.get(tenant_id, user_id)
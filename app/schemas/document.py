@@ -2,7 +2,7 @@
 文档管理Schema
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 
 
@@ -54,6 +54,20 @@ class DocumentConfigResponse(BaseModel):
         from_attributes = True
 
 
+class DocumentRechunkRequest(DocumentConfigRequest):
+    """重新切分请求（未提供的切分配置使用租户当前的 doc.chunk 配置）"""
+    scope: Literal["document", "folder", "tenant"] = Field("document", description="范围：document/folder/tenant")
+    document_id: Optional[str] = Field(None, description="文档ID（scope=document时必填）")
+    folder_id: Optional[str] = Field(None, description="文件夹ID（scope=folder时必填）")
+
+
+class DocumentRechunkResponse(BaseModel):
+    """重新切分响应"""
+    batch_id: Optional[str] = Field(None, description="批次ID（queue模式下用于查询进度）")
+    total: int = Field(..., description="提交重新切分的文档数")
+    chunk_config: DocumentConfigResponse
+
+
 # 文档上传相关Schema
 class DocumentUploadRequest(BaseModel):
     """文档上传请求（表单数据）"""
@@ -12,10 +12,17 @@ class DocumentTaskResponse(BaseModel):
     document_id: str
     tenant_id: str
     user_id: str
-    task_type: str = Field(..., description="任务类型：parse_failed/vectorize_failed")
+    task_type: str = Field(..., description="任务类型：process_document/rechunk_document")
+    status: str = Field(..., description="状态：pending/running/succeeded/failed")
     reason: Optional[str] = None
-    retries: int = Field(default=0, description="重试次数")
+    retries: int = Field(default=0, description="已执行次数")
+    max_retries: int = Field(default=3, description="首次执行失败后的最大重试次数")
     task_data: Optional[Dict[str, Any]] = None
+    batch_id: Optional[str] = Field(default=None, description="批次ID")
+    run_after: Optional[datetime] = Field(default=None, description="最早执行时间（失败退避）")
+    locked_by: Optional[str] = Field(default=None, description="执行中任务所在的worker")
+    lease_expires_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     
@@ -28,3 +35,14 @@ class DocumentTaskListResponse(BaseModel):
     tasks: list[DocumentTaskResponse]
     total: int
 
+
+
+class DocumentTaskBatchProgressResponse(BaseModel):
+    """批次进度响应"""
+    batch_id: str
+    total: int = Field(..., description="批次任务总数")
+    pending: int = Field(default=0, description="等待执行（含等待重试）")
+    running: int = Field(default=0, description="执行中")
+    succeeded: int = Field(default=0, description="已完成")
+    failed: int = Field(default=0, description="重试次数用尽")
+    progress: float = Field(..., description="已结束（完成或失败）的比例")
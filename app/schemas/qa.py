@@ -15,6 +15,7 @@ class ConversationCreate(BaseModel):
     similarity_threshold: Optional[float] = Field(None, description="相似度阈值", ge=0, le=1)
     use_rerank: Optional[bool] = Field(False, description="是否使用重排序")
     rerank_top_n: Optional[int] = Field(None, description="重排序后的top N", ge=1, le=50)
+    retrieval_mode: Optional[str] = Field(None, description="检索模式：vector/lexical/hybrid", pattern="^(vector|lexical|hybrid)$")
 
 
 class ConversationUpdate(BaseModel):
@@ -25,6 +26,7 @@ class ConversationUpdate(BaseModel):
     similarity_threshold: Optional[float] = Field(None, description="相似度阈值", ge=0, le=1)
     use_rerank: Optional[bool] = Field(None, description="是否使用重排序")
     rerank_top_n: Optional[int] = Field(None, description="重排序后的top N", ge=1, le=50)
+    retrieval_mode: Optional[str] = Field(None, description="检索模式：vector/lexical/hybrid", pattern="^(vector|lexical|hybrid)$")
 
 
 class ConversationResponse(BaseModel):
@@ -76,6 +78,7 @@ class ChatRequest(BaseModel):
     similarity_threshold: Optional[float] = Field(None, description="相似度阈值", ge=0, le=1)
     use_rerank: Optional[bool] = Field(False, description="是否使用重排序")
     rerank_top_n: Optional[int] = Field(None, description="重排序后的top N", ge=1, le=50)
+    retrieval_mode: Optional[str] = Field(None, description="检索模式：vector/lexical/hybrid", pattern="^(vector|lexical|hybrid)$")
 
 
 class ChatResponse(BaseModel):
@@ -6,6 +6,9 @@ from fastapi import HTTPException, status
 from app.repositories.config_repository import ConfigRepository
 from app.schemas.config import ConfigUpdateRequest
 from app.core.config_definitions import CONFIG_DEFINITIONS
+from app.core.embedding_cache import query_embedding_cache
+from app.core.client_pool import client_registry
+from app.core.config_cache import resolved_config_cache
 import numbers
 import base64
 import copy
@@ -20,17 +23,9 @@ class ConfigService:
         """
         获取有效配置（系统 -> 租户 -> 用户 覆盖），敏感字段脱敏
         """
-        system_cfg = self._decrypt_and_mask(self.config_repo.to_dict(self.config_repo.list_system_configs(None)))
-        tenant_cfg = (
-            self._decrypt_and_mask(self.config_repo.to_dict(self.config_repo.list_system_configs(tenant_id)))
-            if tenant_id
-            else {}
-        )
-        user_cfg = (
-            self._decrypt_and_mask(self.config_repo.to_dict_user(self.config_repo.list_user_configs(user_id)))
-            if user_id
-            else {}
-        )
+        system_cfg = self.list_scope_configs("system", None)
+        tenant_cfg = self.list_scope_configs("tenant", tenant_id) if tenant_id else {}
+        user_cfg = self.list_scope_configs("user", user_id) if user_id else {}
 
         merged: Dict[str, Dict[str, Any]] = {}
         self._merge_config(merged, system_cfg)
@@ -42,19 +37,58 @@ class ConfigService:
         """
         按作用域列出配置（不合并），敏感字段脱敏
         """
-        if scope == "system":
-            cfg = self._decrypt_and_mask(self.config_repo.to_dict(self.config_repo.list_system_configs(None)))
-        elif scope == "tenant":
-            if scope_id is None:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="缺少 tenant_id")
-            cfg = self._decrypt_and_mask(self.config_repo.to_dict(self.config_repo.list_system_configs(scope_id)))
-        elif scope == "user":
-            if scope_id is None:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="缺少 user_id")
-            cfg = self._decrypt_and_mask(self.config_repo.to_dict_user(self.config_repo.list_user_configs(scope_id)))
-        else:
+        self._check_scope(scope, scope_id)
+        return resolved_config_cache.get_or_load(
+            scope, scope_id, "masked",
+            lambda: self._decrypt_and_mask(self._load_scope_configs(scope, scope_id))
+        )
+
+    def list_scope_configs_unmasked(self, scope: str, scope_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        按作用域列出配置（不合并），敏感字段解密但不脱敏，仅供服务内部调用远端服务使用
+        """
+        self._check_scope(scope, scope_id)
+        return resolved_config_cache.get_or_load(
+            scope, scope_id, "unmasked",
+            lambda: self._decrypt_and_mask(self._load_scope_configs(scope, scope_id), mask=False)
+        )
+
+    def get_resolved_config(
+        self,
+        category: str,
+        key: str,
+        tenant_id: Optional[str],
+        user_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取单个配置项（用户 -> 租户 -> 系统，取第一个存在的作用域，不逐字段合并），敏感字段为明文
+
+        Returns:
+            配置字典，未配置时返回None
+        """
+        scopes = []
+        if user_id:
+            scopes.append(("user", user_id))
+        if tenant_id:
+            scopes.append(("tenant", tenant_id))
+        scopes.append(("system", None))
+        for scope, scope_id in scopes:
+            value = self.list_scope_configs_unmasked(scope, scope_id).get(category, {}).get(key)
+            if value:
+                return value
+        return None
+
+    def _check_scope(self, scope: str, scope_id: Optional[str]) -> None:
+        if scope not in ("system", "tenant", "user"):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="scope 必须是 system/tenant/user")
-        return cfg
+        if scope != "system" and scope_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"缺少 {scope}_id")
+
+    def _load_scope_configs(self, scope: str, scope_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """从数据库读取作用域配置（未解密）"""
+        if scope == "user":
+            return self.config_repo.to_dict_user(self.config_repo.list_user_configs(scope_id))
+        return self.config_repo.to_dict(self.config_repo.list_system_configs(scope_id if scope == "tenant" else None))
 
     # -------- 更新配置 --------
     def update_system_config(self, items: ConfigUpdateRequest, operator_id: Optional[str]):
@@ -65,6 +99,11 @@ class ConfigService:
         except Exception as e:
             self.config_repo.rollback()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"更新系统配置失败: {e}")
+        resolved_config_cache.bump("system", None)
+        # 系统级embedding配置影响所有未单独配置的租户
+        if self._touches_category(items, "embedding"):
+            query_embedding_cache.clear()
+        self._invalidate_clients(items)
 
     def _is_config_value_empty(self, value: Any) -> bool:
         """检查配置值是否为空（空对象或所有字段都为空）"""
@@ -121,6 +160,10 @@ class ConfigService:
         except Exception as e:
             self.config_repo.rollback()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"更新租户配置失败: {e}")
+        resolved_config_cache.bump("tenant", tenant_id)
+        if self._touches_category(items, "embedding"):
+            query_embedding_cache.invalidate_tenant(tenant_id)
+        self._invalidate_clients(items)
 
     def update_user_config(self, user_id: str, items: ConfigUpdateRequest, operator_id: Optional[str]):
         enc_items = self._validate_and_encrypt(items)
@@ -130,6 +173,8 @@ class ConfigService:
         except Exception as e:
             self.config_repo.rollback()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"更新用户配置失败: {e}")
+        resolved_config_cache.bump("user", user_id)
+        self._invalidate_clients(items)
 
     # -------- 历史 --------
     def list_history(
@@ -147,6 +192,15 @@ class ConfigService:
         return {"valid": True, "message": "校验通过"}
 
     # -------- 内部辅助 --------
+    def _touches_category(self, items: ConfigUpdateRequest, category: str) -> bool:
+        return any(item.category == category for item in items.items)
+
+    def _invalidate_clients(self, items: ConfigUpdateRequest) -> None:
+        """模型服务配置变更后，失效对应类别的池化客户端"""
+        for category in ("embedding", "llm", "rerank"):
+            if self._touches_category(items, category):
+                client_registry.invalidate(category)
+
     def _merge_config(self, target: Dict[str, Dict[str, Any]], source: Dict[str, Dict[str, Any]]):
         for category, kv in source.items():
             if category not in target:
@@ -252,7 +306,7 @@ class ConfigService:
                 new_obj[k] = v
         return new_obj
 
-    def _decrypt_and_mask(self, cfg: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    def _decrypt_and_mask(self, cfg: Dict[str, Dict[str, Any]], mask: bool = True) -> Dict[str, Dict[str, Any]]:
         result: Dict[str, Dict[str, Any]] = {}
         for category, kv in cfg.items():
             result[category] = {}
@@ -261,10 +315,10 @@ class ConfigService:
                     result[category][key] = value
                     continue
                 field_defs = CONFIG_DEFINITIONS[category][key]
-                result[category][key] = self._decrypt_object_fields(value, field_defs)
+                result[category][key] = self._decrypt_object_fields(value, field_defs, mask)
         return result
 
-    def _decrypt_object_fields(self, obj: Any, field_defs: Dict[str, Any]):
+    def _decrypt_object_fields(self, obj: Any, field_defs: Dict[str, Any], mask: bool = True):
         if not isinstance(obj, dict):
             return obj
         new_obj = {}
@@ -272,9 +326,9 @@ class ConfigService:
             rule = field_defs.get(k, {})
             if rule.get("sensitive") and isinstance(v, str):
                 decrypted = self._decrypt(v)
-                new_obj[k] = self._mask(decrypted)
+                new_obj[k] = self._mask(decrypted) if mask else decrypted
             elif isinstance(v, dict) and "type" not in rule:
-                new_obj[k] = self._decrypt_object_fields(v, rule)
+                new_obj[k] = self._decrypt_object_fields(v, rule, mask)
             else:
                 new_obj[k] = v
         return new_obj
@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 from pathlib import Path
 from app.core.parsers import ParserFactory, ParserInterface
 from app.core.storage import StorageInterface
+from app.core.parse_pool import parse_pool, ParseTimeoutError
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +21,17 @@ class DocumentParserService:
         self,
         file_path: str,
         file_type: str,
-        storage: StorageInterface
+        storage: StorageInterface,
+        output_path: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        解析文档（异步）
+        解析文档（异步，解析在进程池中执行）
         
         Args:
             file_path: 文件存储路径（相对路径）
             file_type: 文件类型（txt/md/pdf/word）
             storage: 存储接口实例
+            output_path: 本地输出路径，指定时Markdown内容逐页写入该文件，结果中不含content
         
         Returns:
             解析结果，包含：
@@ -38,34 +41,22 @@ class DocumentParserService:
             - metadata: 元数据
         """
         try:
-            # 获取解析器
-            parser = ParserFactory.get_parser_by_type(file_type)
+            # 校验文件类型（不支持的类型在派发到进程池前失败）
+            ParserFactory.get_parser_by_type(file_type)
             
-            # 读取文件内容（异步方式）
-            file_content = await storage.read_file(file_path)
+            # 本地存储直接把真实路径交给解析器，其他存储读入内存后按字节流解析，均不写临时文件
+            local_path = storage.get_local_path(file_path)
+            if local_path:
+                return await parse_pool.parse(file_type, file_path=local_path, output_path=output_path)
             
-            # 创建临时文件用于解析
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_type}") as tmp_file:
-                tmp_file.write(file_content)
-                tmp_path = tmp_file.name
+            file_content = await storage.read_file(file_path)
+            return await parse_pool.parse(
+                file_type,
+                content=file_content,
+                filename=Path(file_path).name,
+                output_path=output_path
+            )
             
-            try:
-                # 解析文件
-                result = parser.parse(tmp_path)
-                
-                # 提取元数据
-                metadata = parser.extract_metadata(tmp_path)
-                result["metadata"].update(metadata)
-                
-                return result
-            finally:
-                # 清理临时文件
-                try:
-                    Path(tmp_path).unlink()
-                except Exception:
-                    pass  # 忽略删除失败
-                
         except Exception as e:
             logger.error(f"解析文档失败: {file_path}, 错误: {e}", exc_info=True)
             raise
@@ -75,7 +66,8 @@ class DocumentParserService:
         file_path: str,
         file_type: str,
         storage: StorageInterface,
-        max_retries: int = 3
+        max_retries: int = 3,
+        output_path: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         解析文档（带重试机制，异步）
@@ -85,13 +77,18 @@ class DocumentParserService:
             file_type: 文件类型
             storage: 存储接口
             max_retries: 最大重试次数
+            output_path: 本地输出路径（见parse_document）
         
         Returns:
             解析结果，失败返回None
         """
         for attempt in range(max_retries):
             try:
-                return await self.parse_document(file_path, file_type, storage)
+                return await self.parse_document(file_path, file_type, storage, output_path=output_path)
+            except ParseTimeoutError as e:
+                # 超时通常由文件本身导致，重试同样会超时
+                logger.error(f"解析文档超时，不再重试: {file_path}, {e}")
+                return None
             except Exception as e:
                 logger.warning(f"解析文档失败（尝试 {attempt + 1}/{max_retries}）: {e}")
                 if attempt == max_retries - 1:
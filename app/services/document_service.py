@@ -2,6 +2,7 @@
 文档服务（应用服务层）
 """
 import logging
+import uuid
 from typing import Optional, Dict, Any, List
 from fastapi import BackgroundTasks, HTTPException, status
 from app.repositories.document_repository import DocumentRepository
@@ -16,6 +17,10 @@ from app.services.config_service import ConfigService
 from app.services.document_domain_service import DocumentDomainService
 from app.repositories.config_repository import ConfigRepository
 from app.repositories.document_chunk_repository import DocumentChunkRepository
+from app.repositories.document_parse_result_repository import DocumentParseResultRepository
+from app.repositories.index_generation_repository import IndexGenerationRepository
+from app.services.index_generation_service import IndexGenerationService
+from app.core.parsers import ParserFactory
 from app.core.exceptions import (
     DocumentNotFoundException,
     DocumentPermissionDeniedException,
@@ -24,6 +29,9 @@ from app.core.exceptions import (
     FolderPermissionDeniedException
 )
 from app.core.value_objects import DocumentQuery, DocumentStatus
+from app.core.retrieval_cache import retrieval_cache
+from app.core.lexical_index import lexical_index
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -269,9 +277,18 @@ class DocumentService:
                 split_keyword=doc_config.split_keyword
             )
         
-        # 异步解析文档（使用后台任务）
+        # 解析+向量化：默认写入持久化任务队列由worker进程执行，inline模式在API进程的后台任务中执行
         # 传递旧文档ID，用于新版本向量化成功后清理旧版本向量数据
-        if background_tasks:
+        if settings.DOCUMENT_PROCESSING_MODE == "queue":
+            from app.repositories.document_task_repository import DocumentTaskRepository
+            from app.services.document_task_service import DocumentTaskService
+            DocumentTaskService(DocumentTaskRepository(self.document_repo.db)).enqueue_document_processing(
+                document,
+                storage_path,
+                file_type,
+                old_document_id
+            )
+        elif background_tasks:
             background_tasks.add_task(
                 self._parse_document_async,
                 document.id,
@@ -283,78 +300,163 @@ class DocumentService:
         return document
     
     async def _parse_document_async(self, document_id: str, storage_path: str, file_type: str, old_document_id: Optional[str] = None):
-        """异步解析文档
+        """异步解析文档（inline模式的后台任务）"""
+        try:
+            await self.process_document(document_id, storage_path, file_type, old_document_id)
+        except Exception as e:
+            logger.error(f"处理文档失败: {document_id}, 错误: {e}", exc_info=True)
+    
+    async def process_document(self, document_id: str, storage_path: str, file_type: str, old_document_id: Optional[str] = None) -> bool:
+        """解析并向量化文档
         
         Args:
             document_id: 新文档ID
             storage_path: 存储路径
             file_type: 文件类型
-            old_document_id: 旧文档ID（如果存在，用于新版本向量化成功后清理旧版本向量数据）
+            old_document_id: 旧文档ID（如果存在，新版本复制其未变化chunk的向量，向量化成功后清理旧版本的向量数据）
+        
+        Returns:
+            文档是否处理完成（解析或向量化失败时返回False，文档状态标记为对应的失败状态）
         """
+        document = self.document_repo.get_by_id(document_id)
+        if not document:
+            logger.error(f"文档不存在: {document_id}")
+            return False
+        
         try:
-            document = self.document_repo.get_by_id(document_id)
-            if not document:
-                logger.error(f"文档不存在: {document_id}")
-                return
-            
             # 更新状态为解析中
             document.mark_as_parsing()
             self.document_repo.update(document)
             
-            # 解析文档
+            # 解析文档（同一租户内已解析过相同文件时直接复用解析结果）
             from app.core.storage import get_storage
             storage = get_storage()
             
-            result = await self.parser_service.parse_document_with_retry(
-                storage_path,
-                file_type,
-                storage,
-                max_retries=3
-            )
+            parsed = await self._get_cached_parse_result(document, file_type, storage)
+            if parsed is None:
+                parsed = await self._parse_to_markdown(document, storage_path, file_type, storage)
             
-            if result:
-                # 保存Markdown结果（异步方式）
-                markdown_content = result["content"].encode("utf-8")
-                # 生成markdown路径（替换文件扩展名）
-                if "." in storage_path:
-                    markdown_path = ".".join(storage_path.split(".")[:-1]) + ".md"
-                else:
-                    markdown_path = f"{storage_path}.md"
-                await storage.save_file(markdown_path, markdown_content)
-                
-                # 更新文档
-                document.update_parsing_result(
-                    markdown_path=markdown_path,
-                    title=result.get("title"),
-                    summary=result.get("summary"),
-                    page_count=result.get("metadata", {}).get("page_count")
-                )
-                self.document_repo.update(document)
-                
-                # 向量化文档
-                try:
-                    success = await self._vectorize_document(document, storage)
-                    # 如果向量化成功且存在旧版本，清理旧版本的向量数据
-                    if success and old_document_id:
-                        await self._cleanup_old_version_vectors(old_document_id, document.tenant_id, document.user_id, document.folder_id)
-                except Exception as e:
-                    logger.error(f"文档 {document_id} 向量化失败: {e}", exc_info=True)
-                    # 向量化失败不影响文档解析成功状态
-            else:
+            if not parsed:
                 # 解析失败
                 document.mark_as_parse_failed()
-                # 注意：待办表功能为预留接口，暂不实现自动加入待办表的逻辑
                 self.document_repo.update(document)
+                return False
             
+            # 更新文档
+            document.update_parsing_result(**parsed)
+            self.document_repo.update(document)
         except Exception as e:
             logger.error(f"解析文档失败: {document_id}, 错误: {e}", exc_info=True)
-            document = self.document_repo.get_by_id(document_id)
-            if document:
-                document.mark_as_parse_failed()
-                self.document_repo.update(document)
+            document.mark_as_parse_failed()
+            self.document_repo.update(document)
+            return False
+        
+        # 向量化文档
+        try:
+            success = await self._vectorize_document(document, storage, old_document_id)
+        except Exception as e:
+            logger.error(f"文档 {document_id} 向量化失败: {e}", exc_info=True)
+            document.mark_as_vectorize_failed()
+            self.document_repo.update(document)
+            return False
+        
+        # 如果向量化成功且存在旧版本，清理旧版本的向量数据（新版本完成前旧版本保持完整可检索）
+        if success and old_document_id:
+            await self._cleanup_old_version_vectors(old_document_id, document.tenant_id, document.user_id, document.folder_id)
+        return success
+    
+    async def _parse_to_markdown(
+        self,
+        document: Document,
+        storage_path: str,
+        file_type: str,
+        storage
+    ) -> Optional[Dict[str, Any]]:
+        """解析文件并保存Markdown，成功后写入解析结果缓存，返回文档的解析结果字段，失败返回None"""
+        if settings.PARSE_RESULT_CACHE_ENABLED:
+            # 按文件哈希存放（不随同名文件的新版本覆盖），可被同一租户内相同文件的文档共享
+            markdown_path = f"{document.tenant_id}/_parsed/{document.file_hash}/{document.id}.md"
+        elif "." in storage_path:
+            # 生成markdown路径（替换文件扩展名）
+            markdown_path = ".".join(storage_path.split(".")[:-1]) + ".md"
+        else:
+            markdown_path = f"{storage_path}.md"
+        # 本地存储由解析子进程逐页直接写入Markdown文件，不在内存中拼接完整内容
+        # （Markdown原文件的输出路径与原文件相同，边读边写会截断原文件，仍走内存）
+        local_markdown_path = storage.get_local_write_path(markdown_path) if markdown_path != storage_path else None
+        
+        result = await self.parser_service.parse_document_with_retry(
+            storage_path,
+            file_type,
+            storage,
+            max_retries=3,
+            output_path=local_markdown_path
+        )
+        if not result:
+            return None
+        
+        if "content" in result:
+            # 保存Markdown结果（异步方式）
+            await storage.save_file(markdown_path, result["content"].encode("utf-8"))
+        
+        parsed = {
+            "markdown_path": markdown_path,
+            "title": result.get("title"),
+            "summary": result.get("summary"),
+            "page_count": result.get("metadata", {}).get("page_count"),
+        }
+        if settings.PARSE_RESULT_CACHE_ENABLED:
+            repo = DocumentParseResultRepository(self.document_repo.db)
+            parser_version = ParserFactory.get_parser_version(file_type)
+            try:
+                previous = repo.get(document.tenant_id, document.file_hash, parser_version)
+                previous_path = previous.markdown_path if previous else None
+                repo.save(
+                    tenant_id=document.tenant_id,
+                    file_hash=document.file_hash,
+                    parser_version=parser_version,
+                    **parsed
+                )
+            except Exception as e:
+                # 缓存写入失败不影响文档处理
+                logger.warning(f"保存文档 {document.id} 的解析结果缓存失败: {e}")
+                self.document_repo.db.rollback()
+            else:
+                # 覆盖了已有的解析结果：旧的Markdown文件不再被缓存引用
+                if previous_path and previous_path != markdown_path and not self._markdown_in_use(previous_path):
+                    await storage.delete_file(previous_path)
+        return parsed
+    
+    def _markdown_in_use(self, markdown_path: str, exclude_document_id: Optional[str] = None) -> bool:
+        """解析结果缓存目录下的Markdown文件是否仍被解析结果或未删除的文档引用（其他目录的文件与原文件相邻存放，不在此清理）"""
+        if "/_parsed/" not in markdown_path:
+            return True
+        if DocumentParseResultRepository(self.document_repo.db).exists_by_markdown_path(markdown_path):
+            return True
+        return self.document_repo.exists_by_markdown_path(markdown_path, exclude_document_id=exclude_document_id)
+    
+    async def _get_cached_parse_result(self, document: Document, file_type: str, storage) -> Optional[Dict[str, Any]]:
+        """查询同一租户内相同文件（文件哈希 + 解析器版本）的解析结果，Markdown文件已不存在时作废"""
+        if not settings.PARSE_RESULT_CACHE_ENABLED:
+            return None
+        repo = DocumentParseResultRepository(self.document_repo.db)
+        cached = repo.get(document.tenant_id, document.file_hash, ParserFactory.get_parser_version(file_type))
+        if cached is None:
+            return None
+        if not await storage.file_exists(cached.markdown_path):
+            logger.warning(f"解析结果缓存的Markdown文件已不存在: {cached.markdown_path}")
+            repo.delete(cached)
+            return None
+        logger.info(f"文档 {document.id} 复用相同文件的解析结果（{cached.markdown_path}），跳过解析")
+        return {
+            "markdown_path": cached.markdown_path,
+            "title": cached.title,
+            "summary": cached.summary,
+            "page_count": cached.page_count,
+        }
     
-    async def _vectorize_document(self, document: Document, storage):
-        """向量化文档"""
+    async def _vectorize_document(self, document: Document, storage, previous_document_id: Optional[str] = None):
+        """向量化文档（指定旧版本时复用内容未变化chunk的向量）"""
         # 获取文档配置
         config = self.document_config_repo.get_by_document_id(document.id)
         if not config:
@@ -381,7 +483,8 @@ class DocumentService:
             embedding_service=embedding_service,
             chunk_repo=chunk_repo,
             config_service=self.config_service,
-            config_repo=config_repo
+            config_repo=config_repo,
+            index_generation_service=IndexGenerationService(IndexGenerationRepository(db))
         )
         
         # 更新文档状态为向量化中
@@ -392,11 +495,12 @@ class DocumentService:
         success = await vectorization_service.vectorize_document(
             document=document,
             config=config,
-            storage=storage
+            storage=storage,
+            previous_document_id=previous_document_id
         )
         
         if success:
-            logger.info(f"文档 {document.id} 向量化成功")
+            logger.info(f"文档 {document.id} 向量化成功: {vectorization_service.last_report}")
             # 标记文档为已完成
             document.mark_as_completed()
             self.document_repo.update(document)
@@ -447,6 +551,9 @@ class DocumentService:
                 logger.info(f"已删除旧文档 {old_document_id} 的向量库索引")
             except Exception as e:
                 logger.error(f"删除旧文档 {old_document_id} 的向量库索引失败: {e}", exc_info=True)
+            finally:
+                lexical_index.remove_document(tenant_id, user_id, old_document_id)
+                retrieval_cache.bump_generation(tenant_id, user_id)
             
             # 删除文档chunk数据
             try:
@@ -455,11 +562,165 @@ class DocumentService:
                 logger.info(f"已删除旧文档 {old_document_id} 的 {deleted_count} 个chunk")
             except Exception as e:
                 logger.error(f"删除旧文档 {old_document_id} 的chunk失败: {e}", exc_info=True)
+            self._publish_index_change(tenant_id, user_id)
             
             logger.info(f"完成清理旧版本文档 {old_document_id} 的向量数据")
         except Exception as e:
             logger.error(f"清理旧版本文档 {old_document_id} 的向量数据失败: {e}", exc_info=True)
     
+    def _resolve_chunk_config(self, tenant_id: str, config_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """切分配置：用户提供的值优先，其余使用租户当前的 doc.chunk 配置"""
+        chunk_config = self._get_chunk_config(tenant_id)
+        config_data = {key: value for key, value in (config_data or {}).items() if value is not None}
+        resolved = {
+            "chunk_size": config_data.get("chunk_size", chunk_config.get("size", 400)),
+            "chunk_overlap": config_data.get("chunk_overlap", chunk_config.get("overlap", 100)),
+            "split_method": config_data.get("split_method", chunk_config.get("strategy", "fixed")),
+            "split_keyword": config_data.get("split_keyword", chunk_config.get("split_keyword")),
+        }
+        if resolved["chunk_overlap"] >= resolved["chunk_size"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="chunk_overlap 必须小于 chunk_size"
+            )
+        return resolved
+    
+    def request_rechunk(
+        self,
+        tenant_id: str,
+        user_id: str,
+        scope: str,
+        document_id: Optional[str] = None,
+        folder_id: Optional[str] = None,
+        config_data: Optional[Dict[str, Any]] = None,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Dict[str, Any]:
+        """
+        按新的切分配置重新切分文档（不重新解析，复用已保存的Markdown）
+        
+        Args:
+            scope: document（单个文档）/ folder（文件夹下的文档）/ tenant（租户下所有用户的文档，权限由API层校验）
+            config_data: 切分配置，未提供的字段使用租户当前的 doc.chunk 配置
+        
+        Returns:
+            {"batch_id", "total", "chunk_config"}；queue模式下每个文档一个任务，按batch_id查询进度，
+            inline模式下在API进程的后台任务中逐个执行（batch_id为None）
+        """
+        chunk_config = self._resolve_chunk_config(tenant_id, config_data)
+        
+        if scope == "document":
+            document = self.get_document(document_id, tenant_id, user_id)
+            documents = self.document_repo.list_rechunkable(tenant_id, document_id=document.id)
+            if not documents:
+                if document.is_processing():
+                    raise DocumentProcessingException(document.id, document.status)
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="文档尚未解析完成或已被新版本替代，无法重新切分"
+                )
+        elif scope == "folder":
+            folder = self.folder_repo.get_by_id(folder_id, tenant_id) if folder_id else None
+            if not folder:
+                raise FolderNotFoundException(folder_id)
+            if folder.user_id != user_id:
+                raise FolderPermissionDeniedException(folder_id)
+            documents = self.document_repo.list_rechunkable(tenant_id, user_id=user_id, folder_id=folder_id)
+        elif scope == "tenant":
+            documents = self.document_repo.list_rechunkable(tenant_id)
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"不支持的范围: {scope}")
+        
+        batch_id = None
+        if settings.DOCUMENT_PROCESSING_MODE == "queue":
+            from app.repositories.document_task_repository import DocumentTaskRepository
+            from app.services.document_task_service import DocumentTaskService
+            batch_id = str(uuid.uuid4())
+            task_service = DocumentTaskService(DocumentTaskRepository(self.document_repo.db))
+            for document in documents:
+                task_service.enqueue_rechunk(document, chunk_config, batch_id)
+        elif background_tasks and documents:
+            background_tasks.add_task(self._rechunk_documents_async, [d.id for d in documents], chunk_config)
+        
+        logger.info(f"已提交 {len(documents)} 个文档的重新切分（范围: {scope}，批次: {batch_id}，配置: {chunk_config}）")
+        return {"batch_id": batch_id, "total": len(documents), "chunk_config": chunk_config}
+    
+    async def _rechunk_documents_async(self, document_ids: List[str], chunk_config: Dict[str, Any]):
+        """逐个重新切分文档（inline模式的后台任务，串行执行以免占满embedding服务）"""
+        for document_id in document_ids:
+            try:
+                await self.rechunk_document(document_id, chunk_config)
+            except Exception as e:
+                logger.error(f"重新切分文档失败: {document_id}, 错误: {e}", exc_info=True)
+    
+    async def rechunk_document(self, document_id: str, chunk_config: Dict[str, Any]) -> bool:
+        """
+        按新的切分配置重新切分并向量化文档（读取已保存的Markdown，不重新解析）
+        
+        配置变化时更新文档配置并递增切分版本，新chunk以新版本写入、与旧chunk并存（切分期间文档仍可检索），
+        全部写入后再删除旧版本的chunk和向量；配置已更新后的重试从向量化检查点继续。
+        与旧切分结果相同的chunk文本命中Chunk Embedding缓存，不重复调用embedding服务
+        
+        Returns:
+            是否完成（配置未变化且文档已完成时只清理残留的旧版本，直接返回True）
+        """
+        document = self.document_repo.get_by_id(document_id)
+        if not document:
+            logger.error(f"文档不存在: {document_id}")
+            return False
+        if not document.markdown_path:
+            logger.error(f"文档 {document_id} 尚未解析，无法重新切分")
+            return False
+        
+        config = self.document_config_repo.get_by_document_id(document_id)
+        changed = config is None or any(getattr(config, key) != value for key, value in chunk_config.items())
+        if changed or document.status != DocumentStatus.COMPLETED.value:
+            document.mark_as_vectorizing()
+            self.document_repo.update(document)
+            if config is None:
+                # 没有配置的历史文档，已有chunk视为版本0
+                config = self.document_config_repo.create(DocumentConfig(document_id=document_id, chunk_revision=1, **chunk_config))
+            elif changed:
+                for key, value in chunk_config.items():
+                    setattr(config, key, value)
+                config.chunk_revision += 1
+                self.document_config_repo.update(config)
+            
+            from app.core.storage import get_storage
+            if not await self._vectorize_document(document, get_storage()):
+                return False
+        else:
+            logger.info(f"文档 {document_id} 的切分配置未变化，跳过重新切分")
+        
+        # 新版本已完整写入，切换后删除其他版本的chunk（上次删除失败时在此补删）
+        self._discard_stale_chunk_revisions(document, config.chunk_revision)
+        return True
+    
+    def _discard_stale_chunk_revisions(self, document: Document, revision: int) -> None:
+        """删除文档中不属于当前切分版本的向量、chunk和词法索引条目（失败时抛出异常，由任务重试）"""
+        from app.core.vector_store.vector_store_factory import VectorStoreFactory
+        
+        chunk_repo = DocumentChunkRepository(self.document_repo.db)
+        vector_ids = chunk_repo.list_vector_ids(document.id, exclude_revision=revision)
+        if vector_ids:
+            vector_store = VectorStoreFactory.create_from_config(document.tenant_id, self.config_service)
+            try:
+                deleted = vector_store.delete_by_ids(
+                    ids=vector_ids,
+                    tenant_id=document.tenant_id,
+                    user_id=document.user_id,
+                    folder_id=document.folder_id
+                )
+                if not deleted:
+                    raise RuntimeError(f"删除文档 {document.id} 的向量失败")
+            finally:
+                lexical_index.remove_chunks(document.tenant_id, document.user_id, vector_ids)
+                retrieval_cache.bump_generation(document.tenant_id, document.user_id)
+        deleted_count = chunk_repo.delete_by_document_id(document.id, exclude_revision=revision)
+        chunk_repo.commit()
+        if vector_ids or deleted_count:
+            self._publish_index_change(document.tenant_id, document.user_id)
+            logger.info(f"已删除文档 {document.id} 按旧配置切分的 {deleted_count} 个chunk")
+    
     def list_documents(
         self,
         user_id: str,
@@ -539,8 +800,14 @@ class DocumentService:
         
         return document
     
-    def delete_document(self, document_id: str, tenant_id: str, user_id: str) -> bool:
-        """删除文档（软删除）"""
+    def delete_document(
+        self,
+        document_id: str,
+        tenant_id: str,
+        user_id: str,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> bool:
+        """删除文档（软删除），指定background_tasks时在后台删除不再被引用的解析结果Markdown文件"""
         document = self.get_document(document_id, tenant_id, user_id)
         
         # 等待处理完成
@@ -568,6 +835,10 @@ class DocumentService:
         except Exception as e:
             logger.error(f"删除文档 {document_id} 的向量库索引失败: {e}", exc_info=True)
             # 向量库删除失败不影响文档删除
+        finally:
+            # 文档被删除后不应再出现在词法索引和缓存的检索结果中
+            lexical_index.remove_document(tenant_id, user_id, document_id)
+            retrieval_cache.bump_generation(tenant_id, user_id)
         
         # 删除文档chunk数据
         try:
@@ -584,11 +855,23 @@ class DocumentService:
         except Exception as e:
             logger.warning(f"删除文档 {document_id} 的配置失败: {e}")
         
+        # 解析结果缓存目录下的Markdown文件：没有解析结果和其他文档引用时一并删除
+        markdown_path = document.markdown_path
+        if background_tasks and markdown_path and not self._markdown_in_use(markdown_path, exclude_document_id=document_id):
+            from app.core.storage import get_storage
+            document.markdown_path = None
+            background_tasks.add_task(get_storage().delete_file, markdown_path)
+        
         # 软删除文档
         document.soft_delete()
         self.document_repo.update(document)
+        self._publish_index_change(tenant_id, user_id)
         return True
     
+    def _publish_index_change(self, tenant_id: str, user_id: str) -> None:
+        """递增数据库中的用户索引代数，使其他进程（API/worker）的检索缓存和词法索引失效（变更提交后调用）"""
+        IndexGenerationService(IndexGenerationRepository(self.document_repo.db)).publish_change(tenant_id, user_id)
+    
     def get_document_versions(self, document_id: str, tenant_id: str, user_id: str) -> List:
         """获取文档版本历史"""
         document = self.get_document(document_id, tenant_id, user_id)
@@ -1,16 +1,22 @@
 """
-文档任务服务（占位实现）
+文档任务服务（持久化任务队列）
 """
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.repositories.document_task_repository import DocumentTaskRepository
 from app.models.document_task import DocumentTask
+from app.models.document import Document
+from app.core.config import settings
+from app.core.value_objects import DocumentTaskStatus, DocumentTaskType
 
 logger = logging.getLogger(__name__)
 
+# 重试退避上限（秒）
+MAX_RETRY_BACKOFF_SECONDS = 3600
+
 
 class DocumentTaskService:
-    """文档任务服务（占位实现）"""
+    """文档任务服务"""
     
     def __init__(self, task_repo: DocumentTaskRepository):
         self.task_repo = task_repo
@@ -22,49 +28,108 @@ class DocumentTaskService:
         user_id: str,
         task_type: str,
         reason: Optional[str] = None,
-        task_data: Optional[dict] = None
+        task_data: Optional[dict] = None,
+        batch_id: Optional[str] = None
     ) -> DocumentTask:
-        """
-        创建任务（占位实现）
-        
-        注意：此功能暂未实现，仅作为占位接口
-        """
-        logger.warning(f"DocumentTaskService.create_task 为占位实现，暂未实现具体逻辑")
-        
+        """创建任务（pending状态，等待worker领取）"""
         task = DocumentTask(
             document_id=document_id,
             tenant_id=tenant_id,
             user_id=user_id,
             task_type=task_type,
+            status=DocumentTaskStatus.PENDING.value,
             reason=reason,
-            task_data=task_data or {}
+            retries=0,
+            max_retries=settings.DOCUMENT_TASK_MAX_RETRIES,
+            task_data=task_data or {},
+            batch_id=batch_id
         )
         return self.task_repo.create(task)
     
+    def enqueue_document_processing(
+        self,
+        document: Document,
+        storage_path: str,
+        file_type: str,
+        old_document_id: Optional[str] = None
+    ) -> DocumentTask:
+        """提交文档解析+向量化任务"""
+        task = self.create_task(
+            document_id=document.id,
+            tenant_id=document.tenant_id,
+            user_id=document.user_id,
+            task_type=DocumentTaskType.PROCESS_DOCUMENT.value,
+            task_data={
+                "storage_path": storage_path,
+                "file_type": file_type,
+                "old_document_id": old_document_id,
+            }
+        )
+        logger.info(f"文档 {document.id} 已提交处理任务 {task.id}")
+        return task
+    
+    def enqueue_rechunk(
+        self,
+        document: Document,
+        chunk_config: Dict[str, Any],
+        batch_id: Optional[str] = None
+    ) -> DocumentTask:
+        """提交重新切分任务（chunk_config: chunk_size/chunk_overlap/split_method/split_keyword）"""
+        return self.create_task(
+            document_id=document.id,
+            tenant_id=document.tenant_id,
+            user_id=document.user_id,
+            task_type=DocumentTaskType.RECHUNK_DOCUMENT.value,
+            task_data={"chunk_config": chunk_config},
+            batch_id=batch_id
+        )
+    
+    def get_batch_progress(self, batch_id: str, tenant_id: str) -> Optional[Dict[str, Any]]:
+        """批次进度：各状态的任务数量，批次不存在时返回None"""
+        counts = self.task_repo.count_by_batch(batch_id, tenant_id)
+        total = sum(counts.values())
+        if not total:
+            return None
+        finished = counts.get(DocumentTaskStatus.SUCCEEDED.value, 0) + counts.get(DocumentTaskStatus.FAILED.value, 0)
+        return {
+            "batch_id": batch_id,
+            "total": total,
+            **{task_status.value: counts.get(task_status.value, 0) for task_status in DocumentTaskStatus},
+            "progress": finished / total,
+        }
+    
+    @staticmethod
+    def retry_delay(attempts: int) -> float:
+        """第attempts次执行失败后的退避秒数（指数增长）"""
+        delay = settings.DOCUMENT_TASK_RETRY_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+        return min(delay, MAX_RETRY_BACKOFF_SECONDS)
+    
+    def record_failure(self, task: DocumentTask, worker_id: str, reason: str) -> Optional[str]:
+        """记录一次执行失败：还有重试次数时按退避时间重新排队，否则标记为失败，返回任务的新状态"""
+        retry_delay = self.retry_delay(task.retries) if task.retries <= task.max_retries else None
+        return self.task_repo.finish(task.id, worker_id, reason=reason, retry_delay=retry_delay)
+    
     def list_tasks(
         self,
         user_id: str,
         tenant_id: str,
         task_type: Optional[str] = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        status: Optional[str] = None
     ) -> List[DocumentTask]:
-        """
-        查询任务列表（占位实现）
-        
-        注意：此功能暂未实现，仅作为占位接口
-        """
-        logger.warning(f"DocumentTaskService.list_tasks 为占位实现，暂未实现具体逻辑")
-        return self.task_repo.list_by_user(user_id, tenant_id, task_type, skip, limit)
+        """查询任务列表"""
+        return self.task_repo.list_by_user(user_id, tenant_id, task_type, skip, limit, status=status)
+    
+    def retry_task(self, task_id: str, user_id: str, tenant_id: str) -> Optional[DocumentTask]:
+        """重新提交失败的任务（仅failed状态可重新提交）"""
+        task = self.get_task(task_id, user_id, tenant_id)
+        if not task or task.status != DocumentTaskStatus.FAILED.value:
+            return None
+        return self.task_repo.requeue(task)
     
     def delete_task(self, task_id: str, user_id: str, tenant_id: str) -> bool:
-        """
-        删除任务（占位实现）
-        
-        注意：此功能暂未实现，仅作为占位接口
-        """
-        logger.warning(f"DocumentTaskService.delete_task 为占位实现，暂未实现具体逻辑")
-        
+        """删除任务（执行中的任务不可删除）"""
         task = self.task_repo.get_by_id(task_id)
         if not task:
             return False
@@ -72,17 +137,13 @@ class DocumentTaskService:
         # 验证权限
         if task.user_id != user_id or task.tenant_id != tenant_id:
             return False
+        if task.status == DocumentTaskStatus.RUNNING.value:
+            return False
         
         return self.task_repo.delete(task_id)
     
     def get_task(self, task_id: str, user_id: str, tenant_id: str) -> Optional[DocumentTask]:
-        """
-        获取任务详情（占位实现）
-        
-        注意：此功能暂未实现，仅作为占位接口
-        """
-        logger.warning(f"DocumentTaskService.get_task 为占位实现，暂未实现具体逻辑")
-        
+        """获取任务详情"""
         task = self.task_repo.get_by_id(task_id)
         if not task:
             return None
@@ -92,4 +153,3 @@ class DocumentTaskService:
             return None
         
         return task
-
@@ -1,13 +1,20 @@
 """
 Embedding服务 - 基于LangChain实现
 """
-from typing import List, Dict, Any, Optional
-import json
+from typing import Callable, List, Dict, Any, Optional, Union
+import asyncio
 import base64
 import logging
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from app.services.config_service import ConfigService
 from app.repositories.config_repository import ConfigRepository
+from app.core.embedding_cache import chunk_embedding_cache, query_embedding_cache
+from app.core.embedding_scheduler import embedding_scheduler_registry
+from app.core.embedding_coalescer import query_embedding_coalescer
+from app.core.client_pool import client_registry
+from app.core.local_embeddings import DEFAULT_DIMENSIONS, LOCAL_PROVIDER, LocalHashEmbeddings
 
 logger = logging.getLogger(__name__)
 
@@ -29,38 +36,8 @@ class EmbeddingService:
         Returns:
             embedding配置字典（包含真实的API key）
         """
-        # 如果有config_repo，直接获取未脱敏的配置
-        if self.config_repo:
-            # 先尝试获取租户级配置
-            if tenant_id:
-                configs = self.config_repo.list_system_configs(tenant_id)
-                for cfg in configs:
-                    if cfg.category == "embedding" and cfg.key == "default":
-                        value = json.loads(cfg.value)
-                        # 解密敏感字段
-                        if "api_key" in value and isinstance(value["api_key"], str):
-                            value["api_key"] = self._decrypt(value["api_key"])
-                        return value
-            
-            # 使用系统默认配置
-            configs = self.config_repo.list_system_configs(None)
-            for cfg in configs:
-                if cfg.category == "embedding" and cfg.key == "default":
-                    value = json.loads(cfg.value)
-                    # 解密敏感字段
-                    if "api_key" in value and isinstance(value["api_key"], str):
-                        value["api_key"] = self._decrypt(value["api_key"])
-                    return value
-        
-        # 如果没有config_repo，使用config_service（可能包含脱敏值）
-        if tenant_id:
-            configs = self.config_service.list_scope_configs("tenant", tenant_id)
-            embedding_config = configs.get("embedding", {}).get("default")
-            if embedding_config:
-                return embedding_config
-        
-        configs = self.config_service.list_scope_configs("system", None)
-        embedding_config = configs.get("embedding", {}).get("default")
+        # 经ConfigService的解析后配置缓存读取，稳态下不查询配置表
+        embedding_config = self.config_service.get_resolved_config("embedding", "default", tenant_id)
         
         if not embedding_config:
             raise ValueError("未找到embedding配置")
@@ -76,8 +53,15 @@ class EmbeddingService:
                 return text
         return text
     
-    def _create_embeddings(self, config: Dict[str, Any]) -> OpenAIEmbeddings:
-        """创建OpenAIEmbeddings实例"""
+    def _create_embeddings(self, config: Dict[str, Any]) -> Embeddings:
+        """获取Embeddings实例（按配置复用，共享HTTP连接池）"""
+        return client_registry.get_or_create("embedding", config, lambda: self._build_embeddings(config))
+    
+    def _build_embeddings(self, config: Dict[str, Any]) -> Embeddings:
+        """创建Embeddings实例（provider为local时使用本地哈希n-gram向量，否则使用OpenAI兼容接口）"""
+        if config.get("provider") == LOCAL_PROVIDER:
+            return LocalHashEmbeddings(int(config.get("dimensions") or DEFAULT_DIMENSIONS))
+        
         base_url = config.get("base_url", "https://api.openai.com/v1")
         api_key = config.get("api_key", "")
         model = config.get("model", "text-embedding-3-small")
@@ -89,23 +73,43 @@ class EmbeddingService:
         # LangChain OpenAIEmbeddings支持自定义base_url和api_key
         # 注意：LangChain使用openai_api_key和openai_api_base参数
         # 使用 OpenAI API 格式，兼容所有支持 OpenAI API 的提供商
+        # embedding调用均为同步接口（在线程池中执行），只需共享同步连接池
         return OpenAIEmbeddings(
             model=model,
             openai_api_key=api_key,
             openai_api_base=base_url,
             check_embedding_ctx_length=False,  # 禁用默认分词处理，兼容更多提供商
+            http_client=client_registry.http_client("embedding", config),
         )
     
-    async def embed_text(self, text: str, tenant_id: Optional[str] = None) -> List[float]:
+    @staticmethod
+    def _model_key(config: Dict[str, Any]) -> str:
+        return chunk_embedding_cache.make_model_key(
+            config.get("provider", "openai"),
+            config.get("model", "text-embedding-3-small"),
+            config.get("base_url")
+        )
+    
+    def get_model_key(self, tenant_id: Optional[str]) -> str:
+        """当前embedding模型标识（provider + 模型 + 接口地址），标识相同时向量可以复用"""
+        return self._model_key(self.get_embedding_config(tenant_id))
+    
+    async def embed_text(
+        self,
+        text: str,
+        tenant_id: Optional[str] = None,
+        as_list: bool = False
+    ) -> Union[np.ndarray, List[float]]:
         """
         对单个文本进行embedding
         
         Args:
             text: 要embedding的文本
             tenant_id: 租户ID
+            as_list: 兼容旧调用方，为True时返回float列表
             
         Returns:
-            向量列表
+            一维float32向量（只读，与查询缓存共享）；as_list=True时为float列表
         """
         # 验证输入参数
         if text is None:
@@ -116,60 +120,137 @@ class EmbeddingService:
             raise ValueError("text参数不能为空字符串")
         
         config = self.get_embedding_config(tenant_id)
+        
+        # 相同问题直接命中查询缓存，跳过远端调用
+        cache_key = query_embedding_cache.make_key(
+            tenant_id,
+            config.get("provider", "openai"),
+            config.get("model", "text-embedding-3-small"),
+            text
+        )
+        cached_vector = query_embedding_cache.get(cache_key)
+        if cached_vector is not None:
+            return cached_vector.tolist() if as_list else cached_vector
+        
         embeddings = self._create_embeddings(config)
+        scheduler = embedding_scheduler_registry.get(config)
+        embed_call = self._array_call(embeddings)
         
         try:
-            # LangChain的embed_query是同步的，需要在线程池中运行
-            import asyncio
-            loop = asyncio.get_event_loop()
             # 确保text是字符串类型
             text_str = str(text).strip()
             if not text_str:
                 raise ValueError("text参数不能为空")
-            vector = await loop.run_in_executor(None, embeddings.embed_query, text_str)
-            return vector
+            # 同一租户、同一配置的并发查询在短窗口内合并为一次批量调用（同步接口经调度器在线程池中执行）
+            vector = await query_embedding_coalescer.embed(
+                (tenant_id, embedding_scheduler_registry.make_key(config)),
+                text_str,
+                lambda texts: scheduler.run_batch(texts, embed_call),
+                max_batch=self._provider_batch_size(config)
+            )
+            vector = query_embedding_cache.set(cache_key, vector)
+            return vector.tolist() if as_list else vector
         except Exception as e:
             logger.error(f"Embedding调用失败: text={repr(text)}, type={type(text)}, error={e}", exc_info=True)
             raise
     
-    async def embed_batch(self, texts: List[str], tenant_id: Optional[str] = None) -> List[List[float]]:
+    async def embed_batch(
+        self,
+        texts: List[str],
+        tenant_id: Optional[str] = None,
+        stats: Optional[Dict[str, int]] = None,
+        as_list: bool = False
+    ) -> Union[np.ndarray, List[List[float]]]:
         """
         批量embedding（优化性能）
         
+        先按 (模型, 文本sha256) 查询Chunk Embedding持久化缓存，只对未命中的文本（去重后）调用远端服务
+        
         Args:
             texts: 要embedding的文本列表
             tenant_id: 租户ID
+            stats: 可选，传入字典时写入本次调用的缓存命中统计（total/hits/misses）
+            as_list: 兼容旧调用方，为True时返回嵌套float列表
             
         Returns:
-            向量列表的列表
+            (len(texts), 维度) 的C连续float32矩阵；as_list=True时为向量列表的列表
         """
         if not texts:
-            return []
+            return [] if as_list else np.zeros((0, 0), dtype=np.float32)
         
         config = self.get_embedding_config(tenant_id)
         provider = config.get("provider", "openai")
-        embeddings = self._create_embeddings(config)
+        model_key = self._model_key(config)
+        
+        if provider == LOCAL_PROVIDER:
+            # 本地计算比查询缓存更快，不使用缓存
+            cached = [None] * len(texts)
+        else:
+            try:
+                # SQLite查询/写入放到线程池执行，避免阻塞事件循环
+                cached = await asyncio.to_thread(chunk_embedding_cache.get_many, model_key, texts)
+            except Exception as e:
+                logger.warning(f"读取Chunk Embedding缓存失败，全部重新embedding: {e}")
+                cached = [None] * len(texts)
+        missing_rows = [i for i, vector in enumerate(cached) if vector is None]
+        if stats is not None:
+            stats.update({"total": len(texts), "hits": len(texts) - len(missing_rows), "misses": len(missing_rows)})
+        missing_texts = list(dict.fromkeys(texts[i] for i in missing_rows))
         
+        new_vectors = None
+        if missing_texts:
+            new_vectors = await self._embed_documents(config, missing_texts)
+            if provider != LOCAL_PROVIDER:
+                try:
+                    await asyncio.to_thread(chunk_embedding_cache.put_many, model_key, missing_texts, new_vectors)
+                except Exception as e:
+                    logger.warning(f"写入Chunk Embedding缓存失败: {e}")
+        
+        # 组装结果矩阵：未命中的行整体拷贝，命中的行逐行拷贝
+        dim = new_vectors.shape[1] if new_vectors is not None else len(next(v for v in cached if v is not None))
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        if new_vectors is not None:
+            position = {text: i for i, text in enumerate(missing_texts)}
+            result[missing_rows] = new_vectors[[position[texts[i]] for i in missing_rows]]
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                result[i] = vector
+        return result.tolist() if as_list else result
+    
+    @staticmethod
+    def _provider_batch_size(config: Dict[str, Any]) -> int:
+        """提供商单次批量embedding的文本数上限"""
         # 阿里云限制批量大小不能超过10
-        batch_size = 10 if provider == "aliyun" else 2048  # OpenAI支持更大的批量
+        return 10 if config.get("provider", "openai") == "aliyun" else 2048  # OpenAI支持更大的批量
+    
+    @staticmethod
+    def _array_call(embeddings: Embeddings) -> Callable[[List[str]], np.ndarray]:
+        """
+        返回在线程池中执行的批量embedding函数，结果为float32矩阵
+        
+        远端提供商返回的嵌套列表在工作线程中逐批转换，不会在整个文档范围内累积装箱float；
+        本地提供商直接生成矩阵
+        """
+        if isinstance(embeddings, LocalHashEmbeddings):
+            return embeddings.embed_array
+        return lambda texts: np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    
+    async def _embed_documents(self, config: Dict[str, Any], texts: List[str]) -> np.ndarray:
+        """
+        调用远端服务批量embedding
+        
+        按提供商的批量上限分批，批次由该embedding配置的调度器并发执行（受rpm/tpm/max_concurrency限制，
+        遇到429时按Retry-After重试并降低并发）
+        """
+        embeddings = self._create_embeddings(config)
+        batch_size = self._provider_batch_size(config)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        if len(batches) > 1:
+            logger.debug(f"分批embedding: {len(texts)} 个文本，{len(batches)} 个批次")
         
         try:
-            import asyncio
-            loop = asyncio.get_event_loop()
-            
-            # 如果文本数量超过批量大小，需要分批处理
-            if len(texts) <= batch_size:
-                vectors = await loop.run_in_executor(None, embeddings.embed_documents, texts)
-                return vectors
-            else:
-                # 分批处理
-                all_vectors = []
-                for i in range(0, len(texts), batch_size):
-                    batch_texts = texts[i:i + batch_size]
-                    logger.debug(f"分批embedding: {i+1}-{min(i+batch_size, len(texts))}/{len(texts)}")
-                    batch_vectors = await loop.run_in_executor(None, embeddings.embed_documents, batch_texts)
-                    all_vectors.extend(batch_vectors)
-                return all_vectors
+            scheduler = embedding_scheduler_registry.get(config)
+            return await scheduler.run(batches, self._array_call(embeddings))
         except Exception as e:
             logger.error(f"批量Embedding调用失败: {e}", exc_info=True)
             raise
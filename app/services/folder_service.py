@@ -4,6 +4,7 @@
 from typing import List, Optional
 from app.repositories.folder_repository import FolderRepository
 from app.models.folder import Folder
+from app.core.folder_tree_cache import folder_tree_cache
 from app.core.exceptions import (
     FolderNotFoundException,
     FolderPermissionDeniedException,
@@ -62,7 +63,9 @@ class FolderService:
             level=level
         )
         
-        return self.folder_repo.create(folder)
+        folder = self.folder_repo.create(folder)
+        folder_tree_cache.invalidate(tenant_id, user_id)
+        return folder
     
     def list_folders(
         self,
@@ -104,7 +107,9 @@ class FolderService:
             )
         
         folder.rename(name)
-        return self.folder_repo.update(folder)
+        folder = self.folder_repo.update(folder)
+        folder_tree_cache.invalidate(tenant_id, user_id)
+        return folder
     
     def delete_folder(
         self,
@@ -135,5 +140,7 @@ class FolderService:
         # 检查是否有文档（通过文档repository检查，这里先简化）
         # TODO: 实际应该检查文件夹下的文档数量
         
-        return self.folder_repo.delete(folder_id)
+        deleted = self.folder_repo.delete(folder_id)
+        folder_tree_cache.invalidate(tenant_id, user_id)
+        return deleted
 
@@ -0,0 +1,45 @@
+"""
+用户索引代数服务
+在数据库中维护用户的索引代数，使API进程能感知worker进程写入/删除的向量
+"""
+import logging
+from app.repositories.index_generation_repository import IndexGenerationRepository
+from app.core.retrieval_cache import retrieval_cache
+from app.core.lexical_index import lexical_index
+
+logger = logging.getLogger(__name__)
+
+
+class IndexGenerationService:
+    """
+    用户索引代数服务
+    
+    - 写入方（向量化、删除、重新切分）在向量和chunk提交后调用publish_change递增数据库代数
+    - 检索方调用sync，数据库代数变化时丢弃本进程的检索缓存条目和BM25词法索引（下次检索从数据库重建）
+    """
+    
+    def __init__(self, repo: IndexGenerationRepository):
+        self.repo = repo
+    
+    def publish_change(self, tenant_id: str, user_id: str) -> None:
+        """用户的向量/chunk已变化（需在变更提交后调用，本进程的缓存由调用方直接维护）"""
+        try:
+            generation = self.repo.bump(tenant_id, user_id)
+        except Exception as e:
+            # 递增失败时其他进程依赖检索缓存/词法索引的TTL过期
+            logger.warning(f"递增用户 {user_id} 的索引代数失败: {e}")
+            self.repo.db.rollback()
+            return
+        retrieval_cache.record_stored_generation(tenant_id, user_id, generation)
+    
+    def sync(self, tenant_id: str, user_id: str) -> None:
+        """与数据库中的索引代数比对（按检查间隔节流），其他进程变更过用户的向量时失效本进程的索引缓存"""
+        if not retrieval_cache.generation_check_due(tenant_id, user_id):
+            return
+        try:
+            generation = self.repo.get(tenant_id, user_id)
+        except Exception as e:
+            logger.warning(f"读取用户 {user_id} 的索引代数失败: {e}")
+            return
+        if retrieval_cache.sync_generation(tenant_id, user_id, generation):
+            lexical_index.invalidate(tenant_id, user_id)
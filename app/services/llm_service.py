@@ -1,6 +1,7 @@
 """
 LLM服务 - 基于LangChain实现
 """
+import asyncio
 import logging
 import json
 import base64
@@ -9,6 +10,7 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from app.services.config_service import ConfigService
 from app.repositories.config_repository import ConfigRepository
+from app.core.client_pool import client_registry
 
 logger = logging.getLogger(__name__)
 
@@ -31,43 +33,8 @@ class LLMService:
         Returns:
             LLM配置字典（包含真实的API key）
         """
-        # 如果有config_repo，直接获取未脱敏的配置
-        if self.config_repo:
-            # 先尝试获取用户级配置
-            if user_id:
-                configs = self.config_repo.list_user_configs(user_id)
-                for cfg in configs:
-                    if cfg.category == "llm" and cfg.key == "default":
-                        value = json.loads(cfg.value)
-                        # 解密敏感字段
-                        if "api_key" in value and isinstance(value["api_key"], str):
-                            value["api_key"] = self._decrypt(value["api_key"])
-                        return value
-            
-            # 尝试获取租户级配置
-            if tenant_id:
-                configs = self.config_repo.list_system_configs(tenant_id)
-                for cfg in configs:
-                    if cfg.category == "llm" and cfg.key == "default":
-                        value = json.loads(cfg.value)
-                        # 解密敏感字段
-                        if "api_key" in value and isinstance(value["api_key"], str):
-                            value["api_key"] = self._decrypt(value["api_key"])
-                        return value
-            
-            # 使用系统默认配置
-            configs = self.config_repo.list_system_configs(None)
-            for cfg in configs:
-                if cfg.category == "llm" and cfg.key == "default":
-                    value = json.loads(cfg.value)
-                    # 解密敏感字段
-                    if "api_key" in value and isinstance(value["api_key"], str):
-                        value["api_key"] = self._decrypt(value["api_key"])
-                    return value
-        
-        # 如果没有config_repo，使用config_service（可能包含脱敏值）
-        effective_config = self.config_service.get_effective_config(tenant_id, user_id)
-        llm_config = effective_config.get("llm", {}).get("default")
+        # 经ConfigService的解析后配置缓存读取，稳态下不查询配置表
+        llm_config = self.config_service.get_resolved_config("llm", "default", tenant_id, user_id)
         
         if not llm_config:
             raise ValueError("未找到LLM配置")
@@ -104,6 +71,21 @@ class LLMService:
     
     def _create_chat_model(self, config: Dict[str, Any], temperature: Optional[float] = None, 
                           max_tokens: Optional[int] = None, streaming: bool = False) -> ChatOpenAI:
+        """获取ChatOpenAI实例（按配置和调用参数复用，共享HTTP连接池）"""
+        try:
+            loop_id = id(asyncio.get_running_loop())
+        except RuntimeError:
+            loop_id = None
+        # 异步连接池按事件循环区分，缓存的实例也需要按事件循环区分
+        variant = (temperature, max_tokens, streaming, loop_id)
+        return client_registry.get_or_create(
+            "llm", config,
+            lambda: self._build_chat_model(config, temperature, max_tokens, streaming, loop_id is not None),
+            variant=variant
+        )
+    
+    def _build_chat_model(self, config: Dict[str, Any], temperature: Optional[float], max_tokens: Optional[int],
+                          streaming: bool, in_event_loop: bool) -> ChatOpenAI:
         """创建ChatOpenAI实例"""
         base_url = config.get("base_url", "https://api.openai.com/v1")
         api_key = config.get("api_key", "")
@@ -124,7 +106,10 @@ class LLMService:
             "temperature": temperature if temperature is not None else config_temperature,
             "timeout": timeout,
             "streaming": streaming,
+            "http_client": client_registry.http_client("llm", config),
         }
+        if in_event_loop:
+            chat_params["http_async_client"] = client_registry.async_http_client("llm", config)
         
         if max_tokens:
             chat_params["max_tokens"] = max_tokens
@@ -71,6 +71,7 @@ class QAService:
         similarity_threshold: Optional[float] = None,
         use_rerank: bool = False,
         rerank_top_n: Optional[int] = None,
+        retrieval_mode: Optional[str] = None,
         stream: bool = False
     ) -> Dict[str, Any]:
         """
@@ -86,6 +87,7 @@ class QAService:
             similarity_threshold: 相似度阈值
             use_rerank: 是否使用重排序
             rerank_top_n: 重排序后的top N
+            retrieval_mode: 检索模式（vector/lexical/hybrid，未指定时使用会话配置，默认vector）
             stream: 是否流式输出
         
         Returns:
@@ -106,6 +108,8 @@ class QAService:
             use_rerank = config.get("use_rerank", use_rerank)
         if "rerank_top_n" in config:
             rerank_top_n = config.get("rerank_top_n", rerank_top_n)
+        if not retrieval_mode:
+            retrieval_mode = config.get("retrieval_mode") or "vector"
         
         # 2. 检索相关内容
         references = await self.retrieval_service.search(
@@ -116,7 +120,8 @@ class QAService:
             top_k=top_k,
             similarity_threshold=similarity_threshold,
             use_rerank=use_rerank,
-            rerank_top_n=rerank_top_n
+            rerank_top_n=rerank_top_n,
+            retrieval_mode=retrieval_mode
         )
         
         # 3. 获取历史消息（用于构建上下文）
@@ -199,7 +204,8 @@ class QAService:
         top_k: int = 5,
         similarity_threshold: Optional[float] = None,
         use_rerank: bool = False,
-        rerank_top_n: Optional[int] = None
+        rerank_top_n: Optional[int] = None,
+        retrieval_mode: Optional[str] = None
     ) -> AsyncGenerator[str, None]:
         """
         进行问答（流式输出）
@@ -214,6 +220,7 @@ class QAService:
             similarity_threshold: 相似度阈值
             use_rerank: 是否使用重排序
             rerank_top_n: 重排序后的top N
+            retrieval_mode: 检索模式（vector/lexical/hybrid，未指定时使用会话配置，默认vector）
         
         Yields:
             SSE格式的字符串片段
@@ -233,6 +240,8 @@ class QAService:
             use_rerank = config.get("use_rerank", use_rerank)
         if "rerank_top_n" in config:
             rerank_top_n = config.get("rerank_top_n", rerank_top_n)
+        if not retrieval_mode:
+            retrieval_mode = config.get("retrieval_mode") or "vector"
         
         # 2. 检索相关内容
         import json
@@ -244,7 +253,8 @@ class QAService:
             top_k=top_k,
             similarity_threshold=similarity_threshold,
             use_rerank=use_rerank,
-            rerank_top_n=rerank_top_n
+            rerank_top_n=rerank_top_n,
+            retrieval_mode=retrieval_mode
         )
         
         # 发送引用信息（在流式输出开始前）
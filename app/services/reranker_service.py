@@ -4,10 +4,10 @@ Reranker服务 - 调用远端Reranker API
 但保持了与LangChain类似的抽象接口风格，支持配置分层和自定义base_url
 """
 import logging
-import json
 import base64
 from typing import List, Dict, Any, Optional
 import httpx
+from app.core.client_pool import client_registry
 from app.services.config_service import ConfigService
 from app.repositories.config_repository import ConfigRepository
 
@@ -32,43 +32,8 @@ class RerankerService:
         Returns:
             Rerank配置字典（包含真实的API key）
         """
-        # 如果有config_repo，直接获取未脱敏的配置
-        if self.config_repo:
-            # 先尝试获取用户级配置
-            if user_id:
-                configs = self.config_repo.list_user_configs(user_id)
-                for cfg in configs:
-                    if cfg.category == "rerank" and cfg.key == "default":
-                        value = json.loads(cfg.value)
-                        # 解密敏感字段
-                        if "api_key" in value and isinstance(value["api_key"], str):
-                            value["api_key"] = self._decrypt(value["api_key"])
-                        return value
-            
-            # 尝试获取租户级配置
-            if tenant_id:
-                configs = self.config_repo.list_system_configs(tenant_id)
-                for cfg in configs:
-                    if cfg.category == "rerank" and cfg.key == "default":
-                        value = json.loads(cfg.value)
-                        # 解密敏感字段
-                        if "api_key" in value and isinstance(value["api_key"], str):
-                            value["api_key"] = self._decrypt(value["api_key"])
-                        return value
-            
-            # 使用系统默认配置
-            configs = self.config_repo.list_system_configs(None)
-            for cfg in configs:
-                if cfg.category == "rerank" and cfg.key == "default":
-                    value = json.loads(cfg.value)
-                    # 解密敏感字段
-                    if "api_key" in value and isinstance(value["api_key"], str):
-                        value["api_key"] = self._decrypt(value["api_key"])
-                    return value
-        
-        # 如果没有config_repo，使用config_service（可能包含脱敏值）
-        effective_config = self.config_service.get_effective_config(tenant_id, user_id)
-        rerank_config = effective_config.get("rerank", {}).get("default")
+        # 经ConfigService的解析后配置缓存读取，稳态下不查询配置表
+        rerank_config = self.config_service.get_resolved_config("rerank", "default", tenant_id, user_id)
         
         if not rerank_config:
             raise ValueError("未找到Rerank配置")
@@ -141,48 +106,49 @@ class RerankerService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(base_url, headers=headers, json=request_data)
-                response.raise_for_status()
-                result = response.json()
-                
-                # 解析响应
-                # 阿里云DashScope返回格式：
-                # {
-                #   "request_id": "...",
-                #   "output": {
-                #     "results": [
-                #       {
-                #         "index": 0,
-                #         "document": {...},
-                #         "relevance_score": 0.95
-                #       }
-                #     ]
-                #   }
-                # }
-                
-                output = result.get("output", {})
-                results = output.get("results", [])
-                
-                # 转换为标准格式
-                # 阿里云API返回的document字段，当return_documents=true时，应该是原始文档内容（字符串）
-                reranked_results = []
-                for item in results:
-                    document_text = item.get("document", "")
-                    # 如果document是对象，尝试提取text字段
-                    if isinstance(document_text, dict):
-                        document_text = document_text.get("text", "")
-                    
-                    reranked_results.append({
-                        "index": item.get("index", 0),
-                        "document": document_text,
-                        "relevance_score": item.get("relevance_score", 0.0)
-                    })
-                
-                # 按相关性分数降序排序（API已经排序，这里确保一下）
-                reranked_results.sort(key=lambda x: x["relevance_score"], reverse=True)
+            # 复用按配置共享的连接池（keep-alive），避免每次调用重新建立连接
+            client = client_registry.async_http_client("rerank", config)
+            response = await client.post(base_url, headers=headers, json=request_data, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            
+            # 解析响应
+            # 阿里云DashScope返回格式：
+            # {
+            #   "request_id": "...",
+            #   "output": {
+            #     "results": [
+            #       {
+            #         "index": 0,
+            #         "document": {...},
+            #         "relevance_score": 0.95
+            #       }
+            #     ]
+            #   }
+            # }
+            
+            output = result.get("output", {})
+            results = output.get("results", [])
+            
+            # 转换为标准格式
+            # 阿里云API返回的document字段，当return_documents=true时，应该是原始文档内容（字符串）
+            reranked_results = []
+            for item in results:
+                document_text = item.get("document", "")
+                # 如果document是对象，尝试提取text字段
+                if isinstance(document_text, dict):
+                    document_text = document_text.get("text", "")
                 
-                return reranked_results
+                reranked_results.append({
+                    "index": item.get("index", 0),
+                    "document": document_text,
+                    "relevance_score": item.get("relevance_score", 0.0)
+                })
+            
+            # 按相关性分数降序排序（API已经排序，这里确保一下）
+            reranked_results.sort(key=lambda x: x["relevance_score"], reverse=True)
+            
+            return reranked_results
         except httpx.HTTPStatusError as e:
             error_detail = ""
             if e.response is not None:
@@ -1,18 +1,26 @@
 """
 检索服务
 """
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from app.services.embedding_service import EmbeddingService
 from app.services.reranker_service import RerankerService
 from app.services.config_service import ConfigService
+from app.services.index_generation_service import IndexGenerationService
 from app.core.vector_store.vector_store_factory import VectorStoreFactory
+from app.core.folder_tree_cache import folder_tree_cache
+from app.core.retrieval_cache import retrieval_cache
+from app.core.lexical_index import lexical_index, reciprocal_rank_fusion
 from app.repositories.folder_repository import FolderRepository
 from app.repositories.document_chunk_repository import DocumentChunkRepository
 from app.repositories.document_repository import DocumentRepository
 
 logger = logging.getLogger(__name__)
 
+# 检索模式：vector（向量检索）、lexical（BM25词法检索）、hybrid（两路检索后RRF融合）
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
 
 class RetrievalService:
     """检索服务"""
@@ -24,7 +32,8 @@ class RetrievalService:
         folder_repo: FolderRepository,
         chunk_repo: DocumentChunkRepository,
         document_repo: Optional[DocumentRepository] = None,
-        reranker_service: Optional[RerankerService] = None
+        reranker_service: Optional[RerankerService] = None,
+        index_generation_service: Optional[IndexGenerationService] = None
     ):
         self.embedding_service = embedding_service
         self.config_service = config_service
@@ -32,19 +41,43 @@ class RetrievalService:
         self.chunk_repo = chunk_repo
         self.document_repo = document_repo
         self.reranker_service = reranker_service
+        self.index_generation_service = index_generation_service
     
     def _get_all_folder_ids(self, folder_id: str, tenant_id: str, user_id: str) -> List[str]:
         """获取文件夹及其所有子文件夹的ID列表"""
-        folder_ids = [folder_id]
+        return self._resolve_folder_ids([folder_id], tenant_id, user_id)
+    
+    def _resolve_folder_ids(
+        self,
+        knowledge_base_ids: Optional[List[str]],
+        tenant_id: str,
+        user_id: str
+    ) -> List[str]:
+        """
+        解析知识库对应的文件夹ID列表（包含所有子文件夹），结果按用户缓存
         
-        # 递归获取所有子文件夹
-        def get_children(parent_id: str):
-            children = self.folder_repo.list_by_user(user_id, tenant_id, parent_id)
-            for child in children:
-                folder_ids.append(child.id)
-                get_children(child.id)  # 递归获取子文件夹的子文件夹
+        Args:
+            knowledge_base_ids: 知识库（文件夹）ID列表，为None或空时返回用户的全部文件夹
+            tenant_id: 租户ID
+            user_id: 用户ID
         
-        get_children(folder_id)
+        Returns:
+            文件夹ID列表（不存在或无权限的文件夹会被忽略）
+        """
+        cache_key = frozenset(knowledge_base_ids) if knowledge_base_ids else folder_tree_cache.ALL_FOLDERS
+        folder_ids = folder_tree_cache.get(tenant_id, user_id, cache_key)
+        if folder_ids is not None:
+            return folder_ids
+        
+        if knowledge_base_ids:
+            folder_ids = self.folder_repo.get_subtree_ids(knowledge_base_ids, tenant_id, user_id)
+            skipped = set(knowledge_base_ids) - set(folder_ids)
+            if skipped:
+                logger.warning(f"文件夹 {sorted(skipped)} 不存在或无权限，跳过")
+        else:
+            folder_ids = self.folder_repo.list_ids_by_user(user_id, tenant_id)
+        
+        folder_tree_cache.set(tenant_id, user_id, cache_key, folder_ids)
         return folder_ids
     
     async def search(
@@ -56,7 +89,8 @@ class RetrievalService:
         top_k: int = 5,
         similarity_threshold: Optional[float] = None,
         use_rerank: bool = False,
-        rerank_top_n: Optional[int] = None
+        rerank_top_n: Optional[int] = None,
+        retrieval_mode: str = "vector"
     ) -> List[Dict[str, Any]]:
         """
         检索相关内容
@@ -70,13 +104,16 @@ class RetrievalService:
             similarity_threshold: 相似度阈值（可选）
             use_rerank: 是否使用重排序
             rerank_top_n: 重排序后的top N（仅在use_rerank=True时使用）
+            retrieval_mode: 检索模式，vector/lexical/hybrid（相似度阈值只作用于向量检索结果）
         
         Returns:
             检索结果列表，每个结果包含：
             - document_id: 文档ID
             - chunk_index: chunk索引
             - content: chunk内容
-            - similarity: 相似度分数
+            - similarity: 相似度分数（词法检索结果为按最高分归一化的BM25分数）
+            - bm25_score: BM25分数（仅词法/混合检索命中时）
+            - rrf_score: 融合分数（仅混合检索）
             - metadata: 元数据（包含文档名称、标题等）
         """
         # 验证查询参数
@@ -84,103 +121,63 @@ class RetrievalService:
             raise ValueError("查询文本不能为空")
         if not isinstance(query, str):
             raise ValueError(f"查询文本必须是字符串类型，当前类型: {type(query)}")
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"不支持的检索模式: {retrieval_mode}，可选值: {', '.join(RETRIEVAL_MODES)}")
         
-        # 1. 对查询文本进行embedding
-        query_vector = await self.embedding_service.embed_text(query, tenant_id)
-        
-        # 2. 确定要搜索的文件夹列表
+        # 1. 确定要搜索的文件夹列表（包含所有子文件夹）
         if not knowledge_base_ids:
-            # 如果没有指定知识库，搜索用户的所有文件夹
-            all_folders = self.folder_repo.list_by_user(user_id, tenant_id, None)
-            folder_ids = []
-            # 递归获取所有文件夹（包括子文件夹）
-            def get_all_folders(parent_id: Optional[str] = None):
-                folders = self.folder_repo.list_by_user(user_id, tenant_id, parent_id)
-                for folder in folders:
-                    folder_ids.append(folder.id)
-                    get_all_folders(folder.id)
-            
-            get_all_folders(None)
-            # 还需要包含根目录（folder_id为None的文档）
-            folder_ids_to_search = [None] + folder_ids
+            # 如果没有指定知识库，搜索用户的所有文件夹，还需要包含根目录（folder_id为None的文档）
+            folder_ids_to_search = [None] + self._resolve_folder_ids(None, tenant_id, user_id)
         else:
-            # 如果指定了知识库，需要包含所有子文件夹
-            folder_ids_to_search = []
-            for folder_id in knowledge_base_ids:
-                # 验证文件夹权限
-                folder = self.folder_repo.get_by_id(folder_id, tenant_id)
-                if not folder or folder.user_id != user_id:
-                    logger.warning(f"文件夹 {folder_id} 不存在或无权限，跳过")
-                    continue
-                
-                # 获取文件夹及其所有子文件夹
-                all_folder_ids = self._get_all_folder_ids(folder_id, tenant_id, user_id)
-                folder_ids_to_search.extend([fid for fid in all_folder_ids])
-            
-            # 去重
-            folder_ids_to_search = list(set(folder_ids_to_search))
+            folder_ids_to_search = self._resolve_folder_ids(knowledge_base_ids, tenant_id, user_id)
         
-        # 3. 在每个文件夹中进行向量检索
-        all_results = []
-        vector_store = VectorStoreFactory.create_from_config(tenant_id, self.config_service)
+        # 命中检索缓存时直接返回（用户的向量发生变化后索引代数递增，旧条目自动失效）；
+        # 先与数据库中的索引代数比对，吸收worker等其他进程写入的向量变更
+        if self.index_generation_service is not None:
+            self.index_generation_service.sync(tenant_id, user_id)
+        index_generation = retrieval_cache.generation(tenant_id, user_id)
+        cache_key = retrieval_cache.make_key(
+            tenant_id, user_id, folder_ids_to_search, query,
+            top_k, similarity_threshold, use_rerank, rerank_top_n,
+            retrieval_mode=retrieval_mode
+        )
+        cached_results = retrieval_cache.get(cache_key)
+        if cached_results is not None:
+            return cached_results
+        cacheable = True
         
-        for folder_id in folder_ids_to_search:
-            try:
-                # 执行向量检索
-                results = vector_store.search(
-                    query_vector=query_vector,
-                    top_k=top_k * 2,  # 多检索一些，后续可能需要重排序
-                    tenant_id=tenant_id,
-                    user_id=user_id,
-                    folder_id=folder_id
-                )
-                
-                # 格式化结果
-                for result in results:
-                    metadata = result.get("metadata", {})
-                    document_id = metadata.get("document_id")
-                    chunk_index = metadata.get("chunk_index")
-                    
-                    if not document_id or chunk_index is None:
-                        continue
-                    
-                    # 计算相似度分数（distance越小，相似度越高）
-                    distance = result.get("distance", 1.0)
-                    similarity = 1.0 - distance  # 转换为相似度（0-1之间，越大越相似）
-                    
-                    # 如果设置了相似度阈值，过滤掉相似度太低的
-                    if similarity_threshold and similarity < similarity_threshold:
-                        continue
-                    
-                    # 获取chunk的详细信息
-                    chunk = self.chunk_repo.get_by_document_and_index(document_id, chunk_index)
-                    if not chunk:
-                        continue
-                    
-                    all_results.append({
-                        "document_id": document_id,
-                        "chunk_index": chunk_index,
-                        "content": result.get("text", chunk.content),
-                        "similarity": similarity,
-                        "distance": distance,
-                        "vector_id": result.get("id"),
-                        "metadata": {
-                            **metadata,
-                            "chunk_metadata": chunk.chunk_metadata
-                        }
-                    })
-            except Exception as e:
-                logger.error(f"在文件夹 {folder_id} 中检索失败: {e}", exc_info=True)
-                continue
+        # 2. 向量检索（在所有文件夹中检索，user模式的向量库为单次查询）
+        vector_results = []
+        if retrieval_mode != "lexical":
+            vector_results, vector_ok = await self._vector_search(
+                query, tenant_id, user_id, folder_ids_to_search, top_k * 2, similarity_threshold
+            )
+            cacheable = cacheable and vector_ok
         
-        # 4. 按相似度排序
-        all_results.sort(key=lambda x: x["similarity"], reverse=True)
+        # 3. BM25词法检索
+        lexical_results = []
+        if retrieval_mode != "vector":
+            lexical_results, lexical_ok = await self._lexical_search(
+                query, tenant_id, user_id, folder_ids_to_search, top_k * 2
+            )
+            cacheable = cacheable and lexical_ok
+        
+        # 4. 合并结果（混合检索使用倒数排名融合）
+        if retrieval_mode == "vector":
+            all_results = vector_results
+        elif retrieval_mode == "lexical":
+            all_results = lexical_results
+        else:
+            all_results = self._fuse_results(vector_results, lexical_results)
         
         # 5. 如果启用了重排序，调用reranker服务
+        hydrated = False
         if use_rerank and self.reranker_service and rerank_top_n:
             try:
                 # 准备重排序的文档列表（取前top_k个，用于重排序）
                 candidate_results = all_results[:top_k * 2] if len(all_results) > top_k else all_results
+                # 词法检索结果不带内容，重排序前先批量补充候选结果的chunk
+                candidate_results = self._hydrate_chunks(candidate_results)
                 
                 # 提取文档内容用于重排序
                 documents_for_rerank = [result["content"] for result in candidate_results]
@@ -217,57 +214,215 @@ class RetrievalService:
                             reranked_results.append(result)
                 
                 all_results = reranked_results
+                hydrated = True
             except Exception as e:
                 logger.error(f"Reranker调用失败，使用原始排序结果: {e}", exc_info=True)
                 # 如果reranker失败，回退到原始排序
                 all_results = all_results[:top_k]
+                cacheable = False
         else:
             # 只取top_k个
             all_results = all_results[:top_k]
         
-        # 6. 补充文档信息（从document_repo获取文档名称和标题）
+        # 6. 批量补充chunk信息（仅对最终返回的结果，重排序时已在重排前补充）
+        if not hydrated:
+            all_results = self._hydrate_chunks(all_results)
+        
+        # 7. 批量补充文档信息（从document_repo获取文档名称和标题）
         if self.document_repo and all_results:
-            document_ids = list(set([r["document_id"] for r in all_results if r.get("document_id")]))
-            logger.info(f"需要补充文档信息的文档ID列表: {document_ids}")
-            if document_ids:
-                documents_map = {}
-                for doc_id in document_ids:
-                    try:
-                        doc = self.document_repo.get_by_id(doc_id, tenant_id)
-                        if doc:
-                            documents_map[doc_id] = {
-                                "name": doc.name,
-                                "original_name": doc.original_name,
-                                "title": doc.title
-                            }
-                            logger.info(f"获取文档信息成功: {doc_id} -> {doc.name}")
-                        else:
-                            logger.warning(f"文档 {doc_id} 不存在或已删除 (tenant_id: {tenant_id})")
-                    except Exception as e:
-                        logger.warning(f"获取文档 {doc_id} 信息失败: {e}", exc_info=True)
-                        continue
-                
-                logger.info(f"成功获取 {len(documents_map)} 个文档的信息")
-                
-                # 为每个结果添加文档信息
-                for result in all_results:
-                    doc_id = result.get("document_id")
-                    if doc_id and doc_id in documents_map:
-                        # 确保metadata字典存在
-                        if "metadata" not in result:
-                            result["metadata"] = {}
-                        result["metadata"].update({
-                            "document_name": documents_map[doc_id]["name"],
-                            "document_original_name": documents_map[doc_id]["original_name"],
-                            "document_title": documents_map[doc_id]["title"]
-                        })
-                        logger.info(f"为结果添加文档信息: {doc_id} -> {documents_map[doc_id]['name']}, metadata: {result['metadata']}")
-                    elif doc_id:
-                        logger.warning(f"文档 {doc_id} 不在documents_map中")
+            self._attach_document_info(all_results, tenant_id)
         else:
             if not self.document_repo:
                 logger.warning("document_repo未初始化，无法获取文档信息")
             if not all_results:
                 logger.debug("没有检索结果，跳过文档信息补充")
         
+        if cacheable:
+            retrieval_cache.set(cache_key, index_generation, all_results)
+        
         return all_results
+    
+    async def _vector_search(
+        self,
+        query: str,
+        tenant_id: str,
+        user_id: str,
+        folder_ids: List[Optional[str]],
+        limit: int,
+        similarity_threshold: Optional[float]
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """向量检索，返回 (按相似度降序的结果, 是否成功)"""
+        query_vector = await self.embedding_service.embed_text(query, tenant_id)
+        vector_store = VectorStoreFactory.create_from_config(tenant_id, self.config_service)
+        
+        try:
+            # 向量库查询是阻塞调用，放到线程中执行以免阻塞事件循环
+            results = await asyncio.to_thread(
+                vector_store.search_folders,
+                query_vector=query_vector,
+                top_k=limit,  # 多检索一些，后续可能需要重排序
+                tenant_id=tenant_id,
+                user_id=user_id,
+                folder_ids=folder_ids
+            )
+        except Exception as e:
+            logger.error(f"向量检索失败: {e}", exc_info=True)
+            return [], False
+        
+        # 格式化结果（chunk和文档信息在最终截断后批量补充）
+        formatted = []
+        for result in results:
+            metadata = result.get("metadata", {})
+            document_id = metadata.get("document_id")
+            chunk_index = metadata.get("chunk_index")
+            
+            if not document_id or chunk_index is None:
+                continue
+            
+            # 计算相似度分数（distance越小，相似度越高）
+            distance = result.get("distance", 1.0)
+            similarity = 1.0 - distance  # 转换为相似度（0-1之间，越大越相似）
+            
+            # 如果设置了相似度阈值，过滤掉相似度太低的
+            if similarity_threshold and similarity < similarity_threshold:
+                continue
+            
+            formatted.append({
+                "document_id": document_id,
+                "chunk_index": chunk_index,
+                "content": result.get("text"),
+                "similarity": similarity,
+                "distance": distance,
+                "vector_id": result.get("id"),
+                "metadata": dict(metadata)
+            })
+        
+        formatted.sort(key=lambda x: x["similarity"], reverse=True)
+        return formatted, True
+    
+    async def _lexical_search(
+        self,
+        query: str,
+        tenant_id: str,
+        user_id: str,
+        folder_ids: List[Optional[str]],
+        limit: int
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """BM25词法检索，返回 (按分数降序的结果, 是否成功)"""
+        try:
+            # 索引构建和BM25打分都是CPU密集的同步操作，放到线程池执行避免阻塞事件循环
+            results = await asyncio.to_thread(
+                lexical_index.search,
+                tenant_id, user_id, query, limit, folder_ids,
+                lambda: self.chunk_repo.list_lexical_rows(tenant_id, user_id)
+            )
+        except Exception as e:
+            logger.error(f"词法检索失败: {e}", exc_info=True)
+            return [], False
+        
+        max_score = results[0]["score"] if results else 0.0
+        formatted = []
+        for result in results:
+            metadata = result["metadata"]
+            formatted.append({
+                "document_id": metadata["document_id"],
+                "chunk_index": metadata["chunk_index"],
+                "content": result["text"],
+                "similarity": result["score"] / max_score if max_score else 0.0,
+                "bm25_score": result["score"],
+                "vector_id": result["id"],
+                "metadata": dict(metadata)
+            })
+        return formatted, True
+    
+    @staticmethod
+    def _result_key(result: Dict[str, Any]) -> Any:
+        """结果去重键（优先使用vector_id）"""
+        return result.get("vector_id") or (result["document_id"], result["chunk_index"])
+    
+    def _fuse_results(
+        self,
+        vector_results: List[Dict[str, Any]],
+        lexical_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """使用倒数排名融合合并向量检索和词法检索结果"""
+        by_key = {self._result_key(r): r for r in lexical_results}
+        for result in vector_results:
+            key = self._result_key(result)
+            lexical = by_key.get(key)
+            if lexical:
+                result["bm25_score"] = lexical["bm25_score"]
+            by_key[key] = result  # 同时命中时保留向量相似度
+        
+        fused = []
+        for key, score in reciprocal_rank_fusion([vector_results, lexical_results], key=self._result_key):
+            result = by_key[key]
+            result["rrf_score"] = score
+            fused.append(result)
+        return fused
+    
+    def _hydrate_chunks(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量查询结果对应的chunk，补充内容和chunk元数据，丢弃数据库中不存在的chunk"""
+        if not results:
+            return results
+        
+        vector_ids = [r["vector_id"] for r in results if r.get("vector_id")]
+        chunks_by_vector_id = {c.vector_id: c for c in self.chunk_repo.get_by_vector_ids(vector_ids)}
+        
+        # 没有vector_id或未命中的结果按(document_id, chunk_index)回查
+        missing_keys = [
+            (r["document_id"], r["chunk_index"])
+            for r in results
+            if r.get("vector_id") not in chunks_by_vector_id
+        ]
+        chunks_by_key = {}
+        if missing_keys:
+            for chunk in self.chunk_repo.get_by_document_and_indexes(missing_keys):
+                chunks_by_key[(chunk.document_id, chunk.chunk_index)] = chunk
+        
+        hydrated = []
+        for result in results:
+            chunk = chunks_by_vector_id.get(result.get("vector_id")) or chunks_by_key.get(
+                (result["document_id"], result["chunk_index"])
+            )
+            if not chunk:
+                continue
+            if result.get("content") is None:
+                result["content"] = chunk.content
+            result["metadata"]["chunk_metadata"] = chunk.chunk_metadata
+            hydrated.append(result)
+        return hydrated
+    
+    def _attach_document_info(self, results: List[Dict[str, Any]], tenant_id: str) -> None:
+        """批量查询结果对应的文档，补充文档名称和标题到metadata"""
+        document_ids = list(set([r["document_id"] for r in results if r.get("document_id")]))
+        if not document_ids:
+            return
+        
+        documents_map = {}
+        try:
+            for doc in self.document_repo.get_by_ids(document_ids, tenant_id):
+                documents_map[doc.id] = {
+                    "name": doc.name,
+                    "original_name": doc.original_name,
+                    "title": doc.title
+                }
+        except Exception as e:
+            logger.warning(f"批量获取文档信息失败: {e}", exc_info=True)
+        
+        logger.debug(f"成功获取 {len(documents_map)}/{len(document_ids)} 个文档的信息")
+        
+        # 为每个结果添加文档信息
+        for result in results:
+            doc_id = result.get("document_id")
+            if doc_id and doc_id in documents_map:
+                # 确保metadata字典存在
+                if "metadata" not in result:
+                    result["metadata"] = {}
+                result["metadata"].update({
+                    "document_name": documents_map[doc_id]["name"],
+                    "document_original_name": documents_map[doc_id]["original_name"],
+                    "document_title": documents_map[doc_id]["title"]
+                })
+            elif doc_id:
+                logger.warning(f"文档 {doc_id} 不存在或已删除 (tenant_id: {tenant_id})")
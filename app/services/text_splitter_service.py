@@ -1,13 +1,134 @@
 """
 文本切分服务
 """
-from typing import List
+from typing import Iterable, Iterator, List, Optional
 from app.models.document_config import DocumentConfig
 
 
+class StreamingTextSplitter:
+    """
+    流式文本切分器
+    
+    文本按片段（如PDF的页、文件读取的块）依次feed，跨片段边界切分，只缓存尚未成块的尾部文本；
+    输出与把全部片段拼接后整体切分的结果完全一致
+    """
+    
+    def __init__(
+        self,
+        split_method: str,
+        chunk_size: int,
+        chunk_overlap: int = 0,
+        split_keyword: Optional[str] = None
+    ):
+        # 兼容旧的配置值 "fixed"，映射为 "length"
+        if split_method == "fixed":
+            split_method = "length"
+        if split_method == "length":
+            if chunk_overlap >= chunk_size:
+                raise ValueError("chunk_overlap必须小于chunk_size")
+            self.separator = None
+        elif split_method == "paragraph":
+            self.separator = "\n\n"
+        elif split_method == "keyword":
+            if not split_keyword:
+                raise ValueError("按关键字切分时，split_keyword不能为空")
+            self.separator = split_keyword
+        else:
+            raise ValueError(f"不支持的切分方法: {split_method}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._buffer = ""
+        self._current_chunk = ""
+    
+    def feed(self, text: str) -> List[str]:
+        """追加文本，返回已经确定的chunk"""
+        self._buffer += text
+        if self.separator is None:
+            return self._take_by_length(final=False)
+        parts = self._buffer.split(self.separator)
+        # 最后一段可能与后续文本相连，留在缓冲区
+        self._buffer = parts.pop()
+        return self._merge(parts)
+    
+    def finish(self) -> List[str]:
+        """文本结束，返回剩余的chunk"""
+        if self.separator is None:
+            return self._take_by_length(final=True)
+        chunks = self._merge([self._buffer])
+        self._buffer = ""
+        if self._current_chunk:
+            chunks.append(self._current_chunk)
+            self._current_chunk = ""
+        return chunks
+    
+    def _take_by_length(self, final: bool) -> List[str]:
+        """按固定长度取出chunk（支持overlap），非结束时只取完整长度的chunk"""
+        chunks = []
+        start = 0
+        step = self.chunk_size - self.chunk_overlap
+        text = self._buffer
+        while start < len(text) and (final or start + self.chunk_size <= len(text)):
+            chunk = text[start:start + self.chunk_size]
+            if chunk.strip():  # 跳过空片段
+                chunks.append(chunk)
+            start += step
+        self._buffer = text[start:] if not final else ""
+        return chunks
+    
+    def _merge(self, segments: Iterable[str]) -> List[str]:
+        """把分隔后的片段合并为不超过chunk_size的chunk，单个片段超长时按长度切分"""
+        chunks = []
+        for segment in segments:
+            segment = segment.strip()
+            if not segment:
+                continue
+            
+            # 如果当前chunk加上新片段不超过最大大小，则合并
+            if len(self._current_chunk) + len(self.separator) + len(segment) <= self.chunk_size:
+                if self._current_chunk:
+                    self._current_chunk += self.separator + segment
+                else:
+                    self._current_chunk = segment
+            else:
+                # 保存当前chunk
+                if self._current_chunk:
+                    chunks.append(self._current_chunk)
+                
+                # 如果单个片段超过最大大小，按长度切分
+                if len(segment) > self.chunk_size:
+                    sub_splitter = StreamingTextSplitter("length", self.chunk_size, self.chunk_size // 4)
+                    chunks.extend(sub_splitter.feed(segment) + sub_splitter.finish())
+                    self._current_chunk = ""
+                else:
+                    self._current_chunk = segment
+        return chunks
+
+
 class TextSplitterService:
     """文本切分服务"""
     
+    def create_stream(self, config: DocumentConfig) -> StreamingTextSplitter:
+        """根据配置创建流式切分器"""
+        return StreamingTextSplitter(
+            config.split_method,
+            config.chunk_size,
+            config.chunk_overlap,
+            config.split_keyword
+        )
+    
+    def iter_split(self, pieces: Iterable[str], config: DocumentConfig) -> Iterator[str]:
+        """
+        流式切分：依次消费文本片段，产出chunk（与split_text("".join(pieces))结果一致）
+        
+        Args:
+            pieces: 文本片段（如逐页的Markdown）
+            config: 文档配置
+        """
+        splitter = self.create_stream(config)
+        for piece in pieces:
+            yield from splitter.feed(piece)
+        yield from splitter.finish()
+    
     def split_text(self, text: str, config: DocumentConfig) -> List[str]:
         """
         根据配置切分文本
@@ -19,22 +140,7 @@ class TextSplitterService:
         Returns:
             切分后的文本片段列表
         """
-        split_method = config.split_method
-        
-        # 兼容旧的配置值 "fixed"，映射为 "length"
-        if split_method == "fixed":
-            split_method = "length"
-        
-        if split_method == "length":
-            return self.split_by_length(text, config.chunk_size, config.chunk_overlap)
-        elif split_method == "paragraph":
-            return self.split_by_paragraph(text, config.chunk_size)
-        elif split_method == "keyword":
-            if not config.split_keyword:
-                raise ValueError("按关键字切分时，split_keyword不能为空")
-            return self.split_by_keyword(text, config.split_keyword, config.chunk_size)
-        else:
-            raise ValueError(f"不支持的切分方法: {split_method}")
+        return list(self.iter_split([text], config))
     
     def split_by_length(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
         """
@@ -48,21 +154,7 @@ class TextSplitterService:
         Returns:
             切分后的文本片段列表
         """
-        if chunk_overlap >= chunk_size:
-            raise ValueError("chunk_overlap必须小于chunk_size")
-        
-        chunks = []
-        start = 0
-        step = chunk_size - chunk_overlap
-        
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            if chunk.strip():  # 跳过空片段
-                chunks.append(chunk)
-            start += step
-        
-        return chunks
+        return self._split(StreamingTextSplitter("length", chunk_size, chunk_overlap), text)
     
     def split_by_paragraph(self, text: str, max_chunk_size: int) -> List[str]:
         """
@@ -75,41 +167,7 @@ class TextSplitterService:
         Returns:
             切分后的文本片段列表
         """
-        # 先按双换行符分割段落
-        paragraphs = text.split("\n\n")
-        
-        chunks = []
-        current_chunk = ""
-        
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-            
-            # 如果当前段落加上新段落不超过最大大小，则合并
-            if len(current_chunk) + len(para) + 2 <= max_chunk_size:
-                if current_chunk:
-                    current_chunk += "\n\n" + para
-                else:
-                    current_chunk = para
-            else:
-                # 保存当前chunk
-                if current_chunk:
-                    chunks.append(current_chunk)
-                
-                # 如果单个段落超过最大大小，按长度切分
-                if len(para) > max_chunk_size:
-                    sub_chunks = self.split_by_length(para, max_chunk_size, max_chunk_size // 4)
-                    chunks.extend(sub_chunks)
-                    current_chunk = ""
-                else:
-                    current_chunk = para
-        
-        # 添加最后一个chunk
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        return chunks
+        return self._split(StreamingTextSplitter("paragraph", max_chunk_size), text)
     
     def split_by_keyword(self, text: str, keyword: str, max_chunk_size: int) -> List[str]:
         """
@@ -123,39 +181,8 @@ class TextSplitterService:
         Returns:
             切分后的文本片段列表
         """
-        # 按关键字分割
-        parts = text.split(keyword)
-        
-        chunks = []
-        current_chunk = ""
-        
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            
-            # 如果当前片段加上新片段不超过最大大小，则合并
-            if len(current_chunk) + len(keyword) + len(part) <= max_chunk_size:
-                if current_chunk:
-                    current_chunk += keyword + part
-                else:
-                    current_chunk = part
-            else:
-                # 保存当前chunk
-                if current_chunk:
-                    chunks.append(current_chunk)
-                
-                # 如果单个片段超过最大大小，按长度切分
-                if len(part) > max_chunk_size:
-                    sub_chunks = self.split_by_length(part, max_chunk_size, max_chunk_size // 4)
-                    chunks.extend(sub_chunks)
-                    current_chunk = ""
-                else:
-                    current_chunk = part
-        
-        # 添加最后一个chunk
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        return chunks
-
+        return self._split(StreamingTextSplitter("keyword", max_chunk_size, split_keyword=keyword), text)
+    
+    @staticmethod
+    def _split(splitter: StreamingTextSplitter, text: str) -> List[str]:
+        return splitter.feed(text) + splitter.finish()
@@ -1,20 +1,29 @@
 """
 向量化服务
 """
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import codecs
 import uuid
+import numpy as np
 from app.models.document import Document
 from app.models.document_config import DocumentConfig
 from app.services.text_splitter_service import TextSplitterService
 from app.services.embedding_service import EmbeddingService
 from app.core.vector_store.vector_store_factory import VectorStoreFactory
+from app.core.vector_store.vector_store_interface import as_vector_matrix
 from app.repositories.document_chunk_repository import DocumentChunkRepository
 from app.core.storage.storage_factory import StorageFactory
 from app.core.config import settings
+from app.core.embedding_cache import ChunkEmbeddingCache
+from app.core.retrieval_cache import retrieval_cache
+from app.core.lexical_index import lexical_index
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 流式读取Markdown的块大小
+MARKDOWN_READ_BLOCK_SIZE = 256 * 1024
+
 
 class VectorizationService:
     """向量化服务"""
@@ -25,123 +34,301 @@ class VectorizationService:
         embedding_service: EmbeddingService,
         chunk_repo: DocumentChunkRepository,
         config_service,
-        config_repo=None
+        config_repo=None,
+        index_generation_service=None
     ):
         self.text_splitter = text_splitter_service
         self.embedding_service = embedding_service
         self.chunk_repo = chunk_repo
         self.config_service = config_service
         self.config_repo = config_repo
+        # 可选：向量变更后递增数据库中的用户索引代数，使其他进程的检索缓存和词法索引失效
+        self.index_generation_service = index_generation_service
+        # 最近一次向量化的统计：chunk总数、复用旧版本的chunk数、实际embedding数、embedding缓存命中数
+        self.last_report: Dict[str, int] = {}
     
     async def vectorize_document(
         self,
         document: Document,
         config: DocumentConfig,
-        storage
+        storage,
+        previous_document_id: Optional[str] = None
     ) -> bool:
         """
-        向量化文档
+        向量化文档（流式：分块读取Markdown → 跨块切分 → 按批embedding并写入）
+        
+        每批写入向量库并提交chunk后即可被检索，内存占用与批大小相关而与文档大小无关；
+        已提交的chunk作为检查点，重试时从检查点继续（切分结果与检查点不一致时重新向量化）。
+        chunk按配置的切分版本写入，重新切分时新旧版本并存，由调用方在完成后删除其他版本。
+        指定旧版本文档时，内容hash相同的chunk复制旧版本的向量（以新文档的向量ID写入新的chunk记录），
+        只embedding新增的chunk；旧版本的向量和chunk保持不变，新版本完成后再整体清理
         
         Args:
             document: 文档对象
             config: 文档配置
             storage: 存储服务实例
+            previous_document_id: 旧版本文档ID（可选）
             
         Returns:
             是否成功
         """
         try:
-            # 1. 读取Markdown内容
+            # 1. 检查Markdown内容
             if not document.markdown_path:
                 logger.error(f"文档 {document.id} 没有markdown_path")
                 return False
             
-            markdown_content = await storage.read_file(document.markdown_path)
-            text = markdown_content.decode("utf-8")
-            
-            # 2. 获取文档的folder_id
-            folder_id = document.folder_id
-            
-            # 3. 文本切分
-            chunks = self.text_splitter.split_text(text, config)
-            if not chunks:
-                logger.warning(f"文档 {document.id} 切分后没有chunk")
-                return False
-            
-            logger.info(f"文档 {document.id} 切分为 {len(chunks)} 个chunk")
-            
-            # 4. Embedding（批量）
-            logger.info(f"文档 {document.id} 开始进行embedding，共 {len(chunks)} 个chunk")
-            try:
-                vectors = await self.embedding_service.embed_batch(chunks, document.tenant_id)
-                logger.info(f"文档 {document.id} embedding完成，获得 {len(vectors)} 个向量")
-            except Exception as e:
-                logger.error(f"文档 {document.id} embedding失败: {e}", exc_info=True)
-                return False
-            
-            if len(vectors) != len(chunks):
-                logger.error(f"文档 {document.id} embedding数量不匹配: 期望 {len(chunks)}, 实际 {len(vectors)}")
-                return False
-            
-            # 5. 创建向量库实例
+            # 2. 创建向量库实例
             vector_store = VectorStoreFactory.create_from_config(
                 document.tenant_id,
                 self.config_service
             )
             
-            # 6. 准备向量数据
-            vector_ids = []
-            metadatas = []
-            for i, chunk in enumerate(chunks):
-                vector_id = str(uuid.uuid4())
-                vector_ids.append(vector_id)
-                metadatas.append({
-                    "document_id": document.id,
-                    "chunk_index": i,
-                    "tenant_id": document.tenant_id,
-                    "user_id": document.user_id,
-                    "folder_id": folder_id or "root"
-                })
-            
-            # 7. 存储到向量库
-            success = vector_store.add_vectors(
-                vectors=vectors,
-                texts=chunks,
-                metadatas=metadatas,
-                ids=vector_ids,
-                tenant_id=document.tenant_id,
-                user_id=document.user_id,
-                folder_id=folder_id
+            # 3. 旧版本中可复用的chunk
+            model_key = self.embedding_service.get_model_key(document.tenant_id)
+            reusable = (
+                self._load_reusable(document, previous_document_id, model_key)
+                if previous_document_id and previous_document_id != document.id else {}
             )
             
-            if not success:
-                logger.error(f"文档 {document.id} 向量存储失败")
-                return False
-            
-            # 8. 保存chunk元数据到数据库
-            from app.models.document_chunk import DocumentChunk
-            chunk_objects = []
-            for i, (chunk, vector_id) in enumerate(zip(chunks, vector_ids)):
-                chunk_obj = DocumentChunk(
-                    document_id=document.id,
-                    folder_id=folder_id,
-                    tenant_id=document.tenant_id,
-                    user_id=document.user_id,
-                    chunk_index=i,
-                    content=chunk,
-                    vector_id=vector_id,
-                    chunk_metadata={"length": len(chunk)}
-                )
-                chunk_objects.append(chunk_obj)
+            # 4. 检查点：之前的执行已提交的当前切分版本的chunk数量
+            revision = config.chunk_revision
+            resume_from = self.chunk_repo.count_by_document(document.id, revision)
+            self.last_report = self._new_report()
+            total = await self._ingest(document, config, storage, vector_store, resume_from, model_key, reusable)
+            if total is None:
+                logger.warning(f"文档 {document.id} 的切分结果与检查点不一致，清理后重新向量化")
+                self._discard_chunks(document, vector_store, revision)
+                self.last_report = self._new_report()
+                total = await self._ingest(document, config, storage, vector_store, 0, model_key, reusable)
             
-            self.chunk_repo.create_batch(chunk_objects)
-            self.chunk_repo.commit()
+            if not total:
+                logger.warning(f"文档 {document.id} 切分后没有chunk")
+                return False
             
-            logger.info(f"文档 {document.id} 向量化完成，共 {len(chunks)} 个chunk")
+            report = self.last_report
+            report["chunks"] = total
+            logger.info(
+                f"文档 {document.id} 向量化完成，共 {total} 个chunk（从第 {resume_from} 个继续），"
+                f"复用旧版本 {report['reused']} 个，embedding {report['embedded']} 个"
+                f"（缓存命中 {report['embedding_cache_hits']}），节省 {report['reused']} 次embedding"
+            )
             return True
             
         except Exception as e:
             logger.error(f"文档 {document.id} 向量化失败: {e}", exc_info=True)
             self.chunk_repo.rollback()
             return False
-
+    
+    @staticmethod
+    def _new_report() -> Dict[str, int]:
+        return {"chunks": 0, "reused": 0, "embedded": 0, "embedding_cache_hits": 0}
+    
+    def _load_reusable(
+        self,
+        document: Document,
+        previous_document_id: str,
+        model_key: str
+    ) -> Dict[str, str]:
+        """
+        旧版本中可复用的chunk，内容hash -> 向量ID
+        
+        只复用同一embedding模型、同一文件夹（同一向量collection）生成的chunk；
+        未记录hash和模型的历史chunk不复用
+        """
+        reusable: Dict[str, str] = {}
+        rows = self.chunk_repo.list_reuse_candidates(previous_document_id, document.tenant_id, document.user_id)
+        for _, vector_id, folder_id, metadata in rows:
+            metadata = metadata or {}
+            if (
+                not vector_id
+                or folder_id != document.folder_id
+                or metadata.get("embedding_model") != model_key
+                or not metadata.get("content_hash")
+            ):
+                continue
+            reusable.setdefault(metadata["content_hash"], vector_id)
+        logger.info(f"旧版本文档 {previous_document_id} 有 {len(reusable)}/{len(rows)} 个chunk可复用")
+        return reusable
+    
+    async def _iter_chunks(self, storage, markdown_path: str, config: DocumentConfig) -> AsyncIterator[str]:
+        """分块读取Markdown并流式切分"""
+        splitter = self.text_splitter.create_stream(config)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        async for block in storage.iter_file(markdown_path, MARKDOWN_READ_BLOCK_SIZE):
+            for chunk in splitter.feed(decoder.decode(block)):
+                yield chunk
+        for chunk in splitter.feed(decoder.decode(b"", final=True)) + splitter.finish():
+            yield chunk
+    
+    async def _ingest(
+        self,
+        document: Document,
+        config: DocumentConfig,
+        storage,
+        vector_store,
+        resume_from: int,
+        model_key: str,
+        reusable: Dict[str, str]
+    ) -> Optional[int]:
+        """
+        切分并按批写入，跳过检查点之前的chunk
+        
+        Returns:
+            文档的chunk总数，检查点最后一个chunk与当前切分结果不一致时返回None
+        """
+        revision = config.chunk_revision
+        last_checkpoint = (
+            self.chunk_repo.get_by_document_and_index(document.id, resume_from - 1, revision)
+            if resume_from else None
+        )
+        batch_size = max(1, settings.VECTORIZE_BATCH_SIZE)
+        batch: List[Tuple[int, str]] = []
+        index = 0
+        async for chunk in self._iter_chunks(storage, document.markdown_path, config):
+            if index < resume_from:
+                if index == resume_from - 1 and (last_checkpoint is None or last_checkpoint.content != chunk):
+                    return None
+                index += 1
+                continue
+            batch.append((index, chunk))
+            index += 1
+            # 逐批写入完成后才继续读取和切分（背压）
+            if len(batch) >= batch_size:
+                await self._store_batch(document, vector_store, batch, model_key, reusable, revision)
+                batch = []
+        if index < resume_from:
+            return None
+        if batch:
+            await self._store_batch(document, vector_store, batch, model_key, reusable, revision)
+        return index
+    
+    async def _store_batch(
+        self,
+        document: Document,
+        vector_store,
+        batch: List[Tuple[int, str]],
+        model_key: str,
+        reusable: Dict[str, str],
+        revision: int = 0
+    ) -> None:
+        """写入一批chunk（复制旧版本的向量或embedding后写入向量库）并提交（检查点），失败时抛出异常"""
+        folder_id = document.folder_id
+        hashes = {index: ChunkEmbeddingCache.hash_text(chunk) for index, chunk in batch}
+        
+        # 内容未变化的chunk：读取旧版本的向量，以新文档的向量ID重新写入（不修改旧版本，失败时旧版本仍完整可检索）
+        vectors_by_index: Dict[int, np.ndarray] = {}
+        reuse_ids = {index: reusable[hashes[index]] for index, _ in batch if hashes[index] in reusable}
+        if reuse_ids:
+            stored = vector_store.get_vectors(
+                ids=list(set(reuse_ids.values())),
+                tenant_id=document.tenant_id,
+                user_id=document.user_id,
+                folder_id=folder_id
+            )
+            vectors_by_index = {index: stored[vector_id] for index, vector_id in reuse_ids.items() if vector_id in stored}
+            if len(vectors_by_index) < len(reuse_ids):
+                logger.warning(
+                    f"文档 {document.id} 有 {len(reuse_ids) - len(vectors_by_index)} 个旧版本向量无法读取，改为embedding"
+                )
+        reused = len(vectors_by_index)
+        
+        fresh = [(index, chunk) for index, chunk in batch if index not in vectors_by_index]
+        if fresh:
+            chunks = [chunk for _, chunk in fresh]
+            
+            # Embedding（批量，命中chunk embedding缓存的不调用远端服务）
+            embed_stats = {}
+            vectors = await self.embedding_service.embed_batch(chunks, document.tenant_id, stats=embed_stats)
+            if len(vectors) != len(chunks):
+                raise ValueError(f"embedding数量不匹配: 期望 {len(chunks)}, 实际 {len(vectors)}")
+            vectors_by_index.update(zip([index for index, _ in fresh], vectors))
+            self.last_report["embedded"] += len(fresh)
+            self.last_report["embedding_cache_hits"] += embed_stats.get("hits", 0)
+        
+        # 准备向量数据（向量ID由文档ID、切分版本和chunk索引确定，重试时重复写入的是同一条向量）
+        vector_ids = [self._vector_id(document, revision, index) for index, _ in batch]
+        
+        # 存储到向量库
+        success = vector_store.add_vectors(
+            vectors=as_vector_matrix([vectors_by_index[index] for index, _ in batch]),
+            texts=[chunk for _, chunk in batch],
+            metadatas=[self._vector_metadata(document, index) for index, _ in batch],
+            ids=vector_ids,
+            tenant_id=document.tenant_id,
+            user_id=document.user_id,
+            folder_id=folder_id
+        )
+        if not success:
+            raise RuntimeError("向量存储失败")
+        
+        # 保存chunk元数据到数据库
+        from app.models.document_chunk import DocumentChunk
+        chunk_objects = [
+            DocumentChunk(
+                document_id=document.id,
+                folder_id=folder_id,
+                tenant_id=document.tenant_id,
+                user_id=document.user_id,
+                chunk_index=index,
+                revision=revision,
+                content=chunk,
+                vector_id=vector_id,
+                chunk_metadata={"length": len(chunk), "content_hash": hashes[index], "embedding_model": model_key}
+            )
+            for (index, chunk), vector_id in zip(batch, vector_ids)
+        ]
+        self.chunk_repo.create_batch(chunk_objects)
+        
+        # 提交即检查点
+        self.chunk_repo.commit()
+        self.last_report["reused"] += reused
+        
+        # 用户的向量已变化，使其检索缓存失效
+        retrieval_cache.bump_generation(document.tenant_id, document.user_id)
+        
+        # 增量更新BM25词法索引
+        lexical_index.add_chunks(document.tenant_id, document.user_id, [
+            (c.vector_id, c.document_id, c.chunk_index, c.content, c.folder_id) for c in chunk_objects
+        ])
+        self._publish_index_change(document)
+        logger.info(
+            f"文档 {document.id} 已写入第 {batch[0][0]}-{batch[-1][0]} 个chunk（复用 {reused} 个）"
+        )
+    
+    @staticmethod
+    def _vector_id(document: Document, revision: int, chunk_index: int) -> str:
+        # 版本0沿用原有的向量ID格式
+        key = f"{document.id}:{chunk_index}" if not revision else f"{document.id}:{revision}:{chunk_index}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+    
+    @staticmethod
+    def _vector_metadata(document: Document, chunk_index: int) -> Dict[str, Any]:
+        return {
+            "document_id": document.id,
+            "chunk_index": chunk_index,
+            "tenant_id": document.tenant_id,
+            "user_id": document.user_id,
+            "folder_id": document.folder_id or "root"
+        }
+    
+    def _discard_chunks(self, document: Document, vector_store, revision: int) -> None:
+        """删除文档在指定切分版本下已写入的向量和chunk（其他版本不受影响）"""
+        vector_ids = self.chunk_repo.list_vector_ids(document.id, revision=revision)
+        if not vector_store.delete_by_ids(
+            ids=vector_ids,
+            tenant_id=document.tenant_id,
+            user_id=document.user_id,
+            folder_id=document.folder_id
+        ):
+            raise RuntimeError(f"删除文档 {document.id} 的向量失败")
+        self.chunk_repo.delete_by_document_id(document.id, revision=revision)
+        self.chunk_repo.commit()
+        lexical_index.remove_chunks(document.tenant_id, document.user_id, vector_ids)
+        retrieval_cache.bump_generation(document.tenant_id, document.user_id)
+        self._publish_index_change(document)
+    
+    def _publish_index_change(self, document: Document) -> None:
+        """递增数据库中的用户索引代数（chunk已提交后调用）"""
+        if self.index_generation_service is not None:
+            self.index_generation_service.publish_change(document.tenant_id, document.user_id)
@@ -0,0 +1,254 @@
+"""
+文档处理worker
+从document_tasks任务队列领取解析+向量化任务执行，与API进程分离部署：
+
+    python -m app.worker --concurrency 2
+
+多个worker进程可同时运行，任务通过租约领取，worker失联后租约过期的任务由其他worker接管；
+重新切分任务按 DOCUMENT_RECHUNK_MAX_RUNNING 限制所有worker合计的同时执行数；
+队列模式下文档解析在worker进程内执行，解析进程池统计按 DOCUMENT_WORKER_STATS_LOG_SECONDS 间隔输出到日志
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+import uuid
+from typing import Dict, Optional, Set
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging_config import setup_logging, get_logger
+from app.core.parse_pool import parse_pool
+from app.core.value_objects import DocumentTaskType
+from app.models.document_task import DocumentTask
+from app.repositories.document_task_repository import DocumentTaskRepository
+from app.services.document_task_service import DocumentTaskService
+
+logger = get_logger(__name__)
+
+
+def _build_document_service(db):
+    """构建文档服务（与API层的依赖组装一致）"""
+    from app.repositories.document_repository import DocumentRepository
+    from app.repositories.document_version_repository import DocumentVersionRepository
+    from app.repositories.document_config_repository import DocumentConfigRepository
+    from app.repositories.folder_repository import FolderRepository
+    from app.repositories.config_repository import ConfigRepository
+    from app.services.document_service import DocumentService
+    from app.services.storage_service import StorageService
+    from app.services.document_parser_service import DocumentParserService
+    from app.services.config_service import ConfigService
+    
+    return DocumentService(
+        document_repo=DocumentRepository(db),
+        document_version_repo=DocumentVersionRepository(db),
+        document_config_repo=DocumentConfigRepository(db),
+        folder_repo=FolderRepository(db),
+        storage_service=StorageService(),
+        parser_service=DocumentParserService(),
+        config_service=ConfigService(ConfigRepository(db))
+    )
+
+
+class DocumentTaskWorker:
+    """文档任务worker（单进程内按并发数同时执行多个任务）"""
+    
+    def __init__(
+        self,
+        concurrency: int = 2,
+        poll_seconds: float = 2.0,
+        lease_seconds: float = 300,
+        worker_id: Optional[str] = None,
+        session_factory=SessionLocal,
+        type_limits: Optional[Dict[str, int]] = None,
+        stats_log_seconds: float = 0
+    ):
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.session_factory = session_factory
+        self.type_limits = type_limits or {}
+        self.stats_log_seconds = stats_log_seconds
+        self._stats_logged_at = time.monotonic()
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+    
+    def stop(self) -> None:
+        """停止领取新任务，已领取的任务执行完后退出"""
+        logger.info(f"worker {self.worker_id} 正在停止，等待 {len(self._running)} 个任务完成")
+        self._stopping.set()
+    
+    def _log_parse_stats(self, force: bool = False) -> None:
+        """按间隔输出解析进程池的排队深度和各文件类型的解析耗时"""
+        if not force and (not self.stats_log_seconds or time.monotonic() - self._stats_logged_at < self.stats_log_seconds):
+            return
+        self._stats_logged_at = time.monotonic()
+        stats = parse_pool.stats()
+        if not stats["by_type"] and not stats["pending"]:
+            return
+        by_type = "，".join(
+            f"{file_type}: {entry['files']} 个文件（失败 {entry['failures']}，超时 {entry['timeouts']}），"
+            f"平均解析 {entry['avg_parse_seconds']:.2f}s，最长 {entry['max_parse_seconds']:.2f}s，累计排队 {entry['wait_seconds']:.1f}s"
+            for file_type, entry in sorted(stats["by_type"].items())
+        )
+        logger.info(
+            f"解析统计：排队 {stats['queued']}，解析中 {stats['in_flight']}，进程池回收 {stats['recycled']} 次；{by_type or '暂无完成的文件'}"
+        )
+    
+    def _claim(self, limit: int):
+        """领取任务（同步数据库操作，在线程中执行）"""
+        db = self.session_factory()
+        try:
+            repo = DocumentTaskRepository(db)
+            expired = repo.fail_expired()
+            if expired:
+                logger.warning(f"{expired} 个任务租约过期且重试次数已用尽，已标记为失败")
+            tasks = repo.claim(self.worker_id, self.lease_seconds, limit, type_limits=self.type_limits)
+            for task in tasks:
+                db.expunge(task)
+            return tasks
+        finally:
+            db.close()
+    
+    def _renew_lease(self, task_id: str) -> bool:
+        db = self.session_factory()
+        try:
+            return DocumentTaskRepository(db).renew_lease(task_id, self.worker_id, self.lease_seconds)
+        finally:
+            db.close()
+    
+    async def _heartbeat(self, task: DocumentTask, execution: asyncio.Task) -> None:
+        """
+        任务执行期间定期续约
+        
+        续约失败说明租约已过期、任务已被其他worker接管，取消本worker的执行，
+        避免两个worker同时写入同一文档的chunk和向量
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self._renew_lease, task.id):
+                    logger.warning(f"任务 {task.id} 续约失败，任务可能已被其他worker接管，中止执行")
+                    execution.cancel()
+                    return
+            except Exception as e:
+                logger.error(f"任务 {task.id} 续约异常: {e}", exc_info=True)
+    
+    async def _execute(self, db, task: DocumentTask) -> bool:
+        """执行任务，返回是否成功"""
+        data = task.task_data or {}
+        if task.task_type == DocumentTaskType.PROCESS_DOCUMENT.value:
+            return await _build_document_service(db).process_document(
+                task.document_id,
+                data["storage_path"],
+                data["file_type"],
+                data.get("old_document_id")
+            )
+        if task.task_type == DocumentTaskType.RECHUNK_DOCUMENT.value:
+            return await _build_document_service(db).rechunk_document(task.document_id, data["chunk_config"])
+        raise ValueError(f"不支持的任务类型: {task.task_type}")
+    
+    async def run_task(self, task: DocumentTask) -> None:
+        """执行单个任务并记录结果"""
+        logger.info(f"开始执行任务 {task.id}（文档 {task.document_id}，第 {task.retries} 次执行）")
+        db = self.session_factory()
+        execution = asyncio.create_task(self._execute(db, task))
+        heartbeat = asyncio.create_task(self._heartbeat(task, execution))
+        try:
+            reason = None
+            try:
+                if not await execution:
+                    reason = "文档处理失败"
+            except asyncio.CancelledError:
+                if not heartbeat.done():
+                    # worker自身被取消
+                    raise
+                # 租约已丢失：任务由接管的worker执行并记录结果
+                db.rollback()
+                logger.warning(f"任务 {task.id} 已中止，不记录执行结果")
+                return
+            except Exception as e:
+                logger.error(f"任务 {task.id} 执行异常: {e}", exc_info=True)
+                db.rollback()
+                reason = f"任务执行异常: {e}"
+            finally:
+                heartbeat.cancel()
+            
+            task_service = DocumentTaskService(DocumentTaskRepository(db))
+            if reason is None:
+                status = task_service.task_repo.finish(task.id, self.worker_id)
+            else:
+                status = task_service.record_failure(task, self.worker_id, reason)
+            logger.info(f"任务 {task.id} 执行结束，状态: {status}")
+        except Exception as e:
+            logger.error(f"记录任务 {task.id} 结果失败: {e}", exc_info=True)
+        finally:
+            db.close()
+    
+    async def run(self) -> None:
+        """主循环：有空闲并发槽位时领取任务，无任务时按轮询间隔等待"""
+        logger.info(f"worker {self.worker_id} 启动，并发数: {self.concurrency}")
+        while not self._stopping.is_set():
+            self._log_parse_stats()
+            free_slots = self.concurrency - len(self._running)
+            tasks = []
+            if free_slots > 0:
+                try:
+                    tasks = await asyncio.to_thread(self._claim, free_slots)
+                except Exception as e:
+                    logger.error(f"领取任务失败: {e}", exc_info=True)
+            for task in tasks:
+                running = asyncio.create_task(self.run_task(task))
+                self._running.add(running)
+                running.add_done_callback(self._running.discard)
+            
+            if tasks and len(tasks) == free_slots and len(self._running) < self.concurrency:
+                # 领满了空闲槽位且期间有任务结束，队列中可能还有任务，立即继续领取
+                continue
+            waiters = [asyncio.create_task(self._stopping.wait())]
+            if self._running:
+                waiters.append(asyncio.create_task(asyncio.wait(set(self._running), return_when=asyncio.FIRST_COMPLETED)))
+            await asyncio.wait(waiters, timeout=self.poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+        
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        self._log_parse_stats(force=True)
+        logger.info(f"worker {self.worker_id} 已停止")
+
+
+async def _main(concurrency: int) -> None:
+    worker = DocumentTaskWorker(
+        concurrency=concurrency,
+        poll_seconds=settings.DOCUMENT_WORKER_POLL_SECONDS,
+        lease_seconds=settings.DOCUMENT_TASK_LEASE_SECONDS,
+        type_limits={DocumentTaskType.RECHUNK_DOCUMENT.value: settings.DOCUMENT_RECHUNK_MAX_RUNNING},
+        stats_log_seconds=settings.DOCUMENT_WORKER_STATS_LOG_SECONDS
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            pass
+    await worker.run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="文档处理worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.DOCUMENT_WORKER_CONCURRENCY,
+        help="同时处理的任务数"
+    )
+    args = parser.parse_args()
+    setup_logging(log_level="INFO")
+    asyncio.run(_main(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
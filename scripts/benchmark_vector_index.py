@@ -0,0 +1,117 @@
+"""
+IVF向量索引召回率/延迟评估脚本
+以精确（平铺、float32）检索结果为基准，输出不同nprobe下的recall@k和平均检索延迟，用于为租户选择nprobe和量化方式。
+
+用法：
+    python scripts/benchmark_vector_index.py [--count 50000] [--dim 256] [--queries 200] [--top-k 10]
+                                             [--nprobe 1,2,4,8,16,32] [--nlist N] [--collection PATH]
+                                             [--quantization none|int8|pq] [--pq-subvectors 16]
+
+--collection 指定已有的numpy/ivf collection目录（如 vector_store/numpy/doc_qa_xxx），使用其中的真实向量评估；
+未指定时生成带聚类结构的随机向量。
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.core.vector_store.numpy_vector_store import FlatCollection
+from app.core.vector_store.ivf_vector_store import IVFCollection
+
+
+def _synthetic_vectors(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """生成带聚类结构的归一化向量（接近真实embedding分布）"""
+    centers = rng.standard_normal((max(count // 500, 8), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.35 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _load_vectors(path: str) -> np.ndarray:
+    """读取已有collection的存活向量"""
+    collection = FlatCollection(path)
+    collection.refresh()
+    return np.asarray(collection.vectors[collection.alive], dtype=np.float32)
+
+
+def benchmark(
+    vectors: np.ndarray,
+    queries: int,
+    top_k: int,
+    nprobes,
+    nlist=None,
+    quantization=None,
+    pq_subvectors=None
+) -> None:
+    rng = np.random.default_rng(1)
+    query_vectors = vectors[rng.choice(len(vectors), queries, replace=False)]
+    query_vectors = query_vectors + 0.05 * rng.standard_normal(query_vectors.shape).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        collection = IVFCollection(tmp_dir)
+        ids = [str(i) for i in range(len(vectors))]
+        started = time.perf_counter()
+        collection.add(
+            vectors, [None] * len(ids), [{} for _ in ids], ids,
+            nlist=nlist, quantization=quantization, pq_subvectors=pq_subvectors
+        )
+        build_seconds = time.perf_counter() - started
+        nlist_used = len(collection.centroids) if collection.is_trained else 0
+        print(f"向量数: {len(vectors)}, 维度: {vectors.shape[1]}, 列表数: {nlist_used}, 构建耗时: {build_seconds:.2f}s")
+        if collection.quantizer is not None:
+            print(
+                f"量化: {collection.quantizer.kind}, 每行 {collection.quantizer.code_size} 字节"
+                f"（float32 {vectors.shape[1] * 4} 字节，压缩 {vectors.shape[1] * 4 / collection.quantizer.code_size:.0f} 倍）"
+            )
+
+        # 精确检索基准（nprobe=全部列表）
+        exact, exact_ms = [], []
+        for query in query_vectors:
+            started = time.perf_counter()
+            results = collection.query(query, top_k, None, nprobe=max(nlist_used, 1))
+            exact_ms.append((time.perf_counter() - started) * 1000)
+            exact.append({r["id"] for r in results})
+        print(f"{'nprobe':>8} {'recall@' + str(top_k):>10} {'avg ms':>8} {'p95 ms':>8}")
+        print(f"{'exact':>8} {1.0:>10.3f} {np.mean(exact_ms):>8.2f} {np.percentile(exact_ms, 95):>8.2f}")
+
+        for nprobe in nprobes:
+            hits, latencies = 0, []
+            for query, truth in zip(query_vectors, exact):
+                started = time.perf_counter()
+                results = collection.query(query, top_k, None, nprobe=nprobe, quantization=quantization)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len(truth & {r["id"] for r in results})
+            recall = hits / max(sum(len(t) for t in exact), 1)
+            print(f"{nprobe:>8} {recall:>10.3f} {np.mean(latencies):>8.2f} {np.percentile(latencies, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF向量索引召回率/延迟评估")
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--collection", default=None)
+    parser.add_argument("--quantization", choices=["none", "int8", "pq"], default="none")
+    parser.add_argument("--pq-subvectors", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.collection:
+        data = _load_vectors(args.collection)
+    else:
+        data = _synthetic_vectors(args.count, args.dim, np.random.default_rng(0))
+    benchmark(
+        data,
+        min(args.queries, len(data)),
+        args.top_k,
+        [int(n) for n in args.nprobe.split(",") if n],
+        args.nlist,
+        None if args.quantization == "none" else args.quantization,
+        args.pq_subvectors
+    )
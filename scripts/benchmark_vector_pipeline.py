@@ -0,0 +1,125 @@
+"""
+向量入库流水线内存/耗时对比脚本
+对比两种方式把一批chunk的embedding写入numpy向量库：
+- list：远端返回的嵌套float列表在整个文档范围内累积，最后整体交给向量库转换（旧流程）
+- ndarray：EmbeddingService.embed_batch 每批在线程池中转为float32矩阵并拼接，向量库直接写入（当前流程）
+
+远端服务用本地随机向量模拟（每批返回嵌套列表，与OpenAI兼容接口的解码结果一致），
+Chunk Embedding缓存关闭，只统计流水线本身。内存为tracemalloc统计的Python/NumPy分配峰值。
+
+用法：
+    python scripts/benchmark_vector_pipeline.py [--chunks 10000] [--dim 1536] [--batch-size 64] [--repeat 3]
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from typing import List
+from unittest.mock import Mock
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import app.services.embedding_service as embedding_service_module
+from app.core.embedding_cache import ChunkEmbeddingCache
+from app.core.vector_store.numpy_vector_store import FlatCollection
+from app.core.vector_store.vector_store_interface import as_vector_matrix
+from app.services.config_service import ConfigService
+from app.services.embedding_service import EmbeddingService
+
+
+class _SimulatedRemoteEmbeddings(Embeddings):
+    """模拟远端embedding服务：按文本确定性地生成向量，以嵌套列表返回"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        seed = int(texts[0].rsplit("-", 1)[-1]) if texts else 0
+        return np.random.default_rng(seed).standard_normal((len(texts), self.dim), dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class _BenchmarkEmbeddingService(EmbeddingService):
+    def __init__(self, embeddings: Embeddings, batch_size: int):
+        super().__init__(Mock(spec=ConfigService))
+        self._embeddings = embeddings
+        self._batch_size = batch_size
+
+    def get_embedding_config(self, tenant_id):
+        return {"provider": "benchmark", "model": "simulated", "max_concurrency": 4}
+
+    def _create_embeddings(self, config):
+        return self._embeddings
+
+    def _provider_batch_size(self, config):
+        return self._batch_size
+
+
+def _metadatas(count: int):
+    return [{"document_id": "bench", "chunk_index": i, "tenant_id": "t", "folder_id": "root"} for i in range(count)]
+
+
+async def _list_pipeline(texts: List[str], embeddings: Embeddings, batch_size: int, path: str) -> None:
+    """旧流程：逐批累积嵌套列表，最后整体写入"""
+    vectors: List[List[float]] = []
+    loop = asyncio.get_running_loop()
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await loop.run_in_executor(None, embeddings.embed_documents, texts[start:start + batch_size]))
+    # 与NumpyVectorStore.add_vectors相同，写入前统一转为float32矩阵
+    FlatCollection(path).add(as_vector_matrix(vectors), texts, _metadatas(len(texts)), [str(i) for i in range(len(texts))])
+
+
+async def _array_pipeline(texts: List[str], service: EmbeddingService, path: str) -> None:
+    """当前流程：embed_batch返回float32矩阵，直接写入"""
+    vectors = await service.embed_batch(texts, "t")
+    FlatCollection(path).add(as_vector_matrix(vectors), texts, _metadatas(len(texts)), [str(i) for i in range(len(texts))])
+
+
+def _measure(run) -> tuple:
+    tracemalloc.start()
+    started = time.perf_counter()
+    asyncio.run(run())
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def benchmark(chunks: int, dim: int, batch_size: int, repeat: int) -> None:
+    # 文本末尾的序号作为模拟向量的随机种子，两种流程得到相同的向量
+    texts = [f"chunk-{i}" for i in range(chunks)]
+    embeddings = _SimulatedRemoteEmbeddings(dim)
+    service = _BenchmarkEmbeddingService(embeddings, batch_size)
+    embedding_service_module.chunk_embedding_cache = ChunkEmbeddingCache(None, 0)
+
+    print(f"chunk数: {chunks}, 维度: {dim}, 每批: {batch_size}, 原始向量: {chunks * dim * 4 / 2 ** 20:.1f} MiB")
+    print(f"{'pipeline':>10} {'seconds':>9} {'peak MiB':>9}")
+    for name in ("list", "ndarray"):
+        best_seconds, best_peak = float("inf"), float("inf")
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                if name == "list":
+                    run = lambda: _list_pipeline(texts, embeddings, batch_size, tmp_dir)
+                else:
+                    run = lambda: _array_pipeline(texts, service, tmp_dir)
+                seconds, peak = _measure(run)
+            best_seconds, best_peak = min(best_seconds, seconds), min(best_peak, peak)
+        print(f"{name:>10} {best_seconds:>9.2f} {best_peak / 2 ** 20:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量入库流水线内存/耗时对比")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.chunks, args.dim, args.batch_size, args.repeat)
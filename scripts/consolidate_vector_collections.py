@@ -0,0 +1,48 @@
+"""
+向量库collection合并脚本
+将按文件夹划分的collection（{prefix}_{tenant}_{user}_{folder}）合并为按用户划分的collection（{prefix}_{tenant}_{user}），
+合并完成后将租户（或系统）的 vector_store.default.collection_mode 设置为 "user"，检索即可对用户的所有文件夹执行单次查询。
+
+用法：
+    python scripts/consolidate_vector_collections.py [--keep-source]
+
+有collection合并失败时以非0状态码退出（失败的源collection保留，可重新执行）
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+from app.core.database import SessionLocal
+from app.core.vector_store.chroma_vector_store import ChromaVectorStore
+from app.repositories.config_repository import ConfigRepository
+from app.services.config_service import ConfigService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def consolidate_vector_collections(drop_source: bool = True) -> int:
+    """合并所有按文件夹划分的collection，返回进程退出码（全部成功为0）"""
+    db = SessionLocal()
+    try:
+        config_service = ConfigService(ConfigRepository(db))
+        vector_store = ChromaVectorStore(config_service)
+        stats = vector_store.consolidate_user_collections(drop_source=drop_source)
+        logger.info(f"合并完成：处理 {stats['collections']} 个collection，复制 {stats['vectors']} 个向量")
+        if stats["failed"]:
+            logger.error(f"{stats['failed']} 个collection合并失败，请检查日志后重新执行")
+            return 1
+        logger.info("请将 vector_store.default.collection_mode 设置为 user 以启用单次多文件夹检索")
+        return 0
+    except Exception as e:
+        logger.error(f"合并collection失败: {e}", exc_info=True)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(consolidate_vector_collections(drop_source="--keep-source" not in sys.argv))
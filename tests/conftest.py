@@ -2,12 +2,19 @@
 Pytest配置和fixtures
 """
 import pytest
+from unittest.mock import Mock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 from app.core.database import Base, get_db
+from app.core.config_cache import resolved_config_cache
 from app.main import app
+from app.models.document import Document
+from app.repositories.document_repository import DocumentRepository
+from app.repositories.document_config_repository import DocumentConfigRepository
+from app.repositories.document_version_repository import DocumentVersionRepository
+from app.services.document_service import DocumentService
 import os
 
 # 使用SQLite内存数据库进行测试
@@ -29,6 +36,8 @@ def db_session():
     
     # 创建所有表
     Base.metadata.create_all(bind=engine)
+    # 每个测试使用新的数据库，清空进程内的解析后配置缓存
+    resolved_config_cache.clear()
     
     # 创建会话
     session = TestingSessionLocal()
@@ -54,6 +63,35 @@ def client(db_session):
     
     app.dependency_overrides.clear()
 
+@pytest.fixture
+def make_document(db_session):
+    """创建文档记录的工厂（关键字参数覆盖默认字段）"""
+    def factory(name="a.pdf", **fields):
+        values = {
+            "tenant_id": "t1", "user_id": "u1", "name": name, "original_name": name, "file_type": "pdf",
+            "mime_type": "application/pdf", "file_size": 1, "file_hash": name, "status": "uploaded"
+        }
+        values.update(fields)
+        values.setdefault("storage_path", f"{values['tenant_id']}/{values['user_id']}/{name}")
+        document = Document(**values)
+        db_session.add(document)
+        db_session.commit()
+        return document
+    return factory
+
+@pytest.fixture
+def document_service(db_session):
+    """文档服务（文档相关Repository使用测试数据库，其余依赖为Mock）"""
+    return DocumentService(
+        document_repo=DocumentRepository(db_session),
+        document_version_repo=DocumentVersionRepository(db_session),
+        document_config_repo=DocumentConfigRepository(db_session),
+        folder_repo=Mock(),
+        storage_service=Mock(),
+        parser_service=Mock(),
+        config_service=Mock()
+    )
+
 @pytest.fixture
 def test_tenant_data():
     """测试租户数据"""
@@ -0,0 +1,55 @@
+"""
+模型服务客户端池测试
+"""
+import pytest
+from unittest.mock import Mock
+from app.core.client_pool import ClientRegistry
+from app.services.config_service import ConfigService
+from app.services.embedding_service import EmbeddingService
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_client_registry_reuse_invalidate_and_close():
+    """测试相同配置复用客户端、配置变化得到新客户端、失效后延迟关闭、关闭时释放连接池"""
+    registry = ClientRegistry()
+    config = {"provider": "openai", "base_url": "https://example.com/v1", "model": "m", "api_key": "k1"}
+    
+    built = []
+    def factory():
+        built.append(object())
+        return built[-1]
+    
+    first = registry.get_or_create("llm", config, factory, variant=(0.2, False))
+    assert registry.get_or_create("llm", dict(config), factory, variant=(0.2, False)) is first
+    assert registry.get_or_create("llm", config, factory, variant=(0.7, False)) is not first
+    assert registry.get_or_create("llm", {**config, "api_key": "k2"}, factory, variant=(0.2, False)) is not first
+    
+    http_client = registry.http_client("llm", config)
+    async_client = registry.async_http_client("llm", config)
+    assert registry.http_client("llm", config) is http_client
+    assert registry.async_http_client("llm", config) is async_client
+    
+    assert registry.invalidate("embedding") == 0
+    assert registry.invalidate("llm") == 2
+    assert registry.stats() == {"clients": 0, "http_clients": 0, "async_http_clients": 0, "retired": 2}
+    assert not http_client.is_closed  # 宽限期内进行中的请求仍可使用
+    
+    await registry.aclose()
+    assert http_client.is_closed and async_client.is_closed
+    assert registry.stats()["retired"] == 0
+
+
+@pytest.mark.unit
+def test_embedding_service_reuses_pooled_client(monkeypatch):
+    """测试EmbeddingService按配置复用OpenAIEmbeddings实例"""
+    import app.services.embedding_service as embedding_service_module
+    registry = ClientRegistry()
+    monkeypatch.setattr(embedding_service_module, "client_registry", registry)
+    service = EmbeddingService(Mock(spec=ConfigService))
+    config = {"provider": "openai", "base_url": "https://example.com/v1", "model": "m", "api_key": "k"}
+    
+    embeddings = service._create_embeddings(config)
+    assert service._create_embeddings(dict(config)) is embeddings
+    assert service._create_embeddings({**config, "model": "m2"}) is not embeddings
+    assert registry.stats()["http_clients"] == 2
@@ -0,0 +1,46 @@
+"""
+解析后配置缓存测试
+"""
+import pytest
+from unittest.mock import Mock
+from app.core.config_cache import resolved_config_cache
+from app.repositories.config_repository import ConfigRepository
+from app.schemas.config import ConfigItem, ConfigUpdateRequest
+from app.services.config_service import ConfigService
+
+
+@pytest.mark.unit
+def test_resolved_config_cached_until_scope_version_bumped():
+    """测试稳态下不查询配置表，更新作用域配置后重新加载"""
+    resolved_config_cache.clear()
+    stored = {
+        None: {"llm": {"default": {"provider": "openai", "model": "m1", "api_key": "ENC:c2stc2VjcmV0LWtleQ=="}}},
+        "t1": {},
+    }
+    config_repo = Mock(spec=ConfigRepository)
+    config_repo.list_system_configs.side_effect = lambda tenant_id=None: tenant_id
+    config_repo.to_dict.side_effect = lambda tenant_id: stored[tenant_id]
+    service = ConfigService(config_repo)
+
+    for _ in range(3):
+        llm_config = service.get_resolved_config("llm", "default", "t1")
+        assert llm_config["model"] == "m1" and llm_config["api_key"] == "sk-secret-key"
+    assert service.list_scope_configs("system", None)["llm"]["default"]["api_key"].startswith("sk-s***")
+    assert config_repo.list_system_configs.call_count == 3  # 租户、系统（明文/脱敏视图）各一次
+
+    # 返回值是副本，调用方修改不影响缓存
+    llm_config["model"] = "changed"
+    assert service.get_resolved_config("llm", "default", "t1")["model"] == "m1"
+
+    # 租户更新后只重新加载租户作用域
+    stored["t1"] = {"llm": {"default": {"provider": "openai", "model": "m2", "api_key": "ENC:dDE="}}}
+    service.update_tenant_config(
+        "t1",
+        ConfigUpdateRequest(items=[ConfigItem(category="llm", key="default", value={
+            "provider": "openai", "base_url": "http://llm", "api_key": "t1", "model": "m2"
+        })]),
+        operator_id=None
+    )
+    assert service.get_resolved_config("llm", "default", "t1")["model"] == "m2"
+    assert service.get_resolved_config("llm", "default", None)["model"] == "m1"
+    assert config_repo.list_system_configs.call_count == 4
@@ -0,0 +1,102 @@
+"""
+解析结果缓存测试
+"""
+import pytest
+from unittest.mock import AsyncMock, Mock
+from fastapi import BackgroundTasks
+from app.core import storage as storage_module
+from app.core.config import settings
+from app.core.parsers import ParserFactory, PDFParser
+from app.core.storage import FilesystemStorage
+from app.repositories.document_parse_result_repository import DocumentParseResultRepository
+
+
+@pytest.mark.asyncio
+async def test_duplicate_upload_reuses_parse_result(db_session, make_document, document_service, tmp_path, monkeypatch):
+    """测试同一租户内相同文件只解析一次，解析器版本变化或其他租户时重新解析"""
+    monkeypatch.setattr(settings, "PARSE_RESULT_CACHE_ENABLED", True)
+    storage = FilesystemStorage(base_path=str(tmp_path))
+    monkeypatch.setattr(storage_module, "get_storage", lambda: storage)
+    
+    parser_service = Mock()
+    async def parse(storage_path, file_type, storage, max_retries=3, output_path=None):
+        return {"content": "# 标题\n\n正文", "title": "标题", "summary": "正文", "metadata": {"page_count": 2}}
+    parser_service.parse_document_with_retry = AsyncMock(side_effect=parse)
+    document_service.parser_service = parser_service
+    document_service._vectorize_document = AsyncMock(return_value=True)
+    
+    first = make_document(user_id="u1", file_hash="hash-1")
+    assert await document_service.process_document(first.id, first.storage_path, "pdf") is True
+    assert first.markdown_path == f"t1/_parsed/hash-1/{first.id}.md"
+    assert await storage.read_file(first.markdown_path) == "# 标题\n\n正文".encode("utf-8")
+    
+    # 其他用户、其他文件夹上传的相同文件：不解析，直接使用已有的Markdown进入切分
+    second = make_document(user_id="u2", file_hash="hash-1", folder_id="f1")
+    assert await document_service.process_document(second.id, second.storage_path, "pdf") is True
+    assert parser_service.parse_document_with_retry.await_count == 1
+    assert (second.markdown_path, second.title, second.page_count) == (first.markdown_path, "标题", 2)
+    assert document_service._vectorize_document.await_count == 2
+    
+    # 其他租户不共享
+    other_tenant = make_document(user_id="u3", file_hash="hash-1", tenant_id="t2")
+    assert await document_service.process_document(other_tenant.id, other_tenant.storage_path, "pdf") is True
+    assert parser_service.parse_document_with_retry.await_count == 2
+    
+    # 解析器输出版本变化后重新解析
+    monkeypatch.setattr(PDFParser, "version", "2")
+    assert ParserFactory.get_parser_version("pdf") == "PDFParser:2"
+    third = make_document(user_id="u1", file_hash="hash-1", folder_id="f2")
+    assert await document_service.process_document(third.id, third.storage_path, "pdf") is True
+    assert parser_service.parse_document_with_retry.await_count == 3
+    assert third.markdown_path != first.markdown_path
+
+
+@pytest.mark.asyncio
+async def test_unreferenced_parsed_markdown_is_deleted(db_session, make_document, document_service, tmp_path, monkeypatch):
+    """测试解析结果被覆盖或文档删除后，不再被引用的Markdown文件被删除"""
+    monkeypatch.setattr(settings, "PARSE_RESULT_CACHE_ENABLED", True)
+    storage = FilesystemStorage(base_path=str(tmp_path))
+    monkeypatch.setattr(storage_module, "get_storage", lambda: storage)
+    
+    parser_service = Mock()
+    parser_service.parse_document_with_retry = AsyncMock(return_value={"content": "正文", "metadata": {}})
+    document_service.parser_service = parser_service
+    document_service._vectorize_document = AsyncMock(return_value=True)
+    
+    first = make_document(user_id="u1", file_hash="hash-1")
+    assert await document_service.process_document(first.id, first.storage_path, "pdf") is True
+    first_path = first.markdown_path
+    first.status = "completed"
+    db_session.commit()
+    
+    # 解析结果仍指向该文件：删除文档时保留
+    tasks = BackgroundTasks()
+    document_service.delete_document(first.id, "t1", "u1", background_tasks=tasks)
+    await tasks()
+    assert await storage.file_exists(first_path)
+    
+    # 并发解析相同文件覆盖了解析结果：旧文件已无引用，被删除
+    second = make_document(user_id="u1", file_hash="hash-1")
+    document_service._get_cached_parse_result = AsyncMock(return_value=None)
+    assert await document_service.process_document(second.id, second.storage_path, "pdf") is True
+    assert second.markdown_path != first_path
+    assert not await storage.file_exists(first_path)
+    
+    # 仍被其他文档使用的文件不删除
+    third = make_document(user_id="u2", file_hash="hash-1")
+    third.markdown_path = second.markdown_path
+    second.status = third.status = "completed"
+    db_session.commit()
+    DocumentParseResultRepository(db_session).delete(
+        DocumentParseResultRepository(db_session).get("t1", "hash-1", ParserFactory.get_parser_version("pdf"))
+    )
+    tasks = BackgroundTasks()
+    document_service.delete_document(second.id, "t1", "u1", background_tasks=tasks)
+    await tasks()
+    assert await storage.file_exists(third.markdown_path)
+    
+    tasks = BackgroundTasks()
+    document_service.delete_document(third.id, "t1", "u2", background_tasks=tasks)
+    await tasks()
+    assert not await storage.file_exists(second.markdown_path)
+    assert third.markdown_path is None
@@ -0,0 +1,114 @@
+"""
+文档重新切分测试
+"""
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.core.vector_store.vector_store_factory import VectorStoreFactory
+from app.models.document_chunk import DocumentChunk
+from app.models.document_config import DocumentConfig
+from app.models.document_version import DocumentVersion
+from app.repositories.document_chunk_repository import DocumentChunkRepository
+from app.repositories.document_config_repository import DocumentConfigRepository
+from app.repositories.document_repository import DocumentRepository
+
+NEW_CONFIG = {"chunk_size": 200, "chunk_overlap": 20, "split_method": "paragraph", "split_keyword": None}
+
+
+@pytest.fixture
+def parsed_document(db_session, make_document):
+    """创建已解析的文档及其切分配置"""
+    def factory(name, status="completed"):
+        document = make_document(name, status=status, storage_path=f"{name}.pdf", markdown_path=f"{name}.md")
+        db_session.add(DocumentConfig(document_id=document.id, chunk_size=400, chunk_overlap=100, split_method="length"))
+        db_session.commit()
+        return document
+    return factory
+
+
+def _add_chunks(db_session, document, revision, count=2):
+    for index in range(count):
+        db_session.add(DocumentChunk(
+            document_id=document.id, tenant_id=document.tenant_id, user_id=document.user_id, chunk_index=index,
+            revision=revision, content=f"r{revision}-{index}", vector_id=f"{document.id}:{revision}:{index}"
+        ))
+    db_session.commit()
+
+
+@pytest.mark.unit
+def test_list_rechunkable_skips_unparsed_processing_and_superseded(db_session, parsed_document):
+    """测试只重新切分已解析、不在处理中的当前版本文档"""
+    current = parsed_document("current")
+    parsed_document("parsing", status="parsing")
+    old = parsed_document("old")
+    db_session.add(DocumentVersion(
+        document_id=old.id, version="V1", file_hash="old", storage_path="old.pdf", operator_id="u1", is_current=False
+    ))
+    db_session.commit()
+    
+    assert [d.id for d in DocumentRepository(db_session).list_rechunkable("t1")] == [current.id]
+
+
+@pytest.mark.asyncio
+async def test_rechunk_keeps_old_chunks_until_new_revision_completes(db_session, parsed_document, document_service, monkeypatch):
+    """测试新版本chunk与旧版本并存，向量化失败时旧chunk保留，重试完成后才删除旧版本；配置未变化且已完成时跳过"""
+    document = parsed_document("doc")
+    _add_chunks(db_session, document, revision=0)
+    chunk_repo = DocumentChunkRepository(db_session)
+    vector_store = Mock()
+    vector_store.delete_by_ids.return_value = True
+    monkeypatch.setattr(VectorStoreFactory, "create_from_config", lambda tenant_id, config_service: vector_store)
+    
+    async def vectorize(doc, storage):
+        # 写入新版本的第一个chunk后失败：旧版本仍完整可检索
+        revision = DocumentConfigRepository(db_session).get_by_document_id(doc.id).chunk_revision
+        if not chunk_repo.count_by_document(doc.id, revision=revision):
+            _add_chunks(db_session, doc, revision, count=1)
+            return False
+        return True
+    document_service._vectorize_document = AsyncMock(side_effect=vectorize)
+    
+    assert await document_service.rechunk_document(document.id, NEW_CONFIG) is False
+    config = DocumentConfigRepository(db_session).get_by_document_id(document.id)
+    assert (config.chunk_size, config.chunk_overlap, config.split_method, config.chunk_revision) == (200, 20, "paragraph", 1)
+    assert chunk_repo.count_by_document(document.id, revision=0) == 2
+    vector_store.delete_by_ids.assert_not_called()
+    
+    # 重试：配置已更新，不再递增版本，完成后删除旧版本
+    document.status = "vectorize_failed"
+    db_session.commit()
+    assert await document_service.rechunk_document(document.id, NEW_CONFIG) is True
+    assert config.chunk_revision == 1
+    assert [c.content for c in chunk_repo.get_by_document_id(document.id)] == ["r1-0"]
+    vector_store.delete_by_ids.assert_called_once()
+    assert vector_store.delete_by_ids.call_args.kwargs["ids"] == [f"{document.id}:0:0", f"{document.id}:0:1"]
+    assert document_service._vectorize_document.await_count == 2
+    
+    # 已完成且配置未变化：跳过
+    document.status = "completed"
+    db_session.commit()
+    assert await document_service.rechunk_document(document.id, NEW_CONFIG) is True
+    assert document_service._vectorize_document.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_rechunk_retries_failed_discard_of_old_revision(db_session, parsed_document, document_service, monkeypatch):
+    """测试旧版本向量删除失败时保留旧chunk并抛出异常，再次执行时补删"""
+    document = parsed_document("doc")
+    _add_chunks(db_session, document, revision=0)
+    chunk_repo = DocumentChunkRepository(db_session)
+    vector_store = Mock()
+    vector_store.delete_by_ids.return_value = False
+    monkeypatch.setattr(VectorStoreFactory, "create_from_config", lambda tenant_id, config_service: vector_store)
+    document_service._vectorize_document = AsyncMock(return_value=True)
+    
+    with pytest.raises(RuntimeError):
+        await document_service.rechunk_document(document.id, NEW_CONFIG)
+    assert chunk_repo.count_by_document(document.id, revision=0) == 2
+    
+    # 新版本已完成、配置未变化：不重新切分，只补删旧版本
+    document.status = "completed"
+    db_session.commit()
+    vector_store.delete_by_ids.return_value = True
+    assert await document_service.rechunk_document(document.id, NEW_CONFIG) is True
+    assert chunk_repo.count_by_document(document.id) == 0
+    assert document_service._vectorize_document.await_count == 1
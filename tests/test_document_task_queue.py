@@ -0,0 +1,102 @@
+"""
+文档任务队列测试
+"""
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.repositories.document_task_repository import DocumentTaskRepository
+from app.services.document_task_service import DocumentTaskService
+from app.core.value_objects import DocumentTaskType
+
+
+def _enqueue(db_session, max_retries=3):
+    service = DocumentTaskService(DocumentTaskRepository(db_session))
+    task = service.create_task(
+        document_id="doc-1",
+        tenant_id="tenant-1",
+        user_id="user-1",
+        task_type=DocumentTaskType.PROCESS_DOCUMENT.value,
+        task_data={"storage_path": "a.pdf", "file_type": "pdf"}
+    )
+    task.max_retries = max_retries
+    db_session.commit()
+    return service, task.id
+
+
+@pytest.mark.unit
+def test_claim_lease_and_retry_backoff(db_session):
+    """测试任务只被一个worker领取，失败后退避重试，租约过期后由其他worker接管"""
+    service, task_id = _enqueue(db_session)
+    repo = service.task_repo
+    
+    claimed = repo.claim("worker-a", lease_seconds=60, limit=5)
+    assert [t.id for t in claimed] == [task_id]
+    assert claimed[0].status == "running" and claimed[0].retries == 1
+    assert repo.claim("worker-b", lease_seconds=60, limit=5) == []
+    
+    # 失败后按退避时间重新排队，退避期间不可领取
+    assert service.record_failure(claimed[0], "worker-a", "解析失败") == "pending"
+    task = repo.get_by_id(task_id)
+    assert task.reason == "解析失败" and task.locked_by is None and task.run_after > datetime.utcnow()
+    assert repo.claim("worker-b", lease_seconds=60) == []
+    
+    task.run_after = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    claimed = repo.claim("worker-a", lease_seconds=60)
+    assert claimed[0].retries == 2
+    
+    # worker-a 失联，租约过期后 worker-b 接管，worker-a 的结果不再生效
+    claimed[0].lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert [t.id for t in repo.claim("worker-b", lease_seconds=60)] == [task_id]
+    assert repo.renew_lease(task_id, "worker-a", 60) is False
+    assert repo.finish(task_id, "worker-a") is None
+    assert repo.finish(task_id, "worker-b") == "succeeded"
+    assert repo.get_by_id(task_id).finished_at is not None
+
+
+@pytest.mark.unit
+def test_task_fails_after_retries_exhausted(db_session):
+    """测试重试次数用尽后标记为失败，重新提交后可再次领取"""
+    service, task_id = _enqueue(db_session, max_retries=0)
+    repo = service.task_repo
+    
+    claimed = repo.claim("worker-a", lease_seconds=60)
+    assert service.record_failure(claimed[0], "worker-a", "向量化失败") == "failed"
+    assert repo.claim("worker-a", lease_seconds=60) == []
+    assert [t.id for t in service.list_tasks("user-1", "tenant-1", status="failed")] == [task_id]
+    
+    assert service.retry_task(task_id, "user-1", "tenant-1").status == "pending"
+    assert [t.id for t in repo.claim("worker-a", lease_seconds=60)] == [task_id]
+    
+    # 执行中的worker崩溃且重试次数已用尽：租约过期后标记为失败
+    task = repo.get_by_id(task_id)
+    task.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert repo.fail_expired() == 1
+    assert repo.get_by_id(task_id).status == "failed"
+
+
+@pytest.mark.unit
+def test_claim_throttles_rechunk_tasks_and_reports_batch_progress(db_session):
+    """测试重新切分任务按类型限制同时执行数，批次进度按状态统计"""
+    service = DocumentTaskService(DocumentTaskRepository(db_session))
+    repo = service.task_repo
+    document = SimpleNamespace(id="doc-1", tenant_id="tenant-1", user_id="user-1")
+    rechunk_ids = [service.enqueue_rechunk(document, {"chunk_size": 200}, batch_id="batch-1").id for _ in range(2)]
+    process_id = service.create_task("doc-2", "tenant-1", "user-1", DocumentTaskType.PROCESS_DOCUMENT.value).id
+    limits = {DocumentTaskType.RECHUNK_DOCUMENT.value: 1}
+    
+    # 只领到一个重新切分任务，不影响其他类型的任务
+    claimed = {t.id for t in repo.claim("worker-a", lease_seconds=60, limit=5, type_limits=limits)}
+    assert process_id in claimed and len(claimed & set(rechunk_ids)) == 1
+    assert repo.claim("worker-b", lease_seconds=60, limit=5, type_limits=limits) == []
+    first, second = sorted(rechunk_ids, key=lambda task_id: task_id not in claimed)
+    
+    progress = service.get_batch_progress("batch-1", "tenant-1")
+    assert (progress["total"], progress["running"], progress["pending"], progress["progress"]) == (2, 1, 1, 0.0)
+    assert service.get_batch_progress("batch-1", "tenant-2") is None
+    
+    assert repo.finish(first, "worker-a") == "succeeded"
+    assert [t.id for t in repo.claim("worker-b", lease_seconds=60, limit=5, type_limits=limits)] == [second]
+    assert service.get_batch_progress("batch-1", "tenant-1")["progress"] == 0.5
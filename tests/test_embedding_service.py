@@ -0,0 +1,266 @@
+"""
+Embedding服务测试
+"""
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+from app.core.embedding_cache import ChunkEmbeddingCache, QueryEmbeddingCache, query_embedding_cache
+from app.services.embedding_service import EmbeddingService
+from app.services.config_service import ConfigService
+
+
+def _as_lists(vectors):
+    return [None if vector is None else vector.tolist() for vector in vectors]
+
+
+@pytest.mark.unit
+def test_query_embedding_cache_lru_and_ttl(monkeypatch):
+    """测试查询缓存的LRU淘汰和TTL过期"""
+    cache = QueryEmbeddingCache(max_size=2, ttl_seconds=60)
+    key_a = cache.make_key("t1", "openai", "m", "  你好   世界 ")
+    key_b = cache.make_key("t1", "openai", "m", "b")
+    key_c = cache.make_key("t1", "openai", "m", "c")
+    
+    assert key_a == cache.make_key("t1", "openai", "m", "你好 世界")
+    cache.set(key_a, [1.0])
+    cache.set(key_b, [2.0])
+    assert cache.get(key_a).tolist() == [1.0]
+    cache.set(key_c, [3.0])  # 淘汰最久未使用的key_b
+    assert cache.get(key_b) is None
+    
+    import app.core.embedding_cache as embedding_cache_module
+    monkeypatch.setattr(embedding_cache_module.time, "time", lambda: 10 ** 12)
+    assert cache.get(key_a) is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.unit
+def test_query_embedding_cache_persistence(tmp_path):
+    """测试查询缓存的磁盘持久化和按租户失效"""
+    path = str(tmp_path / "cache.jsonl")
+    cache = QueryEmbeddingCache(max_size=10, ttl_seconds=60)
+    cache.set(cache.make_key("t1", "p", "m", "q"), [0.5, 0.25])
+    cache.set(cache.make_key("t2", "p", "m", "q"), [0.1])
+    assert cache.save(path) == 2
+    
+    restored = QueryEmbeddingCache(max_size=10, ttl_seconds=60, persist_path=path)
+    assert restored.get(restored.make_key("t1", "p", "m", "q")).tolist() == [0.5, 0.25]
+    assert restored.invalidate_tenant("t1") == 1
+    assert restored.get(restored.make_key("t1", "p", "m", "q")) is None
+    assert restored.get(restored.make_key("t2", "p", "m", "q")).tolist() == pytest.approx([0.1])
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_embed_text_uses_query_cache():
+    """测试重复问题不再调用远端Embedding"""
+    query_embedding_cache.clear()
+    service = EmbeddingService(Mock(spec=ConfigService))
+    service.get_embedding_config = Mock(return_value={"provider": "openai", "model": "m"})
+    embeddings = Mock()
+    embeddings.embed_documents.return_value = [[0.1, 0.2]]
+    
+    with patch.object(service, "_create_embeddings", return_value=embeddings):
+        first = await service.embed_text("常见问题", "tenant_cache_test")
+        second = await service.embed_text(" 常见问题 ", "tenant_cache_test")
+    
+    assert first is second  # 命中缓存时直接返回共享的只读数组
+    assert first.dtype == np.float32 and not first.flags.writeable
+    assert first.tolist() == pytest.approx([0.1, 0.2])
+    embeddings.embed_documents.assert_called_once()
+
+
+@pytest.mark.unit
+def test_chunk_embedding_cache_persistence_and_lru_eviction(tmp_path, monkeypatch):
+    """测试Chunk Embedding缓存的持久化和按磁盘占用LRU淘汰"""
+    import app.core.embedding_cache as embedding_cache_module
+    path = str(tmp_path / "chunks.db")
+    # 每个2维float32向量占8字节，上限24字节最多保留3条，淘汰到21字节（2条）
+    cache = ChunkEmbeddingCache(path, max_bytes=24)
+    clock = iter(range(100))
+    monkeypatch.setattr(embedding_cache_module.time, "time", lambda: next(clock))
+    
+    cache.put_many("m", ["a", "b", "c"], [[1.0, 0.0], [2.0, 0.0], [3.0, 0.0]])
+    assert _as_lists(cache.get_many("m", ["a", "x"])) == [[1.0, 0.0], None]  # 刷新a的使用时间
+    assert cache.get_many("other-model", ["a"]) == [None]
+    cache.put_many("m", ["d"], [[4.0, 0.0]])
+    cache.close()
+    
+    reopened = ChunkEmbeddingCache(path, max_bytes=24)
+    assert _as_lists(reopened.get_many("m", ["a", "b", "c", "d"])) == [[1.0, 0.0], None, None, [4.0, 0.0]]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_embed_batch_only_embeds_uncached_chunks(tmp_path, monkeypatch):
+    """测试批量embedding只对缓存未命中的chunk（去重后）调用远端服务"""
+    import app.services.embedding_service as embedding_service_module
+    cache = ChunkEmbeddingCache(str(tmp_path / "chunks.db"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(embedding_service_module, "chunk_embedding_cache", cache)
+    service = EmbeddingService(Mock(spec=ConfigService))
+    service.get_embedding_config = Mock(return_value={"provider": "openai", "model": "m"})
+    embeddings = Mock()
+    embeddings.embed_documents.side_effect = lambda texts: [[float(len(t)), 0.5] for t in texts]
+    
+    with patch.object(service, "_create_embeddings", return_value=embeddings):
+        first = await service.embed_batch(["aa", "bbb"], "t1")
+        stats = {}
+        second = await service.embed_batch(["aa", "cccc", "bbb", "cccc"], "t1", stats=stats)
+    
+    assert first.dtype == np.float32 and first.flags.c_contiguous
+    assert first.tolist() == [[2.0, 0.5], [3.0, 0.5]]
+    assert second.tolist() == [[2.0, 0.5], [4.0, 0.5], [3.0, 0.5], [4.0, 0.5]]
+    assert stats == {"total": 4, "hits": 2, "misses": 2}
+    assert embeddings.embed_documents.call_args_list[-1].args == (["cccc"],)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_embedding_scheduler_concurrency_and_retry_after():
+    """测试调度器并发执行批次、保持顺序，遇到429时遵循Retry-After并降低并发上限"""
+    import threading
+    import time
+    from app.core.embedding_scheduler import EmbeddingScheduler
+    
+    class RateLimitError(Exception):
+        def __init__(self):
+            super().__init__("429")
+            self.response = Mock(status_code=429, headers={"retry-after": "0.05"})
+    
+    scheduler = EmbeddingScheduler(rpm=None, tpm=None, max_concurrency=4)
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0, "failed": False, "calls": 0}
+    
+    def call(texts):
+        with lock:
+            state["calls"] += 1
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            fail = texts == ["t5"] and not state["failed"]
+            state["failed"] = state["failed"] or fail
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        if fail:
+            raise RateLimitError()
+        return [[float(t[1:])] for t in texts]
+    
+    batches = [[f"t{i}"] for i in range(12)]
+    vectors = await scheduler.run(batches, call)
+    
+    assert vectors.tolist() == [[float(i)] for i in range(12)]
+    assert 1 < state["peak"] <= 4
+    metrics = scheduler.metrics()
+    assert metrics["requests"] == 12 and metrics["rate_limited"] == 1 and metrics["retries"] == 1
+    assert state["calls"] == 13
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_embedding_scheduler_releases_slot_when_batch_cancelled():
+    """测试某个批次失败导致其余进行中的批次被取消后，并发槽位全部归还"""
+    import asyncio
+    import threading
+    from app.core.embedding_scheduler import EmbeddingScheduler
+    
+    scheduler = EmbeddingScheduler(rpm=None, tpm=None, max_concurrency=2)
+    scheduler.concurrency_limit = 2.0
+    blocked = threading.Event()
+    started = threading.Event()
+    
+    def call(texts):
+        if texts == ["bad"]:
+            started.wait(1)
+            raise RuntimeError("boom")
+        started.set()
+        blocked.wait(1)
+        return [[1.0]]
+    
+    try:
+        with pytest.raises(RuntimeError):
+            await scheduler.run([["bad"], ["slow"]], call)
+        await asyncio.sleep(0)
+        assert scheduler.in_flight == 0
+        
+        task = asyncio.ensure_future(scheduler.run_batch(["slow"], call))
+        while scheduler.in_flight == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scheduler.in_flight == 0
+        assert scheduler.metrics()["errors"] == 1
+    finally:
+        blocked.set()
+
+
+@pytest.mark.unit
+def test_token_bucket_waits_when_budget_exhausted():
+    """测试令牌桶超出每分钟额度后返回等待时间"""
+    from app.core.embedding_scheduler import TokenBucket
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert TokenBucket(per_minute=None).reserve(10 ** 9) == 0.0
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_coalescer_merges_concurrent_single_text_requests():
+    """测试并发的单条embedding请求合并为批量调用并正确分发结果"""
+    import asyncio
+    from app.core.embedding_coalescer import EmbeddingCoalescer
+    coalescer = EmbeddingCoalescer(window_seconds=0.01, max_batch=4)
+    calls = []
+    
+    async def flush(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+    
+    texts = ["a", "bb", "a", "ccc", "dddd", "eeeee"]
+    results = await asyncio.gather(*[coalescer.embed("k", t, flush) for t in texts])
+    other = await coalescer.embed("other", "zz", flush, max_batch=1)
+    
+    assert results == [[1.0], [2.0], [1.0], [3.0], [4.0], [5.0]]
+    assert other == [2.0]
+    # 前4个请求达到批量上限立即发出（相同文本去重），其余在窗口结束后发出
+    assert calls == [["a", "bb", "ccc"], ["dddd", "eeeee"], ["zz"]]
+    await asyncio.sleep(0)
+    assert not coalescer._running
+    
+    async def failing(texts):
+        raise RuntimeError("boom")
+    outcomes = await asyncio.gather(
+        coalescer.embed("k", "x", failing), coalescer.embed("k", "y", failing), return_exceptions=True
+    )
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    
+    # 批量调用被取消时，等待中的调用方收到CancelledError而不是永远挂起
+    async def cancelled(texts):
+        raise asyncio.CancelledError()
+    outcomes = await asyncio.wait_for(
+        asyncio.gather(coalescer.embed("k", "x", cancelled), coalescer.embed("k", "y", cancelled), return_exceptions=True),
+        timeout=1
+    )
+    assert all(isinstance(o, asyncio.CancelledError) for o in outcomes)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_local_embedding_provider_is_deterministic_and_offline():
+    """测试local提供商无需远端服务、结果确定、相关文本相似度更高"""
+    service = EmbeddingService(Mock(spec=ConfigService))
+    service.get_embedding_config = Mock(return_value={"provider": "local", "model": "hash-ngram", "dimensions": 256})
+    
+    docs = ["向量数据库的索引与检索性能", "今天天气很好，适合去公园散步", "Vector index recall benchmark"]
+    vectors = await service.embed_batch(docs, "t_local")
+    again = await service.embed_batch(docs, "t_local")
+    query = await service.embed_text("向量检索性能", "t_local")
+    english = await service.embed_text("benchmark of vector indexes", "t_local")
+    
+    assert vectors.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    assert np.array_equal(vectors, again)
+    assert int(np.argmax(vectors @ query)) == 0
+    assert int(np.argmax(vectors @ english)) == 2
+    assert await service.embed_batch(docs[:1], "t_local", as_list=True) == vectors[:1].tolist()
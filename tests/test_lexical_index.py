@@ -0,0 +1,87 @@
+"""
+BM25词法索引测试
+"""
+import pytest
+from app.core.lexical_index import BM25Index, LexicalIndexRegistry, reciprocal_rank_fusion, tokenize
+
+
+@pytest.mark.unit
+def test_tokenize_cjk_bigrams_and_identifiers():
+    """测试中文二元组切分和标识符保留"""
+    assert tokenize("向量检索") == ["向量", "量检", "检索"]
+    assert tokenize("错误码 ERR-1024") == ["错误", "误码", "err-1024", "err", "1024"]
+    assert tokenize("型号Ａ３") == ["型号", "a3"]
+
+
+@pytest.mark.unit
+def test_bm25_index_exact_identifier_and_folder_filter():
+    """测试精确标识符命中、文件夹过滤和文档移除"""
+    index = BM25Index()
+    index.add_chunk("v1", "doc1", 0, "设备返回错误码 E-4031 时需要重启", "f1")
+    index.add_chunk("v2", "doc2", 0, "设备重启后检查网络连接", "f2")
+    index.add_chunk("v3", "doc3", 0, "网络连接说明", None)
+    
+    results = index.search("E-4031 怎么处理", top_k=5)
+    assert [r["id"] for r in results] == ["v1"]
+    assert results[0]["metadata"] == {"document_id": "doc1", "chunk_index": 0, "folder_id": "f1"}
+    # 索引不保存chunk内容，由检索服务按vector_id回查
+    assert results[0]["text"] is None
+    assert "content" not in index._chunks["v1"]
+    
+    results = index.search("网络连接", top_k=5, folder_ids=[None])
+    assert [r["id"] for r in results] == ["v3"]
+    
+    assert index.remove_document("doc1") == 1
+    assert index.search("E-4031", top_k=5) == []
+    assert len(index) == 2
+
+
+@pytest.mark.unit
+def test_registry_lazy_build_and_incremental_update():
+    """测试索引懒加载和增量维护"""
+    registry = LexicalIndexRegistry(max_users=2, ttl_seconds=3600)
+    loads = []
+    
+    def loader():
+        loads.append(1)
+        return [("v1", "doc1", 0, "部署手册", None)]
+    
+    # 索引未加载时增量添加被跳过
+    registry.add_chunks("t", "u", [("v0", "doc0", 0, "不会出现", None)])
+    assert [r["id"] for r in registry.search("t", "u", "部署", 5, None, loader)] == ["v1"]
+    
+    registry.add_chunks("t", "u", [("v2", "doc2", 0, "部署脚本", None), ("v3", "doc2", 1, "部署流程", None)])
+    assert {r["id"] for r in registry.search("t", "u", "部署", 5, None, loader)} == {"v1", "v2", "v3"}
+    registry.remove_document("t", "u", "doc1")
+    assert {r["id"] for r in registry.search("t", "u", "部署", 5, None, loader)} == {"v2", "v3"}
+    assert registry.remove_chunks("t", "u", ["v3", "missing"]) == 1
+    assert [r["id"] for r in registry.search("t", "u", "部署", 5, None, loader)] == ["v2"]
+    assert len(loads) == 1
+
+
+@pytest.mark.unit
+def test_registry_replays_changes_made_during_rebuild():
+    """测试重建期间到达的增量变更在新索引装载前重放，不会丢失"""
+    registry = LexicalIndexRegistry(max_users=2, ttl_seconds=3600)
+    
+    def loader():
+        # 模拟重建读取数据库期间，其他线程写入/删除了chunk
+        registry.add_chunks("t", "u", [("v2", "doc2", 0, "部署脚本", None)])
+        registry.remove_document("t", "u", "doc1")
+        return [("v1", "doc1", 0, "部署手册", None), ("v3", "doc3", 0, "部署说明", None)]
+    
+    results = registry.search("t", "u", "部署", 5, None, loader)
+    assert {r["id"] for r in results} == {"v2", "v3"}
+    
+    registry.invalidate("t", "u")
+    assert registry.remove_document("t", "u", "doc2") == 0
+
+
+@pytest.mark.unit
+def test_reciprocal_rank_fusion():
+    """测试倒数排名融合"""
+    fused = reciprocal_rank_fusion(
+        [[{"id": "a"}, {"id": "b"}], [{"id": "b"}, {"id": "c"}]],
+        key=lambda r: r["id"]
+    )
+    assert [key for key, _ in fused] == ["b", "a", "c"]
@@ -0,0 +1,58 @@
+"""
+文档解析进程池测试
+"""
+import time
+import pytest
+from app.core import parse_pool as parse_pool_module
+from app.core.parse_pool import ParsePool, ParseTimeoutError
+
+
+@pytest.mark.asyncio
+async def test_parse_in_subprocess_and_recycle(tmp_path):
+    """测试在子进程中解析文件，处理达到阈值后回收进程池"""
+    file_path = tmp_path / "a.txt"
+    file_path.write_text("第一行标题\n正文内容", encoding="utf-8")
+    pool = ParsePool(max_workers=1, timeout_seconds=60, max_tasks_per_worker=1)
+    try:
+        for _ in range(2):
+            result = await pool.parse("txt", str(file_path))
+            assert "正文内容" in result["content"]
+        stats = pool.stats()
+        assert stats["recycled"] == 1 and stats["pending"] == 0
+        assert stats["by_type"]["txt"]["files"] == 2
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_parse_timeout_recorded(monkeypatch, tmp_path):
+    """测试单文件解析超时"""
+    def slow_parse(file_type, file_path=None, content=None, filename="", output_path=None):
+        time.sleep(0.5)
+        return {"content": "", "metadata": {}}, 0.5
+
+    monkeypatch.setattr(parse_pool_module, "parse_file", slow_parse)
+    pool = ParsePool(max_workers=0, timeout_seconds=0.05)
+    with pytest.raises(ParseTimeoutError):
+        await pool.parse("pdf", str(tmp_path / "a.pdf"))
+    assert pool.stats()["by_type"]["pdf"]["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_parse_bytes_and_local_path_in_one_pass(tmp_path):
+    """测试内存字节流与本地真实路径解析结果一致，元数据在同一次解析中返回"""
+    from app.core.storage import FilesystemStorage
+
+    storage = FilesystemStorage(base_path=str(tmp_path))
+    raw = "# 标题\r\n\r\n正文".encode("utf-8")
+    await storage.save_file("t/u/a.md", raw)
+    local_path = storage.get_local_path("t/u/a.md")
+    assert local_path == str((tmp_path / "t/u/a.md").resolve())
+    assert storage.get_local_path("t/u/missing.md") is None
+
+    pool = ParsePool(max_workers=0)
+    from_path = await pool.parse("md", file_path=local_path)
+    from_bytes = await pool.parse("md", content=raw, filename="a.md")
+    assert from_path == from_bytes
+    assert from_bytes["title"] == "标题" and from_bytes["content"] == "# 标题\n\n正文"
+    assert from_bytes["metadata"] == {"page_count": None, "file_size": len(raw)}
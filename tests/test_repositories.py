@@ -73,3 +73,24 @@ def test_user_repository_get_by_phone(db_session, test_tenant_data, test_user_da
     
     assert found_user is not None
     assert found_user.phone == test_user_data["phone"]
+
+@pytest.mark.unit
+def test_folder_repository_get_subtree_ids(db_session):
+    """测试文件夹Repository单次查询子树"""
+    from app.models.folder import Folder
+    from app.repositories.folder_repository import FolderRepository
+    
+    repo = FolderRepository(db_session)
+    base_path = "t1/u1"
+    kb_a = repo.create(Folder(tenant_id="t1", user_id="u1", name="A", path=base_path, level=0))
+    kb_b = repo.create(Folder(tenant_id="t1", user_id="u1", name="B", path=base_path, level=0))
+    child = repo.create(Folder(tenant_id="t1", user_id="u1", parent_id=kb_a.id, name="A1",
+                               path=kb_a.generate_child_path(), level=1))
+    other_user = repo.create(Folder(tenant_id="t1", user_id="u2", name="C", path="t1/u2", level=0))
+    
+    assert set(repo.get_subtree_ids([kb_a.id], "t1", "u1")) == {kb_a.id, child.id}
+    assert set(repo.get_subtree_ids([kb_a.id, kb_b.id, other_user.id], "t1", "u1")) == {kb_a.id, kb_b.id, child.id}
+    assert set(repo.list_ids_by_user("u1", "t1")) == {kb_a.id, kb_b.id, child.id}
+    
+    repo.delete(child.id)
+    assert repo.get_subtree_ids([kb_a.id], "t1", "u1") == [kb_a.id]
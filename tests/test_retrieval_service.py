@@ -6,6 +6,9 @@ from unittest.mock import Mock, AsyncMock, patch
 from app.services.retrieval_service import RetrievalService
 from app.services.embedding_service import EmbeddingService
 from app.services.config_service import ConfigService
+from app.core.folder_tree_cache import folder_tree_cache
+from app.core.retrieval_cache import retrieval_cache
+from app.core.lexical_index import lexical_index
 
 @pytest.mark.unit
 @pytest.mark.asyncio
@@ -77,3 +80,289 @@ async def test_retrieval_service_search_with_embedding():
         
         assert isinstance(results, list)
         embedding_service.embed_query.assert_called_once()
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_retrieval_service_batch_hydration():
+    """测试检索结果在top_k截断后批量补充chunk和文档信息"""
+    embedding_service = Mock(spec=EmbeddingService)
+    embedding_service.embed_text = AsyncMock(return_value=[0.1] * 4)
+    config_service = Mock(spec=ConfigService)
+    folder_repo = Mock()
+    folder_repo.list_ids_by_user.return_value = []
+    chunk_repo = Mock()
+    chunk_repo.get_by_vector_ids.side_effect = lambda ids: [
+        Mock(vector_id=vid, document_id=f"doc{vid[-1]}", chunk_index=0, content=f"chunk {vid}", chunk_metadata={})
+        for vid in ids
+    ]
+    document_repo = Mock()
+    document_repo.get_by_ids.side_effect = lambda ids, tenant_id: [
+        Mock(id=doc_id, original_name=f"{doc_id}.md", title=doc_id) for doc_id in ids
+    ]
+    
+    retrieval_service = RetrievalService(
+        embedding_service=embedding_service,
+        config_service=config_service,
+        folder_repo=folder_repo,
+        chunk_repo=chunk_repo,
+        document_repo=document_repo
+    )
+    
+    folder_tree_cache.clear()
+    retrieval_cache.clear()
+    hits = [
+        {"id": f"v{i}", "text": None, "distance": 0.1 * i, "metadata": {"document_id": f"doc{i}", "chunk_index": 0}}
+        for i in range(6)
+    ]
+    with patch('app.services.retrieval_service.VectorStoreFactory') as mock_factory:
+        mock_factory.create_from_config.return_value.search_folders.return_value = hits
+        
+        results = await retrieval_service.search(
+            query="测试查询",
+            tenant_id="test_tenant",
+            user_id="test_user",
+            top_k=2
+        )
+    
+    assert [r["vector_id"] for r in results] == ["v0", "v1"]
+    assert results[0]["content"] == "chunk v0"
+    assert results[1]["metadata"]["document_title"] == "doc1"
+    chunk_repo.get_by_vector_ids.assert_called_once_with(["v0", "v1"])
+    chunk_repo.get_by_document_and_index.assert_not_called()
+    document_repo.get_by_ids.assert_called_once()
+    document_repo.get_by_id.assert_not_called()
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_retrieval_service_result_cache():
+    """测试相同查询命中检索结果缓存，索引代数递增后失效"""
+    embedding_service = Mock(spec=EmbeddingService)
+    embedding_service.embed_text = AsyncMock(return_value=[0.1] * 4)
+    config_service = Mock(spec=ConfigService)
+    folder_repo = Mock()
+    folder_repo.list_ids_by_user.return_value = []
+    chunk_repo = Mock()
+    chunk_repo.get_by_vector_ids.side_effect = lambda ids: [
+        Mock(vector_id=vid, document_id="doc0", chunk_index=0, content="chunk", chunk_metadata={})
+        for vid in ids
+    ]
+    document_repo = Mock()
+    document_repo.get_by_ids.return_value = []
+    
+    retrieval_service = RetrievalService(
+        embedding_service=embedding_service,
+        config_service=config_service,
+        folder_repo=folder_repo,
+        chunk_repo=chunk_repo,
+        document_repo=document_repo
+    )
+    
+    folder_tree_cache.clear()
+    retrieval_cache.clear()
+    hits = [{"id": "v0", "text": "chunk", "distance": 0.1, "metadata": {"document_id": "doc0", "chunk_index": 0}}]
+    with patch('app.services.retrieval_service.VectorStoreFactory') as mock_factory:
+        mock_factory.create_from_config.return_value.search_folders.return_value = hits
+        
+        first = await retrieval_service.search(query="测试  查询", tenant_id="cache_tenant", user_id="cache_user", top_k=2)
+        second = await retrieval_service.search(query="测试 查询", tenant_id="cache_tenant", user_id="cache_user", top_k=2)
+        assert second == first
+        assert embedding_service.embed_text.await_count == 1
+        
+        # 修改缓存返回值不影响缓存内容
+        second[0]["content"] = "changed"
+        third = await retrieval_service.search(query="测试 查询", tenant_id="cache_tenant", user_id="cache_user", top_k=2)
+        assert third[0]["content"] == "chunk"
+        
+        retrieval_cache.bump_generation("cache_tenant", "cache_user")
+        await retrieval_service.search(query="测试 查询", tenant_id="cache_tenant", user_id="cache_user", top_k=2)
+        assert embedding_service.embed_text.await_count == 2
+
+@pytest.mark.asyncio
+async def test_retrieval_service_vector_failure_not_cached():
+    """测试向量检索失败时的降级结果不写入缓存"""
+    embedding_service = Mock(spec=EmbeddingService)
+    embedding_service.embed_text = AsyncMock(return_value=[0.1] * 4)
+    folder_repo = Mock()
+    folder_repo.list_ids_by_user.return_value = []
+    chunk_repo = Mock()
+    chunk_repo.get_by_vector_ids.return_value = []
+    chunk_repo.get_by_document_and_indexes.return_value = []
+    document_repo = Mock()
+    document_repo.get_by_ids.return_value = []
+    
+    retrieval_service = RetrievalService(
+        embedding_service=embedding_service,
+        config_service=Mock(spec=ConfigService),
+        folder_repo=folder_repo,
+        chunk_repo=chunk_repo,
+        document_repo=document_repo
+    )
+    
+    folder_tree_cache.clear()
+    retrieval_cache.clear()
+    with patch('app.services.retrieval_service.VectorStoreFactory') as mock_factory:
+        search_folders = mock_factory.create_from_config.return_value.search_folders
+        search_folders.side_effect = RuntimeError("collection不可用")
+    
+        assert await retrieval_service.search(query="测试", tenant_id="fail_tenant", user_id="fail_user", top_k=2) == []
+        assert retrieval_cache.stats()["size"] == 0
+    
+        search_folders.side_effect = None
+        search_folders.return_value = [
+            {"id": "v0", "text": "chunk", "distance": 0.1, "metadata": {"document_id": "doc0", "chunk_index": 0}}
+        ]
+        await retrieval_service.search(query="测试", tenant_id="fail_tenant", user_id="fail_user", top_k=2)
+        assert search_folders.call_count == 2
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_retrieval_service_hybrid_mode():
+    """测试混合检索融合向量和BM25结果，词法检索不调用embedding"""
+    embedding_service = Mock(spec=EmbeddingService)
+    embedding_service.embed_text = AsyncMock(return_value=[0.1] * 4)
+    config_service = Mock(spec=ConfigService)
+    folder_repo = Mock()
+    folder_repo.list_ids_by_user.return_value = []
+    chunk_repo = Mock()
+    chunk_repo.list_lexical_rows.return_value = [
+        ("v1", "doc1", 0, "错误码 E-4031 表示电源异常", None),
+        ("v2", "doc2", 0, "设备电源说明", None),
+    ]
+    chunk_repo.get_by_vector_ids.side_effect = lambda ids: [
+        Mock(vector_id=vid, document_id=f"doc{vid[-1]}", chunk_index=0, content=f"chunk {vid}", chunk_metadata={})
+        for vid in ids
+    ]
+    document_repo = Mock()
+    document_repo.get_by_ids.return_value = []
+    
+    retrieval_service = RetrievalService(
+        embedding_service=embedding_service,
+        config_service=config_service,
+        folder_repo=folder_repo,
+        chunk_repo=chunk_repo,
+        document_repo=document_repo
+    )
+    
+    folder_tree_cache.clear()
+    retrieval_cache.clear()
+    lexical_index.clear()
+    hits = [
+        {"id": "v2", "text": "设备电源说明", "distance": 0.2, "metadata": {"document_id": "doc2", "chunk_index": 0}},
+        {"id": "v3", "text": "无关内容", "distance": 0.3, "metadata": {"document_id": "doc3", "chunk_index": 0}},
+    ]
+    with patch('app.services.retrieval_service.VectorStoreFactory') as mock_factory:
+        mock_factory.create_from_config.return_value.search_folders.return_value = hits
+        
+        results = await retrieval_service.search(
+            query="E-4031 电源", tenant_id="t", user_id="u", top_k=3, retrieval_mode="hybrid"
+        )
+        assert [r["vector_id"] for r in results][0] == "v2"
+        assert {r["vector_id"] for r in results} == {"v1", "v2", "v3"}
+        assert all("rrf_score" in r for r in results)
+        
+        lexical = await retrieval_service.search(
+            query="E-4031", tenant_id="t", user_id="u", top_k=3, retrieval_mode="lexical"
+        )
+        assert [r["vector_id"] for r in lexical] == ["v1"]
+        assert embedding_service.embed_text.await_count == 1
+    
+    with pytest.raises(ValueError):
+        await retrieval_service.search(query="x", tenant_id="t", user_id="u", retrieval_mode="fuzzy")
+
+
+@pytest.mark.asyncio
+async def test_retrieval_service_hydrates_lexical_hits_before_rerank():
+    """测试词法检索结果在重排序前补充chunk内容"""
+    embedding_service = Mock(spec=EmbeddingService)
+    folder_repo = Mock()
+    folder_repo.list_ids_by_user.return_value = []
+    chunk_repo = Mock()
+    chunk_repo.list_lexical_rows.return_value = [
+        ("v1", "doc1", 0, "错误码 E-4031 表示电源异常", None),
+        ("v2", "doc2", 0, "E-4031 复位步骤", None),
+    ]
+    chunk_repo.get_by_vector_ids.side_effect = lambda ids: [
+        Mock(vector_id=vid, document_id=f"doc{vid[-1]}", chunk_index=0, content=f"chunk {vid}", chunk_metadata={})
+        for vid in ids
+    ]
+    document_repo = Mock()
+    document_repo.get_by_ids.return_value = []
+    reranker_service = Mock()
+    reranker_service.rerank = AsyncMock(return_value=[{"index": 1, "relevance_score": 0.9}, {"index": 0, "relevance_score": 0.5}])
+    
+    retrieval_service = RetrievalService(
+        embedding_service=embedding_service,
+        config_service=Mock(spec=ConfigService),
+        folder_repo=folder_repo,
+        chunk_repo=chunk_repo,
+        document_repo=document_repo,
+        reranker_service=reranker_service
+    )
+    
+    folder_tree_cache.clear()
+    retrieval_cache.clear()
+    lexical_index.clear()
+    results = await retrieval_service.search(
+        query="E-4031", tenant_id="t", user_id="u", top_k=2, retrieval_mode="lexical",
+        use_rerank=True, rerank_top_n=2
+    )
+    
+    documents = reranker_service.rerank.await_args.kwargs["documents"]
+    assert sorted(documents) == ["chunk v1", "chunk v2"]
+    assert [r["content"] for r in results] == [documents[1], documents[0]]
+    assert chunk_repo.get_by_vector_ids.call_count == 1
+
+@pytest.mark.unit
+def test_folder_tree_cache_ttl_and_invalidate(monkeypatch):
+    """测试文件夹子树缓存按用户失效，并在TTL到期后过期（吸收其他进程的文件夹变更）"""
+    from app.core.folder_tree_cache import FolderTreeCache
+    import app.core.folder_tree_cache as folder_tree_cache_module
+    cache = FolderTreeCache(ttl_seconds=60)
+    
+    cache.set("t", "u", cache.ALL_FOLDERS, ["f1", "f2"])
+    assert cache.get("t", "u", cache.ALL_FOLDERS) == ["f1", "f2"]
+    cache.invalidate("t", "u")
+    assert cache.get("t", "u", cache.ALL_FOLDERS) is None
+    
+    cache.set("t", "u", cache.ALL_FOLDERS, ["f1"])
+    monkeypatch.setattr(folder_tree_cache_module.time, "time", lambda: 10 ** 12)
+    assert cache.get("t", "u", cache.ALL_FOLDERS) is None
+    
+    disabled = FolderTreeCache(ttl_seconds=0)
+    disabled.set("t", "u", disabled.ALL_FOLDERS, ["f1"])
+    assert disabled.get("t", "u", disabled.ALL_FOLDERS) is None
+
+
+@pytest.mark.unit
+def test_index_generation_sync_invalidates_caches_across_processes(db_session, monkeypatch):
+    """测试其他进程（worker）递增数据库索引代数后，本进程的检索缓存和词法索引失效；本进程自己的变更不触发重建"""
+    from app.repositories.index_generation_repository import IndexGenerationRepository
+    from app.services.index_generation_service import IndexGenerationService
+    monkeypatch.setattr(retrieval_cache, "generation_check_seconds", 0)
+    repo = IndexGenerationRepository(db_session)
+    service = IndexGenerationService(repo)
+    user_key = ("gen_tenant", "gen_user")
+    
+    service.sync(*user_key)
+    lexical_index.get_or_build(*user_key, loader=lambda: [("v1", "doc1", 0, "部署手册", None)])
+    generation = retrieval_cache.generation(*user_key)
+    
+    # 本进程写入：本地代数已直接递增，数据库代数随后递增，比对时不再重复失效
+    retrieval_cache.bump_generation(*user_key)
+    service.publish_change(*user_key)
+    service.sync(*user_key)
+    assert retrieval_cache.generation(*user_key) == generation + 1
+    assert user_key in lexical_index._indexes
+    
+    # 其他进程写入：只有数据库代数变化
+    IndexGenerationRepository(db_session).bump(*user_key)
+    service.sync(*user_key)
+    assert retrieval_cache.generation(*user_key) == generation + 2
+    assert user_key not in lexical_index._indexes
+    assert repo.get(*user_key) == 2
+    
+    # 检查间隔内不重复读取数据库
+    monkeypatch.setattr(retrieval_cache, "generation_check_seconds", 3600)
+    repo.bump(*user_key)
+    service.sync(*user_key)
+    assert retrieval_cache.generation(*user_key) == generation + 2
@@ -0,0 +1,309 @@
+"""
+向量库测试
+"""
+import pytest
+from collections import OrderedDict
+from unittest.mock import Mock
+from app.core.config import settings
+from app.core.vector_store.chroma_vector_store import ChromaVectorStore
+from app.services.config_service import ConfigService
+
+
+def _make_store(tmp_path, monkeypatch, collection_mode="folder"):
+    monkeypatch.setattr(settings, "VECTOR_STORE_BASE_PATH", str(tmp_path))
+    config_service = Mock(spec=ConfigService)
+    vector_store_config = {"provider": "chroma", "base_url": "", "collection_prefix": "test"}
+    if collection_mode:
+        vector_store_config["collection_mode"] = collection_mode
+    config_service.list_scope_configs.return_value = {"vector_store": {"default": vector_store_config}}
+    return ChromaVectorStore(config_service), vector_store_config
+
+
+def _add(store, folder_id, doc_id, vector):
+    store.add_vectors(
+        vectors=[vector],
+        texts=[f"{doc_id} text"],
+        metadatas=[{"document_id": doc_id, "chunk_index": 0, "folder_id": folder_id or "root"}],
+        ids=[f"{doc_id}-0"],
+        tenant_id="t1",
+        user_id="u1",
+        folder_id=folder_id
+    )
+
+
+@pytest.mark.unit
+def test_user_mode_search_folders_single_collection(tmp_path, monkeypatch):
+    """测试user模式下单次查询多个文件夹"""
+    store, _ = _make_store(tmp_path, monkeypatch, collection_mode="user")
+    _add(store, None, "d_root", [1.0, 0.0])
+    _add(store, "f1", "d_f1", [0.9, 0.1])
+    _add(store, "f2", "d_f2", [0.8, 0.2])
+
+    assert store.get_collection_name("t1", "u1", "f1") == store.get_collection_name("t1", "u1", None)
+
+    results = store.search_folders([1.0, 0.0], 10, "t1", "u1", [None, "f1"])
+    assert {r["metadata"]["document_id"] for r in results} == {"d_root", "d_f1"}
+
+    results = store.search([1.0, 0.0], 10, "t1", "u1", folder_id="f2")
+    assert [r["metadata"]["document_id"] for r in results] == ["d_f2"]
+
+    vectors = store.get_vectors(["d_f1-0", "missing"], "t1", "u1", folder_id="f1")
+    assert list(vectors) == ["d_f1-0"]
+    assert vectors["d_f1-0"].tolist() == pytest.approx([0.9, 0.1])
+
+
+@pytest.mark.unit
+def test_consolidate_folder_collections(tmp_path, monkeypatch):
+    """测试将按文件夹划分的collection合并为按用户划分"""
+    store, vector_store_config = _make_store(tmp_path, monkeypatch, collection_mode="folder")
+    _add(store, None, "d_root", [1.0, 0.0])
+    _add(store, "f1", "d_f1", [0.9, 0.1])
+    legacy = store.search_folders([1.0, 0.0], 10, "t1", "u1", [None, "f1"])
+
+    # 第一个collection合并失败时计入failed并保留源collection，重新执行后完成合并
+    get_or_create = store.client.get_or_create_collection
+    calls = []
+    def flaky_get_or_create(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return get_or_create(*args, **kwargs)
+    monkeypatch.setattr(store.client, "get_or_create_collection", flaky_get_or_create)
+    assert store.consolidate_user_collections() == {"collections": 1, "vectors": 1, "failed": 1}
+    assert store.consolidate_user_collections() == {"collections": 1, "vectors": 1, "failed": 0}
+
+    vector_store_config["collection_mode"] = "user"
+    results = store.search_folders([1.0, 0.0], 10, "t1", "u1", [None, "f1"])
+    assert [r["id"] for r in results] == [r["id"] for r in legacy]
+
+
+@pytest.mark.unit
+def test_chroma_client_and_collection_handles_are_reused(tmp_path, monkeypatch):
+    """测试同一存储路径共享Chroma客户端，重复检索复用collection句柄"""
+    store, _ = _make_store(tmp_path, monkeypatch, collection_mode="user")
+    _add(store, None, "d_root", [1.0, 0.0])
+    other, _ = _make_store(tmp_path, monkeypatch, collection_mode="user")
+    assert other.client is store.client
+
+    get_collection = Mock(wraps=store.client.get_collection)
+    monkeypatch.setattr(store.client, "get_collection", get_collection)
+    for _ in range(3):
+        assert [r["id"] for r in other.search([1.0, 0.0], 5, "t1", "u1")] == ["d_root-0"]
+    get_collection.assert_not_called()
+
+    # 句柄失效（如collection被其他进程删除）时检索失败并抛出异常，下次检索重新获取句柄
+    store.client.delete_collection(name=store.get_collection_name("t1", "u1", None))
+    with pytest.raises(Exception):
+        other.search([1.0, 0.0], 5, "t1", "u1")
+    assert other.search([1.0, 0.0], 5, "t1", "u1") == []
+    get_collection.assert_called_once()
+
+
+def _make_numpy_store(tmp_path, monkeypatch, collection_mode="user"):
+    from app.core.vector_store.numpy_vector_store import NumpyVectorStore
+    monkeypatch.setattr(settings, "VECTOR_STORE_BASE_PATH", str(tmp_path))
+    monkeypatch.setattr(NumpyVectorStore, "_collections", OrderedDict())
+    config_service = Mock(spec=ConfigService)
+    config_service.list_scope_configs.return_value = {"vector_store": {"default": {
+        "provider": "numpy", "base_url": "", "collection_prefix": "test", "collection_mode": collection_mode
+    }}}
+    return NumpyVectorStore(config_service)
+
+
+@pytest.mark.unit
+def test_numpy_store_search_filter_delete_and_reload(tmp_path, monkeypatch):
+    """测试NumPy平铺向量库的检索、过滤、删除压缩和重新加载"""
+    import numpy as np
+    from app.core.vector_store.numpy_vector_store import NumpyVectorStore
+    store = _make_numpy_store(tmp_path, monkeypatch)
+    _add(store, None, "d_root", [1.0, 0.0])
+    _add(store, "f1", "d_f1", [0.9, 0.1])
+    _add(store, "f2", "d_f2", [0.0, 1.0])
+
+    results = store.search_folders([1.0, 0.0], 10, "t1", "u1", [None, "f1"])
+    assert [r["metadata"]["document_id"] for r in results] == ["d_root", "d_f1"]
+    assert results[0]["distance"] == pytest.approx(0.0)
+    assert results[1]["distance"] == pytest.approx(0.02, abs=1e-6)
+
+    results = store.search([1.0, 0.0], 1, "t1", "u1", folder_id="f2")
+    assert [r["id"] for r in results] == ["d_f2-0"]
+
+    # 删除超过压缩阈值后切换到新段
+    assert store.delete_by_document_id("d_root", "t1", "u1")
+    collection = store._get_collection("t1", "u1")
+    assert collection.manifest["segment"] == "seg_1"
+    assert collection.manifest["count"] == 2
+    assert [r["text"] for r in store.search([0.0, 1.0], 1, "t1", "u1", folder_id="f2")] == ["d_f2 text"]
+
+    # 新实例从磁盘重新加载
+    monkeypatch.setattr(NumpyVectorStore, "_collections", OrderedDict())
+    reloaded = _make_numpy_store(tmp_path, monkeypatch)
+    results = reloaded.search_folders([1.0, 0.0], 10, "t1", "u1", [None, "f1", "f2"])
+    assert [r["id"] for r in results] == ["d_f1-0", "d_f2-0"]
+    assert [r["text"] for r in results] == ["d_f1 text", "d_f2 text"]
+    assert isinstance(reloaded._get_collection("t1", "u1").vectors, np.memmap)
+
+
+@pytest.mark.unit
+def test_numpy_store_get_vectors(tmp_path, monkeypatch):
+    """测试读取已有向量（返回副本），按ID删除后不再返回，不存在的ID忽略"""
+    import numpy as np
+    store = _make_numpy_store(tmp_path, monkeypatch)
+    _add(store, None, "d_old", [1.0, 0.0])
+
+    vectors = store.get_vectors(["d_old-0", "missing"], "t1", "u1")
+    assert list(vectors) == ["d_old-0"]
+    np.testing.assert_allclose(vectors["d_old-0"], [1.0, 0.0])
+    vectors["d_old-0"][0] = 5.0
+    np.testing.assert_allclose(store.get_vectors(["d_old-0"], "t1", "u1")["d_old-0"], [1.0, 0.0])
+
+    _add(store, None, "d_new", [0.0, 1.0])
+    assert store.delete_by_ids(["d_old-0", "missing"], "t1", "u1")
+    assert store.get_vectors(["d_old-0", "d_new-0"], "t1", "u1").keys() == {"d_new-0"}
+
+
+@pytest.mark.unit
+def test_numpy_store_collection_and_mask_caches_are_bounded(tmp_path, monkeypatch):
+    """测试collection按LRU淘汰（淘汰后从磁盘重新加载），过滤掩码缓存有上限"""
+    from app.core.vector_store.numpy_vector_store import FlatCollection, NumpyVectorStore
+    store = _make_numpy_store(tmp_path, monkeypatch, collection_mode="folder")
+    monkeypatch.setattr(settings, "NUMPY_COLLECTION_CACHE_SIZE", 2)
+    monkeypatch.setattr(FlatCollection, "MASK_CACHE_SIZE", 2)
+    for folder_id in ("f1", "f2", "f3"):
+        _add(store, folder_id, f"d_{folder_id}", [1.0, 0.0])
+
+    assert len(NumpyVectorStore._collections) == 2
+    results = store.search([1.0, 0.0], 5, "t1", "u1", folder_id="f1")
+    assert [(r["id"], r["text"]) for r in results] == [("d_f1-0", "d_f1 text")]
+    assert len(NumpyVectorStore._collections) == 2
+
+    collection = store._get_collection("t1", "u1", "f1")
+    for document_id in ("a", "b", "c", "d_f1"):
+        collection.where_mask({"document_id": document_id})
+    assert list(collection._mask_cache) == [("document_id", "c"), ("document_id", "d_f1")]
+
+
+@pytest.mark.unit
+def test_ivf_store_train_incremental_insert_and_reload(tmp_path, monkeypatch):
+    """测试IVF索引训练、增量写入、nprobe配置和重新加载"""
+    import numpy as np
+    from app.core.vector_store.ivf_vector_store import IVFCollection, IVFVectorStore
+    monkeypatch.setattr(settings, "VECTOR_STORE_BASE_PATH", str(tmp_path))
+    monkeypatch.setattr(IVFVectorStore, "_collections", OrderedDict())
+    monkeypatch.setattr(IVFCollection, "MIN_TRAIN_SIZE", 200)
+    config_service = Mock(spec=ConfigService)
+    config_service.list_scope_configs.return_value = {"vector_store": {"default": {
+        "provider": "ivf", "base_url": "", "collection_prefix": "test", "collection_mode": "user",
+        "nlist": 8, "nprobe": 8
+    }}}
+    store = IVFVectorStore(config_service)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    ids = [f"v{i}" for i in range(300)]
+    metadatas = [{"document_id": f"d{i % 3}", "chunk_index": i, "folder_id": "root"} for i in range(300)]
+    assert store.add_vectors(vectors[:250].tolist(), [None] * 250, metadatas[:250], ids[:250], "t1", "u1")
+    assert store.add_vectors(vectors[250:].tolist(), [None] * 50, metadatas[250:], ids[250:], "t1", "u1")
+
+    collection = store._get_collection("t1", "u1")
+    assert collection.is_trained and len(collection.centroids) == 8
+    assert len(collection.assignments) == 300
+
+    # nprobe等于列表数时与精确检索一致
+    query = vectors[260]
+    exact = np.argsort(((vectors - query) ** 2).sum(axis=1))[:5]
+    results = store.search_folders(query.tolist(), 5, "t1", "u1", [None])
+    assert [r["id"] for r in results] == [f"v{i}" for i in exact]
+
+    # 过滤后候选不足时自动扩大探查范围
+    results = collection.query(query, 5, {"document_id": "d1"}, nprobe=1)
+    assert len(results) == 5 and all(r["metadata"]["document_id"] == "d1" for r in results)
+
+    monkeypatch.setattr(IVFVectorStore, "_collections", OrderedDict())
+    reloaded = IVFVectorStore(config_service)._get_collection("t1", "u1")
+    reloaded.refresh()
+    assert np.array_equal(reloaded.assignments, collection.assignments)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("quantization,code_size", [("int8", 16), ("pq", 4)])
+def test_quantized_store_rescore_and_reload(tmp_path, monkeypatch, quantization, code_size):
+    """测试量化编码写入、近似筛选+float32重算与精确检索一致、重新加载编码"""
+    import numpy as np
+    from app.core.vector_store.numpy_vector_store import FlatCollection, NumpyVectorStore
+    monkeypatch.setattr(settings, "VECTOR_STORE_BASE_PATH", str(tmp_path))
+    monkeypatch.setattr(NumpyVectorStore, "_collections", OrderedDict())
+    monkeypatch.setattr(FlatCollection, "QUANTIZE_MIN_TRAIN_SIZE", 200)
+    config_service = Mock(spec=ConfigService)
+    config_service.list_scope_configs.return_value = {"vector_store": {"default": {
+        "provider": "numpy", "base_url": "", "collection_prefix": "test", "collection_mode": "user",
+        "quantization": quantization, "pq_subvectors": 4
+    }}}
+    store = NumpyVectorStore(config_service)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    ids = [f"v{i}" for i in range(300)]
+    metadatas = [{"document_id": f"d{i % 3}", "chunk_index": i, "folder_id": "root"} for i in range(300)]
+    assert store.add_vectors(vectors[:250].tolist(), [None] * 250, metadatas[:250], ids[:250], "t1", "u1")
+    assert store.add_vectors(vectors[250:].tolist(), [None] * 50, metadatas[250:], ids[250:], "t1", "u1")
+
+    collection = store._get_collection("t1", "u1")
+    assert collection.quantizer.kind == quantization
+    assert collection.codes.shape == (300, code_size)
+
+    # 重算后的距离为float32精确距离
+    query = vectors[260]
+    exact = np.argsort(((vectors - query) ** 2).sum(axis=1))[:5]
+    results = store.search_folders(query.tolist(), 5, "t1", "u1", [None])
+    assert [r["id"] for r in results] == [f"v{i}" for i in exact]
+    assert results[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+
+    monkeypatch.setattr(NumpyVectorStore, "_collections", OrderedDict())
+    reloaded = NumpyVectorStore(config_service)._get_collection("t1", "u1")
+    reloaded.refresh()
+    assert reloaded.quantizer.kind == quantization
+    assert np.array_equal(reloaded.codes, collection.codes)
+
+
+@pytest.mark.unit
+def test_parallel_search_bounded_concurrency_and_heap_merge():
+    """测试并行检索的单请求并发上限和top-k堆合并"""
+    import threading
+    import time
+    from app.core.vector_store.parallel_search import merge_top_k, run_bounded
+
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def make_call(i):
+        def call():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return [{"id": f"{i}-{j}", "distance": (i * 7 + j * 3) % 10 / 10} for j in range(3)]
+        return call
+
+    result_lists = list(run_bounded([make_call(i) for i in range(8)], max_concurrency=3))
+    assert len(result_lists) == 8
+    assert peak[0] <= 3
+
+    merged = merge_top_k(result_lists, 5)
+    expected = sorted((r for rs in result_lists for r in rs), key=lambda r: r["distance"])[:5]
+    assert [r["distance"] for r in merged] == [r["distance"] for r in expected]
+    assert merge_top_k([[{"id": "a", "distance": None}, {"id": "b", "distance": 0.1}]], 1)[0]["id"] == "b"
+
+
+@pytest.mark.unit
+def test_folder_mode_search_folders_parallel(tmp_path, monkeypatch):
+    """测试folder模式下多个collection并行检索后合并"""
+    store, _ = _make_store(tmp_path, monkeypatch, collection_mode="folder")
+    _add(store, None, "d_root", [1.0, 0.0])
+    _add(store, "f1", "d_f1", [0.9, 0.1])
+    _add(store, "f2", "d_f2", [0.0, 1.0])
+
+    results = store.search_folders([1.0, 0.0], 2, "t1", "u1", [None, "f1", "f2"])
+    assert [r["metadata"]["document_id"] for r in results] == ["d_root", "d_f1"]
@@ -0,0 +1,130 @@
+"""
+流式向量化测试
+"""
+import pytest
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from app.core.config import settings
+from app.core.storage import FilesystemStorage
+from app.repositories.document_chunk_repository import DocumentChunkRepository
+from app.services import vectorization_service as vectorization_module
+from app.services.text_splitter_service import TextSplitterService
+from app.services.vectorization_service import VectorizationService
+
+
+def _embedding_service():
+    embedding_service = Mock()
+    embedding_service.get_model_key.return_value = "local||hash"
+    embedding_service.embed_batch = AsyncMock(side_effect=lambda texts, tenant_id, stats=None: np.ones((len(texts), 3), dtype=np.float32))
+    return embedding_service
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("split_method", ["length", "paragraph", "keyword"])
+def test_streaming_splitter_matches_whole_text_split(split_method):
+    """测试跨片段边界的流式切分与整体切分结果一致"""
+    config = SimpleNamespace(split_method=split_method, chunk_size=12, chunk_overlap=3, split_keyword="##")
+    text = "## 第 1 页\n\n第一段内容比较长一些\n\n短段\n\n## 第 2 页\n\n" + "长" * 30 + "\n\n尾段"
+    splitter = TextSplitterService()
+    pieces = [text[i:i + 5] for i in range(0, len(text), 5)]
+    assert list(splitter.iter_split(pieces, config)) == splitter.split_text(text, config)
+
+
+@pytest.mark.asyncio
+async def test_vectorize_streams_batches_and_resumes_from_checkpoint(db_session, tmp_path, monkeypatch):
+    """测试按批写入，失败后重试从已提交的chunk继续"""
+    monkeypatch.setattr(settings, "VECTORIZE_BATCH_SIZE", 2)
+    monkeypatch.setattr(vectorization_module, "MARKDOWN_READ_BLOCK_SIZE", 7)
+    storage = FilesystemStorage(base_path=str(tmp_path))
+    await storage.save_file("doc.md", "\n\n".join(f"段落{i}" for i in range(5)).encode("utf-8"))
+    document = SimpleNamespace(id="doc-1", tenant_id="t1", user_id="u1", folder_id=None, markdown_path="doc.md")
+    config = SimpleNamespace(split_method="paragraph", chunk_size=4, chunk_overlap=0, split_keyword=None, chunk_revision=0)
+
+    embedding_service = _embedding_service()
+    vector_store = Mock()
+    vector_store.add_vectors.side_effect = [True, False, True, True]
+    monkeypatch.setattr(vectorization_module.VectorStoreFactory, "create_from_config", lambda tenant_id, config_service: vector_store)
+
+    chunk_repo = DocumentChunkRepository(db_session)
+    service = VectorizationService(TextSplitterService(), embedding_service, chunk_repo, config_service=None)
+
+    # 第二批写入失败：第一批已提交，作为检查点
+    assert await service.vectorize_document(document, config, storage) is False
+    assert [c.content for c in chunk_repo.get_by_document_id("doc-1")] == ["段落0", "段落1"]
+
+    # 重试时只embedding检查点之后的chunk
+    embedding_service.embed_batch.reset_mock()
+    assert await service.vectorize_document(document, config, storage) is True
+    chunks = chunk_repo.get_by_document_id("doc-1")
+    assert [c.chunk_index for c in chunks] == [0, 1, 2, 3, 4]
+    assert [call.args[0] for call in embedding_service.embed_batch.call_args_list] == [["段落2", "段落3"], ["段落4"]]
+
+
+@pytest.mark.asyncio
+async def test_new_version_reuses_unchanged_chunks(db_session, tmp_path, monkeypatch):
+    """测试新版本只embedding新增的chunk，未变化的chunk复制旧版本的向量，旧版本保持不变"""
+    storage = FilesystemStorage(base_path=str(tmp_path))
+    await storage.save_file("v1.md", "段落0\n\n段落1\n\n段落2\n\n段落3".encode("utf-8"))
+    await storage.save_file("v2.md", "段落0\n\n新段落\n\n段落2\n\n段落3".encode("utf-8"))
+    v1 = SimpleNamespace(id="doc-1", tenant_id="t1", user_id="u1", folder_id=None, markdown_path="v1.md")
+    v2 = SimpleNamespace(id="doc-2", tenant_id="t1", user_id="u1", folder_id=None, markdown_path="v2.md")
+    config = SimpleNamespace(split_method="paragraph", chunk_size=4, chunk_overlap=0, split_keyword=None, chunk_revision=0)
+
+    embedding_service = _embedding_service()
+    vector_store = Mock()
+    vector_store.add_vectors.return_value = True
+    vector_store.get_vectors.side_effect = lambda ids, **kwargs: {vid: np.full(3, 2.0, dtype=np.float32) for vid in ids}
+    monkeypatch.setattr(vectorization_module.VectorStoreFactory, "create_from_config", lambda tenant_id, config_service: vector_store)
+
+    chunk_repo = DocumentChunkRepository(db_session)
+    service = VectorizationService(TextSplitterService(), embedding_service, chunk_repo, config_service=None)
+    assert await service.vectorize_document(v1, config, storage) is True
+    old_vector_ids = {c.content: c.vector_id for c in chunk_repo.get_by_document_id("doc-1")}
+
+    embedding_service.embed_batch.reset_mock()
+    vector_store.add_vectors.reset_mock()
+    assert await service.vectorize_document(v2, config, storage, previous_document_id="doc-1") is True
+    assert [call.args[0] for call in embedding_service.embed_batch.call_args_list] == [["新段落"]]
+    assert service.last_report == {"chunks": 4, "reused": 3, "embedded": 1, "embedding_cache_hits": 0}
+    assert set(vector_store.get_vectors.call_args.kwargs["ids"]) == {old_vector_ids[c] for c in ("段落0", "段落2", "段落3")}
+
+    # 新版本使用自己的向量ID，复制的向量与旧版本一致
+    chunks = chunk_repo.get_by_document_id("doc-2")
+    assert [(c.chunk_index, c.content) for c in chunks] == [(0, "段落0"), (1, "新段落"), (2, "段落2"), (3, "段落3")]
+    assert not {c.vector_id for c in chunks} & set(old_vector_ids.values())
+    added = vector_store.add_vectors.call_args.kwargs
+    assert [m["document_id"] for m in added["metadatas"]] == ["doc-2"] * 4
+    assert added["vectors"][:, 0].tolist() == [2.0, 1.0, 2.0, 2.0]
+
+    # 旧版本的chunk留给向量化成功后的清理
+    assert [c.content for c in chunk_repo.get_by_document_id("doc-1")] == ["段落0", "段落1", "段落2", "段落3"]
+
+
+@pytest.mark.asyncio
+async def test_new_version_failure_keeps_old_version_intact(db_session, tmp_path, monkeypatch):
+    """测试新版本向量化中途失败时，旧版本的chunk和向量不受影响"""
+    monkeypatch.setattr(settings, "VECTORIZE_BATCH_SIZE", 2)
+    storage = FilesystemStorage(base_path=str(tmp_path))
+    await storage.save_file("v1.md", "段落0\n\n段落1\n\n段落2\n\n段落3".encode("utf-8"))
+    await storage.save_file("v2.md", "段落0\n\n段落1\n\n段落2\n\n新段落".encode("utf-8"))
+    v1 = SimpleNamespace(id="doc-1", tenant_id="t1", user_id="u1", folder_id=None, markdown_path="v1.md")
+    v2 = SimpleNamespace(id="doc-2", tenant_id="t1", user_id="u1", folder_id=None, markdown_path="v2.md")
+    config = SimpleNamespace(split_method="paragraph", chunk_size=4, chunk_overlap=0, split_keyword=None, chunk_revision=0)
+
+    vector_store = Mock()
+    vector_store.add_vectors.return_value = True
+    vector_store.get_vectors.side_effect = lambda ids, **kwargs: {vid: np.ones(3, dtype=np.float32) for vid in ids}
+    monkeypatch.setattr(vectorization_module.VectorStoreFactory, "create_from_config", lambda tenant_id, config_service: vector_store)
+
+    chunk_repo = DocumentChunkRepository(db_session)
+    service = VectorizationService(TextSplitterService(), _embedding_service(), chunk_repo, config_service=None)
+    assert await service.vectorize_document(v1, config, storage) is True
+    old_chunks = [(c.chunk_index, c.content, c.vector_id) for c in chunk_repo.get_by_document_id("doc-1")]
+
+    # 第一批（复用）已写入，第二批写入向量库失败
+    vector_store.add_vectors.side_effect = [True, False]
+    assert await service.vectorize_document(v2, config, storage, previous_document_id="doc-1") is False
+    assert [(c.chunk_index, c.content, c.vector_id) for c in chunk_repo.get_by_document_id("doc-1")] == old_chunks
+    assert [c.content for c in chunk_repo.get_by_document_id("doc-2")] == ["段落0", "段落1"]
+    vector_store.delete_by_document_id.assert_not_called()
@@ -0,0 +1,151 @@
+"""
+文档处理worker测试
+"""
+import asyncio
+import logging
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app import worker as worker_module
+from app.core.value_objects import DocumentTaskType
+from app.models.document_task import DocumentTask
+from app.repositories.document_task_repository import DocumentTaskRepository
+from app.services.document_task_service import DocumentTaskService
+from app.worker import DocumentTaskWorker
+
+
+def _session_factory(db_session):
+    """与测试数据库共享连接的会话工厂（worker每次领取/续约/执行都会新建会话）"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+
+
+def _enqueue(db_session, document, name):
+    """提交一个处理任务（task_data中的storage_path用于区分任务）"""
+    return DocumentTaskService(DocumentTaskRepository(db_session)).create_task(
+        document_id=document.id,
+        tenant_id=document.tenant_id,
+        user_id=document.user_id,
+        task_type=DocumentTaskType.PROCESS_DOCUMENT.value,
+        task_data={"storage_path": name, "file_type": "pdf"}
+    )
+
+
+def _task_state(db_session, task_id):
+    db_session.expire_all()
+    task = db_session.get(DocumentTask, task_id)
+    return task.status, task.locked_by, task.reason
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_claimed_tasks_and_records_results(db_session, make_document, monkeypatch):
+    """测试worker领取任务并发执行，成功、失败、异常分别记录结果"""
+    document = make_document()
+    tasks = {name: _enqueue(db_session, document, name) for name in ("ok", "failed", "error")}
+    
+    async def execute(db, task):
+        name = task.task_data["storage_path"]
+        if name == "error":
+            raise RuntimeError("boom")
+        return name == "ok"
+    worker = DocumentTaskWorker(concurrency=2, poll_seconds=0.01, session_factory=_session_factory(db_session))
+    monkeypatch.setattr(worker, "_execute", execute)
+    
+    running = asyncio.create_task(worker.run())
+    for _ in range(100):
+        states = [_task_state(db_session, task.id) for task in tasks.values()]
+        if all(status == "succeeded" or reason for status, _, reason in states):
+            break
+        await asyncio.sleep(0.01)
+    worker.stop()
+    await asyncio.wait_for(running, timeout=1)
+    
+    assert _task_state(db_session, tasks["ok"].id) == ("succeeded", None, None)
+    assert _task_state(db_session, tasks["failed"].id) == ("pending", None, "文档处理失败")
+    assert _task_state(db_session, tasks["error"].id) == ("pending", None, "任务执行异常: boom")
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_renews_lease_during_execution(db_session, make_document, monkeypatch):
+    """测试执行期间按租约的1/3间隔续约，执行完成后停止续约"""
+    task = _enqueue(db_session, make_document(), "ok")
+    worker = DocumentTaskWorker(lease_seconds=0.03, session_factory=_session_factory(db_session))
+    renewals = []
+    renew_lease = worker._renew_lease
+    
+    def renew(task_id):
+        renewals.append(task_id)
+        return renew_lease(task_id)
+    
+    async def execute(db, task):
+        await asyncio.sleep(0.1)
+        return True
+    monkeypatch.setattr(worker, "_renew_lease", renew)
+    monkeypatch.setattr(worker, "_execute", execute)
+    
+    [claimed] = worker._claim(1)
+    await asyncio.wait_for(worker.run_task(claimed), timeout=1)
+    count = len(renewals)
+    await asyncio.sleep(0.03)
+    
+    assert count >= 2 and set(renewals) == {task.id}
+    assert len(renewals) == count
+    assert _task_state(db_session, task.id) == ("succeeded", None, None)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_failure_cancels_execution(db_session, make_document, monkeypatch):
+    """测试续约失败（任务已被其他worker接管）时中止执行，且不覆盖接管worker的任务状态"""
+    task = _enqueue(db_session, make_document(), "slow")
+    worker = DocumentTaskWorker(lease_seconds=0.03, session_factory=_session_factory(db_session))
+    cancelled = asyncio.Event()
+    
+    async def execute(db, task):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return True
+    monkeypatch.setattr(worker, "_execute", execute)
+    
+    [claimed] = worker._claim(1)
+    # 租约过期后被其他worker领取
+    db_session.query(DocumentTask).filter(DocumentTask.id == task.id).update({DocumentTask.locked_by: "other-worker"})
+    db_session.commit()
+    await asyncio.wait_for(worker.run_task(claimed), timeout=1)
+    
+    assert cancelled.is_set()
+    assert _task_state(db_session, task.id) == ("running", "other-worker", None)
+
+
+@pytest.mark.asyncio
+async def test_worker_logs_parse_stats_periodically(db_session, monkeypatch, caplog):
+    """测试worker按间隔输出解析进程池统计，停止时再输出一次"""
+    stats = {
+        "pending": 1, "in_flight": 1, "queued": 0, "recycled": 0,
+        "by_type": {"pdf": {"files": 3, "failures": 1, "timeouts": 0, "parse_seconds": 4.0,
+                            "max_parse_seconds": 3.0, "wait_seconds": 0.5, "avg_parse_seconds": 2.0}},
+    }
+    monkeypatch.setattr(worker_module.parse_pool, "stats", lambda: stats)
+    worker = DocumentTaskWorker(
+        poll_seconds=0.01, session_factory=_session_factory(db_session), stats_log_seconds=0.02
+    )
+    # 其它测试加载的日志配置可能禁用了已创建的logger
+    monkeypatch.setattr(worker_module.logger, "disabled", False)
+    caplog.set_level(logging.INFO, logger="app.worker")
+    
+    def stats_lines():
+        return [r.getMessage() for r in caplog.records if r.getMessage().startswith("解析统计")]
+    
+    running = asyncio.create_task(worker.run())
+    for _ in range(100):
+        if stats_lines():
+            break
+        await asyncio.sleep(0.01)
+    periodic = len(stats_lines())
+    worker.stop()
+    await asyncio.wait_for(running, timeout=1)
+    
+    lines = stats_lines()
+    assert periodic >= 1
+    assert len(lines) == periodic + 1
+    assert "pdf: 3 个文件（失败 1，超时 0），平均解析 2.00s" in lines[-1]